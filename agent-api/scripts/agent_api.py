@@ -6,6 +6,7 @@ This Flask application provides an endpoint to send questions to a Vertex AI Age
 and receive responses. It handles authentication, session management, and response parsing.
 """
 import os
+import sys
 import json
 import requests
 from datetime import datetime
@@ -14,6 +15,10 @@ from google.oauth2 import service_account
 from google.auth.transport.requests import Request as AuthRequest
 from dotenv import load_dotenv
 
+# Shared detectIntent response extractor
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'api'))
+from agent_response import parse_response
+
 # Load environment variables from .env file if it exists
 load_dotenv()
 
@@ -111,16 +116,8 @@ def ask_agent():
                 'details': response.text
             }), response.status_code
             
-        # Parse response
-        response_data = response.json()
-        
-        # Extract response text
-        response_text = "No response from agent"
-        if "queryResult" in response_data and "responseMessages" in response_data["queryResult"]:
-            for msg in response_data["queryResult"]["responseMessages"]:
-                if "text" in msg and "text" in msg["text"]:
-                    response_text = "\n".join(msg["text"]["text"])
-                    break
+        # Extract every text message in one pass
+        response_text = parse_response(response.content).text
         
         # Return the response
         return jsonify({
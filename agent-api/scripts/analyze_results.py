@@ -7,6 +7,7 @@ It provides statistics and insights on response quality, response time, and erro
 """
 
 import os
+import sys
 import csv
 import glob
 import argparse
@@ -15,10 +16,16 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from collections import Counter, defaultdict
 
+# Shared answer outcome classifier
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'api'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'dashboard'))
+from outcomes import ERROR, outcome_column
+from result_types import apply_schema, read_results
+
 def load_results(file_path):
-    """Load results from a CSV file."""
+    """Load results from a CSV or Parquet file, with compact column types (result_types.py)."""
     try:
-        df = pd.read_csv(file_path)
+        df = read_results(file_path)
         return df
     except Exception as e:
         print(f"Error loading file {file_path}: {e}")
@@ -32,7 +39,9 @@ def analyze_results(df):
     
     # Basic statistics
     total_questions = len(df)
-    error_count = df['answer'].str.startswith('ERROR').sum()
+    df['outcome'] = outcome_column(df)
+    error_count = int((df['outcome'] == ERROR).sum())
+    outcome_counts = df['outcome'].value_counts()
     success_rate = ((total_questions - error_count) / total_questions) * 100
     
     # Response time statistics
@@ -42,12 +51,12 @@ def analyze_results(df):
     max_response_time = df['response_time_ms'].max()
     
     # Group by category and difficulty
-    category_stats = df.groupby('category').agg({
+    category_stats = df.groupby('category', observed=True).agg({
         'question_number': 'count',
         'response_time_ms': 'mean'
     }).rename(columns={'question_number': 'count', 'response_time_ms': 'avg_response_time_ms'})
     
-    difficulty_stats = df.groupby('difficulty').agg({
+    difficulty_stats = df.groupby('difficulty', observed=True).agg({
         'question_number': 'count',
         'response_time_ms': 'mean'
     }).rename(columns={'question_number': 'count', 'response_time_ms': 'avg_response_time_ms'})
@@ -57,6 +66,9 @@ def analyze_results(df):
     print(f"Total questions: {total_questions}")
     print(f"Successful responses: {total_questions - error_count} ({success_rate:.2f}%)")
     print(f"Error responses: {error_count} ({100 - success_rate:.2f}%)")
+    print("\n----- Outcomes -----")
+    for outcome, count in outcome_counts.items():
+        print(f"{outcome}: {count} ({count / total_questions * 100:.2f}%)")
     print("\n----- Response Time Statistics -----")
     print(f"Average response time: {avg_response_time:.2f} ms")
     print(f"Median response time: {median_response_time:.2f} ms")
@@ -73,6 +85,7 @@ def analyze_results(df):
         'total_questions': total_questions,
         'error_count': error_count,
         'success_rate': success_rate,
+        'outcome_counts': outcome_counts,
         'avg_response_time': avg_response_time,
         'median_response_time': median_response_time,
         'min_response_time': min_response_time,
@@ -91,7 +104,7 @@ def generate_visualizations(analysis_results, output_dir):
     
     # 1. Response time distribution
     plt.figure(figsize=(10, 6))
-    plt.hist(df['response_time_ms'], bins=20, alpha=0.7)
+    plt.hist(df['response_time_ms'].dropna(), bins=20, alpha=0.7)
     plt.title('Response Time Distribution')
     plt.xlabel('Response Time (ms)')
     plt.ylabel('Frequency')
@@ -101,7 +114,7 @@ def generate_visualizations(analysis_results, output_dir):
     
     # 2. Response time by category
     plt.figure(figsize=(12, 6))
-    category_times = df.groupby('category')['response_time_ms'].mean().sort_values(ascending=False)
+    category_times = df.groupby('category', observed=True)['response_time_ms'].mean().sort_values(ascending=False)
     category_times.plot(kind='bar')
     plt.title('Average Response Time by Category')
     plt.xlabel('Category')
@@ -114,7 +127,7 @@ def generate_visualizations(analysis_results, output_dir):
     
     # 3. Response time by difficulty
     plt.figure(figsize=(10, 6))
-    difficulty_times = df.groupby('difficulty')['response_time_ms'].mean()
+    difficulty_times = df.groupby('difficulty', observed=True)['response_time_ms'].mean()
     difficulty_times.plot(kind='bar')
     plt.title('Average Response Time by Difficulty')
     plt.xlabel('Difficulty')
@@ -171,7 +184,7 @@ def main():
             print("No valid data found in any files.")
             return 1
         
-        combined_df = pd.concat(dfs, ignore_index=True)
+        combined_df = apply_schema(pd.concat(dfs, ignore_index=True))
         results = analyze_results(combined_df)
         generate_visualizations(results, args.dir)
     elif args.file:
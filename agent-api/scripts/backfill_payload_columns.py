@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Backfill extracted response columns for existing webhook result rows
+
+Older rows carry the raw detectIntent JSON in full_response (or the compact
+record in response_record). This tool reads those rows, fills the extracted
+columns from src/webhook/payload_store.py (match type, page, playbook,
+payload_hash, ...), archives each distinct raw payload once in the payload
+side store, and optionally clears the legacy columns to reclaim storage.
+
+Rows are updated with a single MERGE from a staging table, keyed on
+(question, timestamp).
+
+Usage:
+    python backfill_payload_columns.py --dry-run
+    python backfill_payload_columns.py --store table --clear-raw
+    python backfill_payload_columns.py --store blobs --blob-dir ./raw_payloads
+"""
+
+import os
+import sys
+import gzip
+import json
+import argparse
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(script_dir, '..', '..'))
+sys.path.append(os.path.join(project_root, 'src', 'webhook'))
+
+from agent_response import AgentResponse, parse_response
+from payload_store import (RESPONSE_COLUMNS, BlobPayloadStore, TablePayloadStore, PayloadLogger,
+                           DEFAULT_BLOB_DIR, response_columns)
+
+def ensure_columns(client, table_ref):
+    """Add the extracted columns to a table created before they existed."""
+    from google.cloud import bigquery
+
+    table = client.get_table(table_ref)
+    existing = {field.name for field in table.schema}
+    missing = [bigquery.SchemaField(name, field_type, mode="NULLABLE")
+               for name, field_type in RESPONSE_COLUMNS if name not in existing]
+    if "response_record" not in existing:
+        missing.append(bigquery.SchemaField("response_record", "STRING", mode="NULLABLE"))
+    if missing:
+        table.schema = list(table.schema) + missing
+        client.update_table(table, ["schema"])
+        print(f"Added columns: {', '.join(field.name for field in missing)}")
+
+def fetch_rows(client, table_ref, limit=None):
+    """Rows that still have a legacy payload and no extracted columns yet."""
+    columns = {field.name for field in client.get_table(table_ref).schema}
+    record_column = "response_record" if "response_record" in columns else "CAST(NULL AS STRING)"
+    # A dry run may look at a table that has not been given the new columns yet
+    pending = "message_count IS NULL" if "message_count" in columns else "TRUE"
+    query = f"""
+    SELECT question, timestamp, full_response, {record_column} AS response_record
+    FROM `{table_ref}`
+    WHERE {pending}
+      AND (full_response IS NOT NULL OR {record_column} IS NOT NULL)
+    """
+    if limit:
+        query += f"\nLIMIT {int(limit)}"
+    return list(client.query(query).result())
+
+def extract_row(row, payload_logger):
+    """
+    Build the staging row for one result row.
+
+    Returns:
+        tuple: (staging row dict, raw payload size in bytes)
+    """
+    if row['full_response']:
+        payload = json.loads(row['full_response'])
+        record = parse_response(payload)
+        digest = payload_logger.log(payload)
+        raw_bytes = len(row['full_response'].encode('utf-8'))
+    else:
+        record = AgentResponse.from_dict(json.loads(row['response_record']))
+        digest = None
+        raw_bytes = len(row['response_record'].encode('utf-8'))
+
+    staged = {'question': row['question'], 'timestamp': row['timestamp'].isoformat()}
+    staged.update(response_columns(record, digest))
+    return staged, raw_bytes
+
+def merge_columns(client, table_ref, staged_rows, clear_raw):
+    """Load staged rows into a staging table and MERGE them into the results table."""
+    from google.cloud import bigquery
+
+    staging_ref = f"{table_ref}_backfill_staging"
+    schema = [bigquery.SchemaField("question", "STRING"), bigquery.SchemaField("timestamp", "TIMESTAMP")]
+    schema += [bigquery.SchemaField(name, field_type) for name, field_type in RESPONSE_COLUMNS]
+    job_config = bigquery.LoadJobConfig(schema=schema, write_disposition="WRITE_TRUNCATE")
+    client.load_table_from_json(staged_rows, staging_ref, job_config=job_config).result()
+
+    assignments = [f"{name} = s.{name}" for name, _ in RESPONSE_COLUMNS]
+    if clear_raw:
+        assignments += ["full_response = NULL", "response_record = NULL"]
+    client.query(f"""
+    MERGE `{table_ref}` t
+    USING `{staging_ref}` s
+    ON t.question = s.question AND t.timestamp = s.timestamp
+    WHEN MATCHED THEN UPDATE SET {', '.join(assignments)}
+    """).result()
+    client.delete_table(staging_ref, not_found_ok=True)
+
+def main():
+    """Backfill extracted columns and archive raw payloads."""
+    parser = argparse.ArgumentParser(description="Backfill extracted response columns for webhook results")
+    parser.add_argument("--project", type=str, default=os.environ.get('PROJECT_ID', 'heuristicsai'))
+    parser.add_argument("--dataset", type=str, default=os.environ.get('BIGQUERY_DATASET', 'conversations'))
+    parser.add_argument("--table", type=str, default=os.environ.get('BIGQUERY_TABLE', 'bia'))
+    parser.add_argument("--store", choices=['table', 'blobs', 'none'], default='table',
+                        help="Where to archive raw payloads")
+    parser.add_argument("--blob-dir", type=str, default=DEFAULT_BLOB_DIR,
+                        help="Directory for --store blobs")
+    parser.add_argument("--sample-rate", type=float, default=1.0,
+                        help="Share of distinct payloads to archive")
+    parser.add_argument("--clear-raw", action="store_true",
+                        help="Clear full_response/response_record once columns are filled")
+    parser.add_argument("--limit", type=int, default=None, help="Only backfill this many rows")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Report the storage effect without writing anything")
+    args = parser.parse_args()
+
+    from google.cloud import bigquery
+
+    client = bigquery.Client(project=args.project)
+    table_ref = f"{args.project}.{args.dataset}.{args.table}"
+
+    if args.dry_run or args.store == 'none':
+        store = None
+    elif args.store == 'table':
+        store = TablePayloadStore(client, f"{table_ref}_payloads")
+    else:
+        store = BlobPayloadStore(args.blob_dir)
+    payload_logger = PayloadLogger(store, args.sample_rate)
+
+    if not args.dry_run:
+        ensure_columns(client, table_ref)
+    rows = fetch_rows(client, table_ref, args.limit)
+    print(f"Rows to backfill in {table_ref}: {len(rows)}")
+    if not rows:
+        return 0
+
+    staged = {}
+    raw_total = 0
+    distinct = {}
+    for row in rows:
+        staged_row, raw_bytes = extract_row(row, payload_logger)
+        raw_total += raw_bytes
+        if row['full_response'] and staged_row['payload_hash'] not in distinct:
+            distinct[staged_row['payload_hash']] = len(gzip.compress(row['full_response'].encode('utf-8')))
+        # MERGE needs at most one source row per key
+        staged[(staged_row['question'], staged_row['timestamp'])] = staged_row
+
+    compressed_total = sum(distinct.values())
+    print(f"Legacy payload bytes: {raw_total / 1024:.1f} KiB")
+    print(f"Distinct raw payloads: {len(distinct)} "
+          f"({compressed_total / 1024:.1f} KiB gzip'd, {compressed_total / max(raw_total, 1) * 100:.1f}% of legacy)")
+
+    if args.dry_run:
+        print("Dry run: nothing written")
+        return 0
+
+    merge_columns(client, table_ref, list(staged.values()), args.clear_raw)
+    print(f"Backfilled {len(staged)} rows" + (" and cleared legacy payload columns" if args.clear_raw else ""))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
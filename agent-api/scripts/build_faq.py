@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Build the API's FAQ answer store from recorded results
+
+Collects every recorded question/answer pair, keeps only vetted answers,
+and writes a versioned store (src/api/faq_store.json) that the API serves
+from its FAQ fast path.
+
+An answer is vetted when:
+- the question's catalog difficulty is in --difficulties (Easy by default)
+- its outcome (src/api/outcomes.py) is answered: not an error, empty answer,
+  specialist handoff, refusal or clarifying question
+- it is long enough to be a real answer
+- it does not end by offering a follow-up ("Would you like me to...?"),
+  which the agent could not pick up because it never saw the exchange
+
+When a question has several vetted answers, the most recent one is kept.
+The rules only pick candidates; a person approves what is served, in a
+reviews file:
+
+    {"approved": ["What is Looker?"], "rejected": ["What is Omni?"]}
+
+Rejected questions are always dropped. Candidates nobody has approved are
+written with review_status "pending", which the API does not serve, so the
+store doubles as the review queue; --allow-unreviewed approves them on the
+rules alone. Every entry expires after --ttl-days and must be rebuilt
+(re-vetted) to be served again.
+
+Usage:
+    python build_faq.py
+    python build_faq.py --difficulties Easy,Medium --ttl-days 30
+    python build_faq.py --allow-unreviewed
+"""
+
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import hashlib
+import argparse
+from datetime import datetime
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(script_dir, '..', '..'))
+sys.path.append(os.path.join(project_root, 'src', 'api'))
+
+from faq import DEFAULT_FAQ_FILE, normalize_question, offers_follow_up
+from outcomes import ANSWERED, OUTCOMES, classify
+from question_catalog import extract_questions, DEFAULT_CATALOG_PATH
+
+RESULT_GLOBS = [
+    os.path.join(project_root, 'agent-api', 'data', '*.csv'),
+    os.path.join(project_root, 'agent-api', 'scripts', '*results*.csv'),
+]
+DEFAULT_REVIEWS_FILE = os.path.join(project_root, 'agent-api', 'data', 'faq_reviews.json')
+
+MIN_ANSWER_CHARS = 120
+
+def rejection_reason(answer, outcome=None):
+    """Return why an answer cannot be served from the FAQ, or None if it is vetted."""
+    answer = (answer or '').strip()
+    outcome = outcome if outcome in OUTCOMES else classify(answer)
+    if outcome != ANSWERED:
+        return outcome
+    if len(answer) < MIN_ANSWER_CHARS:
+        return 'too short'
+    if offers_follow_up(answer):
+        return 'offers follow-up'
+    return None
+
+def load_candidates(difficulties):
+    """
+    Gather vetted answers for catalog questions at the given difficulties.
+
+    Returns:
+        tuple: (candidates keyed by normalized question, rejection counts)
+    """
+    catalog = {normalize_question(q): (q, category, difficulty)
+               for q, category, difficulty in extract_questions(DEFAULT_CATALOG_PATH)}
+
+    candidates = {}
+    rejected = {}
+    for pattern in RESULT_GLOBS:
+        for file_path in sorted(glob.glob(pattern)):
+            with open(file_path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    key = normalize_question(row.get('question') or '')
+                    if key not in catalog or catalog[key][2] not in difficulties:
+                        continue
+                    reason = rejection_reason(row.get('answer'), row.get('outcome'))
+                    if reason:
+                        rejected[reason] = rejected.get(reason, 0) + 1
+                        continue
+                    # Result files without timestamps sort first, so dated runs win
+                    recorded_at = row.get('timestamp') or ''
+                    current = candidates.get(key)
+                    if current is None or recorded_at >= current['recorded_at']:
+                        question, category, difficulty = catalog[key]
+                        candidates[key] = {
+                            'question': question,
+                            'answer': row['answer'].strip(),
+                            'category': category,
+                            'difficulty': difficulty,
+                            'source': os.path.relpath(file_path, project_root),
+                            'recorded_at': recorded_at,
+                            'vetted_runs': (current or {}).get('vetted_runs', 0) + 1,
+                        }
+                    else:
+                        current['vetted_runs'] += 1
+    return candidates, rejected
+
+def load_reviews(path):
+    if not path or not os.path.exists(path):
+        return set(), set()
+    with open(path) as f:
+        reviews = json.load(f)
+    return ({normalize_question(q) for q in reviews.get('approved', [])},
+            {normalize_question(q) for q in reviews.get('rejected', [])})
+
+def main():
+    """Build and write the FAQ store."""
+    parser = argparse.ArgumentParser(description="Build the FAQ answer store from recorded results")
+    parser.add_argument("--output", "-o", type=str, default=DEFAULT_FAQ_FILE,
+                        help="Where to write the FAQ store")
+    parser.add_argument("--difficulties", "-d", type=str, default="Easy",
+                        help="Comma-separated catalog difficulties eligible for the FAQ")
+    parser.add_argument("--ttl-days", type=float, default=90,
+                        help="Days until each entry expires and must be re-vetted")
+    parser.add_argument("--reviews", type=str, default=DEFAULT_REVIEWS_FILE,
+                        help="JSON file with 'approved' and 'rejected' question lists")
+    parser.add_argument("--allow-unreviewed", action="store_true",
+                        help="Serve rule-vetted answers that are not approved in the reviews file")
+    args = parser.parse_args()
+
+    difficulties = {d.strip() for d in args.difficulties.split(',')}
+    candidates, rejected = load_candidates(difficulties)
+    approved, rejected_by_review = load_reviews(args.reviews)
+
+    now = time.time()
+    entries = []
+    for key in sorted(candidates):
+        if key in rejected_by_review:
+            continue
+        entry = candidates[key]
+        entry['id'] = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+        if key in approved:
+            entry['review_status'], entry['reviewed_by'] = 'approved', 'reviewer'
+        elif args.allow_unreviewed:
+            entry['review_status'], entry['reviewed_by'] = 'approved', 'rules'
+        else:
+            entry['review_status'], entry['reviewed_by'] = 'pending', None
+        entry['vetted_at'] = now
+        entry['expires_at'] = now + args.ttl_days * 86400
+        entries.append(entry)
+
+    content_hash = hashlib.sha1(
+        json.dumps([(e['question'], e['answer']) for e in entries]).encode('utf-8')
+    ).hexdigest()[:8]
+    store = {
+        'version': f"{datetime.now().strftime('%Y%m%d')}-{content_hash}",
+        'built_at': datetime.now().isoformat(),
+        'difficulties': sorted(difficulties),
+        'entries': entries,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(store, f, indent=1)
+        f.write('\n')
+
+    served = sum(1 for e in entries if e['review_status'] == 'approved')
+    print(f"FAQ store {store['version']}: {len(entries)} answers, {served} approved")
+    if served < len(entries):
+        print(f"{len(entries) - served} answers await review; approve them in {os.path.relpath(args.reviews, project_root)}")
+    print(f"Rejected recorded answers: {rejected}")
+    if rejected_by_review:
+        print(f"Rejected by review: {len(rejected_by_review)}")
+    print(f"Saved to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Build a versioned question set for the webhook
+
+Writes <name>.json in the format read by src/webhook/question_sets.py: the
+questions with their category and difficulty, optional sampling weights,
+a version string and a content hash the webhook validates on load.
+
+Sources:
+- the categorized catalog markdown (agent-api/tests/test_questions.md), default
+- a plain text file with one question per line (--text-file)
+
+Usage:
+    python build_question_set.py --name catalog
+    python build_question_set.py --name smoke --text-file smoke_questions.txt
+    python build_question_set.py --name catalog \\
+        --weights '{"difficulty": {"Easy": 0.5}}' --upload gs://my-bucket/question_sets
+"""
+
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(script_dir, '..', '..'))
+sys.path.append(os.path.join(project_root, 'src', 'webhook'))
+
+from question_sets import DEFAULT_SET_DIR, QuestionSet, content_hash
+from question_catalog import extract_questions, DEFAULT_CATALOG_PATH
+
+def load_text_questions(file_path):
+    with open(file_path) as f:
+        return [{"question": line.strip(), "category": None, "difficulty": None}
+                for line in f if line.strip()]
+
+def build_set(name, questions, weights):
+    """Assemble and validate a question set document."""
+    digest = content_hash(questions, weights)
+    data = {
+        "name": name,
+        "version": f"{datetime.now().strftime('%Y%m%d')}-{digest[:8]}",
+        "built_at": datetime.now().isoformat(),
+        "content_hash": digest,
+        "weights": weights,
+        "questions": questions,
+    }
+    QuestionSet(data)
+    return data
+
+def upload(path, uri, name):
+    """Copy the set to gs://bucket/prefix/<name>.json."""
+    from google.cloud import storage
+
+    bucket_name, _, prefix = uri[len('gs://'):].partition('/')
+    object_name = f"{prefix.rstrip('/')}/{name}.json" if prefix else f"{name}.json"
+    blob = storage.Client().bucket(bucket_name).blob(object_name)
+    blob.upload_from_filename(path, content_type='application/json')
+    print(f"Uploaded to gs://{bucket_name}/{object_name}")
+
+def main():
+    """Build and write the question set."""
+    parser = argparse.ArgumentParser(description="Build a versioned question set for the webhook")
+    parser.add_argument("--name", "-n", type=str, default="catalog", help="Question set name")
+    parser.add_argument("--catalog", "-c", type=str, default=DEFAULT_CATALOG_PATH,
+                        help="Categorized question markdown")
+    parser.add_argument("--text-file", type=str, default=None,
+                        help="Plain text file with one question per line (instead of the catalog)")
+    parser.add_argument("--weights", "-w", type=str, default="{}",
+                        help='JSON sampling weights, e.g. {"difficulty": {"Easy": 0.5}, "category": {"Omni": 2}}')
+    parser.add_argument("--output-dir", "-o", type=str, default=DEFAULT_SET_DIR,
+                        help="Directory to write <name>.json to")
+    parser.add_argument("--upload", type=str, default=None,
+                        help="Also upload to gs://bucket/prefix")
+    args = parser.parse_args()
+
+    if args.text_file:
+        questions = load_text_questions(args.text_file)
+    else:
+        questions = [{"question": q, "category": category, "difficulty": difficulty}
+                     for q, category, difficulty in extract_questions(args.catalog)]
+    data = build_set(args.name, questions, json.loads(args.weights))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"{args.name}.json")
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=1)
+        f.write('\n')
+    print(f"Question set {args.name} {data['version']}: {len(questions)} questions")
+    print(f"Saved to {path}")
+
+    if args.upload:
+        upload(path, args.upload, args.name)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
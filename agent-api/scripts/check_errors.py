@@ -5,8 +5,13 @@ Check for errors in the test results
 
 import csv
 import os
+import sys
 import glob
 
+# Shared answer outcome classifier
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'api'))
+from outcomes import ERROR, OUTCOMES, classify
+
 def find_error_questions():
     error_questions = []
     
@@ -22,8 +27,11 @@ def find_error_questions():
                 difficulty = row.get('difficulty', '')
                 answer = row.get('answer', '')
                 
-                # Check if the answer indicates an error
-                if "error" in answer.lower() or "failed" in answer.lower() or "status code" in answer.lower():
+                # Use the recorded outcome, or classify older rows that have none
+                outcome = row.get('outcome')
+                if outcome not in OUTCOMES:
+                    outcome = classify(answer)
+                if outcome == ERROR:
                     error_questions.append({
                         'question': question,
                         'category': category,
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Multi-turn follow-up shared by the runners
+
+Many answers are a specialist handoff ("I'll route you to Isabella, our dbt
+expert") or a clarifying question, so the first reply's response_time_ms is
+not the time it takes to get a useful answer. converse() keeps talking in
+the same session until the agent gives a substantive answer: it replies to
+a handoff by accepting it and to a clarifying question by asking for a
+general answer, up to a turn limit.
+
+Every turn is timed, and a Conversation reports the first reply's latency,
+the total latency up to the final answer, the number of turns and the
+playbook that gave the final answer. Each turn runs inside a
+phase_timing.measure() block, so an ask() that goes through a TimedSession
+or an instrumented transport also reports the first reply's auth, DNS,
+connect, TLS, send, TTFB and download times and whether its connection was
+cold or warm.
+
+The ask callable does one agent call in a fixed session:
+
+    ask(text) -> (HTTP status code or None, AgentResponse)
+
+dialogflow_ask() builds one for a Dialogflow CX session, using the transport
+configured by the API's environment variables (env_transport()).
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'api'))
+from agent_response import AgentResponse, parse_response
+from dialogflow_transport import DetectIntentError, get_transport
+from outcomes import ANSWERED, CLARIFYING, HANDOFF, classify_record
+from phase_timing import PHASE_FIELDS, instrument, measure
+
+# What the runner says back, by outcome of the agent's last reply
+FOLLOW_UPS = {
+    HANDOFF: "Yes, please connect me.",
+    CLARIFYING: "I don't have more details. Please give me a general answer with an example.",
+}
+
+DEFAULT_MAX_TURNS = 3
+
+
+class Turn:
+    """One message sent and the agent's reply."""
+
+    def __init__(self, text, answer, outcome, latency_ms, status_code=None, playbook=None, timing=None):
+        self.text = text
+        self.answer = answer
+        self.outcome = outcome
+        self.latency_ms = latency_ms
+        self.status_code = status_code
+        self.playbook = playbook
+        self.timing = timing
+
+    def phases(self):
+        """Phase columns (see phase_timing.py), empty when the turn was not timed."""
+        return self.timing.row() if self.timing else dict.fromkeys(PHASE_FIELDS)
+
+    def to_dict(self):
+        return {
+            'text': self.text,
+            'answer': self.answer,
+            'outcome': self.outcome,
+            'latency_ms': self.latency_ms,
+            'status_code': self.status_code,
+            'playbook': self.playbook,
+        }
+
+
+class Conversation:
+    """All turns for one question."""
+
+    def __init__(self, question, turns=None):
+        self.question = question
+        self.turns = turns or []
+
+    @property
+    def final(self):
+        return self.turns[-1]
+
+    @property
+    def first_reply_ms(self):
+        return self.turns[0].latency_ms
+
+    @property
+    def total_ms(self):
+        """Agent time from the question to the final answer, across all turns."""
+        return sum(turn.latency_ms for turn in self.turns)
+
+    @property
+    def answered(self):
+        return self.final.outcome == ANSWERED
+
+    def row(self):
+        """
+        Result columns for this conversation.
+
+        answer and outcome describe the final reply; response_time_ms stays
+        the first reply's latency (time-to-first-reply). time_to_answer_ms is
+        the total across turns, left empty when no turn produced an answer.
+        The phase columns are the first reply's, like response_time_ms.
+        """
+        row = {
+            'answer': self.final.answer,
+            'outcome': self.final.outcome,
+            'response_time_ms': self.first_reply_ms,
+            'first_outcome': self.turns[0].outcome,
+            'turns': len(self.turns),
+            'time_to_answer_ms': self.total_ms if self.answered else None,
+            'total_time_ms': self.total_ms,
+            'turn_latencies_ms': ';'.join(str(turn.latency_ms) for turn in self.turns),
+            'final_playbook': self.final.playbook,
+        }
+        row.update(self.turns[0].phases())
+        return row
+
+
+# Columns added by Conversation.row() beyond the single-turn runners' columns
+CONVERSATION_FIELDS = ['outcome', 'first_outcome', 'turns', 'time_to_answer_ms', 'total_time_ms',
+                       'turn_latencies_ms', 'final_playbook'] + PHASE_FIELDS
+
+
+def converse(ask, question, max_turns=DEFAULT_MAX_TURNS, follow_ups=FOLLOW_UPS):
+    """
+    Ask a question and follow up until the agent answers.
+
+    Args:
+        ask (callable): text -> (status code, AgentResponse), bound to one session
+        question (str): The opening question
+        max_turns (int): Most messages to send, including the question (1 = no follow-ups)
+        follow_ups (dict): Reply to send for each outcome that warrants one
+
+    Returns:
+        Conversation: Every turn, in order
+    """
+    conversation = Conversation(question)
+    text = question
+    while True:
+        with measure() as timing:
+            status_code, record = ask(text)
+        outcome = classify_record(record, status_code)
+        conversation.turns.append(Turn(text, record.text, outcome, int(timing.total_ms), status_code,
+                                       record.playbook, timing))
+
+        text = follow_ups.get(outcome)
+        if text is None or len(conversation.turns) >= max_turns:
+            return conversation
+        print(f"  {outcome} after turn {len(conversation.turns)}, following up: {text}")
+
+
+def error_record(message):
+    """AgentResponse carrying an error message, for calls that raised."""
+    return AgentResponse(messages=[message])
+
+
+def env_transport():
+    """
+    The process-wide Dialogflow transport, configured like the API server
+    (PROJECT_ID, LOCATION, AGENT_ID, GOOGLE_APPLICATION_CREDENTIALS,
+    DIALOGFLOW_TRANSPORT, DIALOGFLOW_TIMEOUT), with per-phase timing.
+    """
+    credentials_file = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
+    if not credentials_file:
+        raise RuntimeError("GOOGLE_APPLICATION_CREDENTIALS must be set")
+    return instrument(get_transport(
+        os.environ.get('DIALOGFLOW_TRANSPORT', 'rest'),
+        os.environ.get('PROJECT_ID', 'heuristicsai'),
+        os.environ.get('LOCATION', 'us-central1'),
+        os.environ.get('AGENT_ID', 'fa0bd62b-3fc7-46c8-9d55-3a18d9812a70'),
+        credentials_file
+    ))
+
+
+def dialogflow_ask(transport, session_id):
+    """
+    Bind one Dialogflow session to the ask() form converse() uses.
+
+    Returns:
+        callable: text -> (status code or None, AgentResponse)
+    """
+    def ask(text):
+        try:
+            return 200, parse_response(transport.detect_intent(session_id, text))
+        except DetectIntentError as e:
+            return e.status_code, error_record(f"Agent API call failed with status code {e.status_code}: {e.details}")
+        except Exception as e:
+            return None, error_record(f"Error sending request: {str(e)}")
+    return ask
@@ -13,8 +13,17 @@ import pandas as pd
 import numpy as np
 import glob
 import os
+import sys
 from datetime import datetime
 
+# Shared answer outcome classifier
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'api'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'dashboard'))
+from answer_charts import add_answer_columns, answer_time_text, show_answer_metrics, show_time_to_answer
+from answer_store import AnswerStore, read_metrics
+from outcomes import ERROR, outcome_column
+from result_types import apply_schema, drop_unused_categories
+
 # Page configuration
 st.set_page_config(
     page_title="Vertex AI Agent Analytics", 
@@ -80,19 +89,28 @@ including response times, success rates, and performance by category and difficu
 # Load data
 @st.cache_data
 def load_all_data():
-    """Load all test results CSV files and combine them into a single DataFrame."""
+    """
+    Load all test results CSV files and combine them into a single DataFrame.
+    
+    Returns:
+        tuple: (pd.DataFrame of metrics, AnswerStore with the answer text), or (None, None)
+    """
     csv_files = glob.glob("*test_results*.csv")
     
     if not csv_files:
         st.error("No test result files found. Please make sure CSV files with 'test_results' in the name exist in the current directory.")
-        return None
+        return None, None
     
     dfs = []
     file_info = []
     
+    # Answer text goes to an on-demand store; the frame keeps the metrics (answer_store.py)
+    csv_files.sort()
+    answers = AnswerStore.for_files(csv_files)
+    
     for file in csv_files:
         try:
-            df = pd.read_csv(file)
+            df = read_metrics(file, answers)
             # Add file source column
             df['source_file'] = file
             
@@ -119,18 +137,20 @@ def load_all_data():
     
     if not dfs:
         st.error("No valid data found in any files.")
-        return None
+        return None, None
     
-    combined_df = pd.concat(dfs, ignore_index=True)
+    # Typed again so columns stay categorical across files (result_types.py)
+    combined_df = apply_schema(pd.concat(dfs, ignore_index=True))
+    answers.finish()
     
     # Add file information to session state
     st.session_state['file_info'] = file_info
     
-    return combined_df
+    return combined_df, answers
 
 # Main content area
 try:
-    df = load_all_data()
+    df, answers = load_all_data()
     
     if df is None:
         st.stop()
@@ -139,13 +159,13 @@ try:
     if 'response_time_ms' in df.columns:
         df['response_time_ms'] = pd.to_numeric(df['response_time_ms'], errors='coerce')
     
-    # Check for success in answers
-    if 'answer' in df.columns:
-        df['is_error'] = df['answer'].astype(str).str.startswith('ERROR')
-    elif 'success' in df.columns:
-        df['is_error'] = ~df['success']
-    else:
-        df['is_error'] = False
+    # Classify every answer: the recorded outcome column, else the answer text
+    # and success flag (see outcomes.py)
+    df['outcome'] = outcome_column(df)
+    df['is_error'] = df['outcome'] == ERROR
+    
+    # Time to a substantive answer and turns taken (see answer_charts.py)
+    df = add_answer_columns(df)
         
     # Sidebar
     st.sidebar.title("Filters")
@@ -180,8 +200,8 @@ try:
         if selected_difficulties:
             df = df[df['difficulty'].isin(selected_difficulties)]
     
-    # Time range filter if timestamps are available
-    if 'timestamp' in df.columns:
+    # Time range filter if timestamps are available (parsed by result_types.apply_schema())
+    if 'timestamp' in df.columns and df['timestamp'].notna().any():
         min_date = df['timestamp'].min()
         max_date = df['timestamp'].max()
         date_range = st.sidebar.date_input(
@@ -219,10 +239,13 @@ try:
             text_query = search_text.lower()
             text_mask = (
                 df['question'].astype(str).str.lower().str.contains(text_query) | 
-                df['answer'].astype(str).str.lower().str.contains(text_query)
+                df['row_id'].isin(answers.search(text_query))
             )
             df = df[text_mask]
     
+    # Filtered-out categories would still show up in counts and charts
+    df = drop_unused_categories(df)
+    
     # Main dashboard content
     if len(df) == 0:
         st.warning("No data matches the selected filters. Please adjust your filters.")
@@ -249,6 +272,8 @@ try:
         median_time = df['response_time_ms'].median()
         st.metric("Median Response Time", f"{median_time:.1f} ms")
     
+    show_answer_metrics(df)
+    
     # Response Time Analysis
     st.markdown('<div class="sub-header">Response Time Analysis</div>', unsafe_allow_html=True)
     
@@ -275,7 +300,7 @@ try:
     with col2:
         # Response time by category
         if 'category' in df.columns:
-            category_stats = df.groupby('category')['response_time_ms'].mean().reset_index()
+            category_stats = df.groupby('category', observed=True)['response_time_ms'].mean().reset_index()
             category_stats = category_stats.sort_values('response_time_ms', ascending=False)
             
             fig = px.bar(
@@ -299,13 +324,16 @@ try:
         else:
             st.info("Category information not available in the dataset.")
     
+    # Time to answer: a handoff or clarifying reply is fast but not an answer
+    show_time_to_answer(df, "#4285F4", dict(plot_bgcolor="white"))
+    
     # Second row of charts
     col1, col2 = st.columns(2)
     
     with col1:
         # Response time by difficulty
         if 'difficulty' in df.columns:
-            difficulty_stats = df.groupby('difficulty')['response_time_ms'].mean().reset_index()
+            difficulty_stats = df.groupby('difficulty', observed=True)['response_time_ms'].mean().reset_index()
             
             # Sort by difficulty level if possible
             difficulty_order = ['Easy', 'Medium', 'Difficult', 'Extremely Difficult']
@@ -462,7 +490,7 @@ try:
                 st.markdown(f"**{selected_row['question']}**")
                 
                 st.markdown("### Answer")
-                st.markdown(selected_row['answer'])
+                st.markdown(answers.get(selected_row['row_id']) or '')
             
             with col2:
                 st.markdown("### Details")
@@ -474,6 +502,8 @@ try:
                 
                 st.markdown(f"**Response Time:** {selected_row['response_time_ms']:.1f} ms")
                 
+                st.markdown(answer_time_text(selected_row))
+                
                 if 'session_id' in selected_row:
                     st.markdown(f"**Session ID:** {selected_row['session_id']}")
                 
@@ -499,7 +529,7 @@ try:
         # Display dataframe
         display_columns = [
             'question_number', 'category', 'difficulty', 'question', 
-            'response_time_ms', 'is_error', 'source_file'
+            'response_time_ms', 'time_to_answer_ms', 'turns', 'outcome', 'is_error', 'source_file'
         ]
         display_columns = [col for col in display_columns if col in df.columns]
         
@@ -13,8 +13,17 @@ import pandas as pd
 import numpy as np
 import glob
 import os
+import sys
 from datetime import datetime
 
+# Shared answer outcome classifier
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'api'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'dashboard'))
+from answer_charts import add_answer_columns, answer_time_text, show_answer_metrics, show_time_to_answer
+from answer_store import AnswerStore, read_metrics
+from outcomes import ERROR, outcome_column
+from result_types import apply_schema, drop_unused_categories
+
 # Force disable caching
 st.cache_data.clear()
 
@@ -243,18 +252,35 @@ including response times, success rates, and performance by category and difficu
 """)
 
 # Load data
-def load_all_data(merged_file_pattern="merged_test_results*.csv"):
+# Written by merge_results.py; older merges were CSV files in the working directory
+MERGED_FILE_PATTERNS = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'data', 'results', 'merged_test_results*.parquet'),
+    "merged_test_results*.csv",
+]
+
+def read_results_file(path):
+    """Read a CSV or Parquet results file, with its answers in an on-demand store (answer_store.py)."""
+    answers = AnswerStore.for_files([path])
+    df = read_metrics(path, answers)
+    answers.finish()
+    return df, answers
+
+def load_all_data(merged_file_patterns=MERGED_FILE_PATTERNS):
     """
     Load test results data, prioritizing merged files if available.
     
     Args:
-        merged_file_pattern (str): Pattern to identify merged data files
+        merged_file_patterns (list): Patterns to identify merged data files, in order of preference
         
     Returns:
-        pd.DataFrame: Combined dataframe with all test results
+        tuple: (pd.DataFrame of metrics, AnswerStore with the answer text), or (None, None)
     """
     # First, look for merged data files
-    merged_files = glob.glob(merged_file_pattern)
+    merged_files = []
+    for pattern in merged_file_patterns:
+        merged_files = glob.glob(pattern)
+        if merged_files:
+            break
     
     if merged_files:
         # Sort by filename to get the most recent merged file (assuming timestamp in filename)
@@ -272,16 +298,16 @@ def load_all_data(merged_file_pattern="merged_test_results*.csv"):
                 # Check if the target file exists
                 if os.path.exists(real_path):
                     st.sidebar.success(f"Target file exists with size: {os.path.getsize(real_path)} bytes")
-                    df = pd.read_csv(real_path)
+                    df, answers = read_results_file(real_path)
                     st.sidebar.write(f"Loaded {len(df)} rows from target file")
                 else:
                     st.sidebar.error(f"Target file does not exist!")
-                    return None
+                    return None, None
             else:
-                df = pd.read_csv(latest_merged_file)
+                df, answers = read_results_file(latest_merged_file)
                 st.sidebar.write(f"Loaded {len(df)} rows from direct file")
             
-            return df
+            return df, answers
         except Exception as e:
             st.warning(f"Could not load merged file {latest_merged_file}: {e}")
     
@@ -290,14 +316,18 @@ def load_all_data(merged_file_pattern="merged_test_results*.csv"):
     
     if not csv_files:
         st.error("No test result files found. Please make sure CSV files with 'test_results' in the name exist in the current directory.")
-        return None
+        return None, None
     
     dfs = []
     file_info = []
     
+    # Answer text goes to an on-demand store; the frame keeps the metrics (answer_store.py)
+    csv_files.sort()
+    answers = AnswerStore.for_files(csv_files)
+    
     for file in csv_files:
         try:
-            df = pd.read_csv(file)
+            df = read_metrics(file, answers)
             # Add file source column
             df['source_file'] = file
             
@@ -324,24 +354,21 @@ def load_all_data(merged_file_pattern="merged_test_results*.csv"):
     
     if not dfs:
         st.error("No valid data found in any files.")
-        return None
+        return None, None
     
-    combined_df = pd.concat(dfs, ignore_index=True)
+    # Typed again so columns stay categorical across files (result_types.py)
+    combined_df = apply_schema(pd.concat(dfs, ignore_index=True))
+    answers.finish()
     
     # Add file information to session state
     st.session_state['file_info'] = file_info
     
-    return combined_df
+    return combined_df, answers
 
 # Main content area
 try:
-    # Load data directly from the target file to bypass any caching or symlink issues
-    target_file = "../tests/data/results/merged_test_results_20250313_023549.csv"
-    if os.path.exists(target_file):
-        df = pd.read_csv(target_file)
-        st.sidebar.success(f"Directly loaded {len(df)} rows from {target_file}")
-    else:
-        df = load_all_data()
+    # The merged dataset from merge_results.py, else the individual results files
+    df, answers = load_all_data()
     
     if df is None:
         st.stop()
@@ -350,13 +377,13 @@ try:
     if 'response_time_ms' in df.columns:
         df['response_time_ms'] = pd.to_numeric(df['response_time_ms'], errors='coerce')
     
-    # Check for success in answers
-    if 'answer' in df.columns:
-        df['is_error'] = df['answer'].astype(str).str.startswith('ERROR')
-    elif 'success' in df.columns:
-        df['is_error'] = ~df['success']
-    else:
-        df['is_error'] = False
+    # Classify every answer: the recorded outcome column, else the answer text
+    # and success flag (see outcomes.py)
+    df['outcome'] = outcome_column(df)
+    df['is_error'] = df['outcome'] == ERROR
+    
+    # Time to a substantive answer and turns taken (see answer_charts.py)
+    df = add_answer_columns(df)
         
     # Sidebar
     st.sidebar.title("Filters")
@@ -391,8 +418,8 @@ try:
         if selected_difficulties:
             df = df[df['difficulty'].isin(selected_difficulties)]
     
-    # Time range filter if timestamps are available
-    if 'timestamp' in df.columns:
+    # Time range filter if timestamps are available (parsed by result_types.apply_schema())
+    if 'timestamp' in df.columns and df['timestamp'].notna().any():
         # Convert timestamp strings to datetime objects if they're not already
         if df['timestamp'].dtype == 'object':  # String type
             df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
@@ -438,10 +465,13 @@ try:
             text_query = search_text.lower()
             text_mask = (
                 df['question'].astype(str).str.lower().str.contains(text_query) | 
-                df['answer'].astype(str).str.lower().str.contains(text_query)
+                df['row_id'].isin(answers.search(text_query))
             )
             df = df[text_mask]
     
+    # Filtered-out categories would still show up in counts and charts
+    df = drop_unused_categories(df)
+    
     # Main dashboard content
     if len(df) == 0:
         st.warning("No data matches the selected filters. Please adjust your filters.")
@@ -468,6 +498,8 @@ try:
         median_time = df['response_time_ms'].median()
         st.metric("Median Response Time", f"{median_time:.1f} ms")
     
+    show_answer_metrics(df)
+    
     # Response Time Analysis
     st.markdown('<div class="sub-header">Response Time Analysis</div>', unsafe_allow_html=True)
     
@@ -515,7 +547,7 @@ try:
     with col2:
         # Response time by category
         if 'category' in df.columns:
-            category_stats = df.groupby('category')['response_time_ms'].mean().reset_index()
+            category_stats = df.groupby('category', observed=True)['response_time_ms'].mean().reset_index()
             category_stats = category_stats.sort_values('response_time_ms', ascending=False)
             
             fig = px.bar(
@@ -539,13 +571,16 @@ try:
         else:
             st.info("Category information not available in the dataset.")
     
+    # Time to answer: a handoff or clarifying reply is fast but not an answer
+    show_time_to_answer(df, "#1B03A3", dark_template["layout"])
+    
     # Second row of charts
     col1, col2 = st.columns(2)
     
     with col1:
         # Response time by difficulty
         if 'difficulty' in df.columns:
-            difficulty_stats = df.groupby('difficulty')['response_time_ms'].mean().reset_index()
+            difficulty_stats = df.groupby('difficulty', observed=True)['response_time_ms'].mean().reset_index()
             
             # Sort by difficulty level if possible
             difficulty_order = ['Easy', 'Medium', 'Difficult', 'Extremely Difficult']
@@ -728,7 +763,7 @@ try:
                     st.markdown(f"**{selected_row['question']}**")
                     
                     st.markdown("### Answer")
-                    st.markdown(selected_row['answer'])
+                    st.markdown(answers.get(selected_row['row_id']) or '')
                 
                 with col2:
                     st.markdown("### Details")
@@ -740,6 +775,8 @@ try:
                     
                     st.markdown(f"**Response Time:** {selected_row['response_time_ms']:.1f} ms")
                     
+                    st.markdown(answer_time_text(selected_row))
+                    
                     if 'session_id' in selected_row:
                         st.markdown(f"**Session ID:** {selected_row['session_id']}")
                     
@@ -775,7 +812,7 @@ try:
         # Display dataframe
         display_columns = [
             'question_number', 'category', 'difficulty', 'question', 
-            'response_time_ms', 'is_error', 'source_file'
+            'response_time_ms', 'time_to_answer_ms', 'turns', 'outcome', 'is_error', 'source_file'
         ]
         display_columns = [col for col in display_columns if col in df.columns]
         
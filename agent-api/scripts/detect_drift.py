@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Answer drift report
+
+Groups recorded test results by question and compares each question's latest
+answer with a baseline answer, using the vectorized scorer the webhook runs
+after every scheduled batch (src/webhook/drift.py). Questions whose drift is
+at or above the threshold are flagged.
+
+Sources:
+- result CSVs (agent-api/data/*.csv and agent-api/scripts/*results*.csv), default
+- the webhook's BigQuery results table (--bigquery)
+
+Baselines:
+- previous: the answer recorded just before the latest one (default)
+- first: the oldest recorded answer
+
+Usage:
+    python detect_drift.py
+    python detect_drift.py --baseline first --threshold 0.5 --output drift_report.json
+    python detect_drift.py --bigquery --table heuristicsai.conversations.bia --days 7
+"""
+
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import argparse
+from datetime import datetime
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(script_dir, '..', '..'))
+sys.path.append(os.path.join(project_root, 'src', 'webhook'))
+
+from drift import DEFAULT_THRESHOLD, drift_report
+
+DEFAULT_PATTERNS = [
+    os.path.join(project_root, 'agent-api', 'data', '*.csv'),
+    os.path.join(script_dir, '*results*.csv'),
+]
+
+def load_csv_history(patterns):
+    """
+    Read answers from result CSVs.
+
+    Returns:
+        dict: question -> list of (timestamp, answer), oldest first
+    """
+    history = {}
+    for pattern in patterns:
+        for file_path in sorted(glob.glob(pattern)):
+            # Files without a timestamp column are ordered by modification time
+            fallback = datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat()
+            with open(file_path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    question = (row.get('question') or '').strip()
+                    if not question or row.get('answer') is None:
+                        continue
+                    history.setdefault(question, []).append((row.get('timestamp') or fallback, row['answer']))
+    for answers in history.values():
+        answers.sort(key=lambda item: item[0])
+    return history
+
+def load_bigquery_history(table_ref, days):
+    """
+    Read answers from the webhook's results table.
+
+    Returns:
+        dict: question -> list of (timestamp, answer), oldest first
+    """
+    from google.cloud import bigquery
+
+    client = bigquery.Client(project=table_ref.split('.')[0])
+    query = f"""
+    SELECT question, timestamp, response_text
+    FROM `{table_ref}`
+    WHERE timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL {int(days)} DAY)
+    ORDER BY question, timestamp
+    """
+    history = {}
+    for row in client.query(query).result():
+        history.setdefault(row['question'], []).append((row['timestamp'].isoformat(), row['response_text'] or ''))
+    return history
+
+def build_pairs(history, baseline='previous'):
+    """
+    Pick a (baseline, latest) answer pair for every question answered at least twice.
+
+    Returns:
+        tuple: (questions, baseline answers, latest answers)
+    """
+    questions, baselines, latest = [], [], []
+    for question, answers in history.items():
+        if len(answers) < 2:
+            continue
+        questions.append(question)
+        baselines.append(answers[0][1] if baseline == 'first' else answers[-2][1])
+        latest.append(answers[-1][1])
+    return questions, baselines, latest
+
+def write_report(report, output_file):
+    """Write the report as JSON or CSV, by file extension."""
+    if output_file.endswith('.json'):
+        with open(output_file, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        with open(output_file, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['question', 'drift', 'flagged'])
+            writer.writeheader()
+            writer.writerows(report)
+    print(f"Report saved to {output_file}")
+
+def main():
+    """Score drift and print the flagged questions."""
+    parser = argparse.ArgumentParser(description="Compare each question's latest answer with a baseline")
+    parser.add_argument("--files", "-f", type=str, nargs='*', default=DEFAULT_PATTERNS,
+                        help="Result CSV files or glob patterns")
+    parser.add_argument("--bigquery", action="store_true", help="Read the webhook's BigQuery table instead")
+    parser.add_argument("--table", type=str, default="heuristicsai.conversations.bia",
+                        help="BigQuery results table (project.dataset.table)")
+    parser.add_argument("--days", type=int, default=30, help="BigQuery lookback in days")
+    parser.add_argument("--baseline", choices=["previous", "first"], default="previous",
+                        help="Compare the latest answer with the previous or the first one")
+    parser.add_argument("--threshold", "-t", type=float, default=DEFAULT_THRESHOLD,
+                        help="Drift (0-1) at or above which a question is flagged")
+    parser.add_argument("--output", "-o", type=str, default=None, help="Report file (.csv or .json)")
+    args = parser.parse_args()
+
+    if args.bigquery:
+        history = load_bigquery_history(args.table, args.days)
+    else:
+        history = load_csv_history(args.files)
+    questions, baselines, latest = build_pairs(history, args.baseline)
+    if not questions:
+        print("No question has been answered twice; nothing to compare")
+        return 0
+
+    start = time.perf_counter()
+    report = drift_report(questions, baselines, latest, args.threshold)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    flagged = [entry for entry in report if entry['flagged']]
+
+    print(f"Scored {len(report)} questions in {elapsed_ms:.1f} ms "
+          f"({args.baseline} baseline, threshold {args.threshold})")
+    print(f"Flagged: {len(flagged)}")
+    for entry in flagged:
+        print(f"  {entry['drift']:.3f}  {entry['question']}")
+
+    if args.output:
+        write_report(report, args.output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,17 +7,21 @@ without requiring the Flask API server to be running.
 """
 
 import os
-import re
-import json
+import sys
 import time
-import csv
+import argparse
 from datetime import datetime
 from tqdm import tqdm
-from google.oauth2 import service_account
-from google.auth.transport.requests import Request as AuthRequest
-import requests
 from dotenv import load_dotenv
 
+# Shared detectIntent response extractor and answer outcome classifier
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'api'))
+from agent_response import parse_response
+from conversation import DEFAULT_MAX_TURNS, converse, error_record
+from question_catalog import DEFAULT_CATALOG_PATH, extract_questions
+from phase_timing import TimedSession, TokenSource
+from result_sink import ResultSink
+
 # Load environment variables
 load_dotenv()
 
@@ -27,36 +31,9 @@ LOCATION = 'global'  # Changed to global based on documentation
 AGENT_ID = '8285e0d0-24ae-43e9-8491-b0bd99befc87'  # Updated agent ID
 CREDENTIALS_FILE = '/Users/dionedge/dev/creds/heuristicsai-9ad7dd8375bf.json'
 
-def extract_questions(file_path):
-    """
-    Extract questions from the markdown file.
-    Returns a list of tuples: (question, category, difficulty)
-    """
-    questions = []
-    current_category = ""
-    current_difficulty = ""
-    
-    # Read the file
-    with open(file_path, 'r') as f:
-        content = f.read()
-    
-    # Find categories and difficulties
-    sections = re.split(r'\*\*([^*]+)\*\*\s*\n\s*\*\*([^*]+)\*\*', content)
-    
-    # Process sections
-    for i in range(1, len(sections), 3):
-        if i+2 <= len(sections):
-            category = sections[i].strip()
-            difficulty = sections[i+1].strip()
-            section_content = sections[i+2]
-            
-            # Extract numbered questions
-            numbered_questions = re.findall(r'\d+\.\s+(.*?)\n', section_content)
-            
-            for question in numbered_questions:
-                questions.append((question.strip(), category, difficulty))
-    
-    return questions
+# One pooled, phase-timed session and token source for every question (phase_timing.py)
+HTTP = TimedSession()
+TOKENS = TokenSource(CREDENTIALS_FILE)
 
 def ask_question_direct(question, session_id):
     """
@@ -67,23 +44,15 @@ def ask_question_direct(question, session_id):
         session_id (str): Session ID for continuous conversation
         
     Returns:
-        str: The response text from the agent
+        tuple: (status code or None, AgentResponse) - failures carry the error message as the answer
     """
     try:
         # Check if credentials file exists
         if not os.path.exists(CREDENTIALS_FILE):
             raise FileNotFoundError(f"Credentials file not found: {CREDENTIALS_FILE}")
             
-        # Load credentials
-        credentials = service_account.Credentials.from_service_account_file(
-            CREDENTIALS_FILE, 
-            scopes=['https://www.googleapis.com/auth/cloud-platform']
-        )
-        
-        # Refresh credentials
-        auth_req = AuthRequest()
-        credentials.refresh(auth_req)
-        token = credentials.token
+        # Minted once and refreshed only when it expires (the auth phase)
+        token = TOKENS.token()
         
         # API URL for Dialogflow CX
         api_url = f"https://{LOCATION}-dialogflow.googleapis.com/v3/projects/{PROJECT_ID}/locations/{LOCATION}/agents/{AGENT_ID}/sessions/{session_id}:detectIntent"
@@ -105,48 +74,35 @@ def ask_question_direct(question, session_id):
         }
         
         # Make the API call
-        response = requests.post(api_url, headers=headers, json=payload, timeout=60)
+        response = HTTP.post(api_url, headers=headers, json=payload, timeout=60)
         
         # Check response
         if response.status_code != 200:
             error_msg = f"Agent API call failed with status code {response.status_code}: {response.text}"
             print(error_msg)
-            return error_msg
+            return response.status_code, error_record(error_msg)
             
-        # Parse response
-        response_data = response.json()
-        
-        # Extract response text
-        response_text = "No response from agent"
-        if "queryResult" in response_data and "responseMessages" in response_data["queryResult"]:
-            for msg in response_data["queryResult"]["responseMessages"]:
-                if "text" in msg and "text" in msg["text"]:
-                    response_text = "\n".join(msg["text"]["text"])
-                    break
-        
-        return response_text
+        # Extract every text message, the playbook and the handoff flag in one pass
+        return response.status_code, parse_response(response.content)
     
     except Exception as e:
         error_msg = f"Error sending request: {str(e)}"
         print(error_msg)
-        return error_msg
+        return None, error_record(error_msg)
 
-def run_tests(questions, limit=5, output_file="direct_test_results.csv"):
+def run_tests(questions, limit=5, output_file="direct_test_results.csv", max_turns=1):
     """
     Run tests using the direct API approach
     
     Args:
         questions: List of (question, category, difficulty) tuples
         limit: Maximum number of questions to test
-        output_file: CSV file to save results
+        output_file: Results file (.csv, .jsonl or .parquet)
+        max_turns: Messages per question including follow-ups to handoffs
+            and clarifying questions (1 = single question, no follow-ups)
     """
-    # Prepare CSV file
-    fieldnames = ['question_number', 'question', 'category', 'difficulty', 
-                 'answer', 'session_id', 'timestamp', 'response_time_ms']
-    
-    with open(output_file, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
+    # Rows are written by the sink's background thread
+    with ResultSink(output_file, runner='direct_test') as sink:
         
         # Process questions
         num_questions = min(limit, len(questions)) if limit > 0 else len(questions)
@@ -158,28 +114,27 @@ def run_tests(questions, limit=5, output_file="direct_test_results.csv"):
             print(f"\nQuestion {question_number}: {question}")
             print(f"Category: {category}, Difficulty: {difficulty}")
             
-            # Ask the question
+            # Ask the question, following up in the same session if allowed
             session_id = f"direct-test-{question_number}-{int(time.time())}"
-            start_time = time.time()
-            answer = ask_question_direct(question, session_id)
-            end_time = time.time()
-            response_time_ms = int((end_time - start_time) * 1000)
+            conversation = converse(lambda text: ask_question_direct(text, session_id), question, max_turns)
+            row = conversation.row()
+            answer = row['answer']
             
             print(f"Answer: {answer[:100]}..." if len(answer) > 100 else f"Answer: {answer}")
-            print(f"Response time: {response_time_ms} ms")
+            print(f"Response time: {row['response_time_ms']} ms")
+            if row['turns'] > 1:
+                print(f"Turns: {row['turns']}, time to answer: {row['total_time_ms']} ms ({row['outcome']})")
             
-            # Write to CSV
-            writer.writerow({
+            # Queue the row for the results file
+            row.update({
                 'question_number': question_number,
                 'question': question,
                 'category': category,
                 'difficulty': difficulty,
-                'answer': answer,
                 'session_id': session_id,
                 'timestamp': datetime.now().isoformat(),
-                'response_time_ms': response_time_ms
             })
-            csvfile.flush()  # Ensure data is written immediately
+            sink.write(row)
             
             # Add a delay between questions
             time.sleep(1)
@@ -188,6 +143,17 @@ def run_tests(questions, limit=5, output_file="direct_test_results.csv"):
 
 def main():
     """Main function to run the test questions."""
+    parser = argparse.ArgumentParser(description="Test the Vertex AI Agent directly through Dialogflow CX")
+    parser.add_argument("--file", default=DEFAULT_CATALOG_PATH, help="Markdown file with questions")
+    parser.add_argument("--limit", type=int, default=5, help="Number of questions to test (0 = all)")
+    parser.add_argument("--output", "-o", default=f"direct_test_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                        help="Results file (.csv, .jsonl or .parquet)")
+    parser.add_argument("--follow-up", action="store_true",
+                        help="Answer handoffs and clarifying questions in the same session until the agent answers")
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS,
+                        help="Messages per question including follow-ups, with --follow-up")
+    args = parser.parse_args()
+    
     print(f"Testing Vertex AI Agent directly")
     print(f"Project ID: {PROJECT_ID}")
     print(f"Location: {LOCATION}")
@@ -195,9 +161,8 @@ def main():
     print(f"Credentials file: {CREDENTIALS_FILE}")
     
     # Extract questions from test file
-    questions_file = "/Users/dionedge/dev/looker-vertex-agent/agent-api/tests/test_questions.md"
-    print(f"Extracting questions from {questions_file}...")
-    questions = extract_questions(questions_file)
+    print(f"Extracting questions from {args.file}...")
+    questions = extract_questions(args.file)
     
     if not questions:
         print("No questions found in the file.")
@@ -206,9 +171,7 @@ def main():
     print(f"Found {len(questions)} questions.")
     
     # Run tests with a small sample
-    output_file = f"direct_test_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    limit = 5  # Test only 5 questions
-    run_tests(questions, limit, output_file)
+    run_tests(questions, args.limit, args.output, args.max_turns if args.follow_up else 1)
     
     return 0
 
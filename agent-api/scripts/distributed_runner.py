@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Distributed Test Runner
+
+Runs the question catalog across several worker processes, or hosts, that
+pull questions from a coordinator's work-stealing queue (work_queue.py).
+Each worker asks its questions straight to the Dialogflow CX agent and
+streams the result rows back. The coordinator is the only process writing
+the results. Parsing and network waits are spread over the workers, so one
+process's GIL and one machine's sockets no longer bound the run.
+
+A task whose worker dies, hangs past its lease or gets a failed agent call
+is re-queued for another worker, up to --max-attempts times. After that it
+is recorded as an error row.
+
+By default the coordinator starts --workers local worker processes on
+127.0.0.1 and replaces any that die. To add workers on other hosts, bind to
+a reachable address and start workers there with the same WORK_QUEUE_TOKEN.
+Workers read the agent configuration from the same environment variables
+as the API (see conversation.env_transport()).
+
+Rows are written in completion order; sort on question_number if needed.
+
+Usage:
+    python distributed_runner.py coordinator --workers 4
+    python distributed_runner.py coordinator --workers 8 --sample 40 --seed 7 --follow-up
+    WORK_QUEUE_TOKEN=secret python distributed_runner.py coordinator --host 0.0.0.0 --port 8765 --workers 2
+    WORK_QUEUE_TOKEN=secret python distributed_runner.py worker --connect coordinator-host:8765
+"""
+
+import os
+import sys
+import time
+import uuid
+import socket
+import secrets
+import argparse
+import subprocess
+from datetime import datetime
+
+from conversation import DEFAULT_MAX_TURNS, converse, dialogflow_ask, env_transport
+from outcomes import ERROR
+from question_catalog import DEFAULT_CATALOG_PATH, add_sampling_arguments, extract_questions, sample_from_args
+from result_sink import ResultSink
+from work_queue import DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS, Coordinator, WorkQueue, WorkerClient, run_worker
+
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+def build_tasks(args):
+    """Read the catalog, apply --limit or --sample, and number the tasks."""
+    questions = extract_questions(args.file)
+    numbered = [(i + 1, question) for i, question in enumerate(questions)]
+    if args.sample:
+        chosen = set(sample_from_args(questions, args))
+        numbered = [(number, question) for number, question in numbered if question in chosen]
+    elif args.limit:
+        numbered = numbered[:args.limit]
+
+    max_turns = args.max_turns if args.follow_up else 1
+    return [{
+        'task_id': task_id,
+        'question_number': number,
+        'question': question,
+        'category': category,
+        'difficulty': difficulty,
+        'max_turns': max_turns,
+    } for task_id, (number, (question, category, difficulty)) in enumerate(numbered)]
+
+def spawn_worker(host, port, token):
+    """Start a local worker process connected to the coordinator."""
+    env = dict(os.environ, WORK_QUEUE_TOKEN=token)
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__), 'worker', '--connect', f"{host}:{port}"],
+                            env=env)
+
+def run_coordinator(args):
+    """Serve the question queue, write result rows and supervise local workers."""
+    tasks = build_tasks(args)
+    if not tasks:
+        print("No questions to run.")
+        return 1
+
+    token = os.environ.get('WORK_QUEUE_TOKEN') or secrets.token_hex(16)
+    if args.host not in LOOPBACK_HOSTS and not os.environ.get('WORK_QUEUE_TOKEN'):
+        print(f"Remote workers need WORK_QUEUE_TOKEN={token}")
+
+    queue = WorkQueue(tasks, shards=args.shards or args.workers or 4, max_attempts=args.max_attempts,
+                      lease_seconds=args.lease)
+    sink = ResultSink(args.output, runner='distributed_runner')
+
+    # Abandon rows are written at the end, so a late result can still replace one
+    abandoned_rows = {}
+
+    def on_result(row):
+        if abandoned_rows.pop(row['question_number'], None):
+            print(f"Late result for Q{row['question_number']} replaces its abandonment")
+        sink.write(row)
+        stats = queue.stats()
+        print(f"[{stats['completed'] + stats['abandoned']}/{stats['tasks']}] Q{row['question_number']} "
+              f"{row['outcome']} in {row['response_time_ms']} ms on {row['worker']} (attempt {row['attempt']})")
+
+    def on_abandon(task, error):
+        print(f"Giving up on Q{task['question_number']} after {queue.attempts.get(task['task_id'], 0)} attempts: {error}")
+        abandoned_rows[task['question_number']] = {
+            'question_number': task['question_number'],
+            'question': task['question'],
+            'category': task['category'],
+            'difficulty': task['difficulty'],
+            'answer': f"ERROR: Gave up after {queue.attempts.get(task['task_id'], 0)} attempts: {error}",
+            'timestamp': datetime.now().isoformat(),
+            'outcome': ERROR,
+            'attempt': queue.attempts.get(task['task_id'], 0),
+        }
+
+    coordinator = Coordinator(queue, on_result, on_abandon, host=args.host, port=args.port, token=token)
+    host, port = coordinator.start()
+    print(f"Coordinator listening on {host}:{port} with {len(tasks)} questions in {len(queue.shards)} shards")
+
+    connect_host = '127.0.0.1' if args.host in ('0.0.0.0', '') else args.host
+    workers = [spawn_worker(connect_host, port, token) for _ in range(args.workers)]
+    restarts = 0
+    start = time.perf_counter()
+    try:
+        while not queue.wait(1.0):
+            for i, proc in enumerate(workers):
+                if proc.poll() is not None and restarts < args.max_restarts:
+                    restarts += 1
+                    print(f"Local worker exited with code {proc.returncode}; starting a replacement")
+                    workers[i] = spawn_worker(connect_host, port, token)
+            if workers and all(proc.poll() is not None for proc in workers) and restarts >= args.max_restarts:
+                print("All local workers have exited and --max-restarts is used up; stopping")
+                break
+        coordinator.report_abandoned()
+    except KeyboardInterrupt:
+        print("Interrupted; unfinished questions are not recorded")
+    finally:
+        for proc in workers:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.terminate()
+        coordinator.stop()
+        for row in abandoned_rows.values():
+            sink.write(row)
+        sink.close()
+
+    stats = queue.stats()
+    elapsed = time.perf_counter() - start
+    print(f"\nCompleted {stats['completed']}/{stats['tasks']} questions in {elapsed:.1f} s "
+          f"({stats['abandoned']} abandoned, {stats['retries']} retries, {stats['steals']} steals, "
+          f"{stats['workers']} workers, {restarts} restarts)")
+    print(f"Results saved to {args.output}")
+    return 0 if queue.finished and stats['abandoned'] == 0 else 1
+
+def run_worker_process(args):
+    """Connect to a coordinator and answer questions until the queue is empty."""
+    host, _, port = args.connect.rpartition(':')
+    worker_id = args.id or f"{socket.gethostname()}-{os.getpid()}"
+    transport = env_transport()
+
+    def execute(task):
+        session_id = f"dist-{task['question_number']}-{uuid.uuid4().hex[:8]}"
+        conversation = converse(dialogflow_ask(transport, session_id), task['question'], task['max_turns'])
+        row = conversation.row()
+        if row['outcome'] == ERROR and task['attempt'] < task['max_attempts']:
+            # Let another worker (or a later attempt) retry failed agent calls
+            raise RuntimeError(row['answer'][:200])
+        row.update({
+            'question_number': task['question_number'],
+            'question': task['question'],
+            'category': task['category'],
+            'difficulty': task['difficulty'],
+            'session_id': session_id,
+            'timestamp': datetime.now().isoformat(),
+            'worker': worker_id,
+            'attempt': task['attempt'],
+        })
+        return row
+
+    client = WorkerClient(host, int(port), worker_id, token=os.environ.get('WORK_QUEUE_TOKEN', ''))
+    try:
+        completed = run_worker(client, execute)
+    finally:
+        client.close()
+    print(f"Worker {worker_id} finished {completed} questions")
+    return 0
+
+def main():
+    """Main function to run the coordinator or a worker."""
+    parser = argparse.ArgumentParser(description="Run the question catalog across worker processes or hosts")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    coordinator = commands.add_parser('coordinator', help="Serve the question queue and write results")
+    coordinator.add_argument("--file", "-f", type=str, default=DEFAULT_CATALOG_PATH,
+                             help="Markdown file with test questions")
+    coordinator.add_argument("--limit", "-l", type=int, default=0,
+                             help="Run only the first N questions (0 = all)")
+    add_sampling_arguments(coordinator)
+    coordinator.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 4,
+                             help="Local worker processes to start (0 = remote workers only)")
+    coordinator.add_argument("--shards", type=int, default=0,
+                             help="Queue shards (default: one per local worker, or 4 with remote workers only)")
+    coordinator.add_argument("--host", type=str, default='127.0.0.1',
+                             help="Address to listen on")
+    coordinator.add_argument("--port", type=int, default=0,
+                             help="Port to listen on (0 = any free port)")
+    coordinator.add_argument("--follow-up", action="store_true",
+                             help="Answer handoffs and clarifying questions in the same session (see conversation.py)")
+    coordinator.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS,
+                             help="Messages per question including follow-ups, with --follow-up")
+    coordinator.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                             help="Attempts per question before it is recorded as an error")
+    coordinator.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS,
+                             help="Seconds a worker may hold a question before it is re-queued")
+    coordinator.add_argument("--max-restarts", type=int, default=10,
+                             help="Local worker processes to replace after they die")
+    coordinator.add_argument("--output", "-o", type=str,
+                             default=f"distributed_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                             help="Results file (.csv, .jsonl or .parquet)")
+
+    worker = commands.add_parser('worker', help="Answer questions from a coordinator")
+    worker.add_argument("--connect", type=str, required=True, help="Coordinator address as host:port")
+    worker.add_argument("--id", type=str, default=None, help="Worker name (default: hostname-pid)")
+
+    args = parser.parse_args()
+    if args.command == 'coordinator':
+        return run_coordinator(args)
+    return run_worker_process(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
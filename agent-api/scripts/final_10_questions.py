@@ -4,18 +4,22 @@ Final test of the last 10 remaining questions.
 """
 
 import os
+import sys
 import re
 import json
 import time
-import csv
 import pickle
 from datetime import datetime
 from tqdm import tqdm
-from google.oauth2 import service_account
-from google.auth.transport.requests import Request as AuthRequest
-import requests
 from dotenv import load_dotenv
 
+# Shared detectIntent response extractor and answer outcome classifier
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'api'))
+from agent_response import parse_response
+from outcomes import ERROR, classify
+from phase_timing import TimedSession, TokenSource, measure
+from result_sink import ResultSink
+
 # Load environment variables
 load_dotenv()
 
@@ -25,6 +29,10 @@ LOCATION = 'us-central1'
 AGENT_ID = 'fa0bd62b-3fc7-46c8-9d55-3a18d9812a70'
 CREDENTIALS_FILE = '/Users/dionedge/dev/creds/heuristicsai-9ad7dd8375bf.json'
 
+# One pooled, phase-timed session and token source for every question (phase_timing.py)
+HTTP = TimedSession()
+TOKENS = TokenSource(CREDENTIALS_FILE)
+
 # Load tested indices from file
 try:
     with open('tested_indices.pkl', 'rb') as f:
@@ -92,16 +100,8 @@ def ask_question_service_acct(question, session_id):
         if not os.path.exists(CREDENTIALS_FILE):
             return f"Credentials file not found: {CREDENTIALS_FILE}"
             
-        # Load credentials
-        credentials = service_account.Credentials.from_service_account_file(
-            CREDENTIALS_FILE, 
-            scopes=['https://www.googleapis.com/auth/cloud-platform']
-        )
-        
-        # Refresh credentials
-        auth_req = AuthRequest()
-        credentials.refresh(auth_req)
-        token = credentials.token
+        # Minted once and refreshed only when it expires (the auth phase)
+        token = TOKENS.token()
         
         # API URL for Dialogflow CX
         api_url = f"https://{LOCATION}-dialogflow.googleapis.com/v3/projects/{PROJECT_ID}/locations/{LOCATION}/agents/{AGENT_ID}/sessions/{session_id}:detectIntent"
@@ -123,7 +123,7 @@ def ask_question_service_acct(question, session_id):
         }
         
         # Make the API call
-        response = requests.post(api_url, headers=headers, json=payload, timeout=60)
+        response = HTTP.post(api_url, headers=headers, json=payload, timeout=60)
         
         # Check response
         if response.status_code != 200:
@@ -131,16 +131,8 @@ def ask_question_service_acct(question, session_id):
             print(error_msg)
             return error_msg
             
-        # Parse response
-        response_data = response.json()
-        
-        # Extract response text
-        response_text = "No response from agent"
-        if "queryResult" in response_data and "responseMessages" in response_data["queryResult"]:
-            for msg in response_data["queryResult"]["responseMessages"]:
-                if "text" in msg and "text" in msg["text"]:
-                    response_text = "\n".join(msg["text"]["text"])
-                    break
+        # Extract every text message in one pass
+        response_text = parse_response(response.content).text
         
         return response_text
     
@@ -149,6 +141,15 @@ def ask_question_service_acct(question, session_id):
         print(error_msg)
         return error_msg
 
+def save_checkpoint(rows):
+    """
+    Mark flushed questions as tested and save the checkpoint. Runs on the
+    result sink's flush thread, after the rows are in the results file.
+    """
+    TESTED_INDICES.update(row['question_number'] - 1 for row in rows)
+    with open('tested_indices.pkl', 'wb') as f:
+        pickle.dump(TESTED_INDICES, f)
+
 def run_tests(questions, output_file="final_10_results.csv"):
     """
     Run tests for the final 10 questions
@@ -157,10 +158,6 @@ def run_tests(questions, output_file="final_10_results.csv"):
         questions: List of (idx, (question, category, difficulty)) tuples
         output_file: CSV file to save results
     """
-    # Prepare CSV file
-    fieldnames = ['question_number', 'question', 'category', 'difficulty', 
-                 'answer', 'session_id', 'timestamp', 'response_time_ms']
-    
     total_questions = len(questions)
     success_count = 0
     error_count = 0
@@ -169,9 +166,8 @@ def run_tests(questions, output_file="final_10_results.csv"):
     stats_by_category = {}
     stats_by_difficulty = {}
     
-    with open(output_file, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
+    # Rows (and the checkpoint) are written by the sink's background thread
+    with ResultSink(output_file, runner='final_10_questions', on_flush=save_checkpoint) as sink:
         
         # Process questions with tqdm progress bar
         for i, (orig_idx, (question, category, difficulty)) in enumerate(tqdm(questions, desc="Final 10 questions")):
@@ -185,15 +181,14 @@ def run_tests(questions, output_file="final_10_results.csv"):
             
             # Ask the question
             session_id = f"final-10-{orig_idx}-{int(time.time())}"
-            start_time = time.time()
-            
             try:
-                answer = ask_question_service_acct(question, session_id)
-                end_time = time.time()
-                response_time_ms = int((end_time - start_time) * 1000)
+                with measure() as timing:
+                    answer = ask_question_service_acct(question, session_id)
+                response_time_ms = int(timing.total_ms)
                 
-                # Determine if answer was successful or an error
-                is_error = "error" in answer.lower() or "failed" in answer.lower() or "status code" in answer.lower()
+                # Classify the answer (error, empty, handoff, refusal, clarifying or answered)
+                outcome = classify(answer)
+                is_error = outcome == ERROR
                 
                 if is_error:
                     error_count += 1
@@ -201,7 +196,7 @@ def run_tests(questions, output_file="final_10_results.csv"):
                 else:
                     success_count += 1
                     print(f"A: {answer[:150]}..." if len(answer) > 150 else f"A: {answer}")
-                    print(f"Response time: {response_time_ms} ms")
+                    print(f"Response time: {response_time_ms} ms [{timing.describe()}]")
                 
                 # Update statistics
                 if category not in stats_by_category:
@@ -218,8 +213,8 @@ def run_tests(questions, output_file="final_10_results.csv"):
                     stats_by_difficulty[difficulty]['success'] += 1 
                     stats_by_difficulty[difficulty]['total_time'] += response_time_ms
                 
-                # Write to CSV
-                writer.writerow({
+                # Queue the row for the results file
+                sink.write({
                     'question_number': question_number,
                     'question': question,
                     'category': category,
@@ -227,14 +222,10 @@ def run_tests(questions, output_file="final_10_results.csv"):
                     'answer': answer,
                     'session_id': session_id,
                     'timestamp': datetime.now().isoformat(),
-                    'response_time_ms': response_time_ms
+                    'response_time_ms': response_time_ms,
+                    'outcome': outcome,
+                    **timing.row()
                 })
-                csvfile.flush()  # Ensure data is written immediately
-                
-                # Save tested index to a pickle file
-                TESTED_INDICES.add(orig_idx)
-                with open('tested_indices.pkl', 'wb') as f:
-                    pickle.dump(TESTED_INDICES, f)
                 
             except Exception as e:
                 print(f"Exception occurred: {str(e)}")
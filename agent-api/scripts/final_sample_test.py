@@ -6,19 +6,23 @@ This script tests a diverse sample of remaining questions from each category.
 """
 
 import os
-import re
+import sys
 import json
 import time
-import csv
 import pickle
-import random
+import argparse
 from datetime import datetime
 from tqdm import tqdm
-from google.oauth2 import service_account
-from google.auth.transport.requests import Request as AuthRequest
-import requests
 from dotenv import load_dotenv
 
+# Shared detectIntent response extractor and answer outcome classifier
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'api'))
+from agent_response import parse_response
+from outcomes import ERROR, classify
+from question_catalog import DEFAULT_CATALOG_PATH, add_sampling_arguments, extract_questions, sample_from_args
+from phase_timing import TimedSession, TokenSource, measure
+from result_sink import ResultSink
+
 # Load environment variables
 load_dotenv()
 
@@ -28,8 +32,9 @@ LOCATION = 'us-central1'
 AGENT_ID = 'fa0bd62b-3fc7-46c8-9d55-3a18d9812a70'
 CREDENTIALS_FILE = '/Users/dionedge/dev/creds/heuristicsai-9ad7dd8375bf.json'
 
-# Set random seed for reproducibility
-random.seed(42)
+# One pooled, phase-timed session and token source for every question (phase_timing.py)
+HTTP = TimedSession()
+TOKENS = TokenSource(CREDENTIALS_FILE)
 
 # Load tested indices from file
 try:
@@ -41,61 +46,6 @@ except FileNotFoundError:
     TESTED_INDICES = set()
     print("No previously tested indices found.")
 
-def extract_all_questions(file_path):
-    """
-    Extract all questions from the markdown file.
-    Returns a list of tuples: (question, category, difficulty)
-    """
-    questions = []
-    
-    # Read the file
-    with open(file_path, 'r') as f:
-        content = f.read()
-    
-    # Find categories and difficulties
-    sections = re.split(r'\*\*([^*]+)\*\*\s*\n\s*\*\*([^*]+)\*\*', content)
-    
-    # Extract all questions
-    for i in range(1, len(sections), 3):
-        if i+2 <= len(sections):
-            category = sections[i].strip()
-            difficulty = sections[i+1].strip()
-            section_content = sections[i+2]
-            
-            # Extract numbered questions
-            numbered_questions = re.findall(r'\d+\.\s+(.*?)\n', section_content)
-            
-            for question in numbered_questions:
-                questions.append((question.strip(), category, difficulty))
-    
-    return questions
-
-def sample_remaining_questions(all_questions, max_per_category=3):
-    """
-    Sample questions that haven't been tested yet.
-    """
-    # Group questions by category
-    questions_by_category = {}
-    
-    # Find untested questions
-    for idx, q_tuple in enumerate(all_questions):
-        if idx not in TESTED_INDICES:
-            category = q_tuple[1]
-            if category not in questions_by_category:
-                questions_by_category[category] = []
-            questions_by_category[category].append((idx, q_tuple))
-    
-    # Sample from each category
-    sampled_questions = []
-    
-    for category, questions in questions_by_category.items():
-        sample_size = min(max_per_category, len(questions))
-        if sample_size > 0:
-            samples = random.sample(questions, sample_size)
-            sampled_questions.extend(samples)
-    
-    return sampled_questions
-
 def ask_question_service_acct(question, session_id):
     """
     Ask a question using service account credentials
@@ -112,16 +62,8 @@ def ask_question_service_acct(question, session_id):
         if not os.path.exists(CREDENTIALS_FILE):
             return f"Credentials file not found: {CREDENTIALS_FILE}"
             
-        # Load credentials
-        credentials = service_account.Credentials.from_service_account_file(
-            CREDENTIALS_FILE, 
-            scopes=['https://www.googleapis.com/auth/cloud-platform']
-        )
-        
-        # Refresh credentials
-        auth_req = AuthRequest()
-        credentials.refresh(auth_req)
-        token = credentials.token
+        # Minted once and refreshed only when it expires (the auth phase)
+        token = TOKENS.token()
         
         # API URL for Dialogflow CX
         api_url = f"https://{LOCATION}-dialogflow.googleapis.com/v3/projects/{PROJECT_ID}/locations/{LOCATION}/agents/{AGENT_ID}/sessions/{session_id}:detectIntent"
@@ -143,7 +85,7 @@ def ask_question_service_acct(question, session_id):
         }
         
         # Make the API call
-        response = requests.post(api_url, headers=headers, json=payload, timeout=60)
+        response = HTTP.post(api_url, headers=headers, json=payload, timeout=60)
         
         # Check response
         if response.status_code != 200:
@@ -151,16 +93,8 @@ def ask_question_service_acct(question, session_id):
             print(error_msg)
             return error_msg
             
-        # Parse response
-        response_data = response.json()
-        
-        # Extract response text
-        response_text = "No response from agent"
-        if "queryResult" in response_data and "responseMessages" in response_data["queryResult"]:
-            for msg in response_data["queryResult"]["responseMessages"]:
-                if "text" in msg and "text" in msg["text"]:
-                    response_text = "\n".join(msg["text"]["text"])
-                    break
+        # Extract every text message in one pass
+        response_text = parse_response(response.content).text
         
         return response_text
     
@@ -169,6 +103,15 @@ def ask_question_service_acct(question, session_id):
         print(error_msg)
         return error_msg
 
+def save_checkpoint(rows):
+    """
+    Mark flushed questions as tested and save the checkpoint. Runs on the
+    result sink's flush thread, after the rows are in the results file.
+    """
+    TESTED_INDICES.update(row['question_number'] - 1 for row in rows)
+    with open('tested_indices.pkl', 'wb') as f:
+        pickle.dump(TESTED_INDICES, f)
+
 def run_tests(questions, output_file="final_sample_results.csv"):
     """
     Run tests for sampled questions
@@ -177,10 +120,6 @@ def run_tests(questions, output_file="final_sample_results.csv"):
         questions: List of (idx, (question, category, difficulty)) tuples
         output_file: CSV file to save results
     """
-    # Prepare CSV file
-    fieldnames = ['question_number', 'question', 'category', 'difficulty', 
-                 'answer', 'session_id', 'timestamp', 'response_time_ms']
-    
     total_questions = len(questions)
     success_count = 0
     error_count = 0
@@ -189,9 +128,8 @@ def run_tests(questions, output_file="final_sample_results.csv"):
     stats_by_category = {}
     stats_by_difficulty = {}
     
-    with open(output_file, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
+    # Rows (and the checkpoint) are written by the sink's background thread
+    with ResultSink(output_file, runner='final_sample_test', on_flush=save_checkpoint) as sink:
         
         # Process questions with tqdm progress bar
         for i, (orig_idx, (question, category, difficulty)) in enumerate(tqdm(questions, desc="Testing final sample")):
@@ -205,15 +143,14 @@ def run_tests(questions, output_file="final_sample_results.csv"):
             
             # Ask the question
             session_id = f"final-sample-{question_number}-{int(time.time())}"
-            start_time = time.time()
-            
             try:
-                answer = ask_question_service_acct(question, session_id)
-                end_time = time.time()
-                response_time_ms = int((end_time - start_time) * 1000)
+                with measure() as timing:
+                    answer = ask_question_service_acct(question, session_id)
+                response_time_ms = int(timing.total_ms)
                 
-                # Determine if answer was successful or an error
-                is_error = "error" in answer.lower() or "failed" in answer.lower() or "status code" in answer.lower()
+                # Classify the answer (error, empty, handoff, refusal, clarifying or answered)
+                outcome = classify(answer)
+                is_error = outcome == ERROR
                 
                 if is_error:
                     error_count += 1
@@ -221,7 +158,7 @@ def run_tests(questions, output_file="final_sample_results.csv"):
                 else:
                     success_count += 1
                     print(f"A: {answer[:150]}..." if len(answer) > 150 else f"A: {answer}")
-                    print(f"Response time: {response_time_ms} ms")
+                    print(f"Response time: {response_time_ms} ms [{timing.describe()}]")
                 
                 # Update statistics
                 if category not in stats_by_category:
@@ -238,8 +175,8 @@ def run_tests(questions, output_file="final_sample_results.csv"):
                     stats_by_difficulty[difficulty]['success'] += 1 
                     stats_by_difficulty[difficulty]['total_time'] += response_time_ms
                 
-                # Write to CSV
-                writer.writerow({
+                # Queue the row for the results file
+                sink.write({
                     'question_number': question_number,
                     'question': question,
                     'category': category,
@@ -247,16 +184,10 @@ def run_tests(questions, output_file="final_sample_results.csv"):
                     'answer': answer,
                     'session_id': session_id,
                     'timestamp': datetime.now().isoformat(),
-                    'response_time_ms': response_time_ms
+                    'response_time_ms': response_time_ms,
+                    'outcome': outcome,
+                    **timing.row()
                 })
-                csvfile.flush()  # Ensure data is written immediately
-                
-                # Save tested index to the set of tested indices
-                TESTED_INDICES.add(orig_idx)
-                
-                # Update the pickle file
-                with open('tested_indices.pkl', 'wb') as f:
-                    pickle.dump(TESTED_INDICES, f)
                 
             except Exception as e:
                 print(f"Exception occurred: {str(e)}")
@@ -292,6 +223,13 @@ def run_tests(questions, output_file="final_sample_results.csv"):
 
 def main():
     """Main function to run the test questions."""
+    parser = argparse.ArgumentParser(description="Test a sample of the questions not tested yet")
+    parser.add_argument("--file", "-f", type=str, default=DEFAULT_CATALOG_PATH,
+                        help="Markdown file with test questions")
+    add_sampling_arguments(parser, default_size=21)
+    parser.set_defaults(seed=42)
+    args = parser.parse_args()
+    
     print(f"Testing Vertex AI Agent - Final Sample of Remaining Questions")
     print(f"Project ID: {PROJECT_ID}")
     print(f"Location: {LOCATION}")
@@ -306,12 +244,13 @@ def main():
     print("Credentials file exists")
     
     # Extract all questions
-    questions_file = "/Users/dionedge/dev/looker-vertex-agent/agent-api/tests/test_questions.md"
-    print(f"Extracting all questions from {questions_file}...")
-    all_questions = extract_all_questions(questions_file)
+    print(f"Extracting all questions from {args.file}...")
+    all_questions = extract_questions(args.file)
     
-    # Sample questions from remaining categories
-    sampled_questions = sample_remaining_questions(all_questions, max_per_category=3)
+    # Seeded stratified sample of the questions not in tested_indices.pkl (question_catalog.py)
+    tested = {all_questions[idx][0] for idx in TESTED_INDICES if idx < len(all_questions)}
+    sampled = set(sample_from_args(all_questions, args, exclude=tested))
+    sampled_questions = [(idx, q_tuple) for idx, q_tuple in enumerate(all_questions) if q_tuple in sampled]
     
     if not sampled_questions:
         print("No untested questions remaining or sampling returned empty set.")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Memory footprint of the results frames, before and after typing
+
+Loads every results file three ways and prints the deep memory use of each
+column:
+
+- untyped: pd.read_csv() per file plus source_file, as the dashboards and
+  analyzers used to load them
+- typed:   result_types.read_results() per file, with the explicit schema
+- metrics: answer_store.read_metrics(), the typed frame without answer text
+  that the dashboards keep in memory
+
+Usage:
+    python frame_memory_report.py
+    python frame_memory_report.py --input '../data/*.csv' --csv memory_report.csv
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'api'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'dashboard'))
+from answer_store import AnswerStore, read_metrics
+from merge_results import DEFAULT_INPUTS, find_inputs
+from result_types import apply_schema, memory_report, read_results
+
+def load_untyped(paths):
+    frames = []
+    for path in paths:
+        df = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+        df['source_file'] = os.path.basename(path)
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True)
+    if 'response_time_ms' in df.columns:
+        df['response_time_ms'] = pd.to_numeric(df['response_time_ms'], errors='coerce')
+    return df
+
+def load_typed(paths):
+    return apply_schema(pd.concat([read_results(path).assign(source_file=os.path.basename(path))
+                                   for path in paths], ignore_index=True))
+
+def load_metrics(paths):
+    directory = tempfile.mkdtemp()
+    try:
+        store = AnswerStore.for_files(paths, directory)
+        df = pd.concat([read_metrics(path, store).assign(source_file=os.path.basename(path))
+                        for path in paths], ignore_index=True)
+        store.close()
+        return apply_schema(df)
+    finally:
+        shutil.rmtree(directory)
+
+def main():
+    """Main function to print the memory report."""
+    parser = argparse.ArgumentParser(description="Compare results frame memory before and after typing")
+    parser.add_argument("--input", "-i", type=str, action="append", default=[],
+                        help="Results files (glob, .csv or .parquet); may be repeated "
+                             "(default: the merge_results.py inputs)")
+    parser.add_argument("--csv", type=str, default=None,
+                        help="Also write the report to this CSV file")
+    args = parser.parse_args()
+
+    paths = [path for path in find_inputs(args.input or DEFAULT_INPUTS) if not path.endswith('.jsonl')]
+    if not paths:
+        print("No results files found.")
+        return 1
+
+    frames = {'untyped': load_untyped(paths), 'typed': load_typed(paths), 'metrics': load_metrics(paths)}
+    report = memory_report(frames)
+    print(f"{len(frames['untyped'])} rows from {len(paths)} files (pandas {pd.__version__})\n")
+    print(report.astype(object).where(report.notna(), '').to_string())
+
+    before = report.loc['total', 'untyped']
+    print()
+    for label in ('typed', 'metrics'):
+        after = report.loc['total', label]
+        print(f"{label}: {after / 1024:.1f} KiB vs {before / 1024:.1f} KiB untyped ({after / before:.0%})")
+    if args.csv:
+        report.to_csv(args.csv)
+        print(f"\nReport saved to: {args.csv}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
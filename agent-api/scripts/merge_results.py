@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Merge every results file into one deduplicated dataset
+
+The runners have written results with several schemas over time: the early
+advanced/edge-case runs have a success column and no timestamp, the service
+account and batched runners record errors only as an "Agent API call failed
+..." or "ERROR: ..." answer, and the ResultSink runners write RESULT_SCHEMA
+as CSV, JSONL or Parquet. This tool reads them all, maps each row onto
+RESULT_SCHEMA (result_sink.normalize()) plus two merge columns, and writes
+one compressed Parquet file that dashboard_dark.py loads:
+
+- run:         the results file's name without extension; copies of a file
+               in other directories count as the same run
+- source_file: the path the row was read from
+
+Rows are deduplicated by (run, question): a question retried within a run
+keeps its last attempt. Outcomes are filled in with outcomes.py when the
+file has none (a false success flag is an error), and rows without a
+timestamp take the one in the file name, or else the file's modification
+time.
+
+Merging is incremental. A manifest next to the output records the size,
+modification time and content hash of every file merged so far; later
+merges read only new or changed files and rewrite the dataset with their
+rows replacing any earlier ones. The dataset is sorted by category,
+difficulty, question and timestamp and written in row groups with column
+statistics, so readers filtering on those columns skip whole row groups.
+
+Usage:
+    python merge_results.py
+    python merge_results.py --output ../tests/data/results/merged_test_results.parquet
+    python merge_results.py --full
+    python merge_results.py --input 'results/*.jsonl' --input 'old/*.csv'
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import glob
+import hashlib
+import argparse
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'api'))
+from outcomes import ERROR, classify
+from result_sink import RESULT_SCHEMA, format_for, normalize
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+agent_api_dir = os.path.abspath(os.path.join(script_dir, '..'))
+
+DEFAULT_OUTPUT = os.path.join(agent_api_dir, 'tests', 'data', 'results', 'merged_test_results.parquet')
+
+DEFAULT_INPUTS = [
+    os.path.join(agent_api_dir, 'data', '*results*'),
+    os.path.join(agent_api_dir, 'scripts', '*results*'),
+    os.path.join(agent_api_dir, 'tests', 'data', 'results', '*results*'),
+]
+
+MERGED_SCHEMA = [('run', 'str'), ('source_file', 'str')] + RESULT_SCHEMA
+MERGED_FIELDS = [name for name, _ in MERGED_SCHEMA]
+
+SORT_COLUMNS = ['category', 'difficulty', 'question', 'timestamp']
+DEFAULT_ROW_GROUP_SIZE = 10000
+
+MANIFEST_VERSION = 1
+
+FILE_TIMESTAMP_PATTERN = re.compile(r'(\d{8}_\d{6})')
+
+def is_merge_output(path):
+    return os.path.basename(path).startswith('merged_test_results')
+
+def find_inputs(patterns):
+    """Results files matching the patterns, skipping merge outputs and unknown formats."""
+    paths = set()
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            try:
+                format_for(path)
+            except ValueError:
+                continue
+            if os.path.isfile(path) and not is_merge_output(path):
+                paths.add(os.path.abspath(path))
+    return sorted(paths)
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_rows(path):
+    """Rows of one results file as dicts, whatever its format."""
+    fmt = format_for(path)
+    if fmt == 'csv':
+        with open(path, newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+    if fmt == 'jsonl':
+        with open(path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    import pyarrow.parquet as pq
+    return pq.read_table(path).to_pylist()
+
+def run_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+def file_timestamp(path):
+    """Timestamp in a results file name (YYYYMMDD_HHMMSS), else its modification time."""
+    match = FILE_TIMESTAMP_PATTERN.search(os.path.basename(path))
+    if match:
+        try:
+            return datetime.strptime(match.group(1), '%Y%m%d_%H%M%S').isoformat()
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+
+def runner_name(path):
+    """Runner that wrote a file, from its name (service_acct_test_results_... -> service_acct_test)."""
+    prefix = run_name(path).split('_results')[0]
+    return prefix if prefix and prefix != run_name(path) else None
+
+def merge_row(row, path, run, timestamp, runner):
+    """Map one row onto MERGED_SCHEMA, filling the outcome and timestamp."""
+    row = dict(row)
+    success = row.pop('success', None)
+    out = normalize(row, runner)
+    if out['question'] is not None:
+        out['question'] = out['question'].strip()
+    if out['outcome'] is None:
+        failed = success is not None and str(success).strip().lower() not in ('true', '1')
+        out['outcome'] = ERROR if failed else classify(out['answer'], row.get('status_code') or None)
+    if out['timestamp'] is None:
+        out['timestamp'] = timestamp
+    out['run'] = run
+    out['source_file'] = path
+    return {name: out[name] for name in MERGED_FIELDS}
+
+def ingest(path):
+    """Every row of a results file with a question, in MERGED_SCHEMA."""
+    run, timestamp, runner = run_name(path), file_timestamp(path), runner_name(path)
+    return [merge_row(row, path, run, timestamp, runner)
+            for row in read_rows(path) if (row.get('question') or '').strip()]
+
+def to_frame(rows):
+    """DataFrame with MERGED_SCHEMA's columns and nullable types."""
+    dtypes = {'str': 'object', 'int': 'Int64', 'float': 'float64'}
+    df = pd.DataFrame(rows, columns=MERGED_FIELDS)
+    return df.astype({name: dtypes[kind] for name, kind in MERGED_SCHEMA})
+
+def deduplicate(df):
+    """One row per (run, question): the last attempt, then the latest timestamp."""
+    order = df.assign(_attempt=df['attempt'].fillna(0)).sort_values(
+        ['run', 'question', '_attempt', 'timestamp'], kind='stable', na_position='first')
+    return order.drop_duplicates(['run', 'question'], keep='last').drop(columns='_attempt')
+
+def write_dataset(df, path, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+    """Write the merged rows as zstd-compressed Parquet, sorted for row-group pruning."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {'str': pa.string(), 'int': pa.int64(), 'float': pa.float64()}
+    schema = pa.schema([(name, types[kind]) for name, kind in MERGED_SCHEMA])
+    df = df.sort_values(SORT_COLUMNS, kind='stable', na_position='last')
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    sorting = [pq.SortingColumn(MERGED_FIELDS.index(name), nulls_first=False) for name in SORT_COLUMNS]
+    temp_path = path + '.tmp'
+    pq.write_table(table, temp_path, compression='zstd', row_group_size=row_group_size,
+                   sorting_columns=sorting, write_statistics=True)
+    os.replace(temp_path, path)
+
+def manifest_path(output):
+    return os.path.splitext(output)[0] + '.manifest.json'
+
+def load_manifest(output):
+    path = manifest_path(output)
+    if not os.path.exists(path) or not os.path.exists(output):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('files', {})
+
+def save_manifest(output, files):
+    path = manifest_path(output)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'output': os.path.basename(output),
+                   'updated': datetime.now().isoformat(), 'files': files}, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def merge(inputs, output=DEFAULT_OUTPUT, full=False, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+    """
+    Merge new or changed results files into the output dataset.
+
+    Args:
+        inputs (list): File paths or glob patterns to merge
+        output (str): Merged Parquet file
+        full (bool): Ignore the manifest and rebuild from every input
+        row_group_size (int): Rows per Parquet row group
+
+    Returns:
+        dict: Files read and skipped, rows read, and rows in the dataset
+    """
+    files = {} if full else load_manifest(output)
+    pending = []
+    touched = False
+    for path in find_inputs(inputs):
+        stat = os.stat(path)
+        known = files.get(path)
+        if known and known['size'] == stat.st_size and known['mtime'] == stat.st_mtime:
+            continue
+        digest = file_hash(path)
+        if known and known['sha1'] == digest:
+            # Touched but not changed: remember the new time so it is not hashed again
+            known['mtime'] = stat.st_mtime
+            touched = True
+            continue
+        pending.append((path, stat, digest))
+
+    stats = {'read': len(pending), 'skipped': len(files) - sum(1 for path, _, _ in pending if path in files),
+             'rows_read': 0, 'rows': None}
+    if not pending:
+        if touched:
+            save_manifest(output, files)
+        return stats
+
+    new_rows = []
+    for path, stat, digest in pending:
+        try:
+            rows = ingest(path)
+        except Exception as e:
+            print(f"Skipping {path}: {e}")
+            stats['read'] -= 1
+            continue
+        new_rows.extend(rows)
+        files[path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha1': digest,
+                       'run': run_name(path), 'rows': len(rows)}
+        print(f"Read {len(rows)} rows from {path}")
+    stats['rows_read'] = len(new_rows)
+
+    frames = [to_frame(new_rows)]
+    if not full and os.path.exists(output):
+        # Rows from files being re-read are replaced by their new contents
+        previous = to_frame(pd.read_parquet(output).to_dict('records'))
+        frames.insert(0, previous[~previous['source_file'].isin([path for path, _, _ in pending])])
+    frames = [frame for frame in frames if not frame.empty] or frames[-1:]
+    merged = deduplicate(pd.concat(frames, ignore_index=True))
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    write_dataset(merged, output, row_group_size)
+    save_manifest(output, files)
+    stats['rows'] = len(merged)
+    return stats
+
+def main():
+    """Main function to merge the results files."""
+    parser = argparse.ArgumentParser(description="Merge every results file into one deduplicated Parquet dataset")
+    parser.add_argument("--input", "-i", type=str, action="append", default=[],
+                        help="Results files to merge (glob, .csv, .jsonl or .parquet); may be repeated "
+                             "(default: agent-api/data, agent-api/scripts and agent-api/tests/data/results)")
+    parser.add_argument("--output", "-o", type=str, default=DEFAULT_OUTPUT,
+                        help="Merged Parquet file")
+    parser.add_argument("--full", action="store_true",
+                        help="Rebuild from every input instead of only new or changed files")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE,
+                        help="Rows per Parquet row group")
+    args = parser.parse_args()
+
+    if format_for(args.output) != 'parquet':
+        print(f"Output must be a .parquet file: {args.output}")
+        return 1
+
+    stats = merge(args.input or DEFAULT_INPUTS, args.output, args.full, args.row_group_size)
+    if stats['rows'] is None:
+        print(f"Nothing new to merge ({stats['skipped']} files already merged into {args.output})")
+        return 0
+    print(f"\nMerged {stats['rows_read']} rows from {stats['read']} files "
+          f"({stats['skipped']} unchanged files skipped)")
+    print(f"{stats['rows']} rows written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Per-phase client timing for the runners
+
+A runner's response_time_ms used to be time.time() around the whole call,
+including loading and refreshing credentials for every question, so it
+could not say how much of the latency was ours and how much was the
+agent's. This module splits one call into monotonic (perf_counter) phases:
+
+- auth:     loading credentials and minting an access token
+- dns:      resolving the agent's host
+- connect:  the TCP handshake
+- tls:      the TLS handshake
+- send:     writing the request
+- ttfb:     from the request being sent to the response headers
+            (the agent's processing time plus one round trip)
+- download: reading the response body
+
+dns, connect and tls only happen on a cold connection; a call that reuses a
+pooled connection is marked warm. The host is resolved once and its
+addresses are tried in order, as urllib3 would, so connect includes any
+addresses that failed first; the one connected to is kept on the timing
+(PhaseTiming.address). The network phases come from hooks on
+the urllib3 connections under a requests session (TimedAdapter), so any
+requests-based client can be timed: the runners' TimedSession, or the API's
+RestTransport via instrument().
+
+Phases are recorded into the PhaseTiming of the enclosing measure() block
+on the current thread, and calls outside one are not timed:
+
+    with measure() as timing:
+        token = tokens.token()                  # auth, only when it expires
+        response = session.post(url, ...)       # dns .. download
+    row.update(timing.row())
+
+Proxied requests are sent through requests' proxy manager and record only
+auth and download.
+"""
+
+import time
+import socket
+import threading
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+PHASES = ['auth', 'dns', 'connect', 'tls', 'send', 'ttfb', 'download']
+NETWORK_PHASES = ('dns', 'connect', 'tls')
+
+# Result columns, in RESULT_SCHEMA order
+PHASE_FIELDS = [f"{name}_ms" for name in PHASES] + ['connection']
+
+COLD = 'cold'
+WARM = 'warm'
+
+SCOPES = ['https://www.googleapis.com/auth/cloud-platform']
+
+_local = threading.local()
+
+
+class PhaseTiming:
+    """Phase durations for one call, in seconds."""
+
+    def __init__(self):
+        self.phases = {}
+        self.connection = None
+        self.address = None     # the address a cold connection reached
+        self.start = time.perf_counter()
+        self.end = None
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + max(seconds, 0.0)
+
+    def seconds(self, *names):
+        return sum(self.phases.get(name, 0.0) for name in names)
+
+    @property
+    def total_ms(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def describe(self):
+        """One-line breakdown for progress output, e.g. "auth 95, ttfb 812, download 1 ms (warm)"."""
+        parts = [f"{name} {self.phases[name] * 1000:.0f}" for name in PHASES if name in self.phases]
+        return f"{', '.join(parts) or 'no phases'} ms ({self.connection or 'not timed'})"
+
+    def row(self):
+        """Result columns: one <phase>_ms per phase seen, and the connection state."""
+        row = {f"{name}_ms": round(self.phases[name] * 1000, 3) if name in self.phases else None
+               for name in PHASES}
+        row['connection'] = self.connection
+        return row
+
+
+def current():
+    """The PhaseTiming being recorded on this thread, or None."""
+    return getattr(_local, 'timing', None)
+
+
+@contextmanager
+def measure():
+    """Record the phases of every call made on this thread inside the block."""
+    outer = current()
+    timing = PhaseTiming()
+    _local.timing = timing
+    try:
+        yield timing
+    finally:
+        timing.end = time.perf_counter()
+        _local.timing = outer
+
+
+@contextmanager
+def phase(name):
+    """Time the block as one phase of the current call, if one is being measured."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing = current()
+        if timing is not None:
+            timing.add(name, time.perf_counter() - start)
+
+
+class _TimedConnectionMixin:
+    """Hooks on a urllib3 connection that record dns, connect, send and ttfb."""
+
+    def _new_conn(self):
+        timing = current()
+        if timing is None:
+            return super()._new_conn()
+        start = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(self._dns_host, self.port, 0, socket.SOCK_STREAM)
+        except OSError:
+            # Let urllib3 fail the lookup itself, with its own exception
+            return super()._new_conn()
+        resolved = time.perf_counter()
+        timing.add('dns', resolved - start)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+
+        # Connect to each resolved address in turn; TLS still verifies self.host
+        dns_host = self._dns_host
+        try:
+            for i, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except (ConnectTimeoutError, NewConnectionError):
+                    if i == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = dns_host
+            timing.add('connect', time.perf_counter() - resolved)
+        timing.connection = COLD
+        timing.address = address
+        return sock
+
+    def request(self, *args, **kwargs):
+        timing = current()
+        if timing is None:
+            return super().request(*args, **kwargs)
+        if timing.connection is None:
+            timing.connection = WARM
+        # Plain HTTP connects inside request(); keep that out of send
+        network = timing.seconds(*NETWORK_PHASES)
+        start = time.perf_counter()
+        try:
+            return super().request(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            timing.add('send', elapsed - (timing.seconds(*NETWORK_PHASES) - network))
+
+    def getresponse(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().getresponse(*args, **kwargs)
+        finally:
+            timing = current()
+            if timing is not None:
+                timing.add('ttfb', time.perf_counter() - start)
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+
+    def connect(self):
+        timing = current()
+        if timing is None:
+            return super().connect()
+        before = timing.seconds('dns', 'connect')
+        start = time.perf_counter()
+        super().connect()
+        # connect() is _new_conn() followed by the TLS handshake
+        elapsed = time.perf_counter() - start
+        timing.add('tls', elapsed - (timing.seconds('dns', 'connect') - before))
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections record phases, and which times the body read."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+    def send(self, request, stream=False, **kwargs):
+        response = super().send(request, stream=stream, **kwargs)
+        if not stream:
+            # requests would read the body later in Session.send; read it here to time it
+            with phase('download'):
+                response.content
+        return response
+
+
+def mount(session):
+    """Time every HTTP(S) call made through a requests session."""
+    adapter = TimedAdapter()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class TimedSession(requests.Session):
+    """requests.Session with pooled connections and per-phase timing."""
+
+    def __init__(self):
+        super().__init__()
+        mount(self)
+
+
+class TokenSource:
+    """
+    Service account access tokens, loaded once and refreshed only when
+    they expire. Both are timed as the auth phase.
+    """
+
+    def __init__(self, credentials_file, scopes=SCOPES):
+        self.credentials_file = credentials_file
+        self.scopes = scopes
+        self.credentials = None
+        self._lock = threading.Lock()
+
+    def token(self):
+        from google.auth.transport.requests import Request as AuthRequest
+        from google.oauth2 import service_account
+
+        with self._lock:
+            if self.credentials is None or not self.credentials.valid:
+                with phase('auth'):
+                    if self.credentials is None:
+                        self.credentials = service_account.Credentials.from_service_account_file(
+                            self.credentials_file, scopes=self.scopes)
+                    self.credentials.refresh(AuthRequest())
+            return self.credentials.token
+
+
+def instrument(transport):
+    """
+    Time calls made through an API transport (see dialogflow_transport).
+
+    RestTransport gets every phase; its token refreshes are timed as auth.
+    Other transports only get the overall latency.
+    """
+    session = getattr(transport, 'session', None)
+    if isinstance(session, requests.Session) and not getattr(transport, 'timed', False):
+        transport.timed = True
+        mount(session)
+        refresh = transport.credentials.refresh
+
+        def timed_refresh(request):
+            with phase('auth'):
+                return refresh(request)
+        transport.credentials.refresh = timed_refresh
+    return transport
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Question catalog parsing shared by the runners and tools
+
+Reads the categorized test question markdown (agent-api/tests/test_questions.md),
+which is laid out as a bold category header followed by bold difficulty
+headers, each with a numbered list of questions:
+
+    **Looker**
+
+    **Easy**
+
+    1.  What is Looker?
+
+Unlike the regex split used in the older runner scripts, the parser tracks
+every difficulty header, so Medium/Difficult/Extremely Difficult questions
+are labeled correctly instead of inheriting the first header of the category.
+
+stratified_sample() is the one sampler the runners use: seeded, stratified
+by category x difficulty, with proportional, equal or Neyman allocation
+(more questions where past response times vary most), and able to skip
+questions tested recently. add_sampling_arguments() and sample_from_args()
+give every runner the same --sample/--seed/--allocation/--history/
+--exclude-days options.
+"""
+
+import os
+import re
+import csv
+import glob
+import json
+import random
+import statistics
+from datetime import datetime, timedelta
+
+DEFAULT_CATALOG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests', 'test_questions.md'))
+
+DIFFICULTIES = ['Easy', 'Medium', 'Difficult', 'Extremely Difficult']
+
+HEADER_PATTERN = re.compile(r'^\*\*([^*]+)\*\*\s*$')
+QUESTION_PATTERN = re.compile(r'^\d+\.\s+(.*\S)\s*$')
+
+def extract_questions(file_path=DEFAULT_CATALOG_PATH):
+    """
+    Extract questions from the markdown catalog.
+    Returns a list of tuples: (question, category, difficulty), in file order.
+    """
+    questions = []
+    category = None
+    difficulty = None
+    
+    with open(file_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            header = HEADER_PATTERN.match(line)
+            if header:
+                title = header.group(1).strip()
+                if title in DIFFICULTIES:
+                    difficulty = title
+                elif not title.endswith(':'):
+                    # Any other bold line (e.g. "**Looker**") starts a category
+                    category = title
+                    difficulty = None
+                continue
+            
+            question = QUESTION_PATTERN.match(line)
+            if question and category and difficulty:
+                questions.append((question.group(1).strip(), category, difficulty))
+    
+    return questions
+
+def stratify(questions):
+    """
+    Group questions by (category, difficulty).
+    Returns a dict of stratum -> list of question tuples, in file order.
+    """
+    strata = {}
+    for question in questions:
+        strata.setdefault((question[1], question[2]), []).append(question)
+    return strata
+
+ALLOCATIONS = ['proportional', 'equal', 'neyman']
+
+def allocate(capacity, weights, size, floor=1):
+    """
+    Split size draws across strata in proportion to their weights, never
+    giving a stratum more than its capacity. When size covers every
+    stratum, each one first gets floor draws. Shares are rounded by largest
+    remainder, and whatever a full stratum cannot take goes to the others.
+
+    Args:
+        capacity (dict): stratum -> questions available
+        weights (dict): stratum -> non-negative weight (all zero = equal)
+        size (int): Total draws
+        floor (int): Draws every stratum gets first, when size allows
+
+    Returns:
+        dict: stratum -> draws, in capacity's order
+    """
+    keys = [key for key in capacity if capacity[key] > 0]
+    size = min(size, sum(capacity[key] for key in keys))
+    counts = dict.fromkeys(keys, 0)
+    if floor and size >= len(keys) * floor:
+        counts = {key: min(floor, capacity[key]) for key in keys}
+    
+    while sum(counts.values()) < size:
+        remaining = size - sum(counts.values())
+        open_keys = [key for key in keys if counts[key] < capacity[key]]
+        total = sum(weights.get(key, 0) for key in open_keys)
+        shares = {key: remaining * (weights.get(key, 0) / total if total > 0 else 1 / len(open_keys))
+                  for key in open_keys}
+        grew = False
+        for key in open_keys:
+            take = min(int(shares[key]), capacity[key] - counts[key])
+            if take:
+                counts[key] += take
+                grew = True
+        if not grew:
+            # Every share is under one draw: the largest shares get one each
+            for key in sorted(open_keys, key=lambda k: shares[k], reverse=True)[:remaining]:
+                counts[key] += 1
+    return counts
+
+def stratified_sample(questions, size, seed=None, allocation='proportional', exclude=(), spreads=None):
+    """
+    Sample questions across the (category, difficulty) strata.
+
+    Allocation decides how many questions each stratum gets:
+
+    - proportional: in proportion to the stratum's size
+    - equal: the same number from every stratum
+    - neyman: in proportion to size x latency standard deviation, so strata
+      whose response times vary most get the most questions. spreads gives
+      each stratum's standard deviation (see latency_spreads()); strata
+      without one get the mean of the others, and without any spreads this
+      is proportional.
+
+    When size is at least the number of strata, every stratum gets at least
+    one question. Questions in exclude (e.g. recently_tested()) are never
+    drawn, so the sample is smaller than size when too few are left. The
+    same seed always gives the same sample.
+
+    Returns a list of question tuples, in catalog order.
+    """
+    if allocation not in ALLOCATIONS:
+        raise ValueError(f"Unknown allocation '{allocation}'. Expected one of: {', '.join(ALLOCATIONS)}")
+    exclude = set(exclude)
+    strata = stratify(questions)
+    available = {key: [q for q in members if q[0] not in exclude] for key, members in strata.items()}
+    if size >= sum(len(members) for members in available.values()):
+        return [question for question in questions if question[0] not in exclude]
+    
+    if allocation == 'equal':
+        weights = dict.fromkeys(strata, 1)
+    elif allocation == 'neyman' and spreads:
+        known = [spreads[key] for key in strata if spreads.get(key) is not None]
+        fallback = sum(known) / len(known) if known else 1
+        weights = {key: len(members) * (spreads.get(key) if spreads.get(key) is not None else fallback)
+                   for key, members in strata.items()}
+    else:
+        weights = {key: len(members) for key, members in strata.items()}
+    counts = allocate({key: len(members) for key, members in available.items()}, weights, size)
+    
+    rng = random.Random(seed)
+    chosen = set()
+    for key, members in available.items():
+        chosen.update(rng.sample(members, counts.get(key, 0)))
+    return [question for question in questions if question in chosen]
+
+def load_result_rows(patterns):
+    """
+    Read result rows from CSV and JSONL results files.
+
+    Args:
+        patterns (list): File paths or glob patterns
+
+    Returns:
+        list: One dict per row
+    """
+    rows = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            if path.endswith('.jsonl'):
+                with open(path, encoding='utf-8') as f:
+                    rows.extend(json.loads(line) for line in f if line.strip())
+            elif path.endswith('.csv'):
+                with open(path, newline='', encoding='utf-8') as f:
+                    rows.extend(csv.DictReader(f))
+    return rows
+
+def latency_spreads(rows, questions):
+    """
+    Standard deviation of response_time_ms per (category, difficulty),
+    from past results. Rows are matched to strata by question text, so
+    results from the older runners with mislabeled difficulties still count.
+
+    Returns:
+        dict: stratum -> standard deviation in ms (strata with fewer than two timings are left out)
+    """
+    stratum_of = {question: (category, difficulty) for question, category, difficulty in questions}
+    timings = {}
+    for row in rows:
+        key = stratum_of.get((row.get('question') or '').strip())
+        try:
+            value = float(row.get('response_time_ms'))
+        except (TypeError, ValueError):
+            continue
+        if key is not None and value >= 0:
+            timings.setdefault(key, []).append(value)
+    return {key: statistics.stdev(values) for key, values in timings.items() if len(values) >= 2}
+
+def recently_tested(rows, days, now=None):
+    """
+    Questions with a result timestamped within the last days.
+
+    Returns:
+        set: Question texts
+    """
+    now = now or datetime.now()
+    cutoff = now - timedelta(days=days)
+    tested = set()
+    for row in rows:
+        try:
+            timestamp = datetime.fromisoformat(str(row.get('timestamp')))
+        except ValueError:
+            continue
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone().replace(tzinfo=None)
+        if timestamp >= cutoff and row.get('question'):
+            tested.add(row['question'].strip())
+    return tested
+
+def add_sampling_arguments(parser, default_size=0):
+    """Add the shared --sample, --seed, --allocation, --history and --exclude-days options."""
+    parser.add_argument("--sample", type=int, default=default_size,
+                        help="Run a stratified sample of N questions across categories and difficulties")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed for --sample, for a reproducible sample")
+    parser.add_argument("--allocation", choices=ALLOCATIONS, default='proportional',
+                        help="Questions per stratum: by stratum size, equal, or neyman (more where "
+                             "latency varies most, from --history)")
+    parser.add_argument("--history", type=str, action="append", default=[],
+                        help="Past results files (glob, .csv or .jsonl) for --allocation neyman and "
+                             "--exclude-days; may be repeated")
+    parser.add_argument("--exclude-days", type=float, default=0,
+                        help="Skip questions with a result in --history from the last N days")
+
+def sample_from_args(questions, args, exclude=()):
+    """Apply the sampling options from add_sampling_arguments() to the catalog."""
+    rows = load_result_rows(args.history) if args.history else []
+    exclude = set(exclude)
+    if args.exclude_days:
+        recent = recently_tested(rows, args.exclude_days)
+        print(f"Excluding {len(recent)} questions tested in the last {args.exclude_days:g} days")
+        exclude |= recent
+    spreads = None
+    if args.allocation == 'neyman':
+        spreads = latency_spreads(rows, questions)
+        if not spreads:
+            print("No latency history for --allocation neyman; allocating proportionally")
+    return stratified_sample(questions, args.sample, seed=args.seed, allocation=args.allocation,
+                             exclude=exclude, spreads=spreads)
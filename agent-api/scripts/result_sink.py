@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Buffered result writer shared by the runners
+
+The runners used to write and flush one CSV row per question, and the
+batched scripts also re-pickled their checkpoint, all on the thread making
+the agent calls. A ResultSink takes rows in memory, and a background thread
+writes them out when flush_rows are waiting or flush_seconds have passed,
+whichever comes first. write() only appends to a list under a lock, so
+writing results never waits on the disk.
+
+Every row is written with the same columns (RESULT_SCHEMA), whichever runner
+produced it. Missing fields are left empty. Fields outside the schema are
+kept as a JSON object in the "extra" column, and each row is tagged with
+the runner's name. The format follows the file extension:
+
+- .csv:     header plus one row per result; appending requires the same header
+- .jsonl:   one JSON object per line
+- .parquet: one row group per flush (needs pyarrow); cannot be appended to
+
+on_flush(rows) runs on the flush thread after each batch reaches the file,
+so checkpoints (e.g. tested_indices.pkl) are never ahead of the results.
+
+Usage:
+    with ResultSink("results.jsonl", runner="run_test_questions") as sink:
+        sink.write({'question': ..., 'answer': ..., 'response_time_ms': 812})
+"""
+
+import os
+import csv
+import json
+import threading
+
+# Column name and type ('str', 'int' or 'float'), in output order
+RESULT_SCHEMA = [
+    ('runner', 'str'),
+    ('question_number', 'int'),
+    ('question', 'str'),
+    ('category', 'str'),
+    ('difficulty', 'str'),
+    ('answer', 'str'),
+    ('outcome', 'str'),
+    ('session_id', 'str'),
+    ('timestamp', 'str'),
+    ('response_time_ms', 'int'),
+    ('first_outcome', 'str'),
+    ('turns', 'int'),
+    ('time_to_answer_ms', 'int'),
+    ('total_time_ms', 'int'),
+    ('turn_latencies_ms', 'str'),
+    ('final_playbook', 'str'),
+    # Client-side phases of the (first) agent call, see phase_timing.py
+    ('auth_ms', 'float'),
+    ('dns_ms', 'float'),
+    ('connect_ms', 'float'),
+    ('tls_ms', 'float'),
+    ('send_ms', 'float'),
+    ('ttfb_ms', 'float'),
+    ('download_ms', 'float'),
+    ('connection', 'str'),
+    ('worker', 'str'),
+    ('attempt', 'int'),
+    ('extra', 'str'),
+]
+
+RESULT_FIELDS = [name for name, _ in RESULT_SCHEMA]
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.parquet': 'parquet'}
+
+DEFAULT_FLUSH_ROWS = 50
+DEFAULT_FLUSH_SECONDS = 2.0
+
+
+def _to_int(value):
+    if value is None or value == '':
+        return None
+    return int(float(value))
+
+
+def _to_float(value):
+    if value is None or value == '':
+        return None
+    return float(value)
+
+
+def _to_str(value):
+    if value is None:
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+CONVERTERS = {'str': _to_str, 'int': _to_int, 'float': _to_float}
+
+
+def normalize(row, runner=None):
+    """
+    Map a runner's row onto RESULT_SCHEMA.
+
+    Args:
+        row (dict): Row as the runner built it
+        runner (str, optional): Runner name, unless the row has one
+
+    Returns:
+        dict: Every schema column, with typed values
+    """
+    out = {}
+    for name, kind in RESULT_SCHEMA:
+        value = row.get(name)
+        try:
+            out[name] = CONVERTERS[kind](value)
+        except (TypeError, ValueError):
+            out[name] = None
+    if out['runner'] is None:
+        out['runner'] = runner
+    extra = {key: value for key, value in row.items() if key not in RESULT_FIELDS}
+    if row.get('extra'):
+        extra.update(json.loads(row['extra']) if isinstance(row['extra'], str) else row['extra'])
+    out['extra'] = json.dumps(extra, default=str) if extra else None
+    return out
+
+
+class _CsvWriter:
+    def __init__(self, path, append):
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            with open(path, newline='', encoding='utf-8') as f:
+                header = next(csv.reader(f), [])
+            if header != RESULT_FIELDS:
+                raise ValueError(f"Cannot append to {path}: its columns differ from RESULT_SCHEMA")
+        self.file = open(path, 'a' if append else 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=RESULT_FIELDS)
+        if not exists:
+            self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class _JsonlWriter:
+    def __init__(self, path, append):
+        self.file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def write(self, rows):
+        self.file.write(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path, append):
+        if append and os.path.exists(path):
+            raise ValueError(f"Cannot append to Parquet file {path}; write a new file")
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+        self.pa = pa
+        types = {'str': pa.string(), 'int': pa.int64(), 'float': pa.float64()}
+        self.schema = pa.schema([(name, types[kind]) for name, kind in RESULT_SCHEMA])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {'csv': _CsvWriter, 'jsonl': _JsonlWriter, 'parquet': _ParquetWriter}
+
+
+def format_for(path):
+    """Output format for a file name, from its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unknown result format '{extension}'. Expected one of: {', '.join(FORMATS)}")
+    return FORMATS[extension]
+
+
+class ResultSink:
+    """Buffers result rows and writes them from a background thread."""
+
+    def __init__(self, path, runner=None, flush_rows=DEFAULT_FLUSH_ROWS, flush_seconds=DEFAULT_FLUSH_SECONDS,
+                 append=False, on_flush=None):
+        self.path = path
+        self.runner = runner
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.on_flush = on_flush
+        self.rows_written = 0
+        self.flushes = 0
+        self.error = None
+
+        self._writer = WRITERS[format_for(path)](path, append)
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name=f"result-sink-{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+
+    def write(self, row):
+        """Queue one row. Never touches the file."""
+        with self._lock:
+            if self._closing:
+                raise ValueError("ResultSink is closed")
+            self._buffer.append(dict(row))
+            full = len(self._buffer) >= self.flush_rows
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            # Read before flushing: once closing is set no more rows can arrive
+            closing = self._closing
+            self._flush()
+            if closing:
+                return
+
+    def _flush(self):
+        with self._lock:
+            pending, self._buffer = self._buffer, []
+        if not pending:
+            return
+        rows = [normalize(row, self.runner) for row in pending]
+        try:
+            self._writer.write(rows)
+        except Exception as e:
+            # Keep the rows and try again on the next flush
+            print(f"Result sink could not write {len(rows)} rows to {self.path}: {e}")
+            self.error = e
+            with self._lock:
+                self._buffer[:0] = pending
+            return
+        self.error = None
+        self.rows_written += len(rows)
+        self.flushes += 1
+        if self.on_flush:
+            try:
+                self.on_flush(rows)
+            except Exception as e:
+                print(f"Result sink on_flush failed: {e}")
+
+    def close(self):
+        """Write everything still buffered and close the file."""
+        with self._lock:
+            if self._closing:
+                return
+            self._closing = True
+        self._wake.set()
+        self._thread.join()
+        if self._buffer:
+            # The last flush failed; try once more so the error surfaces here
+            self._flush()
+        self._writer.close()
+        if self._buffer:
+            raise RuntimeError(f"{len(self._buffer)} result rows could not be written to {self.path}: {self.error}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
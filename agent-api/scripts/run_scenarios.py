@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Concurrent Multi-Turn Scenario Runner
+
+Plays the scripted conversations in agent-api/tests/scenarios.json (format in
+scenarios.py) against the Dialogflow CX agent. Every scenario run gets its
+own session, and runs execute concurrently through one shared transport.
+
+Every message is written to the output CSV with its latency and client
+phase timings (phase_timing.py), its depth in the session and the session's
+final length. The summary shows whether
+latency grows with conversation depth: latency by depth, latency by session
+length and a least-squares slope in ms per turn.
+
+Configuration comes from the same environment variables as the API
+(PROJECT_ID, LOCATION, AGENT_ID, GOOGLE_APPLICATION_CREDENTIALS,
+DIALOGFLOW_TRANSPORT, DIALOGFLOW_TIMEOUT).
+
+Usage:
+    python run_scenarios.py
+    python run_scenarios.py --concurrency 8 --repeat 5 --follow-up
+    python run_scenarios.py --ids exec-dashboard,churn-model --output scenario_results.csv
+"""
+
+import os
+import sys
+import csv
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from conversation import DEFAULT_MAX_TURNS, dialogflow_ask, env_transport
+from phase_timing import PHASE_FIELDS
+from scenarios import (DEFAULT_MAX_MESSAGES, depth_trend, latency_by, load_scenarios, run_scenario,
+                       scenario_session_id)
+
+DEFAULT_SCENARIOS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests', 'scenarios.json'))
+
+FIELDNAMES = ['scenario_id', 'run', 'session_id', 'category', 'difficulty', 'depth', 'session_turns',
+              'step', 'kind', 'text', 'answer', 'outcome', 'playbook', 'status_code', 'latency_ms',
+              'started_s', 'timestamp'] + PHASE_FIELDS
+
+def play(transport, scenario, run, follow_up_turns, max_messages, clock_start):
+    """Play one scenario run in a new session and return its rows."""
+    session_id = scenario_session_id(scenario.id, run)
+    started_s = round(time.perf_counter() - clock_start, 3)
+    rows = run_scenario(scenario, dialogflow_ask(transport, session_id), follow_up_turns, max_messages)
+    for row in rows:
+        row.update({
+            'scenario_id': scenario.id,
+            'run': run,
+            'session_id': session_id,
+            'category': scenario.category,
+            'difficulty': scenario.difficulty,
+            'started_s': started_s,
+            'timestamp': datetime.now().isoformat(),
+        })
+    return rows
+
+def print_summary(rows, wall_s):
+    """Print latency by depth and session length, and the depth trend."""
+    sessions = len({row['session_id'] for row in rows})
+    print(f"\n===== SUMMARY: {sessions} sessions, {len(rows)} messages in {wall_s:.1f} s =====")
+
+    for key, label in (('depth', 'Depth'), ('session_turns', 'Session length')):
+        print(f"\n{label:<15} {'n':>5} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        for value, count, mean_ms, p50_ms, p95_ms in latency_by(rows, key):
+            print(f"{value:<15} {count:>5} {mean_ms:>9.0f} {p50_ms:>8} {p95_ms:>8}")
+
+    trend = depth_trend(rows)
+    if trend:
+        slope, correlation = trend
+        print(f"\nLatency vs. depth: {slope:+.1f} ms per turn (r = {correlation:+.2f})")
+    else:
+        print("\nLatency vs. depth: not enough distinct depths to fit")
+
+    outcomes = {}
+    for row in rows:
+        outcomes[row['outcome']] = outcomes.get(row['outcome'], 0) + 1
+    print("Outcomes: " + ", ".join(f"{name} {count}" for name, count in sorted(outcomes.items())))
+
+def main():
+    """Main function to run the scenarios."""
+    parser = argparse.ArgumentParser(description="Run scripted multi-turn scenarios concurrently")
+    parser.add_argument("--file", "-f", type=str, default=DEFAULT_SCENARIOS_PATH,
+                        help="JSON file with scenarios")
+    parser.add_argument("--ids", type=str, default="",
+                        help="Comma-separated scenario ids to run (default: all)")
+    parser.add_argument("--repeat", "-r", type=int, default=1,
+                        help="Runs per scenario, each in its own session")
+    parser.add_argument("--concurrency", "-c", type=int, default=4,
+                        help="Sessions in flight at once")
+    parser.add_argument("--follow-up", action="store_true",
+                        help="Answer handoffs and clarifying questions automatically (see conversation.py)")
+    parser.add_argument("--max-messages", type=int, default=DEFAULT_MAX_MESSAGES,
+                        help="Most messages per session")
+    parser.add_argument("--output", "-o", type=str,
+                        default=f"scenario_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                        help="Output CSV file, one row per message")
+    args = parser.parse_args()
+
+    scenarios = load_scenarios(args.file)
+    if args.ids:
+        wanted = {scenario_id.strip() for scenario_id in args.ids.split(',')}
+        scenarios = [scenario for scenario in scenarios if scenario.id in wanted]
+    if not scenarios:
+        print("No scenarios to run.")
+        return 1
+
+    try:
+        transport = env_transport()
+    except RuntimeError as e:
+        print(e)
+        return 1
+
+    follow_up_turns = DEFAULT_MAX_TURNS if args.follow_up else 1
+    jobs = [(scenario, run) for run in range(1, args.repeat + 1) for scenario in scenarios]
+    print(f"Running {len(scenarios)} scenarios x {args.repeat} runs, {args.concurrency} sessions at a time...")
+
+    all_rows = []
+    clock_start = time.perf_counter()
+    with open(args.output, 'w', newline='') as csvfile, ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        writer.writeheader()
+
+        futures = [pool.submit(play, transport, scenario, run, follow_up_turns, args.max_messages, clock_start)
+                   for scenario, run in jobs]
+        for future in as_completed(futures):
+            rows = future.result()
+            writer.writerows(rows)
+            csvfile.flush()  # Ensure data is written immediately
+            all_rows.extend(rows)
+
+            latencies = ", ".join(str(row['latency_ms']) for row in rows)
+            print(f"{rows[0]['scenario_id']} run {rows[0]['run']}: {len(rows)} turns, "
+                  f"final {rows[-1]['outcome']} [{latencies} ms]")
+    wall_s = time.perf_counter() - clock_start
+    transport.close()
+
+    print_summary(all_rows, wall_s)
+    print(f"\nResults saved to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Scripted multi-turn conversation scenarios
+
+A scenario is a scripted sequence of user turns sent in one session, with
+optional branching on the agent's replies. Scenarios live in a JSON file
+(agent-api/tests/scenarios.json):
+
+    [
+      {
+        "id": "exec-dashboard",
+        "category": "Looker",
+        "difficulty": "Difficult",
+        "turns": [
+          {"say": "I want to build a sales dashboard for our executive team."},
+          {"id": "structure", "say": "How should I structure the explores behind it?",
+           "branches": [
+             {"match": "which (database|warehouse)", "say": "We use BigQuery."},
+             {"outcome": "error", "end": true}
+           ]},
+          {"say": "How do I add a year-over-year comparison?"}
+        ]
+      }
+    ]
+
+After each scripted turn, its branches are checked in order against the
+final reply. A branch applies when its "outcome" equals the reply's outcome
+(see outcomes.py) and its "match" regex is found in the answer (case-
+insensitive); a branch may give either or both. The first branch that
+applies can:
+
+- "say": send one more message before going on
+- "goto": continue from the turn with that id instead of the next one
+- "end": stop the scenario
+
+With no matching branch, the script moves on to the next turn. An error
+reply ends the scenario, since the session is no longer usable. Handoffs and
+clarifying questions can also be answered automatically with converse()
+(conversation.py) when follow_up_turns is above 1. A session never sends
+more than max_messages messages, so goto loops always terminate.
+"""
+
+import re
+import json
+import math
+import uuid
+import statistics
+
+from conversation import converse
+from outcomes import ERROR
+from sessions import MAX_DIALOGFLOW_SESSION_ID
+
+DEFAULT_MAX_MESSAGES = 12
+
+
+class ScenarioError(ValueError):
+    """Raised for a malformed scenario file."""
+
+
+class Branch:
+    """One branch of a scripted turn."""
+
+    def __init__(self, outcome=None, match=None, say=None, goto=None, end=False):
+        if outcome is None and match is None:
+            raise ScenarioError("A branch needs an 'outcome', a 'match' or both")
+        self.outcome = outcome
+        self.pattern = re.compile(match, re.IGNORECASE) if match else None
+        self.say = say
+        self.goto = goto
+        self.end = end
+
+    def applies(self, answer, outcome):
+        if self.outcome is not None and outcome != self.outcome:
+            return False
+        return self.pattern is None or self.pattern.search(answer) is not None
+
+
+class Scenario:
+    """A scripted conversation."""
+
+    def __init__(self, scenario_id, turns, category="Uncategorized", difficulty="Unknown"):
+        self.id = scenario_id
+        self.turns = turns
+        self.category = category
+        self.difficulty = difficulty
+        self.index = {turn['id']: i for i, turn in enumerate(turns) if turn.get('id')}
+
+        for turn in turns:
+            for branch in turn['branches']:
+                if branch.goto is not None and branch.goto not in self.index:
+                    raise ScenarioError(f"Scenario '{scenario_id}': unknown goto target '{branch.goto}'")
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data.get('id') or not data.get('turns'):
+            raise ScenarioError(f"A scenario needs an 'id' and at least one turn: {data}")
+        turns = []
+        for i, turn in enumerate(data['turns']):
+            if not turn.get('say'):
+                raise ScenarioError(f"Scenario '{data['id']}', turn {i + 1}: missing 'say'")
+            turns.append({
+                'id': turn.get('id'),
+                'say': turn['say'],
+                'branches': [Branch(**branch) for branch in turn.get('branches', [])],
+            })
+        return cls(data['id'], turns, data.get('category', 'Uncategorized'), data.get('difficulty', 'Unknown'))
+
+
+def load_scenarios(file_path):
+    """
+    Load scenarios from a JSON file.
+
+    Args:
+        file_path (str): JSON file holding a list of scenarios
+
+    Returns:
+        list: Scenario objects, in file order
+    """
+    with open(file_path, encoding='utf-8') as f:
+        data = json.load(f)
+    scenarios = [Scenario.from_dict(item) for item in data]
+    ids = [scenario.id for scenario in scenarios]
+    if len(set(ids)) != len(ids):
+        raise ScenarioError(f"Duplicate scenario ids in {file_path}")
+    return scenarios
+
+
+def run_scenario(scenario, ask, follow_up_turns=1, max_messages=DEFAULT_MAX_MESSAGES):
+    """
+    Play a scenario against one session.
+
+    Args:
+        scenario (Scenario): The script to play
+        ask (callable): text -> (status code, AgentResponse), bound to one session
+        follow_up_turns (int): Messages per scripted turn including automatic
+            follow-ups to handoffs and clarifying questions (1 = none)
+        max_messages (int): Most messages to send in the session
+
+    Returns:
+        list: One dict per message sent, in order, with the session depth
+            (1 = first message), the step that sent it and the reply
+    """
+    rows = []
+
+    def send(text, step, kind):
+        conversation = converse(ask, text, min(follow_up_turns, max_messages - len(rows)))
+        for i, turn in enumerate(conversation.turns):
+            rows.append({
+                'depth': len(rows) + 1,
+                'step': step,
+                'kind': kind if i == 0 else 'follow_up',
+                'text': turn.text,
+                'answer': turn.answer,
+                'outcome': turn.outcome,
+                'playbook': turn.playbook,
+                'status_code': turn.status_code,
+                'latency_ms': turn.latency_ms,
+                **turn.phases(),
+            })
+        return conversation.final
+
+    position = 0
+    while position < len(scenario.turns) and len(rows) < max_messages:
+        turn = scenario.turns[position]
+        step = turn['id'] or str(position + 1)
+        reply = send(turn['say'], step, 'script')
+        position += 1
+        if reply.outcome == ERROR:
+            break
+
+        branch = next((b for b in turn['branches'] if b.applies(reply.answer, reply.outcome)), None)
+        if branch is None:
+            continue
+        if branch.say and len(rows) < max_messages:
+            send(branch.say, step, 'branch')
+        if branch.end:
+            break
+        if branch.goto is not None:
+            position = scenario.index[branch.goto]
+
+    # Let every row say how long its session turned out to be
+    for row in rows:
+        row['session_turns'] = len(rows)
+    return rows
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def latency_by(rows, key):
+    """
+    Latency statistics grouped by a row field (e.g. depth or session_turns).
+
+    Returns:
+        list: (value, count, mean_ms, p50_ms, p95_ms), sorted by value
+    """
+    groups = {}
+    for row in rows:
+        if row['latency_ms'] is not None:
+            groups.setdefault(row[key], []).append(row['latency_ms'])
+    summary = []
+    for value in sorted(groups):
+        latencies = sorted(groups[value])
+        summary.append((value, len(latencies), statistics.mean(latencies),
+                        percentile(latencies, 0.5), percentile(latencies, 0.95)))
+    return summary
+
+
+def depth_trend(rows):
+    """
+    Least-squares fit of latency against conversation depth.
+
+    Returns:
+        tuple: (slope in ms per turn, Pearson correlation), or None when
+            there are too few distinct depths to fit
+    """
+    depths = [row['depth'] for row in rows if row['latency_ms'] is not None]
+    latencies = [row['latency_ms'] for row in rows if row['latency_ms'] is not None]
+    if len(set(depths)) < 2 or len(set(latencies)) < 2:
+        return None
+    # statistics.linear_regression and correlation need Python 3.10
+    mean_depth, mean_latency = statistics.mean(depths), statistics.mean(latencies)
+    sxx = sum((d - mean_depth) ** 2 for d in depths)
+    syy = sum((l - mean_latency) ** 2 for l in latencies)
+    sxy = sum((d - mean_depth) * (l - mean_latency) for d, l in zip(depths, latencies))
+    return sxy / sxx, sxy / math.sqrt(sxx * syy)
+
+
+def scenario_session_id(scenario_id, run):
+    """
+    A new Dialogflow session ID for one scenario run, "scenario-<id>-<run>-<8 hex>",
+    with the scenario id cut short to fit Dialogflow's 36-character limit.
+    """
+    suffix = f"-{run}-{uuid.uuid4().hex[:8]}"
+    prefix = re.sub(r'[^A-Za-z0-9_-]', '-', f"scenario-{scenario_id}")
+    return prefix[:MAX_DIALOGFLOW_SESSION_ID - len(suffix)] + suffix
@@ -7,18 +7,22 @@ taking a sample of questions from different categories and difficulty levels.
 """
 
 import os
-import re
+import sys
 import json
 import time
-import csv
-import random
+import argparse
 from datetime import datetime
 from tqdm import tqdm
-from google.oauth2 import service_account
-from google.auth.transport.requests import Request as AuthRequest
-import requests
 from dotenv import load_dotenv
 
+# Shared detectIntent response extractor and answer outcome classifier
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'api'))
+from agent_response import parse_response
+from outcomes import ERROR, classify
+from question_catalog import DEFAULT_CATALOG_PATH, add_sampling_arguments, extract_questions, sample_from_args
+from phase_timing import TimedSession, TokenSource, measure
+from result_sink import ResultSink
+
 # Load environment variables
 load_dotenv()
 
@@ -28,80 +32,9 @@ LOCATION = 'us-central1'
 AGENT_ID = 'fa0bd62b-3fc7-46c8-9d55-3a18d9812a70'
 CREDENTIALS_FILE = '/Users/dionedge/dev/creds/heuristicsai-9ad7dd8375bf.json'
 
-def extract_all_questions(file_path):
-    """
-    Extract all questions from the markdown file.
-    Returns a list of tuples: (question, category, difficulty)
-    """
-    questions = []
-    
-    # Read the file
-    with open(file_path, 'r') as f:
-        content = f.read()
-    
-    # Find categories and difficulties
-    sections = re.split(r'\*\*([^*]+)\*\*\s*\n\s*\*\*([^*]+)\*\*', content)
-    
-    # Extract all questions
-    for i in range(1, len(sections), 3):
-        if i+2 <= len(sections):
-            category = sections[i].strip()
-            difficulty = sections[i+1].strip()
-            section_content = sections[i+2]
-            
-            # Extract numbered questions
-            numbered_questions = re.findall(r'\d+\.\s+(.*?)\n', section_content)
-            
-            for question in numbered_questions:
-                questions.append((question.strip(), category, difficulty))
-    
-    return questions
-
-def sample_diverse_questions(questions, samples_per_category=2, samples_per_difficulty=2):
-    """
-    Sample questions to get a diverse set across categories and difficulties.
-    """
-    # Group questions by category
-    category_questions = {}
-    difficulty_questions = {}
-    
-    for q, category, difficulty in questions:
-        if category not in category_questions:
-            category_questions[category] = []
-        category_questions[category].append((q, category, difficulty))
-        
-        if difficulty not in difficulty_questions:
-            difficulty_questions[difficulty] = []
-        difficulty_questions[difficulty].append((q, category, difficulty))
-    
-    # Sample from each category
-    sampled_questions = []
-    
-    # First by category
-    for category, questions_list in category_questions.items():
-        # Take random samples from this category
-        if len(questions_list) <= samples_per_category:
-            samples = questions_list  # Take all if we have fewer than requested
-        else:
-            samples = random.sample(questions_list, samples_per_category)
-        
-        for sample in samples:
-            if sample not in sampled_questions:
-                sampled_questions.append(sample)
-    
-    # Then by difficulty
-    for difficulty, questions_list in difficulty_questions.items():
-        # Take random samples from this difficulty
-        if len(questions_list) <= samples_per_difficulty:
-            samples = questions_list  # Take all if we have fewer than requested
-        else:
-            samples = random.sample(questions_list, samples_per_difficulty)
-        
-        for sample in samples:
-            if sample not in sampled_questions:
-                sampled_questions.append(sample)
-    
-    return sampled_questions
+# One pooled, phase-timed session and token source for every question (phase_timing.py)
+HTTP = TimedSession()
+TOKENS = TokenSource(CREDENTIALS_FILE)
 
 def ask_question_service_acct(question, session_id):
     """
@@ -119,16 +52,8 @@ def ask_question_service_acct(question, session_id):
         if not os.path.exists(CREDENTIALS_FILE):
             return f"Credentials file not found: {CREDENTIALS_FILE}"
             
-        # Load credentials
-        credentials = service_account.Credentials.from_service_account_file(
-            CREDENTIALS_FILE, 
-            scopes=['https://www.googleapis.com/auth/cloud-platform']
-        )
-        
-        # Refresh credentials
-        auth_req = AuthRequest()
-        credentials.refresh(auth_req)
-        token = credentials.token
+        # Minted once and refreshed only when it expires (the auth phase)
+        token = TOKENS.token()
         
         # API URL for Dialogflow CX
         api_url = f"https://{LOCATION}-dialogflow.googleapis.com/v3/projects/{PROJECT_ID}/locations/{LOCATION}/agents/{AGENT_ID}/sessions/{session_id}:detectIntent"
@@ -150,7 +75,7 @@ def ask_question_service_acct(question, session_id):
         }
         
         # Make the API call
-        response = requests.post(api_url, headers=headers, json=payload, timeout=60)
+        response = HTTP.post(api_url, headers=headers, json=payload, timeout=60)
         
         # Check response
         if response.status_code != 200:
@@ -158,16 +83,8 @@ def ask_question_service_acct(question, session_id):
             print(error_msg)
             return error_msg
             
-        # Parse response
-        response_data = response.json()
-        
-        # Extract response text
-        response_text = "No response from agent"
-        if "queryResult" in response_data and "responseMessages" in response_data["queryResult"]:
-            for msg in response_data["queryResult"]["responseMessages"]:
-                if "text" in msg and "text" in msg["text"]:
-                    response_text = "\n".join(msg["text"]["text"])
-                    break
+        # Extract every text message in one pass
+        response_text = parse_response(response.content).text
         
         return response_text
     
@@ -184,10 +101,6 @@ def run_tests(questions, output_file="diverse_sample_results.csv"):
         questions: List of (question, category, difficulty) tuples
         output_file: CSV file to save results
     """
-    # Prepare CSV file
-    fieldnames = ['question_number', 'question', 'category', 'difficulty', 
-                 'answer', 'session_id', 'timestamp', 'response_time_ms']
-    
     total_questions = len(questions)
     success_count = 0
     error_count = 0
@@ -196,9 +109,8 @@ def run_tests(questions, output_file="diverse_sample_results.csv"):
     stats_by_category = {}
     stats_by_difficulty = {}
     
-    with open(output_file, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
+    # Rows are written by the sink's background thread
+    with ResultSink(output_file, runner='test_diverse_sample') as sink:
         
         # Process questions with tqdm progress bar
         for i, (question, category, difficulty) in enumerate(tqdm(questions, desc="Processing questions")):
@@ -212,15 +124,14 @@ def run_tests(questions, output_file="diverse_sample_results.csv"):
             
             # Ask the question
             session_id = f"diverse-sample-{question_number}-{int(time.time())}"
-            start_time = time.time()
-            
             try:
-                answer = ask_question_service_acct(question, session_id)
-                end_time = time.time()
-                response_time_ms = int((end_time - start_time) * 1000)
+                with measure() as timing:
+                    answer = ask_question_service_acct(question, session_id)
+                response_time_ms = int(timing.total_ms)
                 
-                # Determine if answer was successful or an error
-                is_error = "error" in answer.lower() or "failed" in answer.lower() or "status code" in answer.lower()
+                # Classify the answer (error, empty, handoff, refusal, clarifying or answered)
+                outcome = classify(answer)
+                is_error = outcome == ERROR
                 
                 if is_error:
                     error_count += 1
@@ -228,7 +139,7 @@ def run_tests(questions, output_file="diverse_sample_results.csv"):
                 else:
                     success_count += 1
                     print(f"A: {answer[:150]}..." if len(answer) > 150 else f"A: {answer}")
-                    print(f"Response time: {response_time_ms} ms")
+                    print(f"Response time: {response_time_ms} ms [{timing.describe()}]")
                 
                 # Update statistics
                 if category not in stats_by_category:
@@ -245,8 +156,8 @@ def run_tests(questions, output_file="diverse_sample_results.csv"):
                     stats_by_difficulty[difficulty]['success'] += 1 
                     stats_by_difficulty[difficulty]['total_time'] += response_time_ms
                 
-                # Write to CSV
-                writer.writerow({
+                # Queue the row for the results file
+                sink.write({
                     'question_number': question_number,
                     'question': question,
                     'category': category,
@@ -254,9 +165,10 @@ def run_tests(questions, output_file="diverse_sample_results.csv"):
                     'answer': answer,
                     'session_id': session_id,
                     'timestamp': datetime.now().isoformat(),
-                    'response_time_ms': response_time_ms
+                    'response_time_ms': response_time_ms,
+                    'outcome': outcome,
+                    **timing.row()
                 })
-                csvfile.flush()  # Ensure data is written immediately
             
             except Exception as e:
                 print(f"Exception occurred: {str(e)}")
@@ -292,15 +204,19 @@ def run_tests(questions, output_file="diverse_sample_results.csv"):
 
 def main():
     """Main function to run the test questions."""
+    parser = argparse.ArgumentParser(description="Test a diverse sample of the catalog with service account credentials")
+    parser.add_argument("--file", "-f", type=str, default=DEFAULT_CATALOG_PATH,
+                        help="Markdown file with test questions")
+    add_sampling_arguments(parser, default_size=28)
+    parser.set_defaults(seed=42, allocation='equal')
+    args = parser.parse_args()
+    
     print(f"Testing Vertex AI Agent with service account credentials - Diverse Sample")
     print(f"Project ID: {PROJECT_ID}")
     print(f"Location: {LOCATION}")
     print(f"Agent ID: {AGENT_ID}")
     print(f"Credentials file: {CREDENTIALS_FILE}")
     
-    # Set random seed for reproducibility
-    random.seed(42)
-    
     # Check if credentials file exists
     if not os.path.exists(CREDENTIALS_FILE):
         print(f"Credentials file not found: {CREDENTIALS_FILE}")
@@ -309,13 +225,12 @@ def main():
     print("Credentials file exists")
     
     # Extract all questions
-    questions_file = "/Users/dionedge/dev/looker-vertex-agent/agent-api/tests/test_questions.md"
-    print(f"Extracting all questions from {questions_file}...")
-    all_questions = extract_all_questions(questions_file)
+    print(f"Extracting all questions from {args.file}...")
+    all_questions = extract_questions(args.file)
     
-    # Sample diverse questions
-    print(f"Sampling diverse questions...")
-    sampled_questions = sample_diverse_questions(all_questions, samples_per_category=4, samples_per_difficulty=4)
+    # Seeded stratified sample across categories and difficulties (question_catalog.py)
+    print(f"Sampling {args.sample} questions ({args.allocation} allocation, seed {args.seed})...")
+    sampled_questions = sample_from_args(all_questions, args)
     
     if not sampled_questions:
         print("No questions sampled.")
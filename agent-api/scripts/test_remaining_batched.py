@@ -7,18 +7,22 @@ processing questions in small batches to avoid timeout issues.
 """
 
 import os
+import sys
 import re
 import json
 import time
-import csv
 import pickle
 from datetime import datetime
 from tqdm import tqdm
-from google.oauth2 import service_account
-from google.auth.transport.requests import Request as AuthRequest
-import requests
 from dotenv import load_dotenv
 
+# Shared detectIntent response extractor and answer outcome classifier
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'api'))
+from agent_response import parse_response
+from outcomes import ERROR, classify
+from phase_timing import TimedSession, TokenSource, measure
+from result_sink import ResultSink
+
 # Load environment variables
 load_dotenv()
 
@@ -28,6 +32,10 @@ LOCATION = 'us-central1'
 AGENT_ID = 'fa0bd62b-3fc7-46c8-9d55-3a18d9812a70'
 CREDENTIALS_FILE = '/Users/dionedge/dev/creds/heuristicsai-9ad7dd8375bf.json'
 
+# One pooled, phase-timed session and token source for every question (phase_timing.py)
+HTTP = TimedSession()
+TOKENS = TokenSource(CREDENTIALS_FILE)
+
 # Set of already tested question indices to avoid duplicates
 # Load from pickle file instead of hardcoding
 try:
@@ -96,16 +104,8 @@ def ask_question_service_acct(question, session_id):
         if not os.path.exists(CREDENTIALS_FILE):
             return f"Credentials file not found: {CREDENTIALS_FILE}"
             
-        # Load credentials
-        credentials = service_account.Credentials.from_service_account_file(
-            CREDENTIALS_FILE, 
-            scopes=['https://www.googleapis.com/auth/cloud-platform']
-        )
-        
-        # Refresh credentials
-        auth_req = AuthRequest()
-        credentials.refresh(auth_req)
-        token = credentials.token
+        # Minted once and refreshed only when it expires (the auth phase)
+        token = TOKENS.token()
         
         # API URL for Dialogflow CX
         api_url = f"https://{LOCATION}-dialogflow.googleapis.com/v3/projects/{PROJECT_ID}/locations/{LOCATION}/agents/{AGENT_ID}/sessions/{session_id}:detectIntent"
@@ -127,7 +127,7 @@ def ask_question_service_acct(question, session_id):
         }
         
         # Make the API call
-        response = requests.post(api_url, headers=headers, json=payload, timeout=60)
+        response = HTTP.post(api_url, headers=headers, json=payload, timeout=60)
         
         # Check response
         if response.status_code != 200:
@@ -135,16 +135,8 @@ def ask_question_service_acct(question, session_id):
             print(error_msg)
             return error_msg
             
-        # Parse response
-        response_data = response.json()
-        
-        # Extract response text
-        response_text = "No response from agent"
-        if "queryResult" in response_data and "responseMessages" in response_data["queryResult"]:
-            for msg in response_data["queryResult"]["responseMessages"]:
-                if "text" in msg and "text" in msg["text"]:
-                    response_text = "\n".join(msg["text"]["text"])
-                    break
+        # Extract every text message in one pass
+        response_text = parse_response(response.content).text
         
         return response_text
     
@@ -153,6 +145,15 @@ def ask_question_service_acct(question, session_id):
         print(error_msg)
         return error_msg
 
+def save_checkpoint(rows):
+    """
+    Mark flushed questions as tested and save the checkpoint. Runs on the
+    result sink's flush thread, after the rows are in the results file.
+    """
+    TESTED_INDICES.update(row['question_number'] - 1 for row in rows)
+    with open('tested_indices.pkl', 'wb') as f:
+        pickle.dump(TESTED_INDICES, f)
+
 def run_batch(questions_batch, batch_num, output_file="remaining_batched_results.csv", append=False):
     """
     Run tests for a batch of questions
@@ -163,10 +164,6 @@ def run_batch(questions_batch, batch_num, output_file="remaining_batched_results
         output_file: CSV file to save results
         append: Whether to append to the output file
     """
-    # Prepare CSV file
-    fieldnames = ['question_number', 'question', 'category', 'difficulty', 
-                 'answer', 'session_id', 'timestamp', 'response_time_ms']
-    
     total_questions = len(questions_batch)
     success_count = 0
     error_count = 0
@@ -175,12 +172,9 @@ def run_batch(questions_batch, batch_num, output_file="remaining_batched_results
     stats_by_category = {}
     stats_by_difficulty = {}
     
-    # Create or append to CSV file
-    mode = 'a' if append else 'w'
-    with open(output_file, mode, newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        if not append:
-            writer.writeheader()
+    # Create or append to the results file; rows (and the checkpoint) are
+    # written by the sink's background thread
+    with ResultSink(output_file, runner='test_remaining_batched', on_flush=save_checkpoint, append=append) as sink:
         
         # Process questions with tqdm progress bar
         for batch_idx, (orig_idx, (question, category, difficulty)) in enumerate(tqdm(questions_batch, desc=f"Batch {batch_num}")):
@@ -194,15 +188,14 @@ def run_batch(questions_batch, batch_num, output_file="remaining_batched_results
             
             # Ask the question
             session_id = f"batch{batch_num}-q{question_number}-{int(time.time())}"
-            start_time = time.time()
-            
             try:
-                answer = ask_question_service_acct(question, session_id)
-                end_time = time.time()
-                response_time_ms = int((end_time - start_time) * 1000)
+                with measure() as timing:
+                    answer = ask_question_service_acct(question, session_id)
+                response_time_ms = int(timing.total_ms)
                 
-                # Determine if answer was successful or an error
-                is_error = "error" in answer.lower() or "failed" in answer.lower() or "status code" in answer.lower()
+                # Classify the answer (error, empty, handoff, refusal, clarifying or answered)
+                outcome = classify(answer)
+                is_error = outcome == ERROR
                 
                 if is_error:
                     error_count += 1
@@ -210,7 +203,7 @@ def run_batch(questions_batch, batch_num, output_file="remaining_batched_results
                 else:
                     success_count += 1
                     print(f"A: {answer[:150]}..." if len(answer) > 150 else f"A: {answer}")
-                    print(f"Response time: {response_time_ms} ms")
+                    print(f"Response time: {response_time_ms} ms [{timing.describe()}]")
                 
                 # Update statistics
                 if category not in stats_by_category:
@@ -227,8 +220,8 @@ def run_batch(questions_batch, batch_num, output_file="remaining_batched_results
                     stats_by_difficulty[difficulty]['success'] += 1 
                     stats_by_difficulty[difficulty]['total_time'] += response_time_ms
                 
-                # Write to CSV
-                writer.writerow({
+                # Queue the row for the results file
+                sink.write({
                     'question_number': question_number,
                     'question': question,
                     'category': category,
@@ -236,13 +229,10 @@ def run_batch(questions_batch, batch_num, output_file="remaining_batched_results
                     'answer': answer,
                     'session_id': session_id,
                     'timestamp': datetime.now().isoformat(),
-                    'response_time_ms': response_time_ms
+                    'response_time_ms': response_time_ms,
+                    'outcome': outcome,
+                    **timing.row()
                 })
-                csvfile.flush()  # Ensure data is written immediately
-                
-                # Save tested index to a pickle file for resumability
-                with open('tested_indices.pkl', 'wb') as f:
-                    pickle.dump(TESTED_INDICES.union({orig_idx}), f)
                 
             except Exception as e:
                 print(f"Exception occurred: {str(e)}")
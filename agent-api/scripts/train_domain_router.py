@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Train and evaluate the API's local domain router
+
+Builds the labeled training set from the categorized question catalog and
+every recorded results CSV, trains the Naive Bayes domain classifier from
+src/api/domain_router.py, and writes src/api/domain_model.json.
+
+It also reports what routing would save, based on the recorded answers:
+- cross-validated accuracy of the classifier
+- how many recorded answers were specialist handoffs (an extra hop)
+- the latency those handoff turns cost, and the share a correct route avoids
+
+All figures use out-of-fold predictions, so no question is scored by a model
+that was trained on it.
+
+Usage:
+    python train_domain_router.py
+    python train_domain_router.py --folds 10 --min-confidence 0.9
+"""
+
+import os
+import sys
+import csv
+import glob
+import random
+import argparse
+import statistics
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(script_dir, '..', '..'))
+sys.path.append(os.path.join(project_root, 'src', 'api'))
+
+from domain_router import DomainClassifier, DEFAULT_MODEL_FILE, DEFAULT_MIN_CONFIDENCE, GENERAL
+from outcomes import HANDOFF, OUTCOMES, classify
+from question_catalog import extract_questions, DEFAULT_CATALOG_PATH
+
+# Catalog/CSV category -> playbook domain
+CATEGORY_DOMAINS = {
+    'Looker': 'looker',
+    'Looker Studio': 'looker_studio',
+    'BigQuery': 'bigquery',
+    'BQML (BigQuery ML)': 'bigquery',
+    'BQML': 'bigquery',
+    'dbt (data build tool)': 'dbt',
+    'dbt': 'dbt',
+    'Omni': 'omni',
+    'General Data Analytics': GENERAL,
+}
+
+RESULT_GLOBS = [
+    os.path.join(project_root, 'agent-api', 'data', '*.csv'),
+    os.path.join(project_root, 'agent-api', 'scripts', '*results*.csv'),
+]
+
+def load_results():
+    """Load every recorded result row that has a question and a known category."""
+    rows = []
+    for pattern in RESULT_GLOBS:
+        for file_path in sorted(glob.glob(pattern)):
+            with open(file_path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    if row.get('question') and row.get('category') in CATEGORY_DOMAINS:
+                        rows.append(row)
+    return rows
+
+def build_examples(catalog_path, results):
+    """Return unique (question, domain) pairs from the catalog and results."""
+    examples = {}
+    for question, category, _ in extract_questions(catalog_path):
+        if category in CATEGORY_DOMAINS:
+            examples[question] = CATEGORY_DOMAINS[category]
+    for row in results:
+        examples.setdefault(row['question'].strip(), CATEGORY_DOMAINS[row['category']])
+    return sorted(examples.items())
+
+def out_of_fold_predictions(examples, folds, seed=42):
+    """
+    k-fold cross-validation over unique questions.
+
+    Returns:
+        dict: question -> (predicted domain, confidence) from a model that
+        never saw that question
+    """
+    shuffled = list(examples)
+    random.Random(seed).shuffle(shuffled)
+    predictions = {}
+    for k in range(folds):
+        train = [ex for i, ex in enumerate(shuffled) if i % folds != k]
+        model = DomainClassifier.train(train)
+        for question, _ in shuffled[k::folds]:
+            predictions[question] = model.predict(question)
+    return predictions
+
+def is_routed(prediction, min_confidence):
+    predicted, confidence = prediction
+    return predicted != GENERAL and confidence >= min_confidence
+
+def routing_accuracy(examples, predictions, min_confidence):
+    """
+    Returns:
+        tuple: (accuracy, routed share, accuracy among routed questions)
+    """
+    correct = routed = routed_correct = 0
+    for question, domain in examples:
+        prediction = predictions[question]
+        correct += prediction[0] == domain
+        if is_routed(prediction, min_confidence):
+            routed += 1
+            routed_correct += prediction[0] == domain
+    total = len(examples)
+    return correct / total, routed / total, (routed_correct / routed if routed else 0.0)
+
+def row_outcome(row):
+    """Stored outcome of a results row, else outcomes.classify() of its answer."""
+    stored = row.get('outcome')
+    return stored if stored in OUTCOMES else classify(row.get('answer'))
+
+def handoff_savings(results, predictions, min_confidence):
+    """Estimate hops and latency a correct first-turn route avoids (held-out predictions)."""
+    handoffs = [row for row in results if row_outcome(row) == HANDOFF]
+    avoided = []
+    misrouted = 0
+    for row in handoffs:
+        prediction = predictions[row['question'].strip()]
+        if not is_routed(prediction, min_confidence):
+            continue
+        if prediction[0] == CATEGORY_DOMAINS[row['category']]:
+            avoided.append(row)
+        else:
+            misrouted += 1
+    latencies = []
+    for row in avoided:
+        try:
+            latency = float(row.get('response_time_ms') or 0)
+        except ValueError:
+            continue
+        if latency > 0:
+            latencies.append(latency)
+    return {
+        'answers': len(results),
+        'handoffs': len(handoffs),
+        'avoidable_handoffs': len(avoided),
+        'misrouted_handoffs': misrouted,
+        'mean_handoff_turn_ms': statistics.mean(latencies) if latencies else 0.0,
+        'saved_ms_total': sum(latencies),
+    }
+
+def main():
+    """Train, evaluate and save the domain model."""
+    parser = argparse.ArgumentParser(description="Train the API's local domain router")
+    parser.add_argument("--catalog", "-c", type=str, default=DEFAULT_CATALOG_PATH,
+                        help="Path to the categorized question markdown")
+    parser.add_argument("--output", "-o", type=str, default=DEFAULT_MODEL_FILE,
+                        help="Where to write the trained model")
+    parser.add_argument("--folds", "-k", type=int, default=5,
+                        help="Cross-validation folds")
+    parser.add_argument("--min-confidence", type=float, default=DEFAULT_MIN_CONFIDENCE,
+                        help="Confidence threshold used by the router")
+    args = parser.parse_args()
+
+    results = load_results()
+    examples = build_examples(args.catalog, results)
+    print(f"Training examples: {len(examples)} unique questions from the catalog and {len(results)} result rows")
+
+    predictions = out_of_fold_predictions(examples, args.folds)
+    accuracy, routed_share, routed_accuracy = routing_accuracy(examples, predictions, args.min_confidence)
+    print(f"\n===== {args.folds}-FOLD CROSS-VALIDATION =====")
+    print(f"Accuracy: {accuracy * 100:.1f}%")
+    print(f"Routed at confidence >= {args.min_confidence}: {routed_share * 100:.1f}% of questions, "
+          f"{routed_accuracy * 100:.1f}% of those correct")
+
+    savings = handoff_savings(results, predictions, args.min_confidence)
+    print("\n===== HANDOFF SAVINGS (recorded answers) =====")
+    print(f"Handoff replies: {savings['handoffs']}/{savings['answers']} "
+          f"({savings['handoffs'] / max(savings['answers'], 1) * 100:.1f}%)")
+    print(f"Handoffs a first-turn route would skip: {savings['avoidable_handoffs']} "
+          f"(misrouted: {savings['misrouted_handoffs']})")
+    print(f"Mean latency of those handoff turns: {savings['mean_handoff_turn_ms']:.0f} ms")
+    print(f"Total turn latency avoided: {savings['saved_ms_total'] / 1000:.1f} s")
+
+    model = DomainClassifier.train(examples)
+    model.save(args.output)
+    print(f"\nModel saved to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
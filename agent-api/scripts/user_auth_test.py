@@ -7,16 +7,22 @@ without requiring the Flask API server to be running.
 """
 
 import os
+import sys
 import re
 import json
 import time
-import csv
 import subprocess
 from datetime import datetime
 from tqdm import tqdm
-import requests
 from dotenv import load_dotenv
 
+# Shared detectIntent response extractor and answer outcome classifier
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'api'))
+from agent_response import parse_response
+from outcomes import classify
+from phase_timing import TimedSession, measure, phase
+from result_sink import ResultSink
+
 # Load environment variables
 load_dotenv()
 
@@ -25,6 +31,9 @@ PROJECT_ID = 'heuristicsai'
 LOCATION = 'us-central1'  # Changed to us-central1 as requested
 AGENT_ID = 'fa0bd62b-3fc7-46c8-9d55-3a18d9812a70'
 
+# One pooled, phase-timed session for every question (phase_timing.py)
+HTTP = TimedSession()
+
 def extract_questions(file_path):
     """
     Extract questions from the markdown file.
@@ -76,6 +85,21 @@ def get_access_token():
         print(f"stderr: {e.stderr}")
         return None
 
+# gcloud access tokens last an hour; reuse one for half of that
+TOKEN_REUSE_SECONDS = 1800
+_token_cache = {'token': None, 'minted': 0.0}
+
+def cached_access_token():
+    """
+    Get the gcloud access token, minting a new one (timed as the auth phase)
+    only when there is none yet or it is TOKEN_REUSE_SECONDS old
+    """
+    if _token_cache['token'] is None or time.monotonic() - _token_cache['minted'] > TOKEN_REUSE_SECONDS:
+        with phase('auth'):
+            _token_cache['token'] = get_access_token()
+        _token_cache['minted'] = time.monotonic()
+    return _token_cache['token']
+
 def ask_question_direct(question, session_id, location=None):
     """
     Ask a question directly to the Vertex AI Agent using Dialogflow CX API
@@ -90,7 +114,7 @@ def ask_question_direct(question, session_id, location=None):
     """
     try:
         # Get access token using gcloud CLI
-        token = get_access_token()
+        token = cached_access_token()
         if not token:
             return "Failed to get access token"
         
@@ -120,7 +144,7 @@ def ask_question_direct(question, session_id, location=None):
         print(f"API URL: {api_url}")
         
         # Make the API call
-        response = requests.post(api_url, headers=headers, json=payload, timeout=60)
+        response = HTTP.post(api_url, headers=headers, json=payload, timeout=60)
         
         # Check response
         if response.status_code != 200:
@@ -128,16 +152,8 @@ def ask_question_direct(question, session_id, location=None):
             print(error_msg)
             return error_msg
             
-        # Parse response
-        response_data = response.json()
-        
-        # Extract response text
-        response_text = "No response from agent"
-        if "queryResult" in response_data and "responseMessages" in response_data["queryResult"]:
-            for msg in response_data["queryResult"]["responseMessages"]:
-                if "text" in msg and "text" in msg["text"]:
-                    response_text = "\n".join(msg["text"]["text"])
-                    break
+        # Extract every text message in one pass
+        response_text = parse_response(response.content).text
         
         return response_text
     
@@ -155,13 +171,8 @@ def run_tests(questions, limit=5, output_file="user_auth_test_results.csv"):
         limit: Maximum number of questions to test
         output_file: CSV file to save results
     """
-    # Prepare CSV file
-    fieldnames = ['question_number', 'question', 'category', 'difficulty', 
-                 'answer', 'session_id', 'timestamp', 'response_time_ms']
-    
-    with open(output_file, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
+    # Rows are written by the sink's background thread
+    with ResultSink(output_file, runner='user_auth_test') as sink:
         
         # Process questions
         num_questions = min(limit, len(questions)) if limit > 0 else len(questions)
@@ -175,17 +186,15 @@ def run_tests(questions, limit=5, output_file="user_auth_test_results.csv"):
             
             # Use the specified location (now defaulted to us-central1)
             session_id = f"user-auth-test-{question_number}-{int(time.time())}"
-            start_time = time.time()
-            answer = ask_question_direct(question, session_id)
-                
-            end_time = time.time()
-            response_time_ms = int((end_time - start_time) * 1000)
+            with measure() as timing:
+                answer = ask_question_direct(question, session_id)
+            response_time_ms = int(timing.total_ms)
             
             print(f"Answer: {answer[:100]}..." if len(answer) > 100 else f"Answer: {answer}")
-            print(f"Response time: {response_time_ms} ms")
+            print(f"Response time: {response_time_ms} ms [{timing.describe()}]")
             
-            # Write to CSV
-            writer.writerow({
+            # Queue the row for the results file
+            sink.write({
                 'question_number': question_number,
                 'question': question,
                 'category': category,
@@ -193,9 +202,10 @@ def run_tests(questions, limit=5, output_file="user_auth_test_results.csv"):
                 'answer': answer,
                 'session_id': session_id,
                 'timestamp': datetime.now().isoformat(),
-                'response_time_ms': response_time_ms
+                'response_time_ms': response_time_ms,
+                'outcome': classify(answer),
+                **timing.row()
             })
-            csvfile.flush()  # Ensure data is written immediately
             
             # Add a delay between questions
             time.sleep(1)
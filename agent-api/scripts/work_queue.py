@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Work-stealing task queue shared by a coordinator and worker processes
+
+The coordinator splits the tasks round-robin into one shard per expected
+worker, so every shard gets a mix of categories and difficulties. Each
+worker that connects owns a shard and takes from its front. When its shard
+is empty it steals from the back of the longest remaining shard, so fast
+workers (or hosts) keep busy until all the work is gone.
+
+Every task handed out is leased. The lease ends when the worker reports a
+result or a failure, when its connection closes (the worker died), or when
+the lease times out (the worker hung). A task whose lease ends without a
+result goes onto a retry list that every worker takes from first, until it
+has been attempted max_attempts times. After that the coordinator gives up
+on it. A result that arrives for a task already completed is dropped, so a
+task that was re-queued while its first worker was only slow is recorded
+once; a result for a task the coordinator gave up on is still accepted and
+replaces the abandonment.
+
+Worker names identify leases, so a worker is refused while another
+connection with the same name is open (two workers started with the same
+--id would otherwise release each other's tasks). The name can be reused
+once that connection has closed.
+
+Protocol: one TCP connection per worker, carrying newline-delimited JSON
+requests, each answered by one JSON line:
+
+    {"op": "hello", "worker": "host-1234", "token": "..."}  -> {"ok": true} | {"error": "..."}
+    {"op": "take"}                                 -> {"task": {...}} | {"wait": 1.0} | {"done": true}
+    {"op": "result", "task_id": 7, "row": {...}}   -> {"ok": true, "duplicate": false} | {"error": "..."}
+    {"op": "fail", "task_id": 7, "error": "..."}   -> {"ok": true}
+
+The token is a shared secret, so that only the coordinator's workers can
+join a coordinator listening on a non-loopback address.
+"""
+
+import hmac
+import json
+import time
+import socket
+import threading
+import socketserver
+from collections import deque
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+WAIT_SECONDS = 1.0
+
+
+class WorkQueue:
+    """Sharded task queue with work stealing, leases and retries. Thread-safe."""
+
+    def __init__(self, tasks, shards=1, max_attempts=DEFAULT_MAX_ATTEMPTS, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.tasks = {task['task_id']: task for task in tasks}
+        self.shards = [deque() for _ in range(max(1, shards))]
+        for i, task in enumerate(tasks):
+            self.shards[i % len(self.shards)].append(task['task_id'])
+        self.retry = deque()
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+
+        self.owners = {}       # worker -> shard index
+        self.connected = set() # workers registered and not yet released
+        self.leases = {}       # task_id -> (worker, deadline)
+        self.attempts = {}     # task_id -> times handed out
+        self.completed = set()
+        self.abandoned = {}    # task_id -> last error
+        self.steals = 0
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def register(self, worker):
+        """
+        Give a worker the shard with the fewest owners (its old shard when it reconnects).
+
+        Returns:
+            int: The worker's shard, or None when a worker with the same name
+                is still connected
+        """
+        with self.lock:
+            if worker in self.connected:
+                return None
+            self.connected.add(worker)
+            if worker not in self.owners:
+                owned = [list(self.owners.values()).count(i) for i in range(len(self.shards))]
+                self.owners[worker] = owned.index(min(owned))
+            return self.owners[worker]
+
+    def take(self, worker, now=None):
+        """
+        Lease the next task for a worker: a retry first, then its own
+        shard's front, then the back of the longest other shard.
+
+        Returns:
+            dict: The task with its attempt number, or None when nothing is
+                available right now
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            task_id = self._next(worker)
+            # A re-queued task can finish on its first worker while it waits for a retry
+            while task_id is not None and task_id in self.completed:
+                task_id = self._next(worker)
+            if task_id is None:
+                return None
+            self.attempts[task_id] = self.attempts.get(task_id, 0) + 1
+            self.leases[task_id] = (worker, now + self.lease_seconds)
+            return dict(self.tasks[task_id], attempt=self.attempts[task_id], max_attempts=self.max_attempts)
+
+    def _next(self, worker):
+        if self.retry:
+            return self.retry.popleft()
+        own = self.shards[self.owners.get(worker, 0)]
+        if own:
+            return own.popleft()
+        victim = max(self.shards, key=len)
+        if not victim:
+            return None
+        self.steals += 1
+        return victim.pop()
+
+    def complete(self, worker, task_id):
+        """
+        Record a task's result. A late result for an abandoned task is
+        accepted and the task counts as completed instead.
+
+        Returns:
+            bool: True for the first result, False for a duplicate, None for
+                a task_id that is not in the queue
+        """
+        with self.lock:
+            if task_id not in self.tasks:
+                return None
+            self.leases.pop(task_id, None)
+            if task_id in self.completed:
+                return False
+            self.abandoned.pop(task_id, None)
+            self.completed.add(task_id)
+            self.changed.notify_all()
+            return True
+
+    def fail(self, worker, task_id, error):
+        """End a task's lease without a result and re-queue it."""
+        with self.lock:
+            if self.leases.get(task_id, (None,))[0] == worker:
+                del self.leases[task_id]
+                self._requeue(task_id, error)
+
+    def release(self, worker, error="worker disconnected"):
+        """Re-queue every task leased to a worker that went away."""
+        with self.lock:
+            self.connected.discard(worker)
+            for task_id in [t for t, (owner, _) in self.leases.items() if owner == worker]:
+                del self.leases[task_id]
+                self._requeue(task_id, error)
+
+    def expire(self, now=None):
+        """Re-queue tasks whose lease timed out."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            for task_id in [t for t, (_, deadline) in self.leases.items() if deadline <= now]:
+                del self.leases[task_id]
+                self._requeue(task_id, "lease expired")
+
+    def _requeue(self, task_id, error):
+        if task_id in self.completed:
+            return
+        if self.attempts.get(task_id, 0) >= self.max_attempts:
+            self.abandoned[task_id] = error
+        else:
+            self.retry.append(task_id)
+        self.changed.notify_all()
+
+    @property
+    def finished(self):
+        return len(self.completed) + len(self.abandoned) == len(self.tasks)
+
+    def wait(self, timeout):
+        """Block until the queue is finished or the timeout passes."""
+        with self.changed:
+            return self.changed.wait_for(lambda: self.finished, timeout)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'tasks': len(self.tasks),
+                'completed': len(self.completed),
+                'abandoned': len(self.abandoned),
+                'leased': len(self.leases),
+                'pending': sum(len(shard) for shard in self.shards) + len(self.retry),
+                'retries': sum(self.attempts.values()) - len(self.attempts),
+                'steals': self.steals,
+                'workers': len(self.owners),
+            }
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One worker connection."""
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        worker = None
+        try:
+            for line in self.rfile:
+                message = json.loads(line)
+                op = message.get('op')
+                if worker is None:
+                    token = message.get('token')
+                    if op != 'hello' or not isinstance(token, str) or \
+                            not hmac.compare_digest(token.encode('utf-8'), coordinator.token.encode('utf-8')):
+                        self._send({'error': 'unauthorized'})
+                        return
+                    name = message.get('worker') or f"{self.client_address[0]}:{self.client_address[1]}"
+                    if coordinator.queue.register(name) is None:
+                        print(f"Refused worker {name}: a worker with that name is connected")
+                        self._send({'error': f"worker name already connected: {name}"})
+                        return
+                    worker = name
+                    print(f"Worker {worker} connected")
+                    self._send({'ok': True})
+                elif op == 'take':
+                    self._send(coordinator.take(worker))
+                elif op == 'result':
+                    first = coordinator.queue.complete(worker, message['task_id'])
+                    if first is None:
+                        print(f"Worker {worker} sent a result for unknown task {message['task_id']}")
+                        self._send({'error': f"unknown task: {message['task_id']}"})
+                        continue
+                    if first:
+                        coordinator.on_result(message['row'])
+                    self._send({'ok': True, 'duplicate': not first})
+                elif op == 'fail':
+                    print(f"Worker {worker} failed task {message['task_id']}: {message.get('error')}")
+                    coordinator.queue.fail(worker, message['task_id'], message.get('error'))
+                    self._send({'ok': True})
+                else:
+                    self._send({'error': f"unknown op: {op}"})
+        except (OSError, ValueError) as e:
+            print(f"Worker {worker} connection error: {e}")
+        finally:
+            if worker is not None:
+                coordinator.queue.release(worker)
+                print(f"Worker {worker} disconnected")
+
+    def _send(self, message):
+        self.wfile.write(json.dumps(message).encode('utf-8') + b'\n')
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Coordinator:
+    """
+    Serves a WorkQueue to workers over TCP and hands results to on_result.
+
+    on_result(row) and on_abandon(task, error) are called from connection
+    threads and the reaper thread, one at a time. A task passed to on_abandon
+    can still get a late result from a worker that was only slow; on_result
+    then receives it, and the result replaces the abandonment.
+    """
+
+    def __init__(self, queue, on_result, on_abandon=None, host='127.0.0.1', port=0, token=''):
+        self.queue = queue
+        self.token = token
+        self._on_result = on_result
+        self._on_abandon = on_abandon
+        self._callback_lock = threading.Lock()
+        self._reported = set()
+        self._stopped = threading.Event()
+        self.server = _Server((host, port), _Handler)
+        self.server.coordinator = self
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._reap, daemon=True).start()
+        return self.address
+
+    def stop(self):
+        self._stopped.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def take(self, worker):
+        task = self.queue.take(worker)
+        if task is not None:
+            return {'task': task}
+        self.report_abandoned()
+        return {'done': True} if self.queue.finished else {'wait': WAIT_SECONDS}
+
+    def on_result(self, row):
+        with self._callback_lock:
+            self._on_result(row)
+
+    def report_abandoned(self):
+        """Call on_abandon once for each task the queue gave up on."""
+        with self._callback_lock:
+            for task_id, error in list(self.queue.abandoned.items()):
+                if task_id not in self._reported:
+                    self._reported.add(task_id)
+                    if self._on_abandon:
+                        self._on_abandon(self.queue.tasks[task_id], error)
+
+    def _reap(self):
+        while not self._stopped.wait(1.0):
+            self.queue.expire()
+            self.report_abandoned()
+
+
+class WorkerClient:
+    """A worker's connection to the coordinator."""
+
+    def __init__(self, host, port, worker, token='', timeout=60):
+        self.worker = worker
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.reader = self.sock.makefile('rb')
+        reply = self.call({'op': 'hello', 'worker': worker, 'token': token})
+        if not reply.get('ok'):
+            raise ConnectionError(f"Coordinator refused worker {worker}: {reply.get('error')}")
+
+    def call(self, message):
+        self.sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Coordinator closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+def run_worker(client, execute):
+    """
+    Take tasks until the coordinator has none left.
+
+    Args:
+        client (WorkerClient): Connection to the coordinator
+        execute (callable): task -> result row; raising re-queues the task
+
+    Returns:
+        int: Tasks completed by this worker
+    """
+    completed = 0
+    while True:
+        reply = client.call({'op': 'take'})
+        if reply.get('done'):
+            return completed
+        if 'wait' in reply:
+            time.sleep(reply['wait'])
+            continue
+        task = reply['task']
+        try:
+            row = execute(task)
+        except Exception as e:
+            client.call({'op': 'fail', 'task_id': task['task_id'], 'error': f"{type(e).__name__}: {e}"})
+            continue
+        client.call({'op': 'result', 'task_id': task['task_id'], 'row': row})
+        completed += 1
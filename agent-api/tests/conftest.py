@@ -0,0 +1,72 @@
+"""
+Shared pytest setup for agent-api/tests
+
+Puts the project's module directories on sys.path, so test files import
+the API, webhook, dashboard and script modules directly. src/api comes
+before agent-api/scripts, whose agent_api.py is an older client of the
+same name. The agent_api and fake_backend fixtures give tests the API
+module without network calls.
+
+Run the suite from the repository root or this directory:
+
+    python -m pytest agent-api/tests
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+MODULE_DIRS = [
+    os.path.join(PROJECT_ROOT, 'src', 'api'),
+    os.path.join(PROJECT_ROOT, 'src', 'webhook'),
+    os.path.join(PROJECT_ROOT, 'src', 'dashboard'),
+    os.path.join(PROJECT_ROOT, 'agent-api', 'scripts'),
+    os.path.join(PROJECT_ROOT, 'scripts'),
+]
+
+for module_dir in MODULE_DIRS:
+    if module_dir not in sys.path:
+        sys.path.append(module_dir)
+
+
+class FakeBackendPolicy:
+    """Stands in for backends.FallbackPolicy; records every question it answers."""
+
+    def __init__(self):
+        self.calls = []
+
+    def answer(self, question, session_id, query_params=None, domain=None, history=None):
+        self.calls.append({'question': question, 'session_id': session_id, 'query_params': query_params,
+                           'domain': domain, 'history': history})
+        return f"Live answer to: {question}", 'dialogflow'
+
+
+@pytest.fixture
+def agent_api(monkeypatch):
+    """
+    src/api/agent_api.py, imported without touching the network.
+
+    Importing agent_api starts the warm-up thread when WARMUP_ON_START is
+    true (the default), and that thread loads credentials and connects to
+    Dialogflow, so the warm-up is turned off first. Nothing in the module is
+    replaced here; tests swap its globals with monkeypatch.setattr so they
+    are restored afterwards.
+    """
+    monkeypatch.setenv('WARMUP_ON_START', 'false')
+    import agent_api as module
+
+    assert not any(thread.name == 'agent-warmup' for thread in threading.enumerate()), \
+        "agent_api started a warm-up thread on import"
+    return module
+
+
+@pytest.fixture
+def fake_backend(agent_api, monkeypatch):
+    """A FakeBackendPolicy answering for agent_api, for the length of one test."""
+    backend = FakeBackendPolicy()
+    monkeypatch.setattr(agent_api, 'backend_policy', backend)
+    return backend
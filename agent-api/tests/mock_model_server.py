@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Local mock of the Vertex AI Gemini generateContent endpoint.
+
+Answers POST .../models/<model>:generateContent with a canned candidate that
+echoes the question and the first line of the system instruction, so tests
+can check which playbook was used. Latency and failures can be injected.
+
+Usage:
+    python mock_model_server.py --port 8090 --latency-ms 200
+    GEMINI_API_BASE=http://localhost:8090 GEMINI_AUTH=false python ../../src/api/agent_api.py
+"""
+
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockModelHandler(BaseHTTPRequestHandler):
+    """Handles generateContent requests for a MockModelServer."""
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        server.requests.append({'path': self.path, 'body': body})
+
+        if server.latency_ms:
+            time.sleep(server.latency_ms / 1000)
+
+        if not self.path.endswith(':generateContent'):
+            return self.reply(404, {'error': {'code': 404, 'message': f"Unknown path {self.path}"}})
+        if server.fail_status:
+            return self.reply(server.fail_status, {'error': {'code': server.fail_status, 'message': 'Injected failure'}})
+
+        question = body['contents'][-1]['parts'][0]['text']
+        instruction = body.get('systemInstruction', {}).get('parts', [{}])[0].get('text', '')
+        playbook = instruction.strip().splitlines()[0] if instruction.strip() else ''
+        self.reply(200, {
+            'candidates': [{
+                'content': {'role': 'model', 'parts': [{'text': f"Mock answer to: {question}"}]},
+                'finishReason': 'STOP'
+            }],
+            'usageMetadata': {'promptTokenCount': len(instruction.split()), 'candidatesTokenCount': 5},
+            'modelVersion': 'mock',
+            'playbook': playbook
+        })
+
+    def reply(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockModelServer(ThreadingHTTPServer):
+    """
+    A generateContent server on localhost.
+
+    Args:
+        port (int): Port to bind; 0 picks a free one
+        latency_ms (float): Delay added to every response
+        fail_status (int, optional): Status returned instead of an answer
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency_ms=0, fail_status=None):
+        super().__init__(('127.0.0.1', port), MockModelHandler)
+        self.latency_ms = latency_ms
+        self.fail_status = fail_status
+        self.requests = []
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        """Serve from a background thread and return self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Gemini generateContent server")
+    parser.add_argument("--port", type=int, default=8090, help="Port to listen on")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every response")
+    parser.add_argument("--fail-status", type=int, default=None, help="Always fail with this status")
+    args = parser.parse_args()
+
+    server = MockModelServer(args.port, args.latency_ms, args.fail_status)
+    print(f"Mock model server on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
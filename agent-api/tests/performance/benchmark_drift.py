@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Answer Drift Benchmark
+
+Times src/webhook/drift.py on batches of (baseline, latest) answer pairs
+drawn from the recorded answers in agent-api/data, and checks that a batch
+of --pairs answers scores within --budget-ms so drift can run after every
+scheduled webhook batch.
+
+Usage:
+    python benchmark_drift.py
+    python benchmark_drift.py --pairs 5000 --repeat 5
+"""
+
+import os
+import sys
+import csv
+import glob
+import time
+import random
+import argparse
+import statistics
+
+# Make the webhook modules importable
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..'))
+sys.path.append(os.path.join(project_root, 'src', 'webhook'))
+
+from drift import drift_scores
+
+def load_answers():
+    """All recorded answers in agent-api/data."""
+    answers = []
+    for file_path in glob.glob(os.path.join(project_root, 'agent-api', 'data', '*.csv')):
+        with open(file_path, newline='', encoding='utf-8') as f:
+            answers.extend(row['answer'] for row in csv.DictReader(f) if row.get('answer'))
+    return answers or ["Looker is a business intelligence platform."]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized answer drift scoring")
+    parser.add_argument("--pairs", type=int, default=2000, help="Answer pairs per batch")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed batches")
+    parser.add_argument("--budget-ms", type=float, default=1000, help="Allowed time per batch")
+    args = parser.parse_args()
+
+    answers = load_answers()
+    rng = random.Random(0)
+    baseline = [rng.choice(answers) for _ in range(args.pairs)]
+    latest = [rng.choice(answers) for _ in range(args.pairs)]
+    words = sum(len(a.split()) for a in baseline + latest) / (2 * args.pairs)
+
+    drift_scores(baseline[:10], latest[:10])  # warm up
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        drift_scores(baseline, latest)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    median = statistics.median(timings)
+    print(f"{args.pairs} pairs, {words:.0f} words per answer")
+    print(f"  median {median:.1f} ms, best {min(timings):.1f} ms, "
+          f"{median * 1000 / args.pairs:.1f} us per pair")
+    ok = median <= args.budget_ms
+    print(f"  budget {args.budget_ms:.0f} ms [{'OK' if ok else 'OVER'}]")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
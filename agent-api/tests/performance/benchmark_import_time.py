@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Import-Time Benchmark for the API Server and Webhook
+
+Cold starts on Cloud Run and Cloud Functions pay for every module imported
+at load time. This script imports each entry point in a fresh interpreter
+with `python -X importtime`, takes the median of several runs, and compares
+it with the budgets in import_budget.json. It exits non-zero when an entry
+point goes over budget, so it can gate deploys.
+
+Usage:
+    python benchmark_import_time.py
+    python benchmark_import_time.py --runs 7 --top 15
+    python benchmark_import_time.py --update-budget   # record current medians + headroom
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..'))
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'import_budget.json')
+
+# Entry point name -> (working directory, module to import)
+ENTRY_POINTS = {
+    'api': (os.path.join(project_root, 'src', 'api'), 'agent_api'),
+    'webhook': (os.path.join(project_root, 'src', 'webhook'), 'main'),
+}
+
+# Keep background warm-up/preload threads out of the measurement
+BENCH_ENV = {
+    'WARMUP_ON_START': 'false',
+    'WEBHOOK_PRELOAD': 'false',
+}
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def measure_once(cwd, module):
+    """
+    Import module in a fresh interpreter.
+
+    Returns:
+        tuple: (total import time in ms, {module: cumulative us}) or (None, error text)
+    """
+    env = dict(os.environ, **BENCH_ENV)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=cwd, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        return None, proc.stderr.strip().splitlines()[-1] if proc.stderr else 'import failed'
+
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            cumulative[match.group(4)] = int(match.group(2))
+    # The entry point's cumulative time covers everything it pulls in
+    return cumulative.get(module, 0) / 1000, cumulative
+
+def measure(name, runs):
+    """Return (median ms, slowest modules of the last run) for an entry point."""
+    cwd, module = ENTRY_POINTS[name]
+    totals = []
+    cumulative = {}
+    for _ in range(runs):
+        total_ms, cumulative = measure_once(cwd, module)
+        if total_ms is None:
+            return None, cumulative
+        totals.append(total_ms)
+    return statistics.median(totals), cumulative
+
+def load_budget():
+    if not os.path.exists(BUDGET_FILE):
+        return {}
+    with open(BUDGET_FILE) as f:
+        return json.load(f)
+
+def main():
+    """Measure each entry point and compare against the tracked budget."""
+    parser = argparse.ArgumentParser(description="Measure cold-start import time against a budget")
+    parser.add_argument("--runs", "-r", type=int, default=5,
+                        help="Fresh-interpreter runs per entry point (median is reported)")
+    parser.add_argument("--top", "-t", type=int, default=10,
+                        help="Number of slowest modules to list")
+    parser.add_argument("--update-budget", action="store_true",
+                        help="Write current medians plus 25%% headroom to import_budget.json")
+    args = parser.parse_args()
+
+    budget = load_budget()
+    over_budget = []
+    measured = {}
+
+    for name in ENTRY_POINTS:
+        median_ms, detail = measure(name, args.runs)
+        if median_ms is None:
+            print(f"{name}: SKIPPED ({detail})")
+            continue
+
+        measured[name] = median_ms
+        limit = budget.get(name, {}).get('budget_ms')
+        status = "no budget" if limit is None else ("OK" if median_ms <= limit else "OVER BUDGET")
+        limit_text = f" / budget {limit:.0f} ms" if limit is not None else ""
+        print(f"{name}: {median_ms:.1f} ms{limit_text} [{status}]")
+
+        slowest = sorted(detail.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        for module, cumulative_us in slowest:
+            print(f"    {cumulative_us / 1000:8.1f} ms  {module}")
+
+        if limit is not None and median_ms > limit:
+            over_budget.append(name)
+
+    if args.update_budget:
+        for name, median_ms in measured.items():
+            budget[name] = {'budget_ms': round(median_ms * 1.25), 'measured_ms': round(median_ms, 1)}
+        with open(BUDGET_FILE, 'w') as f:
+            json.dump(budget, f, indent=2)
+            f.write('\n')
+        print(f"Budget written to {BUDGET_FILE}")
+        return 0
+
+    if over_budget:
+        print(f"\nImport-time budget exceeded for: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Answer Outcome Classifier Benchmark
+
+Measures src/api/outcomes.py against the substring heuristic it replaced
+("error" / "failed" / "status code" anywhere in the answer):
+
+1. Accuracy on the labeled fixture set (agent-api/tests/data/outcome_fixtures.json),
+   for the error / not-error split the old heuristic could express.
+2. Throughput on every recorded answer in agent-api/data, per answer and
+   for a whole results file via outcome_column().
+
+Usage:
+    python benchmark_outcomes.py
+    python benchmark_outcomes.py --repeat 20
+"""
+
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import argparse
+import statistics
+
+# Make the API modules importable
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..'))
+sys.path.append(os.path.join(project_root, 'src', 'api'))
+
+from outcomes import ERROR, classify, outcome_column
+
+FIXTURES_FILE = os.path.join(project_root, 'agent-api', 'tests', 'data', 'outcome_fixtures.json')
+
+def substring_is_error(answer):
+    """The heuristic the runners used before outcomes.py."""
+    answer = answer.lower()
+    return "error" in answer or "failed" in answer or "status code" in answer
+
+def load_answers():
+    answers = []
+    for file_path in glob.glob(os.path.join(project_root, 'agent-api', 'data', '*.csv')):
+        with open(file_path, newline='', encoding='utf-8') as f:
+            answers.extend(row.get('answer') or '' for row in csv.DictReader(f))
+    return answers
+
+def time_per_item(func, items, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        timings.append((time.perf_counter() - start) * 1e6 / len(items))
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the answer outcome classifier")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed passes over the answers")
+    args = parser.parse_args()
+
+    with open(FIXTURES_FILE, encoding='utf-8') as f:
+        fixtures = json.load(f)
+    exact = sum(classify(fx['answer'], fx.get('status_code'), fx.get('error'), fx.get('handoff')) == fx['outcome']
+                for fx in fixtures)
+    text_only = [fx for fx in fixtures if 'status_code' not in fx and 'error' not in fx]
+    new_errors = sum((classify(fx['answer'], handoff=fx.get('handoff')) == ERROR) == (fx['outcome'] == ERROR)
+                     for fx in text_only)
+    old_errors = sum(substring_is_error(fx['answer']) == (fx['outcome'] == ERROR) for fx in text_only)
+
+    print(f"Fixtures: {len(fixtures)}")
+    print(f"  outcome accuracy:         {exact}/{len(fixtures)}")
+    print(f"  error/not-error accuracy: classifier {new_errors}/{len(text_only)}, "
+          f"substring heuristic {old_errors}/{len(text_only)}")
+
+    answers = load_answers()
+    if not answers:
+        print("No recorded answers found")
+        return 1
+    words = sum(len(a.split()) for a in answers) / len(answers)
+    print(f"\nRecorded answers: {len(answers)} ({words:.0f} words on average)")
+    print(f"  classify():          {time_per_item(classify, answers, args.repeat):.2f} us per answer")
+    print(f"  substring heuristic: {time_per_item(substring_is_error, answers, args.repeat):.2f} us per answer")
+
+    import pandas as pd
+
+    df = pd.DataFrame({'answer': answers})
+    start = time.perf_counter()
+    column = outcome_column(df)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"  outcome_column():    {elapsed_ms:.1f} ms for {len(df)} rows")
+    print("\nOutcomes:")
+    for outcome, count in column.value_counts().items():
+        print(f"  {outcome:<11} {count}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
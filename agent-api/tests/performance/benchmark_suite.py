@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark Suite for the Hot Paths
+
+Times the code every test run and dashboard load goes through, on fixed
+fixtures, and flags regressions against a stored baseline:
+
+    extract_questions    question_catalog.extract_questions() on the fixture catalog
+    parse_response       agent_response.parse_response() on recorded detectIntent bodies
+    classify             outcomes.classify() on every fixture answer
+    load_results         pandas.read_csv() of each fixture results file
+    merge_results        tagging and concatenating the files, as the dashboards load them
+    dashboard_prepare    outcome_column(), numeric coercion and time to answer
+    dashboard_filter     category, difficulty, response time and text search filters
+    dashboard_aggregate  the metric cards and the per-category/difficulty/turns charts
+    ask_end_to_end       POST /ask through the Flask app, with the Gemini backend
+                         answering from mock_model_server.py
+
+The dashboards run Streamlit at import, so the dashboard benchmarks repeat
+their pandas steps; keep them in step with scripts/dashboard.py.
+
+Fixtures are generated from agent-api/data/*.csv with a fixed seed into
+fixtures/ (not committed; rebuilt when missing or with --build-fixtures).
+The same input data always gives the same fixture files, and their
+fingerprint is stored with every result so that timings on different
+fixtures are never compared.
+
+Each benchmark is calibrated so that one round takes at least
+--min-round-ms. The median of --rounds rounds is reported. Every run is
+appended to benchmark_history.jsonl. benchmark_baseline.json holds the
+reference medians. A benchmark regresses when its median is more than
+--tolerance above the baseline and the difference is larger than twice
+the rounds' spread (IQR). The script then exits non-zero.
+
+Usage:
+    python benchmark_suite.py
+    python benchmark_suite.py --only parse_response,classify --rounds 15
+    python benchmark_suite.py --update-baseline   # record current medians as the baseline
+    python benchmark_suite.py --list
+"""
+
+import io
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import random
+import hashlib
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timedelta
+from contextlib import redirect_stdout
+
+# Make the API modules, the runner helpers and the mock server importable
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..'))
+sys.path.append(os.path.join(project_root, 'src', 'api'))
+sys.path.append(os.path.join(project_root, 'agent-api', 'scripts'))
+sys.path.append(os.path.join(project_root, 'agent-api', 'tests'))
+
+from agent_response import parse_response
+from outcomes import ANSWERED, ERROR, classify, outcome_column
+from question_catalog import DIFFICULTIES, extract_questions
+
+PERFORMANCE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_GLOB = os.path.join(project_root, 'agent-api', 'data', '*.csv')
+FIXTURES_DIR = os.path.join(PERFORMANCE_DIR, 'fixtures')
+BASELINE_FILE = os.path.join(PERFORMANCE_DIR, 'benchmark_baseline.json')
+HISTORY_FILE = os.path.join(PERFORMANCE_DIR, 'benchmark_history.jsonl')
+
+# Fixture shape; changing any of these changes the fingerprint
+FIXTURE_SEED = 2025
+FIXTURE_QUESTIONS = 560
+FIXTURE_RESULT_FILES = 4
+FIXTURE_ROWS_PER_FILE = 500
+RESULT_COLUMNS = ['question_number', 'question', 'category', 'difficulty', 'answer', 'session_id',
+                  'timestamp', 'response_time_ms', 'outcome', 'turns', 'time_to_answer_ms']
+
+# --------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------
+
+def load_source_rows():
+    """Recorded result rows with a question and an answer, in a stable order."""
+    rows = []
+    for file_path in sorted(glob.glob(DATA_GLOB)):
+        with open(file_path, newline='', encoding='utf-8') as f:
+            rows.extend(row for row in csv.DictReader(f) if row.get('question') and row.get('answer'))
+    if not rows:
+        raise RuntimeError(f"No recorded results in {DATA_GLOB}")
+    return rows
+
+def build_catalog(rows, rng):
+    """Markdown catalog of FIXTURE_QUESTIONS questions, in the test_questions.md layout."""
+    seeds = sorted({(row['category'], row['difficulty'], row['question']) for row in rows})
+    by_section = {}
+    for i in range(FIXTURE_QUESTIONS):
+        category, difficulty, question = seeds[i % len(seeds)]
+        if difficulty not in DIFFICULTIES:
+            difficulty = rng.choice(DIFFICULTIES)
+        variant = f" (variant {i // len(seeds)})" if i >= len(seeds) else ""
+        by_section.setdefault(category, {}).setdefault(difficulty, []).append(question + variant)
+
+    lines = ["# Benchmark question catalog", ""]
+    for category in sorted(by_section):
+        lines += [f"**{category}**", ""]
+        for difficulty in DIFFICULTIES:
+            questions = by_section[category].get(difficulty)
+            if questions:
+                lines += [f"**{difficulty}**", ""]
+                lines += [f"{n}.  {question}" for n, question in enumerate(questions, 1)]
+                lines.append("")
+    return "\n".join(lines) + "\n"
+
+def build_response(row, i):
+    """REST-shaped detectIntent response carrying a recorded answer."""
+    paragraphs = [p for p in row['answer'].split('\n\n') if p.strip()] or [row['answer']]
+    messages = [{"text": {"text": [p]}} for p in paragraphs]
+    if i % 7 == 0:
+        messages.append({"liveAgentHandoff": {"metadata": {}}})
+    return {
+        "responseId": f"bench-{i:05d}",
+        "queryResult": {
+            "text": row['question'],
+            "languageCode": "en",
+            "responseMessages": messages,
+            "currentPage": {"name": "projects/p/locations/l/agents/a/flows/f/pages/START_PAGE",
+                            "displayName": "Start Page"},
+            "match": {"matchType": "PLAYBOOK", "confidence": 1.0},
+            "generativeInfo": {"currentPlaybooks": [f"projects/p/locations/l/agents/a/playbooks/{row['category']}"]},
+        }
+    }
+
+def build_results(rows, rng, file_index):
+    """One results file: FIXTURE_ROWS_PER_FILE rows resampled from the recorded ones."""
+    out = []
+    start = datetime(2025, 3, 1 + file_index, 9, 0, 0)
+    for n in range(1, FIXTURE_ROWS_PER_FILE + 1):
+        row = rng.choice(rows)
+        response_ms = max(50, int(float(row.get('response_time_ms') or 1000) * rng.uniform(0.5, 1.5)))
+        outcome = classify(row['answer'])
+        turns = rng.choice([1, 1, 1, 2, 3])
+        out.append({
+            'question_number': n,
+            'question': row['question'],
+            'category': row['category'],
+            'difficulty': row['difficulty'],
+            'answer': row['answer'],
+            'session_id': f"bench-{file_index}-{n}",
+            'timestamp': (start + timedelta(seconds=n * 7)).isoformat(),
+            'response_time_ms': response_ms,
+            'outcome': outcome,
+            'turns': turns,
+            'time_to_answer_ms': response_ms * turns if outcome == ANSWERED else '',
+        })
+    return out
+
+def build_fixtures():
+    """Write the fixture files; the same data always produces the same bytes."""
+    rows = load_source_rows()
+    rng = random.Random(FIXTURE_SEED)
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+
+    with open(os.path.join(FIXTURES_DIR, 'catalog.md'), 'w', encoding='utf-8') as f:
+        f.write(build_catalog(rows, rng))
+    with open(os.path.join(FIXTURES_DIR, 'responses.jsonl'), 'w', encoding='utf-8') as f:
+        for i, row in enumerate(rows):
+            f.write(json.dumps(build_response(row, i)) + '\n')
+    for file_index in range(FIXTURE_RESULT_FILES):
+        path = os.path.join(FIXTURES_DIR, f"test_results_bench_{file_index}.csv")
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(build_results(rows, rng, file_index))
+
+def fixture_paths():
+    return {
+        'catalog': os.path.join(FIXTURES_DIR, 'catalog.md'),
+        'responses': os.path.join(FIXTURES_DIR, 'responses.jsonl'),
+        'results': sorted(glob.glob(os.path.join(FIXTURES_DIR, 'test_results_bench_*.csv'))),
+    }
+
+def fingerprint():
+    """Short hash of every fixture file, to tell which fixtures a result was measured on."""
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*'))):
+        digest.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+# --------------------------------------------------------------------------
+# Benchmarks: each setup takes the fixture paths and returns the callable to time
+# --------------------------------------------------------------------------
+
+def setup_extract_questions(paths):
+    return lambda: extract_questions(paths['catalog'])
+
+def setup_parse_response(paths):
+    with open(paths['responses'], 'rb') as f:
+        payloads = f.read().splitlines()
+    return lambda: [parse_response(payload) for payload in payloads]
+
+def _answers(paths):
+    answers = []
+    for path in paths['results']:
+        with open(path, newline='', encoding='utf-8') as f:
+            answers.extend(row['answer'] for row in csv.DictReader(f))
+    return answers
+
+def setup_classify(paths):
+    answers = _answers(paths)
+    return lambda: [classify(answer) for answer in answers]
+
+def setup_load_results(paths):
+    import pandas as pd
+
+    return lambda: [pd.read_csv(path) for path in paths['results']]
+
+def _merge(frames):
+    import pandas as pd
+
+    tagged = []
+    for path, df in frames:
+        df = df.copy()
+        df['source_file'] = os.path.basename(path)
+        tagged.append(df)
+    return pd.concat(tagged, ignore_index=True)
+
+def setup_merge_results(paths):
+    import pandas as pd
+
+    frames = [(path, pd.read_csv(path)) for path in paths['results']]
+    return lambda: _merge(frames)
+
+def _prepare(df):
+    """The dashboards' steps right after loading (scripts/dashboard.py)."""
+    import pandas as pd
+
+    df = df.copy()
+    df['response_time_ms'] = pd.to_numeric(df['response_time_ms'], errors='coerce')
+    df['outcome'] = outcome_column(df)
+    df['is_error'] = df['outcome'] == ERROR
+    answered_time = df['response_time_ms'].where(df['outcome'] == ANSWERED)
+    df['time_to_answer_ms'] = pd.to_numeric(df['time_to_answer_ms'], errors='coerce').fillna(answered_time)
+    df['turns'] = pd.to_numeric(df['turns'], errors='coerce').fillna(1).astype(int)
+    return df
+
+def _merged(paths):
+    import pandas as pd
+
+    return _merge([(path, pd.read_csv(path)) for path in paths['results']])
+
+def setup_dashboard_prepare(paths):
+    merged = _merged(paths)
+    return lambda: _prepare(merged)
+
+def setup_dashboard_filter(paths):
+    df = _prepare(_merged(paths))
+    categories = sorted(df['category'].unique())[::2]
+    difficulties = DIFFICULTIES[:3]
+    low, high = df['response_time_ms'].quantile([0.05, 0.95])
+
+    def run():
+        filtered = df[df['category'].isin(categories)]
+        filtered = filtered[filtered['difficulty'].isin(difficulties)]
+        filtered = filtered[(filtered['response_time_ms'] >= low) & (filtered['response_time_ms'] <= high)]
+        text_mask = (
+            filtered['question'].astype(str).str.lower().str.contains('looker') |
+            filtered['answer'].astype(str).str.lower().str.contains('looker')
+        )
+        return filtered[text_mask]
+    return run
+
+def setup_dashboard_aggregate(paths):
+    df = _prepare(_merged(paths))
+
+    def run():
+        answered = df[df['outcome'] == ANSWERED]
+        return (
+            (~df['is_error']).mean(),
+            df['response_time_ms'].mean(),
+            df['response_time_ms'].median(),
+            answered['time_to_answer_ms'].median(),
+            df.groupby('category')['response_time_ms'].mean().reset_index(),
+            df.groupby('difficulty')['response_time_ms'].mean().reset_index(),
+            df.groupby(['turns', 'outcome'], observed=True).size().reset_index(name='count'),
+            df['category'].value_counts().reset_index(),
+        )
+    return run
+
+_mock_server = None
+
+def setup_ask_end_to_end(paths):
+    global _mock_server
+    from mock_model_server import MockModelServer
+
+    if _mock_server is None:
+        _mock_server = MockModelServer().start()
+    # agent_api reads its configuration at import
+    os.environ.update({
+        'ANSWER_BACKEND': 'gemini',
+        'FALLBACK_BACKEND': 'none',
+        'GEMINI_AUTH': 'false',
+        'GEMINI_API_BASE': _mock_server.base_url,
+        'WARMUP_ON_START': 'false',
+    })
+    with redirect_stdout(io.StringIO()):
+        import agent_api
+    client = agent_api.app.test_client()
+    questions = [question for question, _, _ in extract_questions(paths['catalog'])]
+    counter = iter(range(10 ** 12))
+
+    def run():
+        n = next(counter)
+        with redirect_stdout(io.StringIO()):
+            response = client.post('/ask', json={'question': questions[n % len(questions)],
+                                                 'sessionId': f"bench-{n}"})
+        if response.status_code != 200:
+            raise RuntimeError(f"/ask returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return run
+
+BENCHMARKS = {
+    'extract_questions': setup_extract_questions,
+    'parse_response': setup_parse_response,
+    'classify': setup_classify,
+    'load_results': setup_load_results,
+    'merge_results': setup_merge_results,
+    'dashboard_prepare': setup_dashboard_prepare,
+    'dashboard_filter': setup_dashboard_filter,
+    'dashboard_aggregate': setup_dashboard_aggregate,
+    'ask_end_to_end': setup_ask_end_to_end,
+}
+
+# --------------------------------------------------------------------------
+# Timing, storage and comparison
+# --------------------------------------------------------------------------
+
+def calibrate(fn, min_round_s):
+    """Calls per round so that a round takes at least min_round_s (like timeit's autorange)."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_round_s or number >= 1 << 20:
+            return number
+        number *= 2
+
+def run_benchmark(fn, rounds, min_round_s):
+    """
+    Time fn.
+
+    Returns:
+        dict: median, min and IQR seconds per call, calls per round and rounds
+    """
+    fn()  # warm up caches and lazy imports
+    number = calibrate(fn, min_round_s)
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+    quartiles = statistics.quantiles(timings, n=4) if len(timings) > 1 else [timings[0]] * 3
+    return {
+        'median_s': statistics.median(timings),
+        'min_s': min(timings),
+        'iqr_s': quartiles[2] - quartiles[0],
+        'number': number,
+        'rounds': rounds,
+    }
+
+def compare(name, result, baseline, tolerance):
+    """Status of one result against the baseline: OK, REGRESSION, faster or no baseline."""
+    reference = baseline.get('results', {}).get(name)
+    if reference is None:
+        return "no baseline", None
+    change = result['median_s'] / reference['median_s'] - 1
+    noise = 2 * max(result['iqr_s'], reference.get('iqr_s', 0))
+    difference = result['median_s'] - reference['median_s']
+    if change > tolerance and difference > noise:
+        return "REGRESSION", change
+    if change < -tolerance and -difference > noise:
+        return "faster", change
+    return "OK", change
+
+def format_seconds(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_baseline():
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE) as f:
+        return json.load(f)
+
+def main():
+    """Run the benchmarks, store the results and compare them with the baseline."""
+    parser = argparse.ArgumentParser(description="Benchmark the project's hot paths against a stored baseline")
+    parser.add_argument("--only", type=str, default="",
+                        help="Comma-separated benchmarks to run (default: all)")
+    parser.add_argument("--rounds", "-r", type=int, default=7,
+                        help="Timed rounds per benchmark (median is reported)")
+    parser.add_argument("--min-round-ms", type=float, default=100,
+                        help="Shortest round; fast benchmarks repeat the call to fill it")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Slowdown over the baseline median that counts as a regression (0.25 = 25%%)")
+    parser.add_argument("--build-fixtures", action="store_true",
+                        help="Regenerate the fixtures from agent-api/data before running")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Write this run's medians to benchmark_baseline.json")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for name in BENCHMARKS:
+            print(name)
+        return 0
+
+    names = [name.strip() for name in args.only.split(',') if name.strip()] or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        print(f"Unknown benchmarks: {', '.join(unknown)}. Use --list to see them.")
+        return 1
+
+    if args.build_fixtures or not os.path.exists(FIXTURES_DIR):
+        build_fixtures()
+        print(f"Fixtures built in {FIXTURES_DIR}")
+    paths = fixture_paths()
+    fixtures = fingerprint()
+
+    baseline = load_baseline()
+    comparable = not baseline or baseline.get('fixtures') == fixtures
+    if not comparable:
+        print(f"Baseline was measured on fixtures {baseline.get('fixtures')}, these are {fixtures}; not comparing")
+
+    print(f"\n{'Benchmark':<22} {'median':>10} {'min':>10} {'IQR':>10} {'calls':>7}  vs. baseline")
+    results = {}
+    regressions = []
+    for name in names:
+        try:
+            fn = BENCHMARKS[name](paths)
+            result = run_benchmark(fn, args.rounds, args.min_round_ms / 1000)
+        except Exception as e:
+            print(f"{name:<22} SKIPPED ({type(e).__name__}: {e})")
+            continue
+        results[name] = result
+
+        status, change = compare(name, result, baseline, args.tolerance) if comparable else ("not compared", None)
+        change_text = f" ({change:+.0%})" if change is not None else ""
+        print(f"{name:<22} {format_seconds(result['median_s']):>10} {format_seconds(result['min_s']):>10} "
+              f"{format_seconds(result['iqr_s']):>10} {result['number']:>7}  {status}{change_text}")
+        if status == "REGRESSION":
+            regressions.append(name)
+
+    run = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'fixtures': fixtures,
+        'results': results,
+    }
+    with open(HISTORY_FILE, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+    print(f"\nResults appended to {HISTORY_FILE}")
+
+    if args.update_baseline:
+        if comparable:
+            # Keep baselines for benchmarks not run this time
+            run['results'] = dict(baseline.get('results', {}), **results)
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(run, f, indent=2)
+            f.write('\n')
+        print(f"Baseline written to {BASELINE_FILE}")
+        return 0
+
+    if regressions:
+        print(f"\nRegressions over {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Dialogflow Transport Benchmark
+
+Compares the REST (HTTPS/JSON) and gRPC (HTTP/2/protobuf) detectIntent
+transports in src/api/dialogflow_transport.py.
+
+Two measurements are taken:
+
+1. Serialization cost (offline): encoding a detectIntent request and decoding a
+   realistic response, built from a recorded answer in agent-api/data, as JSON
+   and as protobuf.
+2. Live latency (--live): many concurrent sessions sent through one shared
+   transport instance per protocol, reporting mean/p50/p95 per call.
+
+Usage:
+    python benchmark_transport.py
+    python benchmark_transport.py --live --calls 40 --concurrency 8
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+# Make the API modules importable
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..'))
+sys.path.append(os.path.join(project_root, 'src', 'api'))
+
+from dialogflow_transport import create_transport, load_credentials
+from agent_response import parse_response
+
+DATA_FILE = os.path.join(project_root, 'agent-api', 'data', 'test_results_mixed_questions.csv')
+
+def load_sample(file_path=DATA_FILE):
+    """Return a (question, answer) pair from recorded results to size the payloads."""
+    with open(file_path, newline='') as f:
+        for row in csv.DictReader(f):
+            if row.get('answer') and not row['answer'].startswith('ERROR'):
+                return row['question'], row['answer']
+    return "What is Looker?", "Looker is a business intelligence platform."
+
+def build_response(question, answer):
+    """Build a REST-shaped detectIntent response similar to what the agent returns."""
+    return {
+        "responseId": "3f1c5a2e-0000-4000-8000-000000000000",
+        "queryResult": {
+            "text": question,
+            "languageCode": "en",
+            "responseMessages": [
+                {"text": {"text": [answer]}},
+                {"text": {"text": ["Is there anything else I can help you with?"]}}
+            ],
+            "currentPage": {
+                "name": "projects/p/locations/us-central1/agents/a/flows/00000000-0000-0000-0000-000000000000/pages/START_PAGE",
+                "displayName": "Start Page"
+            },
+            "match": {"matchType": "PLAYBOOK", "confidence": 1.0},
+            "generativeInfo": {"currentPlaybooks": ["projects/p/locations/us-central1/agents/a/playbooks/looker_playbook"]}
+        }
+    }
+
+def time_per_op(fn, iterations):
+    """Return the mean time per call of fn in microseconds."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def benchmark_serialization(iterations):
+    """Measure request encode and response decode cost for JSON and protobuf."""
+    question, answer = load_sample()
+    response_dict = build_response(question, answer)
+    request_dict = {"queryInput": {"text": {"text": question}, "languageCode": "en"}}
+
+    response_json = json.dumps(response_dict).encode('utf-8')
+    results = {
+        'rest': {
+            'request_bytes': len(json.dumps(request_dict).encode('utf-8')),
+            'response_bytes': len(response_json),
+            'encode_us': time_per_op(lambda: json.dumps(request_dict).encode('utf-8'), iterations),
+            'decode_us': time_per_op(lambda: json.loads(response_json), iterations),
+            # Decode (orjson when installed) and extract the AgentResponse record
+            'decode_extract_us': time_per_op(lambda: parse_response(response_json), iterations),
+            'record_bytes': len(json.dumps(parse_response(response_json).to_dict()).encode('utf-8')),
+        }
+    }
+
+    try:
+        from google.cloud import dialogflowcx_v3 as cx
+    except ImportError:
+        print("google-cloud-dialogflow-cx is not installed; skipping protobuf measurements.")
+        return results
+
+    request_pb = cx.DetectIntentRequest.pb(cx.DetectIntentRequest(
+        session="projects/p/locations/us-central1/agents/a/sessions/benchmark",
+        query_input=cx.QueryInput(text=cx.TextInput(text=question), language_code="en")
+    ))
+    response_pb_class = cx.DetectIntentResponse.pb()
+    response_bytes = cx.DetectIntentResponse.serialize(
+        cx.DetectIntentResponse.from_json(json.dumps(response_dict), ignore_unknown_fields=True)
+    )
+
+    def decode_pb():
+        # Parse the wire bytes and convert to the dict shape the API consumes
+        message = response_pb_class.FromString(response_bytes)
+        return cx.DetectIntentResponse.to_dict(cx.DetectIntentResponse.wrap(message))
+
+    results['grpc'] = {
+        'request_bytes': request_pb.ByteSize(),
+        'response_bytes': len(response_bytes),
+        'encode_us': time_per_op(request_pb.SerializeToString, iterations),
+        'decode_us': time_per_op(lambda: response_pb_class.FromString(response_bytes), iterations),
+        'decode_to_dict_us': time_per_op(decode_pb, iterations),
+    }
+    return results
+
+def benchmark_latency(transport_name, calls, concurrency, question):
+    """Send calls detectIntent requests through one shared transport."""
+    transport = create_transport(
+        transport_name,
+        os.environ.get('PROJECT_ID', 'heuristicsai'),
+        os.environ.get('LOCATION', 'us-central1'),
+        os.environ.get('AGENT_ID', 'fa0bd62b-3fc7-46c8-9d55-3a18d9812a70'),
+        load_credentials(os.environ['GOOGLE_APPLICATION_CREDENTIALS'])
+    )
+
+    def one_call(i):
+        start = time.perf_counter()
+        transport.detect_intent(f"bench-{transport_name}-{i}-{int(time.time())}", question)
+        return (time.perf_counter() - start) * 1000
+
+    # Warm the connection/channel so the first call does not skew the numbers
+    one_call('warmup')
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(one_call, range(calls)))
+    wall_ms = (time.perf_counter() - wall_start) * 1000
+    transport.close()
+
+    return {
+        'mean_ms': statistics.mean(latencies),
+        'p50_ms': latencies[len(latencies) // 2],
+        'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        'wall_ms': wall_ms,
+        'throughput_qps': calls / (wall_ms / 1000),
+    }
+
+def main():
+    """Run the transport benchmarks and print a comparison."""
+    parser = argparse.ArgumentParser(description="Benchmark REST vs gRPC Dialogflow transports")
+    parser.add_argument("--iterations", "-n", type=int, default=20000,
+                        help="Iterations for serialization timings")
+    parser.add_argument("--live", action="store_true",
+                        help="Also measure live latency against the configured agent")
+    parser.add_argument("--calls", type=int, default=20,
+                        help="Live calls per transport")
+    parser.add_argument("--concurrency", "-c", type=int, default=8,
+                        help="Concurrent sessions sharing one transport")
+    parser.add_argument("--question", "-q", type=str, default="What is Looker?",
+                        help="Question used for live calls")
+    args = parser.parse_args()
+
+    print("===== SERIALIZATION COST =====")
+    for name, stats in benchmark_serialization(args.iterations).items():
+        print(f"{name}:")
+        for key, value in stats.items():
+            print(f"  {key}: {value:.2f}" if isinstance(value, float) else f"  {key}: {value}")
+
+    if args.live:
+        if 'GOOGLE_APPLICATION_CREDENTIALS' not in os.environ:
+            print("GOOGLE_APPLICATION_CREDENTIALS must be set for --live")
+            return 1
+        print(f"\n===== LIVE LATENCY ({args.calls} calls, concurrency {args.concurrency}) =====")
+        for name in ('rest', 'grpc'):
+            stats = benchmark_latency(name, args.calls, args.concurrency, args.question)
+            print(f"{name}: " + ", ".join(f"{k}={v:.1f}" for k, v in stats.items()))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,14 +9,19 @@ questions, and edge cases.
 
 import os
 import re
-import csv
+import sys
 import json
-import time
 import argparse
-import requests
 from datetime import datetime
 from tqdm import tqdm
 
+# Shared answer outcome classifier
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'api'))
+from outcomes import ERROR, classify
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from phase_timing import TimedSession, measure
+from result_sink import ResultSink
+
 # Advanced questions covering different complexity levels
 ADVANCED_QUESTIONS = [
     {
@@ -71,7 +76,9 @@ ADVANCED_QUESTIONS = [
     }
 ]
 
-# Multi-part questions to test conversational capabilities
+# Multi-part questions to test conversational capabilities. These are sent as
+# single prompts; scripted multi-turn versions live in tests/scenarios.json
+# and run with scripts/run_scenarios.py
 MULTI_PART_QUESTIONS = [
     {
         "category": "Looker", 
@@ -129,6 +136,9 @@ EDGE_CASE_QUESTIONS = [
     }
 ]
 
+# One pooled, phase-timed session for every question (phase_timing.py)
+HTTP = TimedSession()
+
 def ask_question(question_text, api_url="http://localhost:8082/ask"):
     """Send a question to the Vertex AI Agent API."""
     try:
@@ -138,26 +148,30 @@ def ask_question(question_text, api_url="http://localhost:8082/ask"):
         }
         
         # Make the API request
-        start_time = time.time()
-        response = requests.post(api_url, json=payload)
-        end_time = time.time()
-        response_time_ms = round((end_time - start_time) * 1000)
+        with measure() as timing:
+            response = HTTP.post(api_url, json=payload)
+        response_time_ms = round(timing.total_ms)
         
         # Check if the request was successful
         if response.status_code == 200:
             result = response.json()
+            answer = result.get("answer", "No answer returned")
             return {
-                "answer": result.get("answer", "No answer returned"),
+                "answer": answer,
                 "response_time_ms": response_time_ms,
                 "session_id": result.get("session_id", "No session ID"),
-                "success": True
+                "success": True,
+                "outcome": result.get("outcome") or classify(answer, response.status_code),
+                "phases": timing.row()
             }
         else:
             return {
                 "answer": f"ERROR: API returned status code {response.status_code}",
                 "response_time_ms": response_time_ms,
                 "session_id": None,
-                "success": False
+                "success": False,
+                "outcome": ERROR,
+                "phases": timing.row()
             }
     
     except Exception as e:
@@ -165,15 +179,17 @@ def ask_question(question_text, api_url="http://localhost:8082/ask"):
             "answer": f"ERROR: {str(e)}",
             "response_time_ms": -1,
             "session_id": None,
-            "success": False
+            "success": False,
+            "outcome": ERROR
         }
 
 def run_questions(questions, api_url, output_file):
-    """Run a list of questions and save the results to a CSV file."""
+    """Run a list of questions and save the results (.csv, .jsonl or .parquet)."""
     results = []
     
-    # Setup the progress bar
-    with tqdm(total=len(questions), desc="Processing questions") as pbar:
+    # Rows are written by the sink's background thread as each answer arrives
+    with ResultSink(output_file, runner='run_advanced_questions') as sink, \
+            tqdm(total=len(questions), desc="Processing questions") as pbar:
         for i, question_obj in enumerate(questions):
             question_num = i + 1
             category = question_obj.get("category", "Uncategorized")
@@ -190,13 +206,14 @@ def run_questions(questions, api_url, output_file):
             response_time_ms = result.get("response_time_ms", -1)
             session_id = result.get("session_id", "No session ID")
             success = result.get("success", False)
+            outcome = result.get("outcome", ERROR)
             
             # Print the answer
             print(f"A: {answer[:200]}..." if len(answer) > 200 else f"A: {answer}")
-            print(f"Response Time: {response_time_ms} ms | Success: {success}")
+            print(f"Response Time: {response_time_ms} ms | Success: {success} | Outcome: {outcome}")
             
             # Save the result
-            results.append({
+            row = {
                 "question_number": question_num,
                 "category": category,
                 "difficulty": difficulty,
@@ -204,23 +221,16 @@ def run_questions(questions, api_url, output_file):
                 "answer": answer,
                 "response_time_ms": response_time_ms,
                 "session_id": session_id,
-                "success": success
-            })
+                "success": success,
+                "outcome": outcome,
+                **result.get("phases", {})
+            }
+            results.append(row)
+            sink.write(row)
             
             # Update the progress bar
             pbar.update(1)
     
-    # Save the results to a CSV file
-    fieldnames = [
-        "question_number", "category", "difficulty", "question",
-        "answer", "response_time_ms", "session_id", "success"
-    ]
-    
-    with open(output_file, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(results)
-    
     print(f"\nResults saved to {output_file}")
     
     return results
@@ -232,7 +242,7 @@ def main():
                         help="URL of the Vertex AI Agent API (default: http://localhost:8082/ask)")
     parser.add_argument("--output", "-o", type=str, 
                         default=f"advanced_test_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        help="Path to the output CSV file")
+                        help="Path to the results file (.csv, .jsonl or .parquet)")
     parser.add_argument("--type", "-t", type=str, choices=["advanced", "multi-part", "edge", "all"],
                         default="all", help="Type of questions to run (default: all)")
     
@@ -8,7 +8,6 @@ It saves the results to a CSV file for further analysis.
 
 import os
 import re
-import csv
 import json
 import time
 import sys
@@ -21,6 +20,14 @@ from tqdm import tqdm  # Progress bar
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(project_root)
 
+# Shared agent response record and multi-turn follow-up
+sys.path.append(os.path.join(os.path.dirname(project_root), 'src', 'api'))
+from agent_response import AgentResponse
+sys.path.append(os.path.join(project_root, 'scripts'))
+from conversation import DEFAULT_MAX_TURNS, converse, error_record
+from phase_timing import TimedSession
+from result_sink import ResultSink
+
 # Set default paths relative to project structure
 DEFAULT_QUESTIONS_PATH = os.path.join(project_root, 'tests', 'test_questions.md')
 DEFAULT_RESULTS_PATH = os.path.join(project_root, 'data', 'results', f"test_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
@@ -56,6 +63,9 @@ def extract_questions(file_path):
     
     return questions
 
+# One pooled, phase-timed session for every turn; converse() records the phases
+HTTP = TimedSession()
+
 def ask_question(question, session_id, api_url="http://localhost:8082/ask"):
     """
     Send a question to the Vertex AI Agent API.
@@ -74,7 +84,7 @@ def ask_question(question, session_id, api_url="http://localhost:8082/ask"):
     }
     
     try:
-        response = requests.post(
+        response = HTTP.post(
             api_url,
             headers={"Content-Type": "application/json"},
             json=payload,
@@ -91,6 +101,21 @@ def ask_question(question, session_id, api_url="http://localhost:8082/ask"):
         print(f"Error sending request for question '{question}': {e}")
         return None
 
+def ask_turn(text, session_id, api_url):
+    """
+    One conversation turn through the API, in the form converse() expects.
+    
+    The API only returns the answer text, so the record carries no playbook.
+    
+    Returns:
+        tuple: (status code or None, AgentResponse)
+    """
+    result = ask_question(text, session_id, api_url)
+    if not result:
+        print("Failed to get response")
+        return None, error_record("ERROR: Failed to get response")
+    return 200, AgentResponse(messages=[result.get('answer', 'No answer provided')])
+
 def main():
     """Main function to run the test questions."""
     parser = argparse.ArgumentParser(description="Test Vertex AI Agent with test questions")
@@ -102,11 +127,15 @@ def main():
                         help="API endpoint URL")
     parser.add_argument("--output", "-o", type=str, 
                         default=DEFAULT_RESULTS_PATH,
-                        help="Output CSV file for results")
+                        help="Results file (.csv, .jsonl or .parquet)")
     parser.add_argument("--start", "-s", type=int, default=1,
                         help="Start from this question number (1-indexed)")
     parser.add_argument("--limit", "-l", type=int, default=0,
                         help="Limit the number of questions to process (0 = all)")
+    parser.add_argument("--follow-up", action="store_true",
+                        help="Answer handoffs and clarifying questions in the same session until the agent answers")
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS,
+                        help="Messages per question including follow-ups, with --follow-up")
     
     args = parser.parse_args()
     
@@ -120,13 +149,10 @@ def main():
     
     print(f"Found {len(questions)} questions.")
     
-    # Prepare CSV file
-    fieldnames = ['question_number', 'question', 'category', 'difficulty', 
-                 'answer', 'session_id', 'timestamp', 'response_time_ms']
+    max_turns = args.max_turns if args.follow_up else 1
     
-    with open(args.output, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
+    # Rows are written by the sink's background thread
+    with ResultSink(args.output, runner='run_test_questions') as sink:
         
         # Process questions
         start_idx = max(0, args.start - 1)
@@ -139,47 +165,27 @@ def main():
             print(f"\nQuestion {question_number}: {question}")
             print(f"Category: {category}, Difficulty: {difficulty}")
             
-            # Ask the question
+            # Ask the question, following up in the same session if allowed
             session_id = f"test-{question_number}-{int(time.time())}"
-            start_time = time.time()
-            result = ask_question(question, session_id, args.url)
-            end_time = time.time()
-            response_time_ms = int((end_time - start_time) * 1000)
+            conversation = converse(lambda text: ask_turn(text, session_id, args.url), question, max_turns)
+            row = conversation.row()
+            answer = row['answer']
+            
+            print(f"Answer: {answer[:100]}..." if len(answer) > 100 else f"Answer: {answer}")
+            print(f"Response time: {row['response_time_ms']} ms")
+            if row['turns'] > 1:
+                print(f"Turns: {row['turns']}, time to answer: {row['total_time_ms']} ms ({row['outcome']})")
             
-            if result:
-                answer = result.get('answer', 'No answer provided')
-                timestamp = result.get('timestamp', datetime.now().isoformat())
-                
-                print(f"Answer: {answer[:100]}..." if len(answer) > 100 else f"Answer: {answer}")
-                print(f"Response time: {response_time_ms} ms")
-                
-                # Write to CSV
-                writer.writerow({
-                    'question_number': question_number,
-                    'question': question,
-                    'category': category,
-                    'difficulty': difficulty,
-                    'answer': answer,
-                    'session_id': session_id,
-                    'timestamp': timestamp,
-                    'response_time_ms': response_time_ms
-                })
-                csvfile.flush()  # Ensure data is written immediately
-            else:
-                print("Failed to get response")
-                
-                # Write error to CSV
-                writer.writerow({
-                    'question_number': question_number,
-                    'question': question,
-                    'category': category,
-                    'difficulty': difficulty,
-                    'answer': "ERROR: Failed to get response",
-                    'session_id': session_id,
-                    'timestamp': datetime.now().isoformat(),
-                    'response_time_ms': response_time_ms
-                })
-                csvfile.flush()
+            # Queue the row for the results file
+            row.update({
+                'question_number': question_number,
+                'question': question,
+                'category': category,
+                'difficulty': difficulty,
+                'session_id': session_id,
+                'timestamp': datetime.now().isoformat(),
+            })
+            sink.write(row)
             
             # Add a small delay between questions to avoid overwhelming the API
             time.sleep(1)
@@ -0,0 +1,70 @@
+"""
+Tests for the detectIntent response extractor in src/api/agent_response.py:
+text, custom payload, empty and playbook/handoff response messages.
+
+Usage:
+    python -m pytest test_agent_response.py
+"""
+
+import json
+
+from agent_response import NO_RESPONSE, AgentResponse, parse_response
+from outcomes import ANSWERED, EMPTY, HANDOFF, classify_record
+
+
+def detect_intent(messages, **query_result):
+    query_result['responseMessages'] = messages
+    return {'responseId': 'r-1', 'queryResult': query_result}
+
+
+def test_text_messages():
+    payload = detect_intent([
+        {'text': {'text': ['A PDT is a derived table', 'persisted in the warehouse.']}},
+        {'text': {'text': ['Anything else?']}},
+        {'text': {'text': []}},
+    ], match={'matchType': 'PLAYBOOK', 'confidence': 0.9,
+              'intent': {'name': 'projects/p/locations/l/agents/a/intents/abc'}},
+        currentPage={'displayName': 'Start Page'},
+        currentFlow={'name': 'projects/p/locations/l/agents/a/flows/00000000-0000'})
+    for raw in (payload, json.dumps(payload), json.dumps(payload).encode('utf-8')):
+        record = parse_response(raw, request_ms=120)
+        assert record.messages == ['A PDT is a derived table\npersisted in the warehouse.', 'Anything else?']
+        assert record.text.endswith('\nAnything else?')
+        assert (record.match_type, record.intent, record.confidence) == ('PLAYBOOK', 'abc', 0.9)
+        assert (record.current_page, record.current_flow) == ('Start Page', '00000000-0000')
+        assert record.response_id == 'r-1' and record.request_ms == 120 and record.parse_ms >= 0
+        assert classify_record(record, 200) == ANSWERED
+
+
+def test_payload_messages_are_not_text():
+    record = parse_response(detect_intent([
+        {'payload': {'richContent': [[{'type': 'chips', 'options': [{'text': 'Looker'}]}]]}},
+        {'text': {'text': ['Pick a product.']}},
+    ]))
+    assert record.messages == ['Pick a product.']
+    assert not record.handoff and not record.end_interaction
+
+
+def test_empty_responses():
+    for payload in ({}, {'queryResult': {}}, detect_intent([]), detect_intent([{'payload': {'a': 1}}])):
+        record = parse_response(payload)
+        assert record.messages == [] and record.text == NO_RESPONSE
+        assert record.playbook is None and record.match_type is None
+        assert classify_record(record, 200) == EMPTY
+
+
+def test_playbook_and_handoff():
+    record = parse_response(detect_intent(
+        [{'text': {'text': ['Let me get a person for you.']}},
+         {'liveAgentHandoff': {'metadata': {}}},
+         {'endInteraction': {}}],
+        generativeInfo={'currentPlaybooks': [
+            'projects/p/locations/l/agents/a/playbooks/router',
+            'projects/p/locations/l/agents/a/playbooks/looker_expert',
+        ]}))
+    assert record.playbook == 'looker_expert'
+    assert record.handoff and record.end_interaction
+    assert classify_record(record, 200) == HANDOFF
+
+    copy = AgentResponse.from_dict(json.loads(json.dumps(record.to_dict())))
+    assert copy.to_dict() == record.to_dict()
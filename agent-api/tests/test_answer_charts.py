@@ -0,0 +1,30 @@
+"""
+Tests for the dashboards' shared time-to-answer columns in
+src/dashboard/answer_charts.py.
+
+Usage:
+    python -m pytest test_answer_charts.py
+"""
+
+import pandas as pd
+
+from answer_charts import add_answer_columns, answer_time_text
+
+
+def test_single_turn_rows_use_response_time_when_answered():
+    df = add_answer_columns(pd.DataFrame({'response_time_ms': [100.0, 200.0], 'outcome': ['answered', 'handoff']}))
+    assert df['time_to_answer_ms'].iloc[0] == 100.0 and pd.isna(df['time_to_answer_ms'].iloc[1])
+    assert list(df['turns']) == [1, 1]
+    assert answer_time_text(df.iloc[1]) == "**Time to Answer:** no answer after 1 turns"
+
+
+def test_follow_up_rows_keep_recorded_values():
+    df = add_answer_columns(pd.DataFrame({
+        'response_time_ms': [100.0, 200.0, 300.0],
+        'outcome': ['answered', 'handoff', 'answered'],
+        'time_to_answer_ms': [None, 900.0, None],
+        'turns': [1, 3, None],
+    }))
+    assert list(df['time_to_answer_ms']) == [100.0, 900.0, 300.0]
+    assert list(df['turns']) == [1, 3, 1]
+    assert answer_time_text(df.iloc[1]) == "**Time to Answer:** 900.0 ms (3 turns)"
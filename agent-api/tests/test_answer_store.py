@@ -0,0 +1,107 @@
+"""
+Tests for the dashboards' on-demand answer store in src/dashboard/answer_store.py:
+metrics frames without answer text, lookup and search by row_id, and
+reloading from a complete store.
+
+Usage:
+    python -m pytest test_answer_store.py
+"""
+
+import os
+import glob
+import pickle
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from answer_store import TEXT_COLUMNS, AnswerStore, prune_stores, read_metrics
+from outcomes import outcome_column
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+RESULTS_FILES = sorted(glob.glob(os.path.join(project_root, 'agent-api', 'data', '*results*.csv')))
+
+
+def load(paths, directory, chunk_rows=8):
+    store = AnswerStore.for_files(paths, directory)
+    df = pd.concat([read_metrics(path, store, chunk_rows) for path in paths], ignore_index=True)
+    store.finish()
+    return df, store
+
+
+def test_metrics_frame_has_no_text_and_same_outcomes():
+    directory = tempfile.mkdtemp()
+    try:
+        df, store = load(RESULTS_FILES, directory)
+        full = pd.concat([pd.read_csv(path) for path in RESULTS_FILES], ignore_index=True)
+        assert len(df) == len(full) == len(store)
+        assert not set(TEXT_COLUMNS) & set(df.columns)
+        assert list(df['row_id']) == list(range(len(full)))
+        # Classified per file, so a success column in one file does not mark the others' rows
+        expected = pd.concat([outcome_column(pd.read_csv(path)).astype(str) for path in RESULTS_FILES])
+        assert list(df['outcome']) == list(expected)
+
+        for row_id in (0, 17, len(full) - 1):
+            assert store.get(row_id) == full['answer'].iat[row_id]
+        matches = set(full.index[full['answer'].str.lower().str.contains('explore', regex=False)])
+        assert store.search('EXPLORE') == matches and matches
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_complete_store_is_reused_without_text():
+    directory = tempfile.mkdtemp()
+    try:
+        first, store = load(RESULTS_FILES, directory)
+        # Pickles as its path, as st.cache_data does
+        store = pickle.loads(pickle.dumps(store))
+        assert store.get(3) == AnswerStore.for_files(RESULTS_FILES, directory).get(3)
+
+        again, reused = load(RESULTS_FILES, directory, chunk_rows=5)
+        assert reused.complete and reused.path == store.path
+        pd.testing.assert_frame_equal(first, again)
+
+        # A changed file means a new store
+        assert AnswerStore.for_files(RESULTS_FILES[:2], directory).path != store.path
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_parquet_results():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'results.parquet')
+        pd.read_csv(RESULTS_FILES[0]).to_parquet(path)
+        df, store = load([path], directory)
+        assert 'answer' not in df.columns and len(store) == len(df)
+        assert store.get(0) == pd.read_parquet(path)['answer'].iat[0]
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_old_stores_are_pruned():
+    directory = tempfile.mkdtemp()
+    try:
+        now = time.time()
+        paths = []
+        for age_days in (0, 1, 2, 3, 10):
+            path = os.path.join(directory, f"answers_{age_days:016d}.sqlite")
+            open(path, 'w').close()
+            os.utime(path, (now - age_days * 86400, now - age_days * 86400))
+            paths.append(path)
+        other = os.path.join(directory, 'notes.txt')
+        open(other, 'w').close()
+
+        # Too old, then beyond the newest two; the store in use always stays
+        removed = prune_stores(directory, keep_path=paths[3], max_age_days=7, keep=2)
+        assert sorted(removed) == sorted([paths[1], paths[2], paths[4]])
+        assert sorted(os.listdir(directory)) == sorted([os.path.basename(paths[0]), os.path.basename(paths[3]),
+                                                        'notes.txt'])
+
+        # Opening a store prunes the others with the configured limits
+        store = AnswerStore.for_files(RESULTS_FILES[:1], directory)
+        assert os.path.exists(store.path) and os.path.exists(paths[0])
+        store.close()
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,83 @@
+"""
+Tests for the multi-turn follow-up in scripts/conversation.py, using a
+scripted ask() in place of the agent.
+
+Usage:
+    python -m pytest test_conversation.py
+"""
+
+from agent_response import AgentResponse
+from conversation import CONVERSATION_FIELDS, FOLLOW_UPS, converse, error_record
+
+HANDOFF_REPLY = "I'll route you to Isabella, our dbt expert."
+CLARIFYING_REPLY = "Could you clarify which warehouse you are using?"
+ANSWER_REPLY = "Use a dbt incremental model with a unique_key so reruns merge instead of appending."
+
+
+def scripted_ask(replies):
+    """ask() that returns the given (status, AgentResponse) pairs in order and records what was sent."""
+    sent = []
+    replies = list(replies)
+
+    def ask(text):
+        sent.append(text)
+        return replies.pop(0)
+
+    ask.sent = sent
+    return ask
+
+
+def reply(text, playbook=None, handoff=False):
+    return 200, AgentResponse(messages=[text], playbook=playbook, handoff=handoff)
+
+
+def test_direct_answer_takes_one_turn():
+    ask = scripted_ask([reply(ANSWER_REPLY, playbook='dbt')])
+    conversation = converse(ask, "How do I avoid duplicate rows in dbt?")
+    row = conversation.row()
+    assert ask.sent == ["How do I avoid duplicate rows in dbt?"]
+    assert row['turns'] == 1
+    assert row['outcome'] == 'answered'
+    assert row['time_to_answer_ms'] == row['response_time_ms'] == row['total_time_ms']
+    assert row['final_playbook'] == 'dbt'
+    assert set(CONVERSATION_FIELDS) <= set(row)
+
+
+def test_follows_handoff_and_clarification_until_answered():
+    ask = scripted_ask([
+        reply(HANDOFF_REPLY, playbook='Router'),
+        reply(CLARIFYING_REPLY, playbook='dbt'),
+        reply(ANSWER_REPLY, playbook='dbt'),
+    ])
+    conversation = converse(ask, "How do I avoid duplicate rows in dbt?", max_turns=3)
+    row = conversation.row()
+    assert ask.sent[1:] == [FOLLOW_UPS['handoff'], FOLLOW_UPS['clarifying']]
+    assert [turn.outcome for turn in conversation.turns] == ['handoff', 'clarifying', 'answered']
+    assert row['first_outcome'] == 'handoff'
+    assert row['answer'] == ANSWER_REPLY
+    assert row['final_playbook'] == 'dbt'
+    assert row['total_time_ms'] == sum(turn.latency_ms for turn in conversation.turns)
+    assert len(row['turn_latencies_ms'].split(';')) == 3
+
+
+def test_stops_at_max_turns_without_answer():
+    ask = scripted_ask([reply(HANDOFF_REPLY), reply(CLARIFYING_REPLY)])
+    row = converse(ask, "How do I avoid duplicate rows in dbt?", max_turns=2).row()
+    assert row['turns'] == 2
+    assert row['outcome'] == 'clarifying'
+    assert row['time_to_answer_ms'] is None
+    assert row['total_time_ms'] >= 0
+
+
+def test_single_turn_does_not_follow_up():
+    ask = scripted_ask([reply(HANDOFF_REPLY, handoff=True)])
+    row = converse(ask, "Can I talk to someone?", max_turns=1).row()
+    assert ask.sent == ["Can I talk to someone?"]
+    assert row['outcome'] == 'handoff'
+
+
+def test_errors_end_the_conversation():
+    ask = scripted_ask([(None, error_record("Error sending request: timed out"))])
+    row = converse(ask, "How do I avoid duplicate rows in dbt?").row()
+    assert row['turns'] == 1
+    assert row['outcome'] == 'error'
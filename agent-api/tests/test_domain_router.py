@@ -0,0 +1,105 @@
+"""
+Tests for the API's first-turn domain router in src/api/domain_router.py,
+on a small fixture model: predictions, the confidence threshold, query
+parameters and routing in answer_question.
+
+Usage:
+    python -m pytest test_domain_router.py
+"""
+
+import os
+import shutil
+import tempfile
+
+from domain_router import GENERAL, DomainClassifier, DomainRouter, merge_query_params
+
+AGENT_PATH = 'projects/p/locations/global/agents/a'
+
+EXAMPLES = [
+    ("How do I write a LookML explore with joins?", 'looker'),
+    ("What is a LookML view in Looker?", 'looker'),
+    ("How do Looker PDTs persist derived tables?", 'looker'),
+    ("How do I partition a BigQuery table by date?", 'bigquery'),
+    ("What does BigQuery charge for slots and storage?", 'bigquery'),
+    ("How do I cluster a BigQuery table?", 'bigquery'),
+    ("How do I write a dbt model with ref?", 'dbt'),
+    ("What are dbt tests and snapshots?", 'dbt'),
+    ("How do dbt incremental models work?", 'dbt'),
+    ("What is a data warehouse?", GENERAL),
+    ("What is the difference between OLAP and OLTP?", GENERAL),
+]
+
+
+def classifier():
+    return DomainClassifier.train(EXAMPLES)
+
+
+def test_predictions():
+    model = classifier()
+    assert model.classes == sorted({domain for _, domain in EXAMPLES})
+    for question, domain in (("Add a LookML view to a Looker explore", 'looker'),
+                             ("Partition and cluster a BigQuery table", 'bigquery'),
+                             ("dbt incremental model with ref", 'dbt')):
+        predicted, confidence = model.predict(question)
+        assert predicted == domain and 0.5 < confidence <= 1.0
+    # Unknown words fall back to the priors
+    predicted, confidence = model.predict("zzz qqq")
+    assert predicted in model.classes and confidence < 0.5
+
+
+def test_model_round_trip():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'domain_model.json')
+        model = classifier()
+        model.save(path)
+        loaded = DomainClassifier.load(path)
+        for question, _ in EXAMPLES:
+            assert loaded.predict(question) == model.predict(question)
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_route_threshold_and_params():
+    question = "How do I cluster and partition a BigQuery table?"
+    domain, confidence = classifier().predict(question)
+    assert domain == 'bigquery'
+
+    router = DomainRouter(classifier(), playbook_ids={'bigquery': 'pb-1'}, agent_path=AGENT_PATH,
+                          min_confidence=confidence)
+    assert router.route(question) == ('bigquery', confidence, {
+        "parameters": {"domain_hint": 'bigquery'},
+        "currentPlaybook": f"{AGENT_PATH}/playbooks/pb-1",
+    })
+    # Just below the threshold the General playbook decides
+    router.min_confidence = confidence + 1e-9
+    assert router.route(question) == (None, confidence, None)
+    # No playbook ID: only the hint
+    router = DomainRouter(classifier(), min_confidence=0.0)
+    assert router.route(question)[2] == {"parameters": {"domain_hint": 'bigquery'}}
+    # General questions are never routed
+    assert router.route("What is a data warehouse?")[0] is None
+
+
+def test_merge_query_params():
+    assert merge_query_params(None, {}) is None
+    merged = merge_query_params({"parameters": {"conversation_history": "Q: ..."}},
+                                {"parameters": {"domain_hint": 'dbt'}, "currentPlaybook": "pb"})
+    assert merged == {"parameters": {"conversation_history": "Q: ...", "domain_hint": 'dbt'},
+                      "currentPlaybook": "pb"}
+
+
+def test_answer_question_routes_first_turn_only(agent_api, fake_backend, monkeypatch):
+    monkeypatch.setattr(agent_api, 'domain_router', DomainRouter(
+        classifier(), playbook_ids={'dbt': 'pb-dbt'}, agent_path=AGENT_PATH, min_confidence=0.5))
+    monkeypatch.setattr(agent_api, 'faq_store', None)
+
+    first, status = agent_api.answer_question("How do dbt incremental models work?")
+    assert status == 200 and first['domainHint'] == 'dbt'
+    call = fake_backend.calls[-1]
+    assert call['domain'] == 'dbt'
+    assert call['query_params']['currentPlaybook'] == f"{AGENT_PATH}/playbooks/pb-dbt"
+
+    second, _ = agent_api.answer_question("And how do I test them?", first['sessionId'])
+    assert second['turn'] == 2 and 'domainHint' not in second
+    assert not (fake_backend.calls[-1]['query_params'] or {}).get('currentPlaybook')
@@ -0,0 +1,92 @@
+"""
+Tests for the API's FAQ fast path in src/api/faq.py on a fixture store:
+matching, the score threshold, expiry, and the turn-0 short-circuit in
+answer_question.
+
+Usage:
+    python -m pytest test_faq.py
+"""
+
+from faq import FaqStore, normalize_question, offers_follow_up
+
+NOW = 1800000000
+
+
+def entry(entry_id, question, answer, review_status='approved', expires_at=NOW + 86400):
+    return {'id': entry_id, 'question': question, 'answer': answer,
+            'review_status': review_status, 'expires_at': expires_at}
+
+
+FIXTURE = {
+    'version': 'test-1',
+    'entries': [
+        entry('looker', "What is Looker?", "Looker is a business intelligence platform."),
+        entry('pdt', "What is a persistent derived table in Looker?", "A PDT is a derived table written to the database."),
+        entry('expired', "What is Omni?", "Omni is a BI tool.", expires_at=NOW - 1),
+        entry('pending', "What is dbt?", "dbt transforms data in the warehouse.", review_status='pending'),
+        entry('follow-up', "What is BigQuery?", "BigQuery is a data warehouse. Would you like me to show an example?"),
+    ],
+}
+
+
+def store(min_score=0.9):
+    return FaqStore(FIXTURE, min_score=min_score, now=NOW)
+
+
+def test_normalize_question():
+    assert normalize_question("  What IS Looker?! ") == "what is looker"
+    assert normalize_question("¿?") == ""
+
+
+def test_exact_and_near_matches():
+    faq = store(min_score=0.8)
+    assert len(faq) == 2 and faq.expired == 3 and faq.version == 'test-1'
+
+    found, score = faq.lookup("what is LOOKER")
+    assert found['id'] == 'looker' and score == 1.0
+
+    # One extra word out of nine: Jaccard 8/9
+    found, score = faq.lookup("What is a persistent derived table in Looker exactly?")
+    assert found['id'] == 'pdt' and abs(score - 8 / 9) < 1e-9
+
+    # Below the threshold nothing is served, but the best score is reported
+    found, score = faq.lookup("What is a derived table?")
+    assert found is None and 0 < score < 0.8
+    assert faq.lookup("?") == (None, 0.0)
+    # Shares "a" and "table" with the PDT question: 2 of 9 distinct words
+    assert faq.lookup("Partition a table") == (None, 2 / 9)
+
+
+def test_expired_unapproved_and_follow_up_entries_are_ignored():
+    faq = store()
+    assert faq.lookup("What is Omni?")[0] is None
+    assert faq.lookup("What is dbt?")[0] is None
+    assert faq.lookup("What is BigQuery?")[0] is None
+    assert offers_follow_up("Would you like me to walk you through the steps?\n")
+    assert not offers_follow_up("A PDT is a derived table.") and not offers_follow_up(None)
+
+
+def test_turn_zero_short_circuit(agent_api, fake_backend, monkeypatch):
+    monkeypatch.setattr(agent_api, 'faq_store', store())
+    monkeypatch.setattr(agent_api, 'domain_router', None)
+
+    first, status = agent_api.answer_question("What is Looker?")
+    assert status == 200 and first['source'] == 'faq' and first['faqId'] == 'looker'
+    assert first['answer'] == "Looker is a business intelligence platform."
+    assert first['faqVersion'] == 'test-1' and first['matchScore'] == 1.0 and first['turn'] == 1
+    assert fake_backend.calls == []
+
+    # Later turns of the same conversation always ask the agent, which gets
+    # the FAQ exchange it never saw as history
+    second, _ = agent_api.answer_question("What is Looker?", first['sessionId'])
+    assert second['source'] == 'live' and second['turn'] == 2
+    assert [call['question'] for call in fake_backend.calls] == ["What is Looker?"]
+    history = fake_backend.calls[0]['query_params']['parameters']['conversation_history']
+    assert "Looker is a business intelligence platform." in history
+    agent_api.answer_question("And Looker Studio?", first['sessionId'])
+    assert fake_backend.calls[1]['query_params'] is None
+
+    # So do first turns that opt out or have no confident match
+    assert agent_api.answer_question("What is Looker?", allow_faq=False)[0]['source'] == 'live'
+    assert agent_api.answer_question("What is a derived table?")[0]['source'] == 'live'
+    assert len(fake_backend.calls) == 4
@@ -0,0 +1,147 @@
+"""
+Tests for the API's /jobs endpoints (src/api/jobs.py) through the Flask test
+client, with answer_question replaced by a stub handler.
+
+Usage:
+    python -m pytest test_jobs.py
+"""
+
+import time
+import threading
+
+import pytest
+
+from jobs import CANCELLED, FAILED, SUCCEEDED, JobManager, check_callback_url
+
+
+class StubHandler:
+    """answer_question stand-in; holds each call until released when gated."""
+
+    def __init__(self, status_code=200, error=None, gated=False):
+        self.status_code = status_code
+        self.error = error
+        self.gate = threading.Event()
+        if not gated:
+            self.gate.set()
+        self.started = []
+        self.allow_faq = []
+
+    def __call__(self, question, session_id=None, allow_faq=True):
+        self.started.append(question)
+        self.allow_faq.append(allow_faq)
+        self.gate.wait(5)
+        if self.error:
+            raise self.error
+        return {'question': question, 'answer': f"Answer to: {question}",
+                'sessionId': session_id or 'new-session'}, self.status_code
+
+
+@pytest.fixture
+def client_with(agent_api, monkeypatch):
+    """Test client factory; each call gives agent_api a new JobManager around handler."""
+    def make(handler, **options):
+        monkeypatch.setattr(agent_api, 'job_manager', JobManager(handler, **options))
+        return agent_api.app.test_client()
+    return make
+
+
+def wait_for(client, job_id, statuses, timeout=5):
+    deadline = time.time() + timeout
+    while True:
+        response = client.get(f"/jobs/{job_id}")
+        if response.status_code != 200 or response.get_json()['status'] in statuses or time.time() > deadline:
+            return response
+        time.sleep(0.01)
+
+
+def test_submit_and_poll(client_with):
+    handler = StubHandler(gated=True)
+    client = client_with(handler)
+    assert client.post('/jobs', json={'sessionId': 's1'}).status_code == 400
+
+    response = client.post('/jobs', json={'question': 'What is a PDT?', 'sessionId': 's1'})
+    assert response.status_code == 202
+    submitted = response.get_json()
+    assert submitted['status'] in ('queued', 'running') and 'result' not in submitted
+    assert submitted['statusUrl'] == f"/jobs/{submitted['jobId']}"
+    handler.gate.set()
+
+    job = wait_for(client, submitted['jobId'], (SUCCEEDED,)).get_json()
+    assert job['status'] == SUCCEEDED and job['statusCode'] == 200
+    assert job['result']['answer'] == 'Answer to: What is a PDT?'
+    assert job['sessionId'] == 's1' and job['finishedAt'] >= job['startedAt'] >= job['submittedAt']
+
+
+def test_failed_jobs(client_with):
+    client = client_with(StubHandler(status_code=429))
+    job_id = client.post('/jobs', json={'question': 'Over quota?'}).get_json()['jobId']
+    job = wait_for(client, job_id, (FAILED,)).get_json()
+    assert job['status'] == FAILED and job['statusCode'] == 429
+
+    client = client_with(StubHandler(error=RuntimeError('agent exploded')))
+    job_id = client.post('/jobs', json={'question': 'Crash?'}).get_json()['jobId']
+    job = wait_for(client, job_id, (FAILED,)).get_json()
+    assert job['statusCode'] == 500 and 'agent exploded' in job['result']['error']
+
+
+def test_cancel_running_and_queued(agent_api, client_with):
+    handler = StubHandler(gated=True)
+    client = client_with(handler, max_workers=1)
+    running = client.post('/jobs', json={'question': 'first'}).get_json()['jobId']
+    queued = client.post('/jobs', json={'question': 'second'}).get_json()['jobId']
+    wait_for(client, running, ('running',))
+
+    for job_id in (running, queued):
+        response = client.delete(f"/jobs/{job_id}")
+        assert response.status_code == 200 and response.get_json()['status'] == CANCELLED
+    handler.gate.set()
+    agent_api.job_manager._executor.shutdown(wait=True)
+
+    # The running job's result is discarded; the queued one never ran
+    for job_id in (running, queued):
+        job = client.get(f"/jobs/{job_id}").get_json()
+        assert job['status'] == CANCELLED and 'result' not in job
+    assert handler.started == ['first']
+    assert client.delete('/jobs/unknown').status_code == 404
+
+
+def test_finished_jobs_expire(client_with):
+    client = client_with(StubHandler(), result_ttl=0.5)
+    job_id = client.post('/jobs', json={'question': 'Short-lived?'}).get_json()['jobId']
+    assert wait_for(client, job_id, (SUCCEEDED,)).get_json()['status'] == SUCCEEDED
+    time.sleep(0.6)
+    response = client.get(f"/jobs/{job_id}")
+    assert response.status_code == 404 and 'expired' in response.get_json()['error']
+
+
+def test_allow_faq_is_passed_through(client_with):
+    handler = StubHandler()
+    client = client_with(handler)
+    for body in ({'question': 'What is Looker?'}, {'question': 'What is Looker?', 'allowFaq': False}):
+        job_id = client.post('/jobs', json=body).get_json()['jobId']
+        wait_for(client, job_id, (SUCCEEDED,))
+    assert handler.allow_faq == [True, False]
+
+
+def test_callback_urls_are_restricted(client_with):
+    allowed = ['hooks.example.com', '.callbacks.example.org']
+    check_callback_url('https://hooks.example.com/done', allowed)
+    check_callback_url('https://a.callbacks.example.org:8443/done', allowed)
+    for url in ('http://hooks.example.com/done', 'https://169.254.169.254/computeMetadata',
+                'https://hooks.example.com.evil.net/', 'https://evilcallbacks.example.org/',
+                'file:///etc/passwd', 'https://', 42):
+        try:
+            check_callback_url(url, allowed)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted {url!r}")
+
+    # Without configured hosts no callback is accepted, and nothing is queued
+    handler = StubHandler()
+    client = client_with(handler)
+    response = client.post('/jobs', json={'question': 'q', 'callbackUrl': 'https://hooks.example.com/done'})
+    assert response.status_code == 400 and 'not allowed' in response.get_json()['error']
+    client = client_with(handler, callback_hosts=allowed)
+    response = client.post('/jobs', json={'question': 'q', 'callbackUrl': 'http://localhost:8080/admin'})
+    assert response.status_code == 400 and 'https' in response.get_json()['error']
+    assert handler.started == []
@@ -0,0 +1,108 @@
+"""
+Tests for the incremental results merge in scripts/merge_results.py: schema
+normalization, deduplication, and reading only new or changed files.
+
+Usage:
+    python -m pytest test_merge_results.py
+"""
+
+import os
+import csv
+import json
+import shutil
+import tempfile
+
+import pandas as pd
+
+from merge_results import MERGED_FIELDS, merge
+from result_sink import ResultSink
+
+OLD_COLUMNS = ['question_number', 'category', 'difficulty', 'question', 'answer', 'response_time_ms',
+               'session_id', 'success']
+
+
+def write_csv(path, columns, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def make_results(directory):
+    """An old success-flag file, an older runner's CSV, and a ResultSink JSONL file with a retry."""
+    write_csv(os.path.join(directory, 'advanced_test_results.csv'), OLD_COLUMNS, [
+        {'question_number': 1, 'category': 'Looker', 'difficulty': 'Easy', 'question': 'What is Looker?',
+         'answer': 'A BI tool.', 'response_time_ms': 900, 'session_id': 's1', 'success': 'True'},
+        {'question_number': 2, 'category': 'Looker', 'difficulty': 'Easy', 'question': 'What is LookML?',
+         'answer': 'Timed out', 'response_time_ms': 60000, 'session_id': 's1', 'success': 'False'},
+    ])
+    write_csv(os.path.join(directory, 'service_acct_test_results_20250312_235901.csv'),
+              ['question_number', 'question', 'category', 'difficulty', 'answer', 'session_id', 'timestamp',
+               'response_time_ms'], [
+        {'question_number': 1, 'question': 'What is Looker? ', 'category': 'Looker', 'difficulty': 'Easy',
+         'answer': 'Agent API call failed with status code 403: denied', 'session_id': 's2',
+         'timestamp': '2025-03-12T23:59:02', 'response_time_ms': 120},
+    ])
+    with ResultSink(os.path.join(directory, 'distributed_results.jsonl'), runner='distributed_runner') as sink:
+        for attempt, answer in ((1, 'ERROR: timeout'), (2, 'A BI tool.')):
+            sink.write({'question': 'What is Looker?', 'category': 'Looker', 'difficulty': 'Easy',
+                        'answer': answer, 'attempt': attempt, 'timestamp': f"2025-03-14T10:00:0{attempt}",
+                        'response_time_ms': 800 + attempt})
+
+
+def test_merge_normalizes_and_deduplicates():
+    directory = tempfile.mkdtemp()
+    output = os.path.join(directory, 'out', 'merged_test_results.parquet')
+    try:
+        make_results(directory)
+        stats = merge([os.path.join(directory, '*results*')], output)
+        assert stats['read'] == 3 and stats['rows_read'] == 5 and stats['rows'] == 4
+
+        df = pd.read_parquet(output)
+        assert list(df.columns) == MERGED_FIELDS
+        rows = {(row['run'], row['question']): row for row in df.to_dict('records')}
+        advanced = rows[('advanced_test_results', 'What is LookML?')]
+        assert advanced['outcome'] == 'error' and advanced['runner'] == 'advanced_test'
+        assert advanced['timestamp']  # from the file's modification time
+        assert rows[('advanced_test_results', 'What is Looker?')]['outcome'] == 'answered'
+
+        service = rows[('service_acct_test_results_20250312_235901', 'What is Looker?')]
+        assert service['outcome'] == 'error' and service['timestamp'] == '2025-03-12T23:59:02'
+
+        retried = rows[('distributed_results', 'What is Looker?')]
+        assert retried['attempt'] == 2 and retried['answer'] == 'A BI tool.'
+        assert list(df['question']) == sorted(df['question'])
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_merge_is_incremental():
+    directory = tempfile.mkdtemp()
+    output = os.path.join(directory, 'merged_test_results.parquet')
+    pattern = os.path.join(directory, '*results*')
+    try:
+        make_results(directory)
+        merge([pattern], output)
+        # Copies of a file elsewhere are the same run
+        copies = os.path.join(directory, 'copies')
+        os.makedirs(copies)
+        shutil.copy(os.path.join(directory, 'advanced_test_results.csv'), copies)
+        os.utime(os.path.join(directory, 'advanced_test_results.csv'))
+
+        stats = merge([pattern, os.path.join(copies, '*')], output)
+        assert stats['read'] == 1 and stats['skipped'] == 3 and stats['rows'] == 4
+        assert merge([pattern, os.path.join(copies, '*')], output)['rows'] is None
+
+        # A changed file replaces its earlier rows
+        path = os.path.join(directory, 'service_acct_test_results_20250312_235901.csv')
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow([5, 'What is dbt?', 'dbt', 'Easy', 'A transformation tool.', 's3',
+                                    '2025-03-12T23:59:40', 700])
+        stats = merge([pattern], output)
+        assert stats['read'] == 1 and stats['rows_read'] == 2 and stats['rows'] == 5
+
+        with open(os.path.splitext(output)[0] + '.manifest.json', encoding='utf-8') as f:
+            assert len(json.load(f)['files']) == 4
+        assert merge([pattern], output, full=True)['rows'] == 5
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,179 @@
+"""
+Tests for the API's answer backends and Dialogflow fallback policy.
+
+Everything runs locally: the Gemini backend talks to mock_model_server.py,
+and Dialogflow is replaced by a fake transport that fails like an
+over-quota agent.
+
+Usage:
+    python -m pytest test_model_backend.py
+"""
+
+import time
+import tempfile
+
+from backends import BackendError, FallbackPolicy, GeminiBackend, create_backend_policy
+from mock_model_server import MockModelServer
+
+
+class StubBackend:
+    """Primary backend that fails or stalls on demand."""
+
+    name = 'dialogflow'
+
+    def __init__(self, status_code=None, delay=0):
+        self.status_code = status_code
+        self.delay = delay
+        self.calls = 0
+
+    def answer(self, question, session_id, query_params=None, domain=None, history=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.status_code:
+            raise BackendError(self.name, self.status_code, 'stub failure')
+        return f"Agent answer to: {question}"
+
+
+def test_gemini_backend_uses_domain_playbook():
+    server = MockModelServer().start()
+    try:
+        backend = GeminiBackend('test-project', 'us-central1', api_base=server.base_url)
+        answer = backend.answer("How do I partition a table?", 's1', domain='bigquery',
+                                history="Q: What is BigQuery? A: A data warehouse.")
+        assert answer == "Mock answer to: How do I partition a table?"
+
+        request = server.requests[-1]
+        assert request['path'].endswith('/models/gemini-2.0-flash-001:generateContent')
+        instruction = request['body']['systemInstruction']['parts'][0]['text']
+        assert instruction.startswith('# BigQuery Playbook')
+        assert 'Q: What is BigQuery?' in instruction
+
+        backend.answer("What is a dashboard?", 's2')
+        instruction = server.requests[-1]['body']['systemInstruction']['parts'][0]['text']
+        assert instruction.startswith('## Instructions')  # General Playbook
+    finally:
+        server.stop()
+
+
+def test_gemini_backend_reports_model_errors():
+    server = MockModelServer(fail_status=503).start()
+    try:
+        backend = GeminiBackend('test-project', 'us-central1', api_base=server.base_url)
+        try:
+            backend.answer("What is Looker?", 's1')
+        except BackendError as e:
+            assert e.status_code == 503 and e.backend == 'gemini'
+        else:
+            raise AssertionError("expected BackendError")
+    finally:
+        server.stop()
+
+
+def test_falls_back_when_over_quota_and_cools_down():
+    server = MockModelServer().start()
+    try:
+        primary = StubBackend(status_code=429)
+        policy = FallbackPolicy(primary, GeminiBackend('p', 'us-central1', api_base=server.base_url),
+                                cooldown=0.2)
+        answer, backend = policy.answer("What is Looker?", 's1')
+        assert backend == 'gemini' and answer == "Mock answer to: What is Looker?"
+
+        # Within the cooldown the failing primary is not tried again
+        policy.answer("What is Looker?", 's1')
+        assert primary.calls == 1
+
+        # After the cooldown a recovered primary serves again
+        time.sleep(0.25)
+        primary.status_code = None
+        answer, backend = policy.answer("What is Looker?", 's1')
+        assert backend == 'dialogflow' and primary.calls == 2
+    finally:
+        server.stop()
+
+
+def test_falls_back_when_primary_is_slow():
+    server = MockModelServer().start()
+    try:
+        primary = StubBackend(delay=0.05)
+        policy = FallbackPolicy(primary, GeminiBackend('p', 'us-central1', api_base=server.base_url),
+                                slow_threshold_ms=20, cooldown=60)
+        assert policy.answer("What is dbt?", 's1')[1] == 'dialogflow'
+        assert policy.answer("What is dbt?", 's1')[1] == 'gemini'
+        assert primary.calls == 1
+    finally:
+        server.stop()
+
+
+def test_client_errors_are_not_retried():
+    server = MockModelServer().start()
+    try:
+        policy = FallbackPolicy(StubBackend(status_code=400),
+                                GeminiBackend('p', 'us-central1', api_base=server.base_url))
+        try:
+            policy.answer("What is Omni?", 's1')
+        except BackendError as e:
+            assert e.status_code == 400
+        else:
+            raise AssertionError("expected BackendError")
+        assert not server.requests
+    finally:
+        server.stop()
+
+
+def test_missing_playbooks_fail_loudly(monkeypatch):
+    monkeypatch.setenv('PLAYBOOKS_DIR', tempfile.mkdtemp())
+    try:
+        create_backend_policy(lambda: None, 'p', 'us-central1', None)
+    except ValueError as e:
+        assert 'Playbooks not found' in str(e)
+    else:
+        raise AssertionError("expected ValueError")
+
+    # A Dialogflow-only API does not need them
+    monkeypatch.setenv('FALLBACK_BACKEND', 'none')
+    assert create_backend_policy(lambda: None, 'p', 'us-central1', None).fallback is None
+
+
+def test_ask_endpoint_falls_back_to_model(agent_api, monkeypatch):
+    import dialogflow_transport
+
+    class OverQuotaTransport(dialogflow_transport.DetectIntentTransport):
+        name = 'fake'
+
+        def __init__(self):
+            super().__init__('p', 'us-central1', 'a', None)
+            self.calls = []
+            self.failing = True
+
+        def detect_intent(self, session_id, text, language_code="en", query_params=None):
+            self.calls.append(query_params)
+            if self.failing:
+                raise dialogflow_transport.DetectIntentError(429, 'Quota exceeded')
+            return {'queryResult': {'responseMessages': [{'text': {'text': [f"Agent answer to: {text}"]}}]}}
+
+    server = MockModelServer().start()
+    try:
+        transport = OverQuotaTransport()
+        monkeypatch.setenv('GEMINI_API_BASE', server.base_url)
+        monkeypatch.setenv('GEMINI_AUTH', 'false')
+        monkeypatch.setenv('FALLBACK_COOLDOWN_SECONDS', '0')
+        policy = create_backend_policy(lambda: transport, 'p', 'us-central1', tempfile.mkstemp()[1])
+        monkeypatch.setattr(agent_api, 'backend_policy', policy)
+        monkeypatch.setattr(agent_api, 'faq_store', None)
+        client = agent_api.app.test_client()
+
+        response = client.post('/ask', json={'question': "How do I create a BigQuery ML model?"})
+        body = response.get_json()
+        assert response.status_code == 200, body
+        assert body['backend'] == 'gemini' and body['source'] == 'live'
+        assert body['answer'] == "Mock answer to: How do I create a BigQuery ML model?"
+
+        # Once Dialogflow is back it gets the turn the model answered
+        transport.failing = False
+        body = client.post('/ask', json={'question': "Which models can it train?",
+                                         'sessionId': body['sessionId']}).get_json()
+        assert body['backend'] == 'dialogflow' and body['turn'] == 2
+        history = transport.calls[-1]['parameters']['conversation_history']
+        assert "How do I create a BigQuery ML model?" in history
+    finally:
+        server.stop()
@@ -0,0 +1,63 @@
+"""
+Tests for the answer outcome classifier against the labeled fixture set.
+
+data/outcome_fixtures.json holds recorded answers from agent-api/data and
+synthetic edge cases, each labeled with the expected outcome (and the
+status code, error field or handoff flag where one applies).
+
+Usage:
+    python -m pytest test_outcomes.py
+"""
+
+import os
+import json
+
+from outcomes import OUTCOMES, classify, classify_record, outcome_column
+from agent_response import parse_response
+
+FIXTURES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'outcome_fixtures.json')
+
+
+def load_fixtures():
+    with open(FIXTURES_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_fixtures_are_classified_correctly():
+    misses = []
+    for fixture in load_fixtures():
+        got = classify(fixture['answer'], fixture.get('status_code'), fixture.get('error'), fixture.get('handoff'))
+        if got != fixture['outcome']:
+            misses.append((fixture['outcome'], got, fixture['answer'][:80]))
+    assert not misses, misses
+
+
+def test_fixtures_cover_every_outcome():
+    assert {fixture['outcome'] for fixture in load_fixtures()} == set(OUTCOMES)
+
+
+def test_answers_about_errors_are_not_errors():
+    answer = "If the job failed, the error message and status code are in the job's errorResult."
+    assert classify(answer) == 'answered'
+    assert classify(answer, status_code=200) == 'answered'
+    assert classify(answer, status_code=500) == 'error'
+
+
+def test_classify_record_uses_handoff_flag():
+    handoff = parse_response({'queryResult': {'responseMessages': [
+        {'text': {'text': ["One moment."]}}, {'liveAgentHandoff': {}}]}})
+    assert classify_record(handoff, 200) == 'handoff'
+    assert classify_record(parse_response({'queryResult': {}}), 200) == 'empty'
+
+
+def test_outcome_column_is_categorical():
+    import pandas as pd
+
+    df = pd.DataFrame({
+        'answer': ["Looker is a BI platform.", "ERROR: Failed to get response", "", "Looker is a BI platform."],
+        'outcome': [None, None, None, 'handoff'],
+    })
+    column = outcome_column(df)
+    assert str(column.dtype) == 'category'
+    assert list(column.cat.categories) == list(OUTCOMES)
+    assert column.tolist() == ['answered', 'error', 'empty', 'handoff']
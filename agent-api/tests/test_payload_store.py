@@ -0,0 +1,129 @@
+"""
+Tests for the webhook's raw payload storage in src/webhook/payload_store.py:
+content hashes, deduplication and the sampling decision, which all depend
+only on the payload.
+
+Usage:
+    python -m pytest test_payload_store.py
+"""
+
+import os
+import gzip
+import json
+import base64
+import shutil
+import tempfile
+
+from payload_store import (BlobPayloadStore, PayloadLogger, TablePayloadStore, canonical_payload, payload_hash,
+                           sampled)
+
+
+def detect_intent(answer, response_id='r-1', latency=0.5):
+    return {
+        'responseId': response_id,
+        'queryResult': {
+            'text': 'What is Looker?',
+            'responseMessages': [{'text': {'text': [answer]}}],
+            'diagnosticInfo': {'latency': latency},
+            'match': {'matchType': 'PLAYBOOK', 'confidence': 0.9},
+        },
+    }
+
+
+class RecordingStore:
+    """Payload store stand-in that records what it is asked to keep."""
+
+    def __init__(self):
+        self.puts = []
+
+    def put(self, digest, canonical):
+        self.puts.append(digest)
+        return True
+
+
+class FakeClient:
+    """BigQuery client stand-in; insert_rows_json fails on demand."""
+
+    def __init__(self, fail=0):
+        self.fail = fail
+        self.rows = []
+
+    def insert_rows_json(self, table_ref, rows):
+        if self.fail:
+            self.fail -= 1
+            return [{"index": 0, "errors": [{"reason": "backendError"}]}]
+        self.rows += rows
+        return []
+
+
+class OfflineTableStore(TablePayloadStore):
+    def ensure_table(self):
+        self.created = getattr(self, 'created', 0) + 1
+
+
+def test_hash_ignores_per_call_fields():
+    first = detect_intent("Looker is a BI platform.", response_id='r-1', latency=0.5)
+    again = detect_intent("Looker is a BI platform.", response_id='r-2', latency=3.2)
+    reordered = json.loads(json.dumps(again, sort_keys=True))
+    reordered['queryResult'] = dict(reversed(list(reordered['queryResult'].items())))
+
+    digest = payload_hash(canonical_payload(first))
+    assert len(digest) == 64 and int(digest, 16) >= 0
+    assert payload_hash(canonical_payload(again)) == digest
+    assert payload_hash(canonical_payload(reordered)) == digest
+    assert payload_hash(canonical_payload(detect_intent("Looker is a BI tool."))) != digest
+    # The caller's payload is left as it was
+    assert first['responseId'] == 'r-1' and 'diagnosticInfo' in first['queryResult']
+
+
+def test_blob_store_deduplicates():
+    directory = tempfile.mkdtemp()
+    try:
+        store = BlobPayloadStore(directory)
+        canonical = canonical_payload(detect_intent("Looker is a BI platform."))
+        digest = payload_hash(canonical)
+        assert store.put(digest, canonical) is True
+        assert store.put(digest, canonical) is False
+        assert store.get(digest) == json.loads(canonical)
+        assert os.listdir(os.path.join(directory, digest[:2])) == [f"{digest}.json.gz"]
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_table_store_deduplicates_and_retries_failed_writes():
+    client = FakeClient(fail=1)
+    store = OfflineTableStore(client, 'p.d.results_payloads')
+    canonical = canonical_payload(detect_intent("Looker is a BI platform."))
+    digest = payload_hash(canonical)
+
+    # A failed insert is forgotten, so the next sighting tries again
+    assert store.put(digest, canonical) is False
+    assert store.put(digest, canonical) is True
+    assert store.put(digest, canonical) is False
+    assert store.created == 1 and len(client.rows) == 1
+    row = client.rows[0]
+    assert row['payload_hash'] == digest and row['raw_bytes'] == len(canonical)
+    assert gzip.decompress(base64.b64decode(row['payload_gzip'])) == canonical
+
+
+def test_sampling_is_deterministic():
+    payloads = [detect_intent(f"Answer number {i}.") for i in range(400)]
+    digests = [payload_hash(canonical_payload(payload)) for payload in payloads]
+
+    assert not any(sampled(digest, 0.0) for digest in digests)
+    assert all(sampled(digest, 1.0) for digest in digests)
+    tenth = {digest for digest in digests if sampled(digest, 0.1)}
+    half = {digest for digest in digests if sampled(digest, 0.5)}
+    # Raising the rate only adds payloads; the share kept is close to the rate
+    assert tenth <= half
+    assert 20 <= len(tenth) <= 60 and 160 <= len(half) <= 240
+
+    # Two loggers (two instances, or two runs) keep exactly the same payloads
+    stores = [RecordingStore(), RecordingStore()]
+    for store in stores:
+        logger = PayloadLogger(store, sample_rate=0.5)
+        assert [logger.log(payload) for payload in payloads] == digests
+    assert stores[0].puts == stores[1].puts == [digest for digest in digests if digest in half]
+
+    # Every row still gets its hash when nothing is kept
+    assert PayloadLogger(None, 1.0).log(payloads[0]) == digests[0]
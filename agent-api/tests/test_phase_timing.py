@@ -0,0 +1,138 @@
+"""
+Tests for the per-phase client timing in scripts/phase_timing.py, against a
+local HTTP server.
+
+Usage:
+    python -m pytest test_phase_timing.py
+"""
+
+import time
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from conversation import converse
+from agent_response import AgentResponse
+from phase_timing import PHASE_FIELDS, TimedSession, current, measure, phase
+from result_sink import normalize
+
+SERVER_DELAY = 0.05
+BODY = b'{"answer": "' + b'x' * 100000 + b'"}'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        time.sleep(SERVER_DELAY)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://localhost:{server.server_address[1]}/ask"
+
+
+def test_cold_then_warm_connection():
+    server, url = start_server()
+    session = TimedSession()
+    try:
+        with measure() as cold:
+            assert session.post(url, json={'question': 'q'}).status_code == 200
+        with measure() as warm:
+            assert len(session.post(url, json={'question': 'q'}).content) == len(BODY)
+    finally:
+        session.close()
+        server.shutdown()
+
+    cold_row, warm_row = cold.row(), warm.row()
+    assert cold_row['connection'] == 'cold' and warm_row['connection'] == 'warm'
+    assert cold_row['dns_ms'] is not None and cold_row['connect_ms'] is not None
+    assert warm_row['dns_ms'] is None and warm_row['connect_ms'] is None
+    # Plain HTTP has no TLS handshake, and no token was minted
+    assert cold_row['tls_ms'] is None and cold_row['auth_ms'] is None
+    for row in (cold_row, warm_row):
+        assert row['ttfb_ms'] >= SERVER_DELAY * 1000
+        assert row['send_ms'] is not None and row['download_ms'] is not None
+    phases_ms = sum(value for key, value in cold_row.items() if key.endswith('_ms') and value)
+    assert phases_ms <= cold.total_ms + 1
+    assert cold.address == '127.0.0.1' and warm.address is None
+
+
+def test_connect_falls_back_to_later_addresses():
+    server, url = start_server()
+    real_getaddrinfo = socket.getaddrinfo
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        if host != 'localhost':
+            return real_getaddrinfo(host, port, *args, **kwargs)
+        # The server only listens on 127.0.0.1, so the first address is refused
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.2', port)),
+                (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', port))]
+
+    session = TimedSession()
+    socket.getaddrinfo = getaddrinfo
+    try:
+        with measure() as timing:
+            assert session.post(url, json={'question': 'q'}).status_code == 200
+    finally:
+        socket.getaddrinfo = real_getaddrinfo
+        session.close()
+        server.shutdown()
+    assert timing.address == '127.0.0.1'
+    assert timing.row()['connection'] == 'cold' and timing.row()['connect_ms'] is not None
+
+
+def test_calls_outside_measure_are_not_timed():
+    server, url = start_server()
+    session = TimedSession()
+    try:
+        assert current() is None
+        assert session.post(url, json={}).status_code == 200
+        with phase('auth'):
+            pass
+        assert current() is None
+    finally:
+        session.close()
+        server.shutdown()
+
+
+def test_auth_phase_and_nesting():
+    with measure() as outer:
+        with measure() as inner:
+            with phase('auth'):
+                time.sleep(0.01)
+        with phase('auth'):
+            pass
+    assert inner.row()['auth_ms'] >= 10
+    assert outer.row()['auth_ms'] < inner.row()['auth_ms']
+    assert 'auth' in inner.describe()
+
+
+def test_converse_records_first_reply_phases():
+    server, url = start_server()
+    session = TimedSession()
+
+    def ask(text):
+        response = session.post(url, json={'question': text})
+        return response.status_code, AgentResponse(messages=[response.json()['answer']])
+
+    try:
+        row = converse(ask, "How do I avoid duplicate rows in dbt?").row()
+    finally:
+        session.close()
+        server.shutdown()
+    assert set(PHASE_FIELDS) <= set(row)
+    assert row['connection'] == 'cold' and row['ttfb_ms'] >= SERVER_DELAY * 1000
+
+    stored = normalize(row)
+    assert isinstance(stored['ttfb_ms'], float) and stored['connection'] == 'cold'
@@ -0,0 +1,50 @@
+"""
+Tests for the webhook's question set loader in src/webhook/question_sets.py.
+
+Usage:
+    python -m pytest test_question_sets.py
+"""
+
+import os
+import json
+import shutil
+import tempfile
+
+from question_sets import DEFAULT_SET_DIR, QuestionSetLoader, check_name, content_hash
+
+
+def test_check_name():
+    for name in ('catalog', 'smoke', 'catalog-v2', 'set_1.beta'):
+        assert check_name(name) == name
+    for name in ('../secrets', '..', 'a..b', 'sub/catalog', '/etc/passwd', 'catalog\n', '', None, 42):
+        try:
+            check_name(name)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted {name!r}")
+
+
+def test_loader_rejects_traversal():
+    directory = tempfile.mkdtemp()
+    try:
+        sets = os.path.join(directory, 'sets')
+        os.makedirs(sets)
+        questions = [{"question": "Outside?", "category": "Looker", "difficulty": "Easy"}]
+        with open(os.path.join(directory, 'outside.json'), 'w') as f:
+            json.dump({"name": "outside", "questions": questions, "content_hash": content_hash(questions)}, f)
+        loader = QuestionSetLoader(sets)
+        try:
+            loader.load('../outside')
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("loaded a set outside the set directory")
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_loads_shipped_sets():
+    loader = QuestionSetLoader(DEFAULT_SET_DIR)
+    for name in ('catalog', 'smoke'):
+        question_set = loader.load(name)
+        assert len(question_set) > 0 and loader.load(name) is question_set
@@ -0,0 +1,159 @@
+"""
+Tests for the buffered result writer in scripts/result_sink.py: the shared
+schema, each output format, size- and time-based flushing and the
+on_flush checkpoint hook.
+
+Usage:
+    python -m pytest test_result_sink.py
+"""
+
+import os
+import csv
+import json
+import time
+import shutil
+import tempfile
+import threading
+
+from result_sink import RESULT_FIELDS, ResultSink, normalize
+
+ROW = {'question_number': 3, 'question': "Why?", 'answer': "Because", 'outcome': 'ANSWERED',
+       'response_time_ms': 812.6, 'success': True}
+
+
+def temp_path(name):
+    directory = tempfile.mkdtemp()
+    return os.path.join(directory, name)
+
+
+def test_normalize_types_columns_and_extra():
+    row = normalize(ROW, runner='unit')
+    assert list(row) == RESULT_FIELDS
+    assert row['runner'] == 'unit'
+    assert row['question_number'] == 3 and row['response_time_ms'] == 812
+    assert row['category'] is None
+    assert json.loads(row['extra']) == {'success': True}
+    assert normalize({'response_time_ms': 'n/a'})['response_time_ms'] is None
+
+
+def test_csv_and_jsonl_round_trip():
+    for name in ('results.csv', 'results.jsonl'):
+        path = temp_path(name)
+        with ResultSink(path, runner='unit') as sink:
+            sink.write(ROW)
+            sink.write(dict(ROW, question_number=4))
+        with open(path, newline='', encoding='utf-8') as f:
+            if name.endswith('.csv'):
+                rows = list(csv.DictReader(f))
+                assert list(rows[0]) == RESULT_FIELDS
+            else:
+                rows = [json.loads(line) for line in f]
+        assert [str(row['question_number']) for row in rows] == ['3', '4']
+        assert rows[0]['runner'] == 'unit'
+        shutil.rmtree(os.path.dirname(path))
+
+
+def test_parquet_round_trip():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow not installed; skipping")
+        return
+    path = temp_path('results.parquet')
+    with ResultSink(path, runner='unit', flush_rows=2) as sink:
+        for number in range(5):
+            sink.write(dict(ROW, question_number=number))
+    table = pq.read_table(path)
+    assert table.column_names == RESULT_FIELDS
+    assert table.column('question_number').to_pylist() == list(range(5))
+    assert str(table.schema.field('response_time_ms').type) == 'int64'
+    shutil.rmtree(os.path.dirname(path))
+
+
+def test_flushes_by_size_and_time():
+    path = temp_path('results.jsonl')
+    flushed = []
+    sink = ResultSink(path, flush_rows=3, flush_seconds=60, on_flush=lambda rows: flushed.append(len(rows)))
+    for _ in range(3):
+        sink.write(ROW)
+    deadline = time.time() + 5
+    while not flushed and time.time() < deadline:
+        time.sleep(0.01)
+    assert flushed == [3]
+    sink.close()
+
+    timed = []
+    sink = ResultSink(path, flush_rows=100, flush_seconds=0.05, on_flush=lambda rows: timed.append(len(rows)))
+    sink.write(ROW)
+    time.sleep(0.5)
+    assert timed == [1]
+    sink.close()
+    shutil.rmtree(os.path.dirname(path))
+
+
+def test_on_flush_runs_after_rows_reach_the_file():
+    path = temp_path('results.csv')
+    seen = []
+
+    def on_flush(rows):
+        with open(path, newline='', encoding='utf-8') as f:
+            seen.append(len(list(csv.DictReader(f))))
+
+    with ResultSink(path, on_flush=on_flush) as sink:
+        sink.write(ROW)
+        sink.write(ROW)
+    assert seen == [2]
+    shutil.rmtree(os.path.dirname(path))
+
+
+def test_write_does_not_wait_for_the_file():
+    path = temp_path('results.jsonl')
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_flush(rows):
+        started.set()
+        release.wait(5)
+
+    sink = ResultSink(path, flush_rows=1, on_flush=slow_flush)
+    sink.write(ROW)
+    assert started.wait(5)
+    # The flush thread is busy; writing must still return at once
+    begin = time.perf_counter()
+    for _ in range(100):
+        sink.write(ROW)
+    assert time.perf_counter() - begin < 0.5
+    release.set()
+    sink.close()
+    assert sink.rows_written == 101
+    shutil.rmtree(os.path.dirname(path))
+
+
+def test_append_rules():
+    path = temp_path('results.csv')
+    with ResultSink(path) as sink:
+        sink.write(ROW)
+    with ResultSink(path, append=True) as sink:
+        sink.write(ROW)
+    with open(path, newline='', encoding='utf-8') as f:
+        assert len(list(csv.DictReader(f))) == 2
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("question,answer\n")
+    try:
+        ResultSink(path, append=True)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("appended to a CSV with different columns")
+
+    parquet = temp_path('results.parquet')
+    open(parquet, 'wb').close()
+    try:
+        ResultSink(parquet, append=True)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("appended to a Parquet file")
+    for file_path in (path, parquet):
+        shutil.rmtree(os.path.dirname(file_path))
@@ -0,0 +1,62 @@
+"""
+Tests for the typed results frames in src/dashboard/result_types.py.
+
+Usage:
+    python -m pytest test_result_types.py
+"""
+
+import os
+import glob
+
+import pandas as pd
+
+from outcomes import OUTCOMES
+from result_types import STRING_DTYPE, apply_schema, drop_unused_categories, memory_report, read_results
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+RESULTS_FILES = sorted(glob.glob(os.path.join(project_root, 'agent-api', 'data', '*results*.csv')))
+
+
+def test_schema_types():
+    df = apply_schema(pd.DataFrame({
+        'category': ['Looker', 'dbt', 'Looker'],
+        'outcome': ['answered', None, 'bogus'],
+        'response_time_ms': ['812.6', '', 'n/a'],
+        'ttfb_ms': [1.5, None, 2.0],
+        'session_id': ['s1', 's2', None],
+        'timestamp': ['2025-03-13T00:13:11.642218', 'not a time', '2025-03-13T00:13:12+00:00'],
+        'success': ['True', 'False', None],
+        'notes': ['kept', 'as', 'is'],
+    }))
+    assert isinstance(df['category'].dtype, pd.CategoricalDtype)
+    assert list(df['outcome'].cat.categories) == list(OUTCOMES)
+    assert df['outcome'].isna().tolist() == [False, True, True]
+    assert str(df['response_time_ms'].dtype) == 'Int32' and df['response_time_ms'].iat[0] == 813
+    assert df['response_time_ms'].isna().sum() == 2
+    assert str(df['ttfb_ms'].dtype) == 'float32'
+    assert df['session_id'].dtype == STRING_DTYPE
+    assert pd.api.types.is_datetime64_any_dtype(df['timestamp']) and pd.isna(df['timestamp'].iat[1])
+    assert df['success'].tolist()[:2] == [True, False] and pd.isna(df['success'].iat[2])
+    assert df['notes'].tolist() == ['kept', 'as', 'is']
+    # Typing twice changes nothing
+    pd.testing.assert_frame_equal(apply_schema(df), df)
+
+
+def test_read_results_is_smaller_and_filters_by_date():
+    untyped = pd.concat([pd.read_csv(path) for path in RESULTS_FILES], ignore_index=True)
+    typed = apply_schema(pd.concat([read_results(path) for path in RESULTS_FILES], ignore_index=True))
+    assert isinstance(typed['difficulty'].dtype, pd.CategoricalDtype)
+    report = memory_report({'untyped': untyped, 'typed': typed})
+    assert report.loc['total', 'typed'] < report.loc['total', 'untyped']
+    assert report.loc['category', 'typed dtype'] == 'category'
+
+    dated = typed[typed['timestamp'].notna()]
+    day = dated['timestamp'].dt.date.min()
+    assert (dated['timestamp'].dt.date >= day).all()
+
+
+def test_drop_unused_categories():
+    df = apply_schema(pd.DataFrame({'category': ['Looker', 'dbt', 'BigQuery'], 'response_time_ms': [1, 2, 3]}))
+    filtered = drop_unused_categories(df[df['category'] != 'dbt'])
+    assert sorted(filtered['category'].cat.categories) == ['BigQuery', 'Looker']
+    assert len(filtered.groupby('category', observed=False)['response_time_ms'].mean()) == 2
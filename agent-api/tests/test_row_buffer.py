@@ -0,0 +1,177 @@
+"""
+Tests for the webhook's BigQuery row buffer in src/webhook/row_buffer.py:
+retries, replay of segments left by an earlier process (including one
+torn mid-write), and segments set aside as .dead.
+
+Usage:
+    python -m pytest test_row_buffer.py
+"""
+
+import os
+import glob
+import json
+import time
+import shutil
+import tempfile
+
+from row_buffer import MAX_SEGMENT_ATTEMPTS, STALE_SECONDS, RowBuffer
+
+TABLE = 'project.dataset.table'
+
+
+class FakeInsert:
+    """
+    insert_rows stand-in that plays back a script of failures, then succeeds.
+
+    Each script step is an exception to raise or the set of row["n"] values
+    to reject in that call.
+    """
+
+    def __init__(self, script=()):
+        self.script = list(script)
+        self.calls = []
+        self.delivered = {}
+
+    def __call__(self, table_ref, rows, row_ids):
+        self.calls.append((table_ref, list(row_ids)))
+        step = self.script.pop(0) if self.script else None
+        if isinstance(step, Exception):
+            raise step
+        errors = []
+        for i, (row, row_id) in enumerate(zip(rows, row_ids)):
+            if step and row["n"] in step:
+                errors.append({"index": i, "errors": [{"reason": "backendError"}]})
+            else:
+                self.delivered[row_id] = row
+        return errors
+
+
+def files(directory, state):
+    return sorted(glob.glob(os.path.join(directory, f'*.{state}')))
+
+
+def test_retry_until_delivered():
+    directory = tempfile.mkdtemp()
+    try:
+        # Timeout, then rows 1 and 2 rejected, then row 2 rejected again, then success
+        insert = FakeInsert([TimeoutError("deadline exceeded"), {1, 2}, {2}])
+        buffer = RowBuffer(directory, insert, retry_delays=(0, 0, 0))
+        for i in range(4):
+            buffer.append(TABLE, {"n": i})
+
+        assert buffer.flush() == (4, 0)
+        assert sorted(row["n"] for row in insert.delivered.values()) == [0, 1, 2, 3]
+        # Retries resend only the failed rows, under the same insert ids
+        first_ids = insert.calls[0][1]
+        assert [row_ids for _, row_ids in insert.calls] == [first_ids, first_ids, first_ids[1:3], [first_ids[2]]]
+        assert not os.listdir(directory) and buffer.pending_rows() == 0
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_batches_and_segments():
+    directory = tempfile.mkdtemp()
+    try:
+        insert = FakeInsert()
+        buffer = RowBuffer(directory, insert, batch_size=2, segment_rows=3, retry_delays=())
+        for i in range(7):
+            buffer.append(TABLE if i % 2 else 'project.dataset.other', {"n": i})
+        # Full segments are closed as they fill; the last one stays open
+        assert len(files(directory, 'ready')) == 2 and len(files(directory, 'open')) == 1
+        assert buffer.pending_rows() == 7
+
+        assert buffer.flush() == (7, 0)
+        assert all(len(row_ids) <= 2 for _, row_ids in insert.calls)
+        assert {table for table, _ in insert.calls} == {TABLE, 'project.dataset.other'}
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_replays_leftover_segments():
+    directory = tempfile.mkdtemp()
+    try:
+        # A segment a crashed process never closed, one it closed but did not
+        # deliver, and one another live process is still writing
+        leftovers = {'crashed-a0.open': 3, 'closed-a0.ready': 2, 'live-a0.open': 1}
+        for name, rows in leftovers.items():
+            with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+                for i in range(rows):
+                    f.write(json.dumps({"table": TABLE, "row": {"n": i}, "id": f"{name}-{i}"}) + "\n")
+        old = time.time() - STALE_SECONDS - 1
+        os.utime(os.path.join(directory, 'crashed-a0.open'), (old, old))
+
+        insert = FakeInsert()
+        buffer = RowBuffer(directory, insert, retry_delays=())
+        assert buffer.pending_rows() == 6
+        assert buffer.flush() == (5, 0)
+        assert sorted(insert.delivered) == ['closed-a0.ready-0', 'closed-a0.ready-1', 'crashed-a0.open-0',
+                                            'crashed-a0.open-1', 'crashed-a0.open-2']
+        assert [os.path.basename(path) for path in os.listdir(directory)] == ['live-a0.open']
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_torn_last_line_is_set_aside():
+    directory = tempfile.mkdtemp()
+    try:
+        # A process that crashed mid-write left half of its last line
+        lines = [json.dumps({"table": TABLE, "row": {"n": i}, "id": f"torn-{i}"}) for i in range(3)]
+        with open(os.path.join(directory, 'torn-a0.ready'), 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines[:2]) + "\n" + lines[2][:20])
+
+        insert = FakeInsert()
+        buffer = RowBuffer(directory, insert, retry_delays=())
+        assert buffer.flush() == (2, 0)
+        assert sorted(insert.delivered) == ['torn-0', 'torn-1']
+        with open(os.path.join(directory, 'torn-a0.torn'), encoding='utf-8') as f:
+            assert f.read() == lines[2][:20] + "\n"
+        assert buffer.pending_rows() == 0 and buffer.flush() == (0, 0)
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_failing_rows_are_set_aside():
+    directory = tempfile.mkdtemp()
+    try:
+        # Row 1 is rejected on every attempt
+        insert = FakeInsert([{1}] * 100)
+        buffer = RowBuffer(directory, insert, retry_delays=(0,))
+        for i in range(3):
+            buffer.append(TABLE, {"n": i})
+
+        assert buffer.flush() == (2, 1)
+        ready = files(directory, 'ready')
+        assert len(ready) == 1 and ready[0].endswith('-a1.ready')
+        for attempt in range(2, MAX_SEGMENT_ATTEMPTS):
+            assert buffer.flush() == (0, 1)
+            assert files(directory, 'ready')[0].endswith(f'-a{attempt}.ready')
+        assert buffer.flush() == (0, 1)
+
+        dead = files(directory, 'dead')
+        assert len(dead) == 1 and dead[0].endswith(f'-a{MAX_SEGMENT_ATTEMPTS}.dead')
+        with open(dead[0], encoding='utf-8') as f:
+            assert [json.loads(line)["row"] for line in f] == [{"n": 1}]
+        # Dead segments are neither retried nor counted as pending
+        assert buffer.pending_rows() == 0
+        assert buffer.flush() == (0, 0)
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_drain_gives_up_after_timeout():
+    directory = tempfile.mkdtemp()
+    try:
+        def slow_insert(table_ref, rows, row_ids):
+            time.sleep(0.5)
+            return []
+
+        buffer = RowBuffer(directory, slow_insert, retry_delays=())
+        buffer.append(TABLE, {"n": 0})
+        assert buffer.drain(timeout=0.05) == (0, 1)
+        # The abandoned flush still finishes in the background
+        deadline = time.time() + 5
+        while buffer.pending_rows() and time.time() < deadline:
+            time.sleep(0.05)
+        assert buffer.pending_rows() == 0
+    finally:
+        shutil.rmtree(directory)
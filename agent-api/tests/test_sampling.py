@@ -0,0 +1,81 @@
+"""
+Tests for the stratified sampler in scripts/question_catalog.py.
+
+Usage:
+    python -m pytest test_sampling.py
+"""
+
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta
+
+from question_catalog import (add_sampling_arguments, allocate, extract_questions, latency_spreads,
+                              recently_tested, sample_from_args, stratified_sample, stratify)
+
+
+def strata_counts(sample):
+    return Counter((q[1], q[2]) for q in sample)
+
+
+def test_allocate_respects_capacity_and_floor():
+    capacity = {'a': 10, 'b': 2, 'c': 1}
+    counts = allocate(capacity, {'a': 1, 'b': 1, 'c': 100}, 9)
+    assert sum(counts.values()) == 9
+    assert counts == {'a': 6, 'b': 2, 'c': 1}
+    # Too small to give every stratum its floor: largest weights first
+    assert allocate(capacity, {'a': 5, 'b': 1, 'c': 1}, 2) == {'a': 2, 'b': 0, 'c': 0}
+    assert sum(allocate(capacity, {}, 50).values()) == 13
+
+
+def test_equal_allocation_covers_every_stratum_evenly():
+    questions = extract_questions()
+    strata = stratify(questions)
+    sample = stratified_sample(questions, 2 * len(strata), seed=3, allocation='equal')
+    assert set(strata_counts(sample).values()) == {2}
+    assert sample == stratified_sample(questions, 2 * len(strata), seed=3, allocation='equal')
+    assert sample != stratified_sample(questions, 2 * len(strata), seed=4, allocation='equal')
+
+
+def test_neyman_favours_high_variance_strata():
+    questions = extract_questions()
+    strata = list(stratify(questions))
+    noisy = strata[0]
+    spreads = dict.fromkeys(strata, 100.0)
+    spreads[noisy] = 5000.0
+    counts = strata_counts(stratified_sample(questions, 56, seed=1, allocation='neyman', spreads=spreads))
+    assert counts[noisy] == 5
+    assert all(counts[key] >= 1 for key in strata)
+    # Without latency history Neyman falls back to proportional
+    assert stratified_sample(questions, 56, seed=1, allocation='neyman') == stratified_sample(questions, 56, seed=1)
+
+
+def test_exclusion_and_history():
+    questions = extract_questions()
+    now = datetime(2026, 3, 1, 12, 0)
+    rows = [
+        {'question': questions[0][0], 'timestamp': (now - timedelta(days=1)).isoformat(), 'response_time_ms': '900'},
+        {'question': questions[1][0], 'timestamp': (now - timedelta(days=1)).isoformat(), 'response_time_ms': '100'},
+        {'question': questions[2][0], 'timestamp': (now - timedelta(days=30)).isoformat(), 'response_time_ms': 'n/a'},
+    ]
+    recent = recently_tested(rows, 7, now=now)
+    assert recent == {questions[0][0], questions[1][0]}
+    sample = stratified_sample(questions, 120, seed=5, exclude=recent)
+    assert len(sample) == 120 and not recent & {q[0] for q in sample}
+    assert len(stratified_sample(questions, 1000, exclude=recent)) == len(questions) - 2
+
+    # The first two questions share a stratum; the third has no usable timing
+    assert latency_spreads(rows, questions) == {(questions[0][1], questions[0][2]): 565.685424949238}
+
+
+def test_sampling_arguments():
+    parser = argparse.ArgumentParser()
+    add_sampling_arguments(parser, default_size=28)
+    args = parser.parse_args(['--seed', '9', '--allocation', 'equal'])
+    questions = extract_questions()
+    sample = sample_from_args(questions, args)
+    assert len(sample) == 28 and set(strata_counts(sample).values()) == {1}
+    try:
+        stratified_sample(questions, 10, allocation='random')
+    except ValueError:
+        return
+    raise AssertionError("unknown allocation was accepted")
@@ -0,0 +1,120 @@
+"""
+Tests for the scripted scenario engine in scripts/scenarios.py, using a
+scripted ask() in place of the agent, and a check that scenarios.json loads.
+
+Usage:
+    python -m pytest test_scenarios.py
+"""
+
+import os
+
+from agent_response import AgentResponse
+from scenarios import (Scenario, ScenarioError, depth_trend, latency_by, load_scenarios, run_scenario,
+                       scenario_session_id)
+from sessions import DIALOGFLOW_SESSION_ID_PATTERN
+
+SCENARIOS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios.json')
+
+ANSWER = "Create an explore per subject area and join the views with many_to_one relationships."
+
+
+def replying(answers):
+    """ask() that answers from a {message: answer} dict (default ANSWER) and records what was sent."""
+    sent = []
+
+    def ask(text):
+        sent.append(text)
+        return 200, AgentResponse(messages=[answers.get(text, ANSWER)])
+
+    ask.sent = sent
+    return ask
+
+
+def scenario(turns):
+    return Scenario.from_dict({'id': 'test', 'turns': turns})
+
+
+def test_plays_turns_in_order():
+    ask = replying({})
+    rows = run_scenario(scenario([{'say': 'one'}, {'say': 'two'}, {'say': 'three'}]), ask)
+    assert ask.sent == ['one', 'two', 'three']
+    assert [row['depth'] for row in rows] == [1, 2, 3]
+    assert {row['session_turns'] for row in rows} == {3}
+    assert [row['step'] for row in rows] == ['1', '2', '3']
+
+
+def test_branch_say_goto_and_end():
+    ask = replying({'one': "Which warehouse are you using?", 'jump': "Sure."})
+    rows = run_scenario(scenario([
+        {'say': 'one', 'branches': [{'match': 'which warehouse', 'say': 'BigQuery.'}]},
+        {'say': 'jump', 'branches': [{'match': '^sure', 'goto': 'last'}]},
+        {'say': 'skipped'},
+        {'id': 'last', 'say': 'last', 'branches': [{'outcome': 'answered', 'end': True}]},
+        {'say': 'never'},
+    ]), ask)
+    assert ask.sent == ['one', 'BigQuery.', 'jump', 'last']
+    assert [row['kind'] for row in rows] == ['script', 'branch', 'script', 'script']
+
+
+def test_goto_loops_stop_at_max_messages():
+    ask = replying({})
+    rows = run_scenario(scenario([
+        {'id': 'again', 'say': 'again', 'branches': [{'outcome': 'answered', 'goto': 'again'}]},
+    ]), ask, max_messages=5)
+    assert len(rows) == 5
+
+
+def test_follow_ups_answer_handoffs():
+    ask = replying({'one': "I'll route you to Isabella, our dbt expert."})
+    rows = run_scenario(scenario([{'say': 'one'}, {'say': 'two'}]), ask, follow_up_turns=3)
+    assert [row['kind'] for row in rows] == ['script', 'follow_up', 'script']
+    assert [row['outcome'] for row in rows] == ['handoff', 'answered', 'answered']
+
+
+def test_error_ends_scenario():
+    def ask(text):
+        return 500, AgentResponse(messages=["Agent API call failed with status code 500: internal"])
+    rows = run_scenario(scenario([{'say': 'one'}, {'say': 'two'}]), ask)
+    assert len(rows) == 1
+    assert rows[0]['outcome'] == 'error'
+
+
+def test_invalid_scenarios_are_rejected():
+    for turns in ([{'say': 'one', 'branches': [{'goto': 'x', 'match': 'a'}]}],
+                  [{'say': 'one', 'branches': [{'say': 'no condition'}]}],
+                  [{'text': 'missing say'}]):
+        try:
+            scenario(turns)
+        except ScenarioError:
+            continue
+        raise AssertionError(f"accepted {turns}")
+
+
+def test_latency_by_depth_and_trend():
+    rows = [{'depth': depth, 'session_turns': 3, 'latency_ms': 1000 + 100 * depth} for depth in (1, 2, 3)] * 2
+    assert [(value, count, mean) for value, count, mean, _, _ in latency_by(rows, 'depth')] == \
+        [(1, 2, 1100), (2, 2, 1200), (3, 2, 1300)]
+    slope, correlation = depth_trend(rows)
+    assert round(slope) == 100 and round(correlation, 6) == 1
+    assert depth_trend(rows[:1]) is None
+
+    # A noisy fit, checked against the closed-form values
+    rows = [{'depth': d, 'latency_ms': l} for d, l in ((1, 900), (2, 1300), (3, 1100), (4, 1500))]
+    slope, correlation = depth_trend(rows)
+    assert abs(slope - 160) < 1e-9 and abs(correlation - 0.8) < 1e-9
+
+
+def test_scenario_file_loads():
+    scenarios = load_scenarios(SCENARIOS_FILE)
+    assert scenarios
+    assert all(len(s.turns) >= 2 for s in scenarios)
+
+
+def test_session_ids_fit_dialogflow():
+    scenario_ids = [s.id for s in load_scenarios(SCENARIOS_FILE)] + ['x' * 60, 'odd id/with spaces']
+    for scenario_id in scenario_ids:
+        for run in (1, 10, 1000):
+            session_id = scenario_session_id(scenario_id, run)
+            assert DIALOGFLOW_SESSION_ID_PATTERN.match(session_id), session_id
+            assert session_id.endswith(f"-{run}-" + session_id[-8:])
+    assert scenario_session_id('redshift-migration', 1) != scenario_session_id('redshift-migration', 1)
@@ -0,0 +1,126 @@
+"""
+Tests for the webhook's scheduled question selection in
+src/webhook/scheduler.py, with a fixed clock and made-up history.
+
+Usage:
+    python -m pytest test_scheduler.py
+"""
+
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+from scheduler import DEFAULT_MIN_STABILITY, QuestionState, StalenessPolicy, create_policy, select_for_run
+
+NOW = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+VERSION = 'v2'
+STEADY = ["Explores join views in LookML.", "Explores join views in LookML."]
+CHANGING = ["Use a PDT.", "Partition the table by date and cluster it."]
+REWORDED = [
+    "A persistent derived table (PDT) is a derived table that Looker writes to a scratch schema in your "
+    "database and rebuilds on a schedule set by a datagroup.",
+    "Looker writes a persistent derived table (PDT) to a scratch schema in your database. It is rebuilt on "
+    "the schedule you set with a datagroup or sql_trigger_value.",
+    "In short, a PDT is a derived table that Looker persists to a scratch schema in your database, "
+    "rebuilding it when its datagroup triggers.",
+]
+
+
+def state(question, hours_ago, version=VERSION, answers=STEADY):
+    return QuestionState(question, NOW - timedelta(hours=hours_ago), version, list(answers))
+
+
+def history():
+    """History with one question per reason except new (never asked), plus two still current."""
+    return {
+        'old version': state('old version', 1, version='v1'),
+        'unstable': state('unstable', 7, answers=CHANGING),
+        'unstable recently asked': state('unstable recently asked', 1, answers=CHANGING),
+        'stale': state('stale', 30),
+        'staler': state('staler', 50),
+        'fresh': state('fresh', 2),
+    }
+
+
+QUESTIONS = ['fresh', 'stale', 'unstable', 'never asked', 'old version', 'staler', 'unstable recently asked']
+
+
+def with_env(**values):
+    def wrap(test):
+        def run():
+            saved = {name: os.environ.get(name) for name in values}
+            os.environ.update(values)
+            try:
+                test()
+            finally:
+                for name, value in saved.items():
+                    if value is None:
+                        os.environ.pop(name, None)
+                    else:
+                        os.environ[name] = value
+        run.__name__ = test.__name__
+        return run
+    return wrap
+
+
+def test_reasons():
+    policy = StalenessPolicy(max_age_hours=24)
+    states = history()
+    reasons = {question: policy.reason(states.get(question), VERSION, NOW) for question in QUESTIONS}
+    assert reasons == {
+        'fresh': None,
+        'stale': 'stale',
+        'unstable': 'unstable',
+        'never asked': 'new',
+        'old version': 'agent_changed',
+        'staler': 'stale',
+        'unstable recently asked': None,
+    }
+    # Without a known agent version, version changes are not a reason
+    assert policy.reason(states['old version'], None, NOW) is None
+    # Reworded free-text answers are not unstable
+    assert state('reworded', 7, answers=REWORDED).stability > DEFAULT_MIN_STABILITY
+    assert policy.reason(state('reworded', 7, answers=REWORDED), VERSION, NOW) is None
+
+
+def test_priority_and_budget():
+    policy = StalenessPolicy(budget=10)
+    selected = policy.select(QUESTIONS, history(), VERSION, now=NOW)
+    assert selected == [('never asked', 'new'), ('old version', 'agent_changed'), ('unstable', 'unstable'),
+                        ('staler', 'stale'), ('stale', 'stale')]
+    assert StalenessPolicy(budget=2).select(QUESTIONS, history(), VERSION, now=NOW) == selected[:2]
+    # Nothing is due right after everything was asked
+    asked = {question: state(question, 0) for question in QUESTIONS}
+    assert policy.select(QUESTIONS, asked, VERSION, now=NOW) == []
+
+
+def test_weighted_selection_is_seeded():
+    policy = StalenessPolicy(budget=3)
+    questions = [f"q{i}" for i in range(20)]
+    states = {question: state(question, 30 + i) for i, question in enumerate(questions)}
+    weight = lambda question: 0 if question == 'q19' else 1 + int(question[1:]) % 3
+
+    first = policy.select(questions, states, VERSION, now=NOW, weight=weight, rng=random.Random(7))
+    again = policy.select(questions, states, VERSION, now=NOW, weight=weight, rng=random.Random(7))
+    assert first == again and len(first) == 3
+    assert all(reason == 'stale' for _, reason in first)
+    # A zero weight is never drawn
+    for seed in range(50):
+        drawn = policy.select(questions, states, VERSION, now=NOW, weight=weight, rng=random.Random(seed))
+        assert 'q19' not in [question for question, _ in drawn]
+
+
+@with_env(SCHEDULE_BUDGET='3', SCHEDULE_MAX_AGE_HOURS='40', SCHEDULE_MIN_STABILITY='0.2')
+def test_schedule_policy():
+    policy = create_policy()
+    assert policy.budget == 3 and policy.max_age == timedelta(hours=40)
+
+    # SCHEDULE_POLICY=stale: only what is due under the configured ages; with a
+    # 40h maximum age, 'stale' (30h) and 'unstable' (7h < 40h / 4) are not
+    selected = select_for_run(QUESTIONS, history(), VERSION, 'stale', now=NOW)
+    assert selected == [('never asked', 'new'), ('old version', 'agent_changed'), ('staler', 'stale')]
+
+    # SCHEDULE_POLICY=all and ?all=true ask every question, in set order, ignoring the budget
+    everything = [(question, 'all') for question in QUESTIONS]
+    assert select_for_run(QUESTIONS, history(), VERSION, 'all', now=NOW) == everything
+    assert select_for_run(QUESTIONS, history(), VERSION, 'stale', ask_all=True, now=NOW) == everything
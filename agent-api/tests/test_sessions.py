@@ -0,0 +1,109 @@
+"""
+Tests for the API's session manager in src/api/sessions.py: Dialogflow
+session ID length, LRU and TTL eviction, and rollover after Dialogflow's
+idle timeout.
+
+Usage:
+    python -m pytest test_sessions.py
+"""
+
+import sessions
+from sessions import (DIALOGFLOW_SESSION_TTL, MAX_DIALOGFLOW_SESSION_ID, MemorySessionBackend, SessionManager)
+
+
+class FakeClock:
+    """Stands in for the time module inside sessions.py."""
+
+    def __init__(self, now=1000000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def with_clock(test):
+    def run():
+        real, sessions.time = sessions.time, FakeClock()
+        try:
+            test(sessions.time)
+        finally:
+            sessions.time = real
+    run.__name__ = test.__name__
+    return run
+
+
+def test_dialogflow_session_ids_fit():
+    manager = SessionManager(MemorySessionBackend())
+    record, _ = manager.begin_turn()
+    assert len(record.conversation_id) <= MAX_DIALOGFLOW_SESSION_ID
+    assert record.dialogflow_session_id == record.conversation_id
+
+    # Short, safe client IDs are kept; anything else is hashed
+    record, _ = manager.begin_turn("client-42")
+    assert record.dialogflow_session_id == "client-42"
+    for client_id in ("x" * 37, "user@example.com/chat", "über-session"):
+        record, _ = manager.begin_turn(client_id)
+        assert record.conversation_id == client_id
+        assert len(record.dialogflow_session_id) == 32
+        assert record.dialogflow_session_id == manager.begin_turn(client_id)[0].dialogflow_session_id
+
+
+@with_clock
+def test_rollover_starts_short_session_with_context(clock):
+    manager = SessionManager(MemorySessionBackend())
+    conversation_id = "c" * 36
+    record, params = manager.begin_turn(conversation_id)
+    manager.end_turn(record, "What is LookML?", "A modeling language.")
+
+    clock.now += 60
+    record, params = manager.begin_turn(conversation_id)
+    assert params is None and record.dialogflow_session_id == conversation_id
+
+    clock.now += DIALOGFLOW_SESSION_TTL + 1
+    record, params = manager.begin_turn(conversation_id)
+    assert record.conversation_id == conversation_id
+    assert record.dialogflow_session_id != conversation_id
+    assert len(record.dialogflow_session_id) <= MAX_DIALOGFLOW_SESSION_ID
+    assert "What is LookML?" in params['parameters']['conversation_history']
+
+
+@with_clock
+def test_memory_backend_ttl_and_lru(clock):
+    backend = MemorySessionBackend(max_sessions=2, ttl=100)
+    manager = SessionManager(backend)
+    for conversation_id in ("a", "b"):
+        record, _ = manager.begin_turn(conversation_id)
+        manager.end_turn(record, "q", "a")
+
+    # Reading "a" makes "b" the least recently used
+    assert backend.get("a") is not None
+    record, _ = manager.begin_turn("c")
+    manager.end_turn(record, "q", "a")
+    assert backend.get("b") is None and len(backend) == 2
+
+    clock.now += 101
+    assert backend.get("a") is None and backend.get("c") is None
+
+
+def test_history_is_compacted():
+    manager = SessionManager(MemorySessionBackend(), max_history_turns=2)
+    record, _ = manager.begin_turn("compact")
+    for i in range(5):
+        manager.end_turn(record, f"question {i}", f"answer {i}")
+    assert len(record.history) == 2 and record.turn_count == 5
+    assert "question 0" in record.summary and "question 4" in manager.context_text(record)
+
+
+def test_history_is_sent_after_turns_dialogflow_missed():
+    manager = SessionManager(MemorySessionBackend())
+    record, _ = manager.begin_turn("fallback")
+    manager.end_turn(record, "What is a PDT?", "A persisted derived table.", answered_by_agent=False)
+
+    # Dialogflow did not see turn 1, so turn 2 carries it, once
+    record, params = manager.begin_turn("fallback")
+    assert record.missed_turns == 1 and record.dialogflow_session_id == "fallback"
+    assert "What is a PDT?" in params['parameters']['conversation_history']
+    manager.end_turn(record, "How do I rebuild one?", "Use the PDT panel.")
+    record, params = manager.begin_turn("fallback")
+    assert params is None and record.missed_turns == 0
+    assert SessionManager(MemorySessionBackend()).begin_turn()[0].to_dict()['missed_turns'] == 0
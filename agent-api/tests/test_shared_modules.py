@@ -0,0 +1,35 @@
+"""
+Check that every service's copy of a shared module matches its source
+(see scripts/sync_shared_modules.py).
+
+Usage:
+    python -m pytest test_shared_modules.py
+"""
+
+import os
+import shutil
+import tempfile
+
+from sync_shared_modules import SRC_DIR, copies, stale_copies, sync
+
+
+def test_copies_match_sources():
+    stale = stale_copies()
+    assert not stale, f"Stale copies (run scripts/sync_shared_modules.py): {stale}"
+
+
+def test_sync_rewrites_stale_copy():
+    directory = tempfile.mkdtemp()
+    try:
+        src_dir = os.path.join(directory, 'src')
+        for service in ('api', 'webhook', 'dashboard'):
+            shutil.copytree(os.path.join(SRC_DIR, service), os.path.join(src_dir, service),
+                            ignore=shutil.ignore_patterns('__pycache__'))
+        source, copy = next(copies(src_dir))
+        with open(copy, 'a') as f:
+            f.write("# local edit\n")
+        assert stale_copies(src_dir) == [copy]
+        assert sync(src_dir) == [copy]
+        assert stale_copies(src_dir) == []
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,84 @@
+"""
+Tests for the API's startup warm-up (src/api/warmup.py) and the /ready
+probe, with a fake transport in place of Dialogflow.
+
+Usage:
+    python -m pytest test_warmup.py
+"""
+
+import time
+import threading
+
+from warmup import FAILED, PENDING, READY, WarmupState, run_warmup, start_warmup
+
+
+class FakeTransport:
+    """Dialogflow transport stand-in; connect() fails the first `failures` times."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+
+    def refresh_token(self):
+        self.calls.append('refresh_token')
+
+    def connect(self):
+        self.calls.append('connect')
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('connection refused')
+
+    def detect_intent(self, session_id, question):
+        self.calls.append(('detect_intent', question))
+
+
+def test_import_does_not_warm_up(agent_api):
+    # The agent_api fixture also checks that no warm-up thread was started
+    assert agent_api.WARMUP_ON_START is False
+    assert agent_api.warmup_state.status == PENDING and agent_api.warmup_state.attempts == 0
+    assert not any(thread.name == 'agent-warmup' for thread in threading.enumerate())
+
+
+def test_run_warmup_records_steps():
+    state = WarmupState()
+    transport = FakeTransport()
+    assert run_warmup(state, lambda: transport, canary=True)
+    assert state.ready and state.ready_at and state.error is None
+    assert transport.calls == ['refresh_token', 'connect', ('detect_intent', 'What is Looker?')]
+    assert set(state.to_dict()['steps_ms']) == {'load_credentials', 'mint_token', 'connect', 'canary'}
+
+    state = WarmupState()
+    assert not run_warmup(state, lambda: FakeTransport(failures=1))
+    assert state.status == FAILED and state.error == 'connection refused' and state.attempts == 1
+
+
+def test_start_warmup_retries_until_ready():
+    state = WarmupState()
+    transport = FakeTransport(failures=2)
+    thread = start_warmup(state, lambda: transport, retry_seconds=0.01)
+    thread.join(5)
+    assert not thread.is_alive() and state.ready and state.attempts == 3
+
+
+def test_ready_endpoint_follows_warmup(agent_api, monkeypatch):
+    client = agent_api.app.test_client()
+    # With warm-up off the server is ready at once
+    assert client.get('/ready').status_code == 200
+    assert client.get('/').get_json()['ready'] is True
+
+    monkeypatch.setattr(agent_api, 'WARMUP_ON_START', True)
+    monkeypatch.setattr(agent_api, 'warmup_state', WarmupState())
+    response = client.get('/ready')
+    assert response.status_code == 503 and response.get_json()['status'] == PENDING
+    assert client.get('/').get_json()['ready'] is False
+
+    transport = FakeTransport(failures=1)
+    run_warmup(agent_api.warmup_state, lambda: transport)
+    response = client.get('/ready')
+    assert response.status_code == 503 and response.get_json()['status'] == FAILED
+    assert response.get_json()['error'] == 'connection refused'
+
+    run_warmup(agent_api.warmup_state, lambda: transport)
+    response = client.get('/ready')
+    assert response.status_code == 200 and response.get_json()['status'] == READY
+    assert response.get_json()['attempts'] == 2 and response.get_json()['ready_at'] <= time.time()
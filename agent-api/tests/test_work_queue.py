@@ -0,0 +1,174 @@
+"""
+Tests for the coordinator/worker queue in scripts/work_queue.py and the
+stratified sampler in scripts/question_catalog.py. The end-to-end test runs
+a coordinator and worker threads over loopback with a fake task executor.
+
+Usage:
+    python -m pytest test_work_queue.py
+"""
+
+import time
+import threading
+from collections import Counter
+
+from question_catalog import extract_questions, stratified_sample, stratify
+from work_queue import Coordinator, WorkQueue, WorkerClient, run_worker
+
+
+def make_tasks(count):
+    return [{'task_id': i, 'question': f"question {i}"} for i in range(count)]
+
+
+def test_workers_take_own_shard_then_steal():
+    queue = WorkQueue(make_tasks(6), shards=2)
+    queue.register('a')
+    queue.register('b')
+    assert [queue.take('a')['task_id'] for _ in range(3)] == [0, 2, 4]
+    # a's shard is empty, so it steals from the back of b's
+    assert queue.take('a')['task_id'] == 5
+    assert queue.steals == 1
+    assert queue.take('b')['task_id'] == 1
+
+
+def test_failed_and_released_tasks_are_retried_first():
+    queue = WorkQueue(make_tasks(4), shards=1)
+    first = queue.take('a')
+    queue.fail('a', first['task_id'], "boom")
+    retried = queue.take('b')
+    assert retried['task_id'] == first['task_id'] and retried['attempt'] == 2
+
+    queue.release('b')
+    assert queue.take('c')['task_id'] == first['task_id']
+
+
+def test_expired_leases_are_requeued_and_duplicates_dropped():
+    queue = WorkQueue(make_tasks(1), shards=1, lease_seconds=10)
+    queue.take('slow', now=0)
+    queue.expire(now=11)
+    queue.take('fast', now=11)
+    assert queue.complete('fast', 0) is True
+    assert queue.complete('slow', 0) is False
+    assert queue.finished
+
+
+def test_unknown_task_ids_are_rejected():
+    queue = WorkQueue(make_tasks(2), shards=1)
+    assert queue.complete('bogus', 99) is None and queue.complete('bogus', '0') is None
+    assert queue.completed == set() and not queue.finished
+
+    rows = []
+    coordinator = Coordinator(queue, rows.append, token='secret')
+    host, port = coordinator.start()
+    try:
+        client = WorkerClient(host, port, 'w1', token='secret')
+        assert client.call({'op': 'result', 'task_id': 99, 'row': {}}) == {'error': "unknown task: 99"}
+        assert client.call({'op': 'take'})['task']['task_id'] == 0
+        client.close()
+    finally:
+        coordinator.stop()
+    assert rows == [] and not queue.finished
+
+
+def test_tasks_are_abandoned_after_max_attempts():
+    queue = WorkQueue(make_tasks(1), shards=1, max_attempts=2)
+    for worker in ('a', 'b'):
+        queue.take(worker)
+        queue.fail(worker, 0, f"{worker} failed")
+    assert queue.take('c') is None
+    assert queue.abandoned == {0: "b failed"}
+    assert queue.finished
+
+
+def test_late_result_replaces_abandonment():
+    queue = WorkQueue(make_tasks(1), shards=1, max_attempts=1, lease_seconds=10)
+    queue.take('slow', now=0)
+    queue.expire(now=11)
+    assert queue.abandoned == {0: "lease expired"}
+    # The slow worker finishes after all: its result is kept, once
+    assert queue.complete('slow', 0) is True
+    assert queue.abandoned == {} and queue.completed == {0}
+    assert queue.complete('slow', 0) is False
+    assert queue.finished
+
+
+def test_coordinator_with_crashing_worker():
+    queue = WorkQueue(make_tasks(30), shards=3)
+    rows = []
+    coordinator = Coordinator(queue, rows.append, token='secret')
+    host, port = coordinator.start()
+    try:
+        # A worker that takes a task and dies without reporting it
+        crashing = WorkerClient(host, port, 'crashing', token='secret')
+        lost = crashing.call({'op': 'take'})['task']
+        crashing.close()
+
+        def execute(task):
+            if task['task_id'] == 7 and task['attempt'] == 1:
+                raise RuntimeError("transient")
+            return {'task_id': task['task_id'], 'attempt': task['attempt']}
+
+        threads = [threading.Thread(target=lambda name=name: run_worker(
+            WorkerClient(host, port, name, token='secret'), execute)) for name in ('w1', 'w2', 'w3')]
+        for thread in threads:
+            thread.start()
+        assert queue.wait(10)
+        for thread in threads:
+            thread.join(10)
+    finally:
+        coordinator.stop()
+
+    assert sorted(row['task_id'] for row in rows) == list(range(30))
+    by_id = {row['task_id']: row for row in rows}
+    assert by_id[lost['task_id']]['attempt'] == 2
+    assert by_id[7]['attempt'] == 2
+
+
+def test_coordinator_rejects_wrong_token():
+    coordinator = Coordinator(WorkQueue(make_tasks(1)), lambda row: None, token='secret')
+    host, port = coordinator.start()
+    try:
+        WorkerClient(host, port, 'intruder', token='wrong')
+    except ConnectionError:
+        return
+    finally:
+        coordinator.stop()
+    raise AssertionError("worker with the wrong token was accepted")
+
+
+def test_coordinator_rejects_duplicate_worker_names():
+    queue = WorkQueue(make_tasks(2), shards=1)
+    coordinator = Coordinator(queue, lambda row: None, token='secret')
+    host, port = coordinator.start()
+    try:
+        first = WorkerClient(host, port, 'w1', token='secret')
+        task = first.call({'op': 'take'})['task']
+        try:
+            WorkerClient(host, port, 'w1', token='secret')
+            raise AssertionError("second worker named w1 was accepted")
+        except ConnectionError as e:
+            assert 'already connected' in str(e)
+        # The refused connection did not release the first worker's lease
+        assert queue.leases[task['task_id']][0] == 'w1'
+        assert queue.stats()['leased'] == 1 and not queue.retry
+
+        # Once the first connection has closed, the name can be used again
+        first.close()
+        for _ in range(100):
+            if 'w1' not in queue.connected:
+                break
+            time.sleep(0.05)
+        again = WorkerClient(host, port, 'w1', token='secret')
+        assert again.call({'op': 'take'})['task']['task_id'] == task['task_id']
+        again.close()
+    finally:
+        coordinator.stop()
+
+
+def test_stratified_sample_is_proportional_and_reproducible():
+    questions = extract_questions()
+    strata = stratify(questions)
+    sample = stratified_sample(questions, 40, seed=7)
+    assert len(sample) == 40
+    assert sample == stratified_sample(questions, 40, seed=7)
+    assert set(Counter((q[1], q[2]) for q in sample)) == set(strata)
+    assert len(stratified_sample(questions, 10, seed=1)) == 10
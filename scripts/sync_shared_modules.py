@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Copy the modules shared between services into each service directory
+
+Each service under src/ deploys on its own (the API as a container, the
+webhook as a Cloud Function with --source=., the dashboard with
+streamlit), so a module they all need has to be inside every service
+directory. Each shared module is edited in one place, its source service,
+and copied from there:
+
+- src/api/outcomes.py       -> src/webhook, src/dashboard
+- src/api/agent_response.py -> src/webhook
+
+Shared config files are copied the same way from config/:
+
+- config/playbooks/*.md     -> src/api/playbooks (the Gemini fallback's
+  system instructions; the API image only contains src/api)
+
+src/webhook/deploy.sh and src/dashboard/run_dashboard.sh run this before
+deploying or starting; agent-api/tests/test_shared_modules.py runs the
+check and fails when a copy differs from its source.
+
+Usage:
+    python sync_shared_modules.py           # write the copies
+    python sync_shared_modules.py --check   # exit 1 if any copy is stale
+"""
+
+import os
+import sys
+import shutil
+import filecmp
+import argparse
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+CONFIG_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+
+# (source service, module) -> services that get a copy
+SHARED_MODULES = {
+    ('api', 'outcomes.py'): ('webhook', 'dashboard'),
+    ('api', 'agent_response.py'): ('webhook',),
+}
+
+# config directory -> services that get a copy of its files
+SHARED_CONFIG = {
+    'playbooks': ('api',),
+}
+
+
+def copies(src_dir=SRC_DIR, config_dir=CONFIG_DIR):
+    """(source path, copy path) for every shared module and config file copy."""
+    for (service, module), targets in SHARED_MODULES.items():
+        for target in targets:
+            yield os.path.join(src_dir, service, module), os.path.join(src_dir, target, module)
+    for name, targets in SHARED_CONFIG.items():
+        for file_name in sorted(os.listdir(os.path.join(config_dir, name))):
+            for target in targets:
+                yield os.path.join(config_dir, name, file_name), os.path.join(src_dir, target, name, file_name)
+
+
+def stale_copies(src_dir=SRC_DIR):
+    """Copy paths that are missing or differ from their source."""
+    return [copy for source, copy in copies(src_dir)
+            if not os.path.exists(copy) or not filecmp.cmp(source, copy, shallow=False)]
+
+
+def sync(src_dir=SRC_DIR):
+    """Write every stale copy; returns the paths written."""
+    stale = stale_copies(src_dir)
+    for source, copy in copies(src_dir):
+        if copy in stale:
+            os.makedirs(os.path.dirname(copy), exist_ok=True)
+            shutil.copyfile(source, copy)
+            root = os.path.dirname(src_dir)
+            print(f"Copied {os.path.relpath(source, root)} -> {os.path.relpath(copy, root)}")
+    return stale
+
+
+def main():
+    """Main function to sync or check the shared modules."""
+    parser = argparse.ArgumentParser(description="Copy shared modules into each service directory")
+    parser.add_argument("--check", action="store_true",
+                        help="Only report stale copies; exit 1 if there are any")
+    args = parser.parse_args()
+
+    if args.check:
+        stale = stale_copies()
+        for copy in stale:
+            print(f"Stale copy: {os.path.relpath(copy, SRC_DIR)} (run scripts/sync_shared_modules.py)")
+        return 1 if stale else 0
+
+    if not sync():
+        print("Shared modules are up to date.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,19 +8,28 @@ and receive responses. It handles authentication, session management, and respon
 import os
 import json
 import sys
-import requests
 from datetime import datetime
 from flask import Flask, request, jsonify
-from google.oauth2 import service_account
-from google.auth.transport.requests import Request as AuthRequest
-from dotenv import load_dotenv
+
+from dialogflow_transport import get_transport
+from sessions import create_session_manager
+from jobs import JobManager, callback_hosts_from_env
+from warmup import WarmupState, start_warmup
+from domain_router import create_router, merge_query_params
+from faq import create_faq_store
+from backends import BackendError, create_backend_policy
+from outcomes import classify
 
 # Add project root to path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
 sys.path.append(project_root)
 
-# Load environment variables from .env file if it exists
-load_dotenv(os.path.join(project_root, '.env'))
+# Load environment variables from .env file if it exists. python-dotenv is
+# only imported when there is a file to load (deployed images have none).
+env_file = os.path.join(project_root, '.env')
+if os.path.exists(env_file):
+    from dotenv import load_dotenv
+    load_dotenv(env_file)
 
 app = Flask(__name__)
 
@@ -30,17 +39,145 @@ LOCATION = os.environ.get('LOCATION', 'us-central1')
 AGENT_ID = os.environ.get('AGENT_ID', 'fa0bd62b-3fc7-46c8-9d55-3a18d9812a70')
 CREDENTIALS_FILE = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS', 
                                  '/Users/dionedge/dev/creds/heuristicsai-9ad7dd8375bf.json')
+# Transport for detectIntent calls: "rest" (HTTPS/JSON) or "grpc" (HTTP/2/protobuf)
+DIALOGFLOW_TRANSPORT = os.environ.get('DIALOGFLOW_TRANSPORT', 'rest')
+
+# Warm credentials and connections before reporting ready on /ready
+WARMUP_ON_START = os.environ.get('WARMUP_ON_START', 'true').lower() == 'true'
+WARMUP_CANARY = os.environ.get('WARMUP_CANARY', 'false').lower() == 'true'
+
+# Conversation state (SESSION_BACKEND=memory|redis)
+session_manager = create_session_manager()
+warmup_state = WarmupState()
+
+# Vetted historical answers served without calling the agent (FAQ_ENABLED)
+faq_store = create_faq_store()
+
+# Local classifier that sends first-turn questions straight to a specialist playbook
+domain_router = create_router(f"projects/{PROJECT_ID}/locations/{LOCATION}/agents/{AGENT_ID}")
+
+def shared_transport():
+    """Return the process-wide Dialogflow transport."""
+    return get_transport(DIALOGFLOW_TRANSPORT, PROJECT_ID, LOCATION, AGENT_ID, CREDENTIALS_FILE)
+
+# Answer backends: Dialogflow first, direct Gemini when it is slow, failing
+# or over quota (ANSWER_BACKEND, FALLBACK_BACKEND)
+backend_policy = create_backend_policy(shared_transport, PROJECT_ID, LOCATION, CREDENTIALS_FILE)
 
 @app.route('/', methods=['GET'])
 def index():
     """Simple index endpoint to check if the service is running."""
     return jsonify({
         'status': 'online',
+        'ready': warmup_state.ready or not WARMUP_ON_START,
         'service': 'Vertex AI Agent API',
         'version': '1.0.0',
-        'usage': 'Send POST requests to /ask with a JSON body containing "question" field'
+        'usage': 'Send POST requests to /ask with a JSON body containing "question" field',
+        'async_usage': 'POST the same body to /jobs, then poll GET /jobs/<jobId> (DELETE cancels)'
     })
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 once credentials, token and connections are warm, 503 before."""
+    state = warmup_state.to_dict()
+    if warmup_state.ready or not WARMUP_ON_START:
+        return jsonify(state), 200
+    return jsonify(state), 503
+
+def answer_question(question, conversation_id=None, allow_faq=True):
+    """
+    Send a question to the agent within a tracked conversation.
+    
+    Shared by the synchronous /ask endpoint and the background job workers.
+    The first turn of a conversation is answered from the FAQ store when it
+    has a high-confidence match; the response's "source" says which path
+    produced the answer ("faq" or "live"), and live answers name the
+    "backend" that produced them ("dialogflow" or "gemini").
+    
+    Args:
+        question (str): The question to ask
+        conversation_id (str, optional): Client conversation ID to continue
+        allow_faq (bool): Whether the FAQ fast path may answer
+        
+    Returns:
+        tuple: (response dict, HTTP status code)
+    """
+    session, query_params = session_manager.begin_turn(conversation_id)
+    session_id = session.dialogflow_session_id
+    
+    if faq_store and allow_faq and session.turn_count == 0:
+        entry, score = faq_store.lookup(question)
+        if entry:
+            print(f"Answered from FAQ {faq_store.version} (entry {entry['id']}, score {score:.2f})")
+            # Dialogflow gets this exchange as history on the next turn
+            session_manager.end_turn(session, question, entry['answer'], answered_by_agent=False)
+            return {
+                'question': question,
+                'answer': entry['answer'],
+                'outcome': classify(entry['answer']),
+                'sessionId': session.conversation_id,
+                'turn': session.turn_count,
+                'source': 'faq',
+                'faqId': entry['id'],
+                'faqVersion': faq_store.version,
+                'matchScore': round(score, 3),
+                'timestamp': datetime.now().isoformat()
+            }, 200
+    
+    # Route new conversations directly to the predicted specialist
+    domain = None
+    if domain_router and session.turn_count == 0:
+        domain, confidence, route_params = domain_router.route(question)
+        query_params = merge_query_params(query_params, route_params)
+        if domain:
+            print(f"Routing hint: {domain} (confidence {confidence:.2f})")
+    
+    # Log the request
+    print(f"Received question: {question}")
+    print(f"Session ID: {session.conversation_id} (turn {session.turn_count + 1})")
+    
+    # Dialogflow keeps its own session state; the model backend gets the
+    # playbook for the question's domain and the conversation so far
+    model_domain = domain
+    if domain_router and session.turn_count > 0:
+        model_domain = domain_router.route(question)[0]
+    
+    try:
+        response_text, backend_name = backend_policy.answer(
+            question, session_id, query_params=query_params,
+            domain=model_domain, history=session_manager.context_text(session)
+        )
+    except BackendError as e:
+        return {
+            'error': str(e),
+            'details': e.details
+        }, e.status_code
+    
+    # Turns the fallback answered are sent to Dialogflow as history next time
+    session_manager.end_turn(session, question, response_text, answered_by_agent=backend_name == 'dialogflow')
+    
+    result = {
+        'question': question,
+        'answer': response_text,
+        'outcome': classify(response_text),
+        'sessionId': session.conversation_id,
+        'turn': session.turn_count,
+        'source': 'live',
+        'backend': backend_name,
+        'timestamp': datetime.now().isoformat()
+    }
+    if domain:
+        result['domainHint'] = domain
+    return result, 200
+
+# Background workers for /jobs
+job_manager = JobManager(
+    answer_question,
+    max_workers=int(os.environ.get('JOB_WORKERS', 4)),
+    result_ttl=float(os.environ.get('JOB_RESULT_TTL_SECONDS', 3600)),
+    callback_hosts=callback_hosts_from_env()
+)
+
 @app.route('/ask', methods=['POST'])
 def ask_agent():
     """
@@ -49,8 +186,12 @@ def ask_agent():
     Expected POST body:
     {
         "question": "Your question here",
-        "sessionId": "optional-session-id"  # Will be generated if not provided
+        "sessionId": "optional-session-id",  # Will be generated if not provided
+        "allowFaq": true                     # Optional; false always asks the agent
     }
+    
+    Reusing a sessionId continues the conversation; the server tracks turns
+    and maps it to a live Dialogflow session.
     """
     try:
         # Get request data
@@ -60,80 +201,9 @@ def ask_agent():
                 'error': 'Missing required parameter: question'
             }), 400
             
-        question = data['question']
-        session_id = data.get('sessionId', f"session-{datetime.now().timestamp()}")
-        
-        # Log the request
-        print(f"Received question: {question}")
-        print(f"Session ID: {session_id}")
-        
-        # Check if credentials file exists
-        if not os.path.exists(CREDENTIALS_FILE):
-            return jsonify({
-                'error': f"Credentials file not found: {CREDENTIALS_FILE}"
-            }), 500
-            
-        # Load credentials
-        credentials = service_account.Credentials.from_service_account_file(
-            CREDENTIALS_FILE, 
-            scopes=['https://www.googleapis.com/auth/cloud-platform']
-        )
-        
-        # Refresh credentials
-        auth_req = AuthRequest()
-        credentials.refresh(auth_req)
-        token = credentials.token
-        
-        # API URL for Dialogflow CX - using regional endpoint
-        # For regional agents, use the region-specific endpoint
-        api_url = f"https://{LOCATION}-dialogflow.googleapis.com/v3/projects/{PROJECT_ID}/locations/{LOCATION}/agents/{AGENT_ID}/sessions/{session_id}:detectIntent"
-        
-        # Request payload
-        payload = {
-            "queryInput": {
-                "text": {
-                    "text": question
-                },
-                "languageCode": "en"
-            }
-        }
-        
-        # Headers with authentication
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-        
-        print(f"Sending request to: {api_url}")
-        
-        # Make the API call
-        response = requests.post(api_url, headers=headers, json=payload)
-        
-        # Check response
-        if response.status_code != 200:
-            return jsonify({
-                'error': f"Agent API call failed with status code {response.status_code}",
-                'details': response.text
-            }), response.status_code
-            
-        # Parse response
-        response_data = response.json()
-        
-        # Extract response text
-        response_text = "No response from agent"
-        if "queryResult" in response_data and "responseMessages" in response_data["queryResult"]:
-            for msg in response_data["queryResult"]["responseMessages"]:
-                if "text" in msg and "text" in msg["text"]:
-                    response_text = "\n".join(msg["text"]["text"])
-                    break
-        
-        # Return the response
-        return jsonify({
-            'question': question,
-            'answer': response_text,
-            'sessionId': session_id,
-            'timestamp': datetime.now().isoformat()
-        })
+        result, status_code = answer_question(data['question'], data.get('sessionId'),
+                                              allow_faq=data.get('allowFaq', True))
+        return jsonify(result), status_code
         
     except Exception as e:
         print(f"Error processing request: {str(e)}")
@@ -141,6 +211,73 @@ def ask_agent():
             'error': f"An error occurred: {str(e)}"
         }), 500
 
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Submit a question for background processing.
+    
+    Expected POST body:
+    {
+        "question": "Your question here",
+        "sessionId": "optional-session-id",
+        "allowFaq": true,                    # Optional, as for /ask
+        "callbackUrl": "optional https URL on a JOB_CALLBACK_HOSTS host that receives the finished job as JSON"
+    }
+    
+    Returns 202 with a jobId to poll at /jobs/<jobId>, or 400 for a
+    callbackUrl that is not allowed.
+    """
+    data = request.get_json(silent=True)
+    if not data or 'question' not in data:
+        return jsonify({
+            'error': 'Missing required parameter: question'
+        }), 400
+    
+    try:
+        job = job_manager.submit(data['question'], data.get('sessionId'), data.get('callbackUrl'),
+                                 allow_faq=data.get('allowFaq', True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    response = job.to_dict()
+    response['statusUrl'] = f"/jobs/{job.job_id}"
+    return jsonify(response), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll a job; finished jobs include the same result body as /ask."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': f"Job not found or expired: {job_id}"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running job."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': f"Job not found or expired: {job_id}"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/sessions/<session_id>', methods=['GET'])
+def get_session(session_id):
+    """Return the server-side state of a conversation."""
+    session = session_manager.get(session_id)
+    if session is None:
+        return jsonify({'error': f"Session not found: {session_id}"}), 404
+    return jsonify(session.to_dict())
+
+@app.route('/sessions/<session_id>', methods=['DELETE'])
+def end_session(session_id):
+    """End a conversation and forget its state."""
+    if not session_manager.end(session_id):
+        return jsonify({'error': f"Session not found: {session_id}"}), 404
+    return jsonify({'sessionId': session_id, 'status': 'ended'})
+
+# Starts on import (gunicorn imports agent_api:app); tests import with
+# WARMUP_ON_START=false so no credentials are loaded (agent_api fixture in tests/conftest.py)
+if WARMUP_ON_START:
+    start_warmup(warmup_state, shared_transport, canary=WARMUP_CANARY)
+
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 8082))
     print(f"Starting Vertex AI Agent API on port {port}...")
@@ -148,4 +285,7 @@ if __name__ == '__main__':
     print(f"Location: {LOCATION}")
     print(f"Agent ID: {AGENT_ID}")
     print(f"Credentials file: {CREDENTIALS_FILE}")
+    print(f"Dialogflow transport: {DIALOGFLOW_TRANSPORT}")
+    print(f"Answer backend: {backend_policy.primary.name} "
+          f"(fallback: {backend_policy.fallback.name if backend_policy.fallback else 'none'})")
     app.run(host='0.0.0.0', port=port, debug=True) 
\ No newline at end of file
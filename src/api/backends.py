@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Answer backends for /ask and the fallback policy between them
+
+- DialogflowBackend: the Dialogflow CX agent via detectIntent (primary)
+- GeminiBackend: a direct Vertex AI Gemini generateContent call that uses the
+  matching playbook file as the system instruction. The playbooks are edited
+  in config/playbooks and copied into src/api/playbooks by
+  scripts/sync_shared_modules.py, so they ship in the API image.
+
+FallbackPolicy sends questions to the primary backend and switches to the
+fallback when the primary fails with a retryable error (quota, 5xx, timeout,
+connection failure) or has become slow. After a failure or a slow spell it
+keeps using the fallback for a cooldown period, then tries the primary again.
+Dialogflow does not see the turns the fallback answers, so the API sends it
+the conversation so far on its next turn (sessions.SessionManager).
+"""
+import os
+import time
+import threading
+
+DEFAULT_PLAYBOOKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'playbooks')
+
+# Router domain -> playbook file
+PLAYBOOK_FILES = {
+    'looker': 'Looker Playbook.md',
+    'looker_studio': 'Looker Studio Playbook.md',
+    'bigquery': 'BigQuery Playbook.md',
+    'dbt': 'dbt Playbook.md',
+    'omni': 'Omni Playbook.md',
+}
+GENERAL_PLAYBOOK = 'General Playbook.md'
+
+DEFAULT_GEMINI_MODEL = 'gemini-2.0-flash-001'
+DEFAULT_TIMEOUT = 60
+
+# Statuses worth retrying on another backend: quota, and server-side failures
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class BackendError(Exception):
+    """Raised by a backend that could not produce an answer."""
+
+    def __init__(self, backend, status_code, details, message=None, retryable=None):
+        super().__init__(message or f"{backend} backend failed with status code {status_code}")
+        self.backend = backend
+        self.status_code = status_code
+        self.details = details
+        # Configuration problems are not fixed by asking another backend
+        self.retryable = status_code in RETRYABLE_STATUS_CODES if retryable is None else retryable
+
+
+class DialogflowBackend:
+    """
+    The Dialogflow CX agent, reached through a detectIntent transport.
+
+    Args:
+        get_transport (callable): Returns the shared DetectIntentTransport
+        credentials_file (str): Service account file the transport loads
+    """
+
+    name = 'dialogflow'
+
+    def __init__(self, get_transport, credentials_file):
+        self.get_transport = get_transport
+        self.credentials_file = credentials_file
+
+    def answer(self, question, session_id, query_params=None, domain=None, history=None):
+        """
+        Returns:
+            str: The agent's answer
+
+        Raises:
+            BackendError: On a failed call
+        """
+        from dialogflow_transport import DetectIntentError
+        from agent_response import parse_response
+
+        if not os.path.exists(self.credentials_file):
+            raise BackendError(self.name, 500, None, retryable=False,
+                               message=f"Credentials file not found: {self.credentials_file}")
+
+        transport = self.get_transport()
+        print(f"Sending request via {transport.name} transport for session: {session_id}")
+        start = time.perf_counter()
+        try:
+            response_data = transport.detect_intent(session_id, question, query_params=query_params)
+        except DetectIntentError as e:
+            raise BackendError(self.name, e.status_code, e.details, message=str(e)) from e
+        except Exception as e:
+            # Timeouts and connection failures never reach an HTTP status
+            raise BackendError(self.name, 503, str(e)) from e
+
+        record = parse_response(response_data, request_ms=(time.perf_counter() - start) * 1000)
+        if record.playbook or record.current_page:
+            print(f"Matched {record.match_type} in playbook {record.playbook} / page {record.current_page}")
+        return record.text
+
+
+class GeminiBackend:
+    """
+    Direct Gemini generateContent calls with playbook context.
+
+    Args:
+        project_id (str): Google Cloud project ID
+        location (str): Vertex AI region
+        model (str): Gemini model name
+        credentials_file (str, optional): Service account file; None sends
+            unauthenticated requests (used against a local mock server)
+        api_base (str, optional): Override the Vertex AI base URL
+        playbooks_dir (str): Directory containing the playbook markdown files
+        timeout (float): Request timeout in seconds
+    """
+
+    name = 'gemini'
+
+    def __init__(self, project_id, location, model=DEFAULT_GEMINI_MODEL, credentials_file=None,
+                 api_base=None, playbooks_dir=DEFAULT_PLAYBOOKS_DIR, timeout=DEFAULT_TIMEOUT):
+        self.model = model
+        self.credentials_file = credentials_file
+        self.timeout = timeout
+        self.playbooks_dir = playbooks_dir
+        base = api_base or f"https://{location}-aiplatform.googleapis.com"
+        self.url = (f"{base.rstrip('/')}/v1/projects/{project_id}/locations/{location}"
+                    f"/publishers/google/models/{model}:generateContent")
+        self._session = None
+        self._lock = threading.Lock()
+        self._playbooks = {}
+
+    def session(self):
+        """Create the HTTP session on first use, so an idle fallback costs nothing."""
+        with self._lock:
+            if self._session is None:
+                if self.credentials_file:
+                    from google.auth.transport.requests import AuthorizedSession
+                    from dialogflow_transport import load_credentials
+                    self._session = AuthorizedSession(load_credentials(self.credentials_file))
+                else:
+                    import requests
+                    self._session = requests.Session()
+            return self._session
+
+    def playbook(self, domain):
+        """Return the playbook text for a domain, cached after the first read."""
+        file_name = PLAYBOOK_FILES.get(domain, GENERAL_PLAYBOOK)
+        if file_name not in self._playbooks:
+            path = os.path.join(self.playbooks_dir, file_name)
+            try:
+                with open(path) as f:
+                    self._playbooks[file_name] = f.read()
+            except OSError:
+                print(f"Playbook not found: {path}")
+                self._playbooks[file_name] = ""
+        return self._playbooks[file_name]
+
+    def build_request(self, question, domain=None, history=None):
+        """Build the generateContent body (see config/openapi/openapi.yaml)."""
+        instruction = self.playbook(domain)
+        if history:
+            instruction += "\n\n## Conversation so far\n" + history
+        body = {
+            "contents": [{"role": "user", "parts": [{"text": question}]}],
+            "generationConfig": {
+                "temperature": 0.2,
+                "topK": 40,
+                "topP": 0.95,
+                "maxOutputTokens": 2048
+            }
+        }
+        if instruction:
+            body["systemInstruction"] = {"parts": [{"text": instruction}]}
+        return body
+
+    def answer(self, question, session_id, query_params=None, domain=None, history=None):
+        """
+        Returns:
+            str: The model's answer
+
+        Raises:
+            BackendError: On a failed call
+        """
+        import requests
+
+        try:
+            session = self.session()
+        except Exception as e:
+            raise BackendError(self.name, 500, str(e), retryable=False) from e
+
+        try:
+            response = session.post(self.url, json=self.build_request(question, domain, history),
+                                    timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            raise BackendError(self.name, 503, str(e)) from e
+
+        if response.status_code != 200:
+            raise BackendError(self.name, response.status_code, response.text,
+                               message=f"Model API call failed with status code {response.status_code}")
+
+        data = response.json()
+        for candidate in data.get('candidates', []):
+            parts = candidate.get('content', {}).get('parts', [])
+            text = "".join(part.get('text', '') for part in parts)
+            if text:
+                return text
+        return "No response from model"
+
+
+class FallbackPolicy:
+    """
+    Chooses between a primary and a fallback backend.
+
+    Args:
+        primary: Backend used by default
+        fallback: Backend used when the primary is failing or slow (or None)
+        slow_threshold_ms (float): Smoothed primary latency above which the
+            primary is treated as slow
+        cooldown (float): Seconds to stay on the fallback after a failure or
+            slow spell before trying the primary again
+        smoothing (float): Weight of the newest sample in the latency average
+    """
+
+    def __init__(self, primary, fallback=None, slow_threshold_ms=15000, cooldown=60, smoothing=0.3):
+        self.primary = primary
+        self.fallback = fallback
+        self.slow_threshold_ms = slow_threshold_ms
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self.avg_latency_ms = None
+        self.fallback_until = 0
+        self._lock = threading.Lock()
+
+    def _record_primary(self, latency_ms):
+        with self._lock:
+            if self.avg_latency_ms is None:
+                self.avg_latency_ms = latency_ms
+            else:
+                self.avg_latency_ms += self.smoothing * (latency_ms - self.avg_latency_ms)
+            if self.avg_latency_ms > self.slow_threshold_ms:
+                self.fallback_until = time.time() + self.cooldown
+                # Start fresh once the cooldown ends so one slow spell is not remembered forever
+                self.avg_latency_ms = None
+
+    def _trip(self):
+        with self._lock:
+            self.fallback_until = time.time() + self.cooldown
+
+    def answer(self, question, session_id, query_params=None, domain=None, history=None):
+        """
+        Answer with whichever backend the policy selects.
+
+        Returns:
+            tuple: (answer text, name of the backend that answered)
+
+        Raises:
+            BackendError: If no backend could answer
+        """
+        if self.fallback and time.time() < self.fallback_until:
+            return self.fallback.answer(question, session_id, query_params, domain, history), self.fallback.name
+
+        start = time.perf_counter()
+        try:
+            text = self.primary.answer(question, session_id, query_params, domain, history)
+        except BackendError as e:
+            if not (self.fallback and e.retryable):
+                raise
+            print(f"{e}; falling back to {self.fallback.name}")
+            self._trip()
+            return self.fallback.answer(question, session_id, query_params, domain, history), self.fallback.name
+
+        self._record_primary((time.perf_counter() - start) * 1000)
+        return text, self.primary.name
+
+
+def create_backend_policy(get_transport, project_id, location, credentials_file):
+    """
+    Build the backend policy from environment configuration.
+
+    ANSWER_BACKEND picks the primary backend ("dialogflow" or "gemini");
+    FALLBACK_BACKEND picks the fallback ("gemini" or "none"). GEMINI_MODEL,
+    GEMINI_API_BASE and PLAYBOOKS_DIR configure the model backend, and
+    GEMINI_AUTH=false sends unauthenticated requests (local mock servers).
+    FALLBACK_SLOW_MS and FALLBACK_COOLDOWN_SECONDS tune the fallback policy.
+
+    Returns:
+        FallbackPolicy: The configured policy
+
+    Raises:
+        ValueError: On an unknown backend, or when the model backend is used
+            and the playbooks directory has no General Playbook
+    """
+    def gemini():
+        authenticated = os.environ.get('GEMINI_AUTH', 'true').lower() == 'true'
+        playbooks_dir = os.environ.get('PLAYBOOKS_DIR', DEFAULT_PLAYBOOKS_DIR)
+        if not os.path.isfile(os.path.join(playbooks_dir, GENERAL_PLAYBOOK)):
+            raise ValueError(f"Playbooks not found in {playbooks_dir} "
+                             f"(run scripts/sync_shared_modules.py or set PLAYBOOKS_DIR)")
+        return GeminiBackend(
+            project_id, location,
+            model=os.environ.get('GEMINI_MODEL', DEFAULT_GEMINI_MODEL),
+            credentials_file=credentials_file if authenticated else None,
+            api_base=os.environ.get('GEMINI_API_BASE'),
+            playbooks_dir=playbooks_dir,
+            timeout=float(os.environ.get('GEMINI_TIMEOUT', DEFAULT_TIMEOUT))
+        )
+
+    backends = {
+        'dialogflow': lambda: DialogflowBackend(get_transport, credentials_file),
+        'gemini': gemini,
+    }
+    primary_name = os.environ.get('ANSWER_BACKEND', 'dialogflow')
+    fallback_name = os.environ.get('FALLBACK_BACKEND', 'gemini')
+    if primary_name not in backends:
+        raise ValueError(f"Unknown answer backend: {primary_name} (expected one of {', '.join(backends)})")
+
+    fallback = None
+    if fallback_name in backends and fallback_name != primary_name:
+        fallback = backends[fallback_name]()
+
+    return FallbackPolicy(
+        backends[primary_name](), fallback,
+        slow_threshold_ms=float(os.environ.get('FALLBACK_SLOW_MS', 15000)),
+        cooldown=float(os.environ.get('FALLBACK_COOLDOWN_SECONDS', 60))
+    )
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Dialogflow CX detectIntent transports
+
+The API server talks to the agent through a transport object instead of
+building REST requests inline. Two implementations are provided:
+
+- RestTransport: JSON over HTTPS using a pooled, authorized requests session
+- GrpcTransport: protobuf over a single persistent HTTP/2 channel using the
+  google-cloud-dialogflow-cx client library
+
+Both return the detectIntent response as a REST-shaped (camelCase) dictionary,
+so response parsing is identical whichever transport is selected. The API server
+chooses the transport with the DIALOGFLOW_TRANSPORT environment variable
+("rest" or "grpc").
+"""
+import os
+import json
+import threading
+
+SCOPES = ['https://www.googleapis.com/auth/cloud-platform']
+
+DEFAULT_TRANSPORT = 'rest'
+DEFAULT_TIMEOUT = 60
+
+
+class DetectIntentError(Exception):
+    """Raised when the agent rejects a detectIntent call or the call fails."""
+
+    def __init__(self, status_code, details):
+        super().__init__(f"Agent API call failed with status code {status_code}")
+        self.status_code = status_code
+        self.details = details
+
+
+def load_credentials(credentials_file):
+    """
+    Load service account credentials for the Dialogflow API.
+
+    Credentials are refreshed lazily by the transports, so this call does not
+    mint a token.
+    """
+    from google.oauth2 import service_account
+
+    return service_account.Credentials.from_service_account_file(
+        credentials_file,
+        scopes=SCOPES
+    )
+
+
+def regional_endpoint(location):
+    """Return the Dialogflow CX API host for an agent location."""
+    if location == 'global':
+        return "dialogflow.googleapis.com"
+    return f"{location}-dialogflow.googleapis.com"
+
+
+class DetectIntentTransport:
+    """
+    Base class for detectIntent transports.
+
+    Subclasses implement detect_intent() and return the response as a
+    REST-shaped dictionary.
+    """
+
+    name = None
+
+    def __init__(self, project_id, location, agent_id, credentials, timeout=DEFAULT_TIMEOUT):
+        self.project_id = project_id
+        self.location = location
+        self.agent_id = agent_id
+        self.credentials = credentials
+        self.timeout = timeout
+        self.endpoint = regional_endpoint(location)
+
+    def session_path(self, session_id):
+        """Return the fully qualified session resource name."""
+        return (f"projects/{self.project_id}/locations/{self.location}"
+                f"/agents/{self.agent_id}/sessions/{session_id}")
+
+    def detect_intent(self, session_id, text, language_code="en", query_params=None):
+        """
+        Send a text query to the agent.
+
+        Args:
+            session_id (str): Dialogflow session ID
+            text (str): The user's message
+            language_code (str): Query language
+            query_params (dict, optional): REST-shaped QueryParameters
+
+        Returns:
+            dict: The detectIntent response in REST (camelCase) form
+
+        Raises:
+            DetectIntentError: If the agent returns a non-success status
+        """
+        raise NotImplementedError
+
+    def refresh_token(self):
+        """Mint an access token now instead of on the first call."""
+        from google.auth.transport.requests import Request as AuthRequest
+
+        self.credentials.refresh(AuthRequest())
+
+    def connect(self):
+        """Open the underlying connection or channel ahead of the first call."""
+
+    def close(self):
+        """Release pooled connections or channels."""
+
+
+class RestTransport(DetectIntentTransport):
+    """detectIntent over HTTPS/JSON with a pooled, auto-refreshing session."""
+
+    name = 'rest'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        from google.auth.transport.requests import AuthorizedSession
+
+        # AuthorizedSession refreshes the token only when it expires and keeps
+        # TCP/TLS connections alive between calls.
+        self.session = AuthorizedSession(self.credentials)
+
+    def url(self, session_id):
+        return f"https://{self.endpoint}/v3/{self.session_path(session_id)}:detectIntent"
+
+    def detect_intent(self, session_id, text, language_code="en", query_params=None):
+        payload = {
+            "queryInput": {
+                "text": {
+                    "text": text
+                },
+                "languageCode": language_code
+            }
+        }
+        if query_params:
+            payload["queryParams"] = query_params
+
+        response = self.session.post(self.url(session_id), json=payload, timeout=self.timeout)
+
+        if response.status_code != 200:
+            raise DetectIntentError(response.status_code, response.text)
+
+        return response.json()
+
+    def connect(self):
+        # Any response will do: the point is to resolve DNS and leave a
+        # TLS connection to the endpoint in the session's pool.
+        self.session.get(f"https://{self.endpoint}/", timeout=self.timeout)
+
+    def close(self):
+        self.session.close()
+
+
+class GrpcTransport(DetectIntentTransport):
+    """
+    detectIntent over gRPC.
+
+    A single SessionsClient holds one HTTP/2 channel, which is shared by every
+    thread; concurrent sessions are multiplexed as streams on that channel.
+    """
+
+    name = 'grpc'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        try:
+            from google.cloud import dialogflowcx_v3
+        except ImportError as e:
+            raise RuntimeError(
+                "The gRPC transport requires google-cloud-dialogflow-cx "
+                "(pip install google-cloud-dialogflow-cx)"
+            ) from e
+
+        self._cx = dialogflowcx_v3
+        self.client = dialogflowcx_v3.SessionsClient(
+            credentials=self.credentials,
+            client_options={"api_endpoint": f"{self.endpoint}:443"},
+            transport="grpc"
+        )
+
+    def build_request(self, session_id, text, language_code="en", query_params=None):
+        """Build the protobuf DetectIntentRequest for a text query."""
+        cx = self._cx
+        request = cx.DetectIntentRequest(
+            session=self.session_path(session_id),
+            query_input=cx.QueryInput(
+                text=cx.TextInput(text=text),
+                language_code=language_code
+            )
+        )
+        if query_params:
+            # Accept the same REST-shaped dictionary as RestTransport
+            request.query_params = cx.QueryParameters.from_json(
+                json.dumps(query_params),
+                ignore_unknown_fields=True
+            )
+        return request
+
+    def detect_intent(self, session_id, text, language_code="en", query_params=None):
+        from google.api_core import exceptions as api_exceptions
+
+        request = self.build_request(session_id, text, language_code, query_params)
+        try:
+            response = self.client.detect_intent(request=request, timeout=self.timeout)
+        except api_exceptions.GoogleAPICallError as e:
+            raise DetectIntentError(e.code or 500, e.message) from e
+
+        return self._cx.DetectIntentResponse.to_dict(
+            response,
+            preserving_proto_field_name=False,
+            use_integers_for_enums=False
+        )
+
+    def connect(self):
+        import grpc
+
+        grpc.channel_ready_future(self.client.transport.grpc_channel).result(timeout=self.timeout)
+
+    def close(self):
+        self.client.transport.close()
+
+
+TRANSPORTS = {
+    RestTransport.name: RestTransport,
+    GrpcTransport.name: GrpcTransport,
+}
+
+
+def create_transport(name, project_id, location, agent_id, credentials, timeout=DEFAULT_TIMEOUT):
+    """
+    Create a transport by name.
+
+    Args:
+        name (str): "rest" or "grpc"
+        project_id (str): Google Cloud project ID
+        location (str): Agent location, e.g. "us-central1" or "global"
+        agent_id (str): Dialogflow CX agent ID
+        credentials: google-auth credentials
+        timeout (float): Per-call timeout in seconds
+
+    Returns:
+        DetectIntentTransport: The transport instance
+    """
+    name = (name or DEFAULT_TRANSPORT).lower()
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown Dialogflow transport '{name}'. Expected one of: {', '.join(TRANSPORTS)}")
+    return TRANSPORTS[name](project_id, location, agent_id, credentials, timeout=timeout)
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport(name, project_id, location, agent_id, credentials_file):
+    """
+    Return the process-wide transport, creating it on first use.
+
+    The transport is shared by all request threads so connections and
+    channels are reused. DIALOGFLOW_TIMEOUT overrides the per-call timeout.
+    """
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = create_transport(
+                    name,
+                    project_id,
+                    location,
+                    agent_id,
+                    load_credentials(credentials_file),
+                    timeout=float(os.environ.get('DIALOGFLOW_TIMEOUT', DEFAULT_TIMEOUT))
+                )
+    return _transport
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Local domain classifier for first-turn playbook routing
+
+The General playbook spends a turn deciding which specialist (Looker,
+BigQuery, dbt, Looker Studio, Omni) should answer, and often replies with a
+handoff ("Let me connect you with Miguel, our BigQuery expert") instead of
+an answer. This module predicts the domain locally with a small multinomial
+Naive Bayes model over word unigrams and bigrams, so the first detectIntent
+can carry the domain as a session parameter and, when playbook IDs are
+configured, start directly in the specialist playbook.
+
+The model is trained offline by agent-api/scripts/train_domain_router.py and
+shipped as domain_model.json next to this file.
+"""
+import os
+import re
+import json
+import math
+
+DEFAULT_MODEL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'domain_model.json')
+DEFAULT_MIN_CONFIDENCE = 0.9
+
+# Domain label that means "let the General playbook handle it"
+GENERAL = 'general'
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lowercase word unigrams plus adjacent bigrams."""
+    words = TOKEN_PATTERN.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class DomainClassifier:
+    """Multinomial Naive Bayes over tokenize() features."""
+
+    def __init__(self, classes, log_priors, log_likelihoods, log_unseen):
+        self.classes = classes
+        self.log_priors = log_priors
+        self.log_likelihoods = log_likelihoods
+        self.log_unseen = log_unseen
+
+    @classmethod
+    def train(cls, examples, alpha=0.5):
+        """
+        Fit the model.
+
+        Args:
+            examples (list): (text, domain) pairs
+            alpha (float): Additive smoothing
+
+        Returns:
+            DomainClassifier: The trained model
+        """
+        class_docs = {}
+        token_counts = {}
+        vocabulary = set()
+        for text, domain in examples:
+            class_docs[domain] = class_docs.get(domain, 0) + 1
+            counts = token_counts.setdefault(domain, {})
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+                vocabulary.add(token)
+
+        classes = sorted(class_docs)
+        total_docs = sum(class_docs.values())
+        log_priors = {c: math.log(class_docs[c] / total_docs) for c in classes}
+        log_likelihoods = {}
+        log_unseen = {}
+        for c in classes:
+            counts = token_counts[c]
+            denominator = sum(counts.values()) + alpha * (len(vocabulary) + 1)
+            log_likelihoods[c] = {t: math.log((n + alpha) / denominator) for t, n in counts.items()}
+            log_unseen[c] = math.log(alpha / denominator)
+        return cls(classes, log_priors, log_likelihoods, log_unseen)
+
+    def predict(self, text):
+        """
+        Predict the domain of a question.
+
+        Returns:
+            tuple: (domain, confidence) where confidence is the posterior
+            probability of the predicted domain
+        """
+        tokens = tokenize(text)
+        scores = {}
+        for c in self.classes:
+            likelihoods = self.log_likelihoods[c]
+            unseen = self.log_unseen[c]
+            scores[c] = self.log_priors[c] + sum(likelihoods.get(t, unseen) for t in tokens)
+
+        best = max(scores, key=scores.get)
+        # Softmax over log scores, shifted by the max for numerical stability
+        total = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / total
+
+    def to_dict(self):
+        return {
+            'classes': self.classes,
+            'log_priors': self.log_priors,
+            'log_likelihoods': self.log_likelihoods,
+            'log_unseen': self.log_unseen,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['classes'], data['log_priors'], data['log_likelihoods'], data['log_unseen'])
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'), sort_keys=True)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+class DomainRouter:
+    """
+    Turns classifier predictions into detectIntent query parameters.
+
+    Args:
+        classifier (DomainClassifier): Trained model
+        playbook_ids (dict): Optional domain -> Dialogflow playbook ID mapping
+        agent_path (str): projects/.../agents/<id>, used to build playbook names
+        min_confidence (float): Below this, the General playbook decides
+    """
+
+    def __init__(self, classifier, playbook_ids=None, agent_path=None,
+                 min_confidence=DEFAULT_MIN_CONFIDENCE):
+        self.classifier = classifier
+        self.playbook_ids = playbook_ids or {}
+        self.agent_path = agent_path
+        self.min_confidence = min_confidence
+
+    def route(self, question):
+        """
+        Build routing hints for a first-turn question.
+
+        Returns:
+            tuple: (domain or None, confidence, REST-shaped QueryParameters or None)
+        """
+        domain, confidence = self.classifier.predict(question)
+        if domain == GENERAL or confidence < self.min_confidence:
+            return None, confidence, None
+
+        query_params = {"parameters": {"domain_hint": domain}}
+        playbook_id = self.playbook_ids.get(domain)
+        if playbook_id and self.agent_path:
+            query_params["currentPlaybook"] = f"{self.agent_path}/playbooks/{playbook_id}"
+        return domain, confidence, query_params
+
+
+def merge_query_params(*params):
+    """Merge REST-shaped QueryParameters dicts, combining their parameters."""
+    merged = {}
+    for p in params:
+        if not p:
+            continue
+        for key, value in p.items():
+            if key == 'parameters':
+                merged.setdefault('parameters', {}).update(value)
+            else:
+                merged[key] = value
+    return merged or None
+
+
+def create_router(agent_path):
+    """
+    Build the router from environment configuration.
+
+    DOMAIN_ROUTER=false disables routing; DOMAIN_MODEL_FILE overrides the model
+    path; PLAYBOOK_IDS is a JSON object mapping domains to playbook IDs;
+    ROUTER_MIN_CONFIDENCE sets the confidence threshold.
+
+    Returns:
+        DomainRouter or None: None when routing is disabled or no model exists
+    """
+    if os.environ.get('DOMAIN_ROUTER', 'true').lower() != 'true':
+        return None
+    model_file = os.environ.get('DOMAIN_MODEL_FILE', DEFAULT_MODEL_FILE)
+    if not os.path.exists(model_file):
+        print(f"Domain model not found at {model_file}; routing disabled")
+        return None
+    return DomainRouter(
+        DomainClassifier.load(model_file),
+        playbook_ids=json.loads(os.environ.get('PLAYBOOK_IDS', '{}')),
+        agent_path=agent_path,
+        min_confidence=float(os.environ.get('ROUTER_MIN_CONFIDENCE', DEFAULT_MIN_CONFIDENCE))
+    )
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+FAQ fast path for the API server
+
+Serves vetted historical answers for common questions (mostly definitional
+ones like "What is Looker?") without calling the agent. The answer store is
+a versioned JSON file built by agent-api/scripts/build_faq.py; only entries
+a reviewer approved are served, and each carries an expiry date after which
+it is ignored until it is re-vetted. Answers that end by offering a follow-up
+("Would you like me to...?") are never served: the agent did not see the
+exchange, so it could not follow up on it.
+
+Lookup is an exact match on the normalized question, then a near-match on
+word overlap through an inverted index. Only matches at or above the
+confidence threshold are served; everything else falls through to the agent.
+"""
+import os
+import re
+import json
+import time
+
+DEFAULT_FAQ_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'faq_store.json')
+DEFAULT_MIN_SCORE = 0.9
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_question(text):
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(WORD_PATTERN.findall(text.lower()))
+
+
+def offers_follow_up(answer):
+    """Whether an answer ends by asking the user something."""
+    return (answer or '').rstrip().endswith('?')
+
+
+class FaqStore:
+    """In-memory index over the vetted answers in a FAQ store file."""
+
+    def __init__(self, data, min_score=DEFAULT_MIN_SCORE, now=None):
+        self.version = data.get('version')
+        self.min_score = min_score
+        now = now or time.time()
+
+        self.entries = [e for e in data.get('entries', [])
+                        if e.get('review_status') == 'approved' and e.get('expires_at', 0) > now
+                        and not offers_follow_up(e.get('answer'))]
+        # Entries not served: expired, unapproved or offering a follow-up
+        self.expired = len(data.get('entries', [])) - len(self.entries)
+
+        self._exact = {}
+        self._token_sets = []
+        self._inverted = {}
+        for i, entry in enumerate(self.entries):
+            normalized = normalize_question(entry['question'])
+            self._exact[normalized] = i
+            tokens = frozenset(normalized.split())
+            self._token_sets.append(tokens)
+            for token in tokens:
+                self._inverted.setdefault(token, []).append(i)
+
+    @classmethod
+    def load(cls, path, min_score=DEFAULT_MIN_SCORE):
+        with open(path) as f:
+            return cls(json.load(f), min_score=min_score)
+
+    def lookup(self, question):
+        """
+        Find a vetted answer for a question.
+
+        Returns:
+            tuple: (entry, score) for a match at or above min_score, else (None, best score)
+        """
+        normalized = normalize_question(question)
+        if normalized in self._exact:
+            return self.entries[self._exact[normalized]], 1.0
+
+        tokens = frozenset(normalized.split())
+        if not tokens:
+            return None, 0.0
+
+        # Count shared tokens per candidate through the inverted index
+        overlap = {}
+        for token in tokens:
+            for i in self._inverted.get(token, ()):
+                overlap[i] = overlap.get(i, 0) + 1
+
+        best, best_score = None, 0.0
+        for i, shared in overlap.items():
+            score = shared / len(tokens | self._token_sets[i])
+            if score > best_score:
+                best, best_score = i, score
+
+        if best is not None and best_score >= self.min_score:
+            return self.entries[best], best_score
+        return None, best_score
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def create_faq_store():
+    """
+    Load the FAQ store from environment configuration.
+
+    FAQ_ENABLED=false disables the fast path; FAQ_FILE overrides the store
+    path; FAQ_MIN_SCORE sets the match threshold.
+
+    Returns:
+        FaqStore or None: None when disabled or no store file exists
+    """
+    if os.environ.get('FAQ_ENABLED', 'true').lower() != 'true':
+        return None
+    faq_file = os.environ.get('FAQ_FILE', DEFAULT_FAQ_FILE)
+    if not os.path.exists(faq_file):
+        print(f"FAQ store not found at {faq_file}; FAQ fast path disabled")
+        return None
+    store = FaqStore.load(faq_file, min_score=float(os.environ.get('FAQ_MIN_SCORE', DEFAULT_MIN_SCORE)))
+    print(f"Loaded FAQ store {store.version}: {len(store)} answers ({store.expired} expired, unapproved or offering a follow-up)")
+    return store
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Background job processing for long-running questions
+
+Difficult questions can take well over 10 seconds. Instead of holding a
+request thread (and the client's connection) open, clients submit a job,
+get a job ID back immediately, and poll for the result. A fixed worker pool
+runs the jobs, finished results are kept for a TTL, and an optional callback
+URL receives the finished job as a JSON POST.
+
+The server makes the callback request itself, so callback URLs are limited
+to https URLs on configured hosts (JOB_CALLBACK_HOSTS); with none configured,
+jobs cannot have callbacks. Redirects are not followed.
+"""
+import os
+import time
+import uuid
+import threading
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+CALLBACK_TIMEOUT = 10
+
+
+def callback_hosts_from_env():
+    """Hosts allowed in callback URLs, from comma-separated JOB_CALLBACK_HOSTS."""
+    return [host.strip().lower() for host in os.environ.get('JOB_CALLBACK_HOSTS', '').split(',') if host.strip()]
+
+
+def check_callback_url(url, allowed_hosts):
+    """
+    Check that a callback URL is https and on an allowed host. An allowed
+    host starting with "." also allows its subdomains.
+
+    Raises:
+        ValueError: If the URL may not be called back
+    """
+    parts = urlsplit(url) if isinstance(url, str) else None
+    if parts is None or parts.scheme != 'https' or not parts.hostname:
+        raise ValueError("callbackUrl must be an https URL")
+    host = parts.hostname.lower()
+    for allowed in allowed_hosts:
+        if host == allowed.lstrip('.') or (allowed.startswith('.') and host.endswith(allowed)):
+            return
+    raise ValueError(f"callbackUrl host is not allowed: {host}")
+
+
+class Job:
+    """A submitted question and its eventual result."""
+
+    def __init__(self, question, session_id=None, callback_url=None, allow_faq=True):
+        self.job_id = uuid.uuid4().hex
+        self.question = question
+        self.session_id = session_id
+        self.callback_url = callback_url
+        self.allow_faq = allow_faq
+        self.status = QUEUED
+        self.result = None
+        self.status_code = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    def to_dict(self):
+        data = {
+            'jobId': self.job_id,
+            'status': self.status,
+            'question': self.question,
+            'sessionId': self.session_id,
+            'submittedAt': self.submitted_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at,
+        }
+        if self.status in (SUCCEEDED, FAILED):
+            data['result'] = self.result
+            data['statusCode'] = self.status_code
+        return data
+
+
+class JobManager:
+    """
+    Runs jobs on a worker pool and keeps finished results for result_ttl seconds.
+
+    Args:
+        handler: Callable (question, session_id, allow_faq=...) -> (response dict, status code)
+        max_workers (int): Number of worker threads
+        result_ttl (float): Seconds to keep finished jobs before they expire
+        callback_hosts (list): Hosts callback URLs may point at (see check_callback_url)
+    """
+
+    def __init__(self, handler, max_workers=4, result_ttl=3600, callback_hosts=()):
+        self.handler = handler
+        self.result_ttl = result_ttl
+        self.callback_hosts = list(callback_hosts)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='agent-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, question, session_id=None, callback_url=None, allow_faq=True):
+        """
+        Queue a question and return its Job immediately.
+
+        Raises:
+            ValueError: If callback_url is not allowed
+        """
+        if callback_url is not None:
+            check_callback_url(callback_url, self.callback_hosts)
+        self._expire()
+        job = Job(question, session_id, callback_url, allow_faq)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        job.future = self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        self._expire()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Cancel a job.
+
+        Queued jobs never run. A job that is already running cannot be
+        interrupted mid-call, but its result is discarded and no callback
+        is sent.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            if job.status in (QUEUED, RUNNING):
+                job.future.cancel()
+                job.status = CANCELLED
+                job.finished_at = time.time()
+        return job
+
+    def _run(self, job):
+        with self._lock:
+            if job.status == CANCELLED:
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+
+        try:
+            result, status_code = self.handler(job.question, job.session_id, allow_faq=job.allow_faq)
+        except Exception as e:
+            print(f"Job {job.job_id} failed: {str(e)}")
+            result, status_code = {'error': f"An error occurred: {str(e)}"}, 500
+
+        with self._lock:
+            if job.status == CANCELLED:
+                return
+            job.result = result
+            job.status_code = status_code
+            job.status = SUCCEEDED if status_code == 200 else FAILED
+            job.finished_at = time.time()
+            if result.get('sessionId'):
+                job.session_id = result['sessionId']
+
+        if job.callback_url:
+            self._send_callback(job)
+
+    def _send_callback(self, job):
+        import requests
+
+        try:
+            requests.post(job.callback_url, json=job.to_dict(), timeout=CALLBACK_TIMEOUT, allow_redirects=False)
+        except requests.exceptions.RequestException as e:
+            print(f"Callback for job {job.job_id} to {job.callback_url} failed: {e}")
+
+    def _expire(self):
+        """Drop finished jobs older than the result TTL."""
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.status in FINISHED_STATES and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
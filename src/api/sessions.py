@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Server-side session management for multi-turn conversations
+
+Maps client conversation IDs to Dialogflow CX sessions and keeps a small,
+bounded record per conversation: turn count, last activity, and a compacted
+history of recent exchanges.
+
+Conversation IDs and Dialogflow session IDs are kept apart. Dialogflow CX
+rejects session IDs longer than 36 characters, so a client ID is only reused
+as the Dialogflow session when it is short and made of safe characters;
+any other ID is hashed, and new or rolled-over sessions get a 32-character
+random ID.
+
+Dialogflow CX expires idle sessions after 30 minutes. When a conversation
+outlives its Dialogflow session, the manager starts a new one and hands the
+compacted history to the agent as a session parameter so context is not lost.
+The history is also sent when earlier turns were answered without
+Dialogflow (from the FAQ store or by the Gemini fallback), so the agent can
+follow up on them.
+
+Storage is pluggable:
+- memory: per-process LRU with TTL eviction (default)
+- redis: shared across API replicas (SESSION_BACKEND=redis, REDIS_URL=...)
+"""
+import os
+import re
+import json
+import hashlib
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_SESSIONS = 10000
+DEFAULT_SESSION_TTL = 24 * 60 * 60
+DIALOGFLOW_SESSION_TTL = 30 * 60
+DEFAULT_MAX_HISTORY_TURNS = 6
+MAX_MESSAGE_CHARS = 500
+MAX_SUMMARY_CHARS = 2000
+
+# Dialogflow CX session IDs: at most 36 characters
+MAX_DIALOGFLOW_SESSION_ID = 36
+DIALOGFLOW_SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,%d}$' % MAX_DIALOGFLOW_SESSION_ID)
+
+
+class SessionRecord:
+    """State kept for one client conversation."""
+
+    def __init__(self, conversation_id, dialogflow_session_id, created_at=None,
+                 last_activity=None, turn_count=0, history=None, summary="", missed_turns=0):
+        self.conversation_id = conversation_id
+        self.dialogflow_session_id = dialogflow_session_id
+        self.created_at = created_at or time.time()
+        self.last_activity = last_activity or self.created_at
+        self.turn_count = turn_count
+        self.history = history or []
+        self.summary = summary
+        # Turns since the last one Dialogflow answered itself
+        self.missed_turns = missed_turns
+
+    def to_dict(self):
+        return {
+            'conversation_id': self.conversation_id,
+            'dialogflow_session_id': self.dialogflow_session_id,
+            'created_at': self.created_at,
+            'last_activity': self.last_activity,
+            'turn_count': self.turn_count,
+            'history': self.history,
+            'summary': self.summary,
+            'missed_turns': self.missed_turns,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class MemorySessionBackend:
+    """In-process LRU store with TTL eviction, bounded by max_sessions."""
+
+    def __init__(self, max_sessions=DEFAULT_MAX_SESSIONS, ttl=DEFAULT_SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id):
+        with self._lock:
+            data = self._records.get(conversation_id)
+            if data is None:
+                return None
+            if time.time() - data['last_activity'] > self.ttl:
+                del self._records[conversation_id]
+                return None
+            self._records.move_to_end(conversation_id)
+            return SessionRecord.from_dict(data)
+
+    def put(self, record):
+        with self._lock:
+            self._records[record.conversation_id] = record.to_dict()
+            self._records.move_to_end(record.conversation_id)
+            while len(self._records) > self.max_sessions:
+                self._records.popitem(last=False)
+
+    def delete(self, conversation_id):
+        with self._lock:
+            return self._records.pop(conversation_id, None) is not None
+
+    def __len__(self):
+        return len(self._records)
+
+
+class RedisSessionBackend:
+    """
+    Redis-backed store so several API replicas share conversations.
+
+    Records are stored as JSON with a TTL that is renewed on every turn;
+    Redis' own maxmemory policy bounds total memory.
+    """
+
+    def __init__(self, url, ttl=DEFAULT_SESSION_TTL, prefix="agent-session:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("SESSION_BACKEND=redis requires the redis package (pip install redis)") from e
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, conversation_id):
+        data = self.client.get(self.prefix + conversation_id)
+        if data is None:
+            return None
+        return SessionRecord.from_dict(json.loads(data))
+
+    def put(self, record):
+        self.client.setex(self.prefix + record.conversation_id, int(self.ttl), json.dumps(record.to_dict()))
+
+    def delete(self, conversation_id):
+        return bool(self.client.delete(self.prefix + conversation_id))
+
+
+def create_backend(name, ttl=DEFAULT_SESSION_TTL, max_sessions=DEFAULT_MAX_SESSIONS, redis_url=None):
+    """Create a session backend by name ("memory" or "redis")."""
+    name = (name or 'memory').lower()
+    if name == 'memory':
+        return MemorySessionBackend(max_sessions=max_sessions, ttl=ttl)
+    if name == 'redis':
+        return RedisSessionBackend(redis_url or 'redis://localhost:6379/0', ttl=ttl)
+    raise ValueError(f"Unknown session backend '{name}'. Expected 'memory' or 'redis'")
+
+
+def _clip(text, limit=MAX_MESSAGE_CHARS):
+    text = text or ""
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+class SessionManager:
+    """Tracks conversations and the Dialogflow session each one maps to."""
+
+    def __init__(self, backend, max_history_turns=DEFAULT_MAX_HISTORY_TURNS,
+                 dialogflow_session_ttl=DIALOGFLOW_SESSION_TTL):
+        self.backend = backend
+        self.max_history_turns = max_history_turns
+        self.dialogflow_session_ttl = dialogflow_session_ttl
+
+    @staticmethod
+    def new_session_id():
+        """A fresh Dialogflow session ID (32 characters)."""
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def dialogflow_session_id(conversation_id):
+        """
+        Dialogflow session ID for a new conversation: the conversation ID
+        itself when Dialogflow accepts it, else a 32-character hash of it.
+        """
+        if DIALOGFLOW_SESSION_ID_PATTERN.match(conversation_id):
+            return conversation_id
+        return hashlib.sha256(conversation_id.encode('utf-8')).hexdigest()[:32]
+
+    def begin_turn(self, conversation_id=None):
+        """
+        Look up (or start) a conversation before sending a question.
+
+        Args:
+            conversation_id (str, optional): Client conversation ID
+
+        Returns:
+            tuple: (SessionRecord, query_params) where query_params is a
+            REST-shaped QueryParameters dict carrying the compacted history
+            when a new Dialogflow session had to be started or Dialogflow
+            missed earlier turns, otherwise None
+        """
+        conversation_id = conversation_id or self.new_session_id()
+        record = self.backend.get(conversation_id)
+
+        if record is None:
+            # Keep the client's ID as the Dialogflow session when it is valid there
+            record = SessionRecord(conversation_id, self.dialogflow_session_id(conversation_id))
+            return record, None
+
+        query_params = None
+        expired = time.time() - record.last_activity > self.dialogflow_session_ttl
+        if expired:
+            # Dialogflow has dropped the old session; carry context forward
+            record.dialogflow_session_id = self.new_session_id()
+        if expired or record.missed_turns:
+            context = self.context_text(record)
+            if context:
+                query_params = {"parameters": {"conversation_history": context}}
+
+        return record, query_params
+
+    def end_turn(self, record, question, answer, answered_by_agent=True):
+        """
+        Record a completed exchange and persist the conversation.
+
+        Args:
+            record (SessionRecord): The conversation
+            question (str): The question asked
+            answer (str): The answer given
+            answered_by_agent (bool): False when Dialogflow did not see the
+                exchange, so the next turn sends it the history
+        """
+        record.missed_turns = 0 if answered_by_agent else record.missed_turns + 1
+        record.turn_count += 1
+        record.last_activity = time.time()
+        record.history.append({'question': _clip(question), 'answer': _clip(answer)})
+        self.compact(record)
+        self.backend.put(record)
+        return record
+
+    def compact(self, record):
+        """Fold turns beyond max_history_turns into a bounded text summary."""
+        overflow = len(record.history) - self.max_history_turns
+        if overflow <= 0:
+            return
+        folded = record.history[:overflow]
+        record.history = record.history[overflow:]
+        lines = [f"Q: {turn['question']} A: {_clip(turn['answer'], 160)}" for turn in folded]
+        summary = "\n".join(filter(None, [record.summary] + lines))
+        # Keep the most recent part of the summary when it grows too long
+        record.summary = summary[-MAX_SUMMARY_CHARS:]
+
+    def context_text(self, record):
+        """Render the compacted history as text for the agent."""
+        parts = []
+        if record.summary:
+            parts.append(record.summary)
+        parts.extend(f"Q: {turn['question']} A: {turn['answer']}" for turn in record.history)
+        return "\n".join(parts)
+
+    def get(self, conversation_id):
+        return self.backend.get(conversation_id)
+
+    def end(self, conversation_id):
+        return self.backend.delete(conversation_id)
+
+
+def create_session_manager():
+    """Build the session manager from environment configuration."""
+    backend = create_backend(
+        os.environ.get('SESSION_BACKEND', 'memory'),
+        ttl=float(os.environ.get('SESSION_TTL_SECONDS', DEFAULT_SESSION_TTL)),
+        max_sessions=int(os.environ.get('SESSION_MAX_SESSIONS', DEFAULT_MAX_SESSIONS)),
+        redis_url=os.environ.get('REDIS_URL')
+    )
+    return SessionManager(
+        backend,
+        max_history_turns=int(os.environ.get('SESSION_MAX_HISTORY_TURNS', DEFAULT_MAX_HISTORY_TURNS))
+    )
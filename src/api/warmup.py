@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Startup warm-up and readiness tracking for the API server
+
+After a deploy or a Cloud Run cold start, the first question would otherwise
+pay for loading credentials, minting a token, DNS, and TLS setup. The warm-up
+runs those steps in a background thread when the server starts, optionally
+followed by a canary detectIntent, and records how long each step took.
+The /ready endpoint reports 200 only once the warm-up has succeeded.
+"""
+import time
+import threading
+
+PENDING = 'pending'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+DEFAULT_RETRY_SECONDS = 10
+CANARY_QUESTION = "What is Looker?"
+
+
+class WarmupState:
+    """Readiness status and per-step timings, safe to read from request threads."""
+
+    def __init__(self):
+        self.status = PENDING
+        self.steps = {}
+        self.error = None
+        self.attempts = 0
+        self.ready_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.status == READY
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'status': self.status,
+                'steps_ms': dict(self.steps),
+                'error': self.error,
+                'attempts': self.attempts,
+                'ready_at': self.ready_at,
+            }
+
+
+def _timed(state, name, fn):
+    start = time.perf_counter()
+    result = fn()
+    with state._lock:
+        state.steps[name] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def run_warmup(state, get_transport, canary=False):
+    """
+    Run one warm-up attempt.
+
+    Args:
+        state (WarmupState): Where to record progress
+        get_transport: Callable returning the shared transport (loads credentials)
+        canary (bool): Also send a detectIntent to warm the agent itself
+
+    Returns:
+        bool: True if the server is ready
+    """
+    with state._lock:
+        state.status = WARMING
+        state.attempts += 1
+        state.error = None
+
+    try:
+        transport = _timed(state, 'load_credentials', get_transport)
+        _timed(state, 'mint_token', transport.refresh_token)
+        _timed(state, 'connect', transport.connect)
+        if canary:
+            _timed(state, 'canary', lambda: transport.detect_intent(
+                f"warmup-{int(time.time())}", CANARY_QUESTION))
+    except Exception as e:
+        print(f"Warm-up attempt {state.attempts} failed: {str(e)}")
+        with state._lock:
+            state.status = FAILED
+            state.error = str(e)
+        return False
+
+    with state._lock:
+        state.status = READY
+        state.ready_at = time.time()
+    print(f"Warm-up complete: {state.steps}")
+    return True
+
+
+def start_warmup(state, get_transport, canary=False, retry_seconds=DEFAULT_RETRY_SECONDS):
+    """Run the warm-up in a daemon thread, retrying until it succeeds."""
+
+    def loop():
+        while not run_warmup(state, get_transport, canary):
+            time.sleep(retry_seconds)
+
+    thread = threading.Thread(target=loop, name='agent-warmup', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Time-to-answer columns, metrics and charts shared by the dashboards
+
+A handoff or clarifying reply is fast but is not an answer, so besides the
+first reply's latency the dashboards show how long questions took to get a
+substantive answer and how many turns that took. src/dashboard/dashboard.py
+and the two dashboards in agent-api/scripts (which import this module from
+src/dashboard, like answer_store.py) call the same functions; only the chart
+colours differ.
+"""
+import pandas as pd
+
+from outcomes import ANSWERED
+
+
+def add_answer_columns(df):
+    """
+    Add time_to_answer_ms and turns to a results frame with an outcome column.
+
+    Follow-up runs record both (see agent-api/scripts/conversation.py); a
+    single-turn row has an answer time only when its one reply was an answer.
+
+    Returns:
+        pd.DataFrame: The same frame
+    """
+    answered_time = df['response_time_ms'].where(df['outcome'] == ANSWERED)
+    if 'time_to_answer_ms' in df.columns:
+        answered_time = pd.to_numeric(df['time_to_answer_ms'], errors='coerce').fillna(answered_time)
+    df['time_to_answer_ms'] = answered_time
+    df['turns'] = pd.to_numeric(df['turns'], errors='coerce').fillna(1).astype(int) if 'turns' in df.columns else 1
+    return df
+
+
+def show_answer_metrics(df):
+    """Show answered rate, average and median time to answer and average turns."""
+    import streamlit as st
+
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        answered_rate = df['time_to_answer_ms'].notna().mean() * 100 if len(df) > 0 else 0
+        st.metric("Answered", f"{answered_rate:.1f}%")
+
+    with col2:
+        st.metric("Avg Time to Answer", f"{df['time_to_answer_ms'].mean():.1f} ms")
+
+    with col3:
+        st.metric("Median Time to Answer", f"{df['time_to_answer_ms'].median():.1f} ms")
+
+    with col4:
+        st.metric("Avg Turns", f"{df['turns'].mean():.2f}")
+
+
+def show_time_to_answer(df, color, layout):
+    """
+    Show the Time to Answer section: first reply vs. answer times, and turns
+    per question by final outcome.
+
+    Args:
+        df (pd.DataFrame): Results with add_answer_columns() applied
+        color (str): Box plot colour
+        layout (dict): Extra Plotly layout settings (background, fonts)
+    """
+    import streamlit as st
+    import plotly.express as px
+
+    st.markdown('<div class="sub-header">Time to Answer</div>', unsafe_allow_html=True)
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        # First reply vs. final answer, for questions that got an answer
+        answered_df = df[df['time_to_answer_ms'].notna()]
+        timing_df = pd.concat([
+            pd.DataFrame({'measure': 'First reply', 'time_ms': answered_df['response_time_ms']}),
+            pd.DataFrame({'measure': 'Answer', 'time_ms': answered_df['time_to_answer_ms']}),
+        ])
+        fig = px.box(
+            timing_df,
+            x="measure",
+            y="time_ms",
+            title="Time to First Reply vs. Time to Answer",
+            labels={"time_ms": "Time (ms)", "measure": ""},
+            color_discrete_sequence=[color]
+        )
+        fig.update_layout(
+            xaxis_title="",
+            yaxis_title="Time (ms)",
+            margin=dict(l=20, r=20, t=40, b=20),
+            **layout
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+    with col2:
+        # Turns each question took, by final outcome
+        turn_counts = df.groupby(['turns', 'outcome'], observed=True).size().reset_index(name='count')
+        fig = px.bar(
+            turn_counts,
+            x="turns",
+            y="count",
+            color="outcome",
+            title="Turns per Question",
+            labels={"turns": "Turns", "count": "Number of Questions", "outcome": "Final Outcome"}
+        )
+        fig.update_layout(
+            xaxis_title="Turns",
+            yaxis_title="Number of Questions",
+            margin=dict(l=20, r=20, t=40, b=20),
+            **layout
+        )
+        fig.update_xaxes(dtick=1)
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def answer_time_text(row):
+    """Time-to-answer line for one result in the question details view."""
+    if pd.notna(row['time_to_answer_ms']):
+        return f"**Time to Answer:** {row['time_to_answer_ms']:.1f} ms ({row['turns']} turns)"
+    return f"**Time to Answer:** no answer after {row['turns']} turns"
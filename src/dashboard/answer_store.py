@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+On-demand answer text for the dashboards
+
+Answers are multi-paragraph LLM text and make up most of a results file,
+but only the Question Explorer (one answer at a time) and the search box
+read them. read_metrics() reads a results file (CSV or Parquet) in chunks,
+classifies each row while its answer is at hand (outcomes.outcome_column()),
+writes the answer text to an AnswerStore and returns a metrics frame without
+the text columns, typed by result_types.apply_schema(). Every row gets a
+row_id that looks up its answer:
+
+    store = AnswerStore.for_files(paths)
+    df = pd.concat([read_metrics(path, store) for path in paths])
+    store.finish()
+    store.get(df['row_id'].iloc[0])       # one answer
+    df['row_id'].isin(store.search('pdt')) # rows whose answer mentions "pdt"
+
+The store is a SQLite file keyed by the input files' paths, sizes and
+modification times, under ANSWER_STORE_DIR (default: a directory in the
+system temp dir, safe to delete). Once a store is complete, later loads of
+the same files skip the text columns entirely and take each row's outcome
+from the store, so loading scales with the number of rows, not with answer
+volume. An AnswerStore pickles as its path, so it can be returned from
+st.cache_data.
+
+Every change to the results files makes a new store, so opening one prunes
+the others: stores unused for ANSWER_STORE_MAX_AGE_DAYS (default 7) are
+deleted, and at most ANSWER_STORE_KEEP (default 5) are kept.
+
+This module lives with the dashboard; the scripts in agent-api/scripts add
+src/dashboard to sys.path to import it.
+"""
+import os
+import glob
+import time
+import hashlib
+import sqlite3
+import tempfile
+
+from outcomes import outcome_column
+from result_types import apply_schema
+
+# Columns kept out of the metrics frame: answer text and raw payloads
+TEXT_COLUMNS = ('answer', 'full_response', 'response_record', 'extra')
+
+DEFAULT_CHUNK_ROWS = 5000
+
+ANSWER_STORE_DIR = os.environ.get('ANSWER_STORE_DIR', os.path.join(tempfile.gettempdir(), 'agent_answer_store'))
+ANSWER_STORE_MAX_AGE_DAYS = float(os.environ.get('ANSWER_STORE_MAX_AGE_DAYS', '7'))
+ANSWER_STORE_KEEP = int(os.environ.get('ANSWER_STORE_KEEP', '5'))
+
+
+def fingerprint(paths):
+    """Key for a set of results files, changing when any of them does."""
+    digest = hashlib.sha1()
+    for path in sorted(os.path.abspath(p) for p in paths):
+        stat = os.stat(path)
+        digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def prune_stores(directory, keep_path=None, max_age_days=None, keep=None):
+    """
+    Delete old answer stores from a store directory.
+
+    Args:
+        directory (str): Store directory (ANSWER_STORE_DIR)
+        keep_path (str, optional): Store in use, never deleted
+        max_age_days (float, optional): Delete stores unused for longer than
+            this (default: ANSWER_STORE_MAX_AGE_DAYS)
+        keep (int, optional): Keep at most this many stores, most recently used
+            first (default: ANSWER_STORE_KEEP)
+
+    Returns:
+        list: Paths of the deleted stores
+    """
+    max_age_days = ANSWER_STORE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    keep = ANSWER_STORE_KEEP if keep is None else keep
+    stores = []
+    for path in glob.glob(os.path.join(directory, 'answers_*.sqlite')):
+        try:
+            stores.append((os.path.getmtime(path), path))
+        except OSError:
+            continue
+    stores.sort(reverse=True)
+    cutoff = time.time() - max_age_days * 86400
+    kept = 1 if keep_path else 0
+    removed = []
+    for mtime, path in stores:
+        if keep_path and os.path.abspath(path) == os.path.abspath(keep_path):
+            continue
+        if mtime >= cutoff and kept < keep:
+            kept += 1
+            continue
+        for stale in (path, path + '-journal'):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+        removed.append(path)
+    if removed:
+        print(f"Pruned {len(removed)} old answer stores from {directory}")
+    return removed
+
+
+class AnswerStore:
+    """Answer text and outcome by row_id, in a SQLite file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.next_id = 0
+        self._connect()
+
+    def _connect(self):
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS answers (row_id INTEGER PRIMARY KEY, outcome TEXT, answer TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.complete = self.conn.execute("SELECT value FROM meta WHERE key = 'complete'").fetchone() is not None
+        if not self.complete:
+            # Left over from a load that did not finish
+            self.conn.execute("DELETE FROM answers")
+            self.conn.commit()
+
+    @classmethod
+    def for_files(cls, paths, directory=None):
+        """The store for these results files: complete if they were loaded before, else empty."""
+        directory = directory or ANSWER_STORE_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"answers_{fingerprint(paths)}.sqlite")
+        if os.path.exists(path):
+            # Marks the store as recently used for prune_stores()
+            os.utime(path)
+        prune_stores(directory, keep_path=path)
+        return cls(path)
+
+    def reserve(self, count):
+        """Next count row ids, in load order."""
+        start = self.next_id
+        self.next_id += count
+        return range(start, start + count)
+
+    def add(self, row_ids, outcomes, answers):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO answers VALUES (?, ?, ?)",
+                                  zip(row_ids, outcomes, answers))
+
+    def outcomes(self, row_ids):
+        """Stored outcome for each row id, in order."""
+        found = dict(self.conn.execute("SELECT row_id, outcome FROM answers WHERE row_id BETWEEN ? AND ?",
+                                       (row_ids[0], row_ids[-1])).fetchall()) if len(row_ids) else {}
+        return [found.get(row_id) for row_id in row_ids]
+
+    def finish(self):
+        """Mark the store complete, so the next load of the same files skips the text."""
+        if not self.complete:
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('complete', '1')")
+            self.complete = True
+
+    def get(self, row_id):
+        """Answer text for one row, or None."""
+        found = self.conn.execute("SELECT answer FROM answers WHERE row_id = ?", (int(row_id),)).fetchone()
+        return found[0] if found else None
+
+    def search(self, text):
+        """Row ids whose answer contains text, ignoring case."""
+        query = "SELECT row_id FROM answers WHERE instr(lower(answer), ?) > 0"
+        return {row[0] for row in self.conn.execute(query, (text.lower(),))}
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def __getstate__(self):
+        return {'path': self.path, 'next_id': self.next_id}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._connect()
+
+
+def _chunks(path, skip_text, chunk_rows):
+    """DataFrame chunks of a CSV or Parquet results file."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        columns = [name for name in parquet.schema_arrow.names if not (skip_text and name in TEXT_COLUMNS)]
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    import pandas as pd
+
+    usecols = (lambda name: name not in TEXT_COLUMNS) if skip_text else None
+    yield from pd.read_csv(path, usecols=usecols, chunksize=chunk_rows)
+
+
+def read_metrics(path, store, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Read a results file without its text columns.
+
+    Args:
+        path (str): CSV or Parquet results file
+        store (AnswerStore): Receives each row's answer and outcome (or, when
+            complete, supplies the outcomes)
+        chunk_rows (int): Rows read at a time
+
+    Returns:
+        pd.DataFrame: The file's other columns plus row_id and outcome, typed by
+            result_types.apply_schema()
+    """
+    import pandas as pd
+
+    chunks = []
+    for chunk in _chunks(path, store.complete, chunk_rows):
+        chunk = chunk.reset_index(drop=True)
+        row_ids = store.reserve(len(chunk))
+        if store.complete:
+            outcome = store.outcomes(row_ids)
+        else:
+            outcome = outcome_column(chunk)
+            answers = chunk['answer'] if 'answer' in chunk.columns else pd.Series(None, index=chunk.index)
+            store.add(row_ids, outcome.astype(str).tolist(),
+                      [answer if isinstance(answer, str) else None for answer in answers.tolist()])
+        chunk = chunk.drop(columns=[name for name in TEXT_COLUMNS if name in chunk.columns])
+        chunk['row_id'] = list(row_ids)
+        chunk['outcome'] = list(outcome)
+        chunks.append(chunk)
+    if not chunks:
+        return apply_schema(pd.DataFrame(columns=['row_id', 'outcome']))
+    return apply_schema(pd.concat(chunks, ignore_index=True))
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Typed, memory-compact results frames for the dashboards and analyzers
+
+pd.read_csv() gives object (or plain string) columns for category,
+difficulty, session_id and source_file, float64 latencies once
+pd.to_numeric() has run, and timestamps as strings, so date filters need
+their own conversion. apply_schema() gives every known results column an
+explicit type:
+
+- categoricals for the low-cardinality columns (category, difficulty,
+  outcome, runner, source_file, ...); outcome keeps the OUTCOMES order
+- nullable int32 for latencies, counts and ids (missing values stay NA)
+- float32 for the client phase timings (phase_timing.py)
+- Arrow-backed strings for free text and ids (Python strings without pyarrow)
+- datetime64 for timestamp and file_timestamp
+
+Columns it does not know are left as they are. read_results() reads a CSV
+or Parquet results file and applies the schema; memory_report() compares
+the deep memory footprint of frames column by column.
+
+The analyzers and dashboards in agent-api/scripts import it from
+src/dashboard (added to sys.path).
+"""
+from datetime import datetime
+
+import pandas as pd
+
+from outcomes import OUTCOMES
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = pd.StringDtype('pyarrow')
+except ImportError:
+    STRING_DTYPE = pd.StringDtype('python')
+
+OUTCOME_DTYPE = pd.CategoricalDtype(OUTCOMES)
+
+CATEGORY_COLUMNS = ('runner', 'run', 'category', 'difficulty', 'source_file', 'final_playbook',
+                    'connection', 'worker')
+OUTCOME_COLUMNS = ('outcome', 'first_outcome')
+INT32_COLUMNS = ('row_id', 'question_number', 'response_time_ms', 'time_to_answer_ms', 'total_time_ms',
+                 'turns', 'attempt', 'status_code')
+FLOAT32_COLUMNS = ('auth_ms', 'dns_ms', 'connect_ms', 'tls_ms', 'send_ms', 'ttfb_ms', 'download_ms')
+STRING_COLUMNS = ('question', 'answer', 'session_id', 'turn_latencies_ms', 'extra', 'full_response',
+                  'response_record')
+DATETIME_COLUMNS = ('timestamp', 'file_timestamp')
+BOOLEAN_COLUMNS = ('success', 'is_error')
+
+
+def _local_naive(value):
+    """Parse one ISO timestamp, converting one with an offset to naive local time."""
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+
+
+def _to_datetime(series):
+    # Timestamps with offsets are compared in local time, like the naive ones the runners write
+    if pd.api.types.is_datetime64_any_dtype(series) and getattr(series.dt, 'tz', None) is None:
+        return series
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        try:
+            parsed = pd.to_datetime(series, errors='coerce', format='ISO8601')
+            if getattr(parsed.dt, 'tz', None) is None:
+                return parsed
+        except ValueError:
+            # Mixed offsets
+            pass
+    return pd.to_datetime(series.map(_local_naive, na_action='ignore'))
+
+
+def _to_boolean(series):
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype('boolean')
+    lowered = series.astype(STRING_DTYPE).str.strip().str.lower()
+    return lowered.map({'true': True, '1': True, 'false': False, '0': False}).astype('boolean')
+
+
+def column_type(name):
+    """The dtype apply_schema() gives a column, or None for columns it leaves alone."""
+    if name in CATEGORY_COLUMNS:
+        return 'category'
+    if name in OUTCOME_COLUMNS:
+        return OUTCOME_DTYPE
+    if name in INT32_COLUMNS:
+        return 'Int32'
+    if name in FLOAT32_COLUMNS:
+        return 'float32'
+    if name in STRING_COLUMNS:
+        return STRING_DTYPE
+    if name in DATETIME_COLUMNS:
+        return 'datetime64[ns]'
+    if name in BOOLEAN_COLUMNS:
+        return 'boolean'
+    return None
+
+
+def apply_schema(df):
+    """
+    Convert the known results columns to their compact types.
+
+    Args:
+        df (pd.DataFrame): Results as read from any results file
+
+    Returns:
+        pd.DataFrame: The same rows and columns, typed
+    """
+    converted = {}
+    for name in df.columns:
+        dtype = column_type(name)
+        series = df[name]
+        if dtype is None or series.dtype == dtype:
+            continue
+        if name in DATETIME_COLUMNS:
+            converted[name] = _to_datetime(series)
+        elif name in BOOLEAN_COLUMNS:
+            converted[name] = _to_boolean(series)
+        elif name in OUTCOME_COLUMNS:
+            values = series.astype(object)
+            converted[name] = values.where(values.isin(OUTCOMES)).astype(OUTCOME_DTYPE)
+        elif name in INT32_COLUMNS:
+            # Rounded like ResultSink stores latencies; unparseable values become NA
+            converted[name] = pd.to_numeric(series, errors='coerce').round().astype('Int32')
+        elif name in FLOAT32_COLUMNS:
+            converted[name] = pd.to_numeric(series, errors='coerce').astype('float32')
+        else:
+            converted[name] = series.astype(dtype)
+    return df.assign(**converted) if converted else df
+
+
+def read_results(path):
+    """Read a CSV or Parquet results file with apply_schema() types."""
+    if path.endswith('.parquet'):
+        return apply_schema(pd.read_parquet(path))
+    categories = {name: 'category' for name in CATEGORY_COLUMNS}
+    return apply_schema(pd.read_csv(path, dtype=categories))
+
+
+def drop_unused_categories(df):
+    """Remove categories no row uses any more, e.g. after filtering, so counts and charts skip them."""
+    converted = {name: df[name].cat.remove_unused_categories()
+                 for name in df.columns if isinstance(df[name].dtype, pd.CategoricalDtype)}
+    return df.assign(**converted) if converted else df
+
+
+def memory_report(frames):
+    """
+    Deep memory footprint of each frame, by column.
+
+    Args:
+        frames (dict): Label -> DataFrame
+
+    Returns:
+        pd.DataFrame: One row per column plus a total row, with each frame's
+            bytes and dtype
+    """
+    columns = list(dict.fromkeys(name for df in frames.values() for name in df.columns))
+    usage = {label: df.memory_usage(deep=True, index=False) for label, df in frames.items()}
+    rows = []
+    for name in columns + ['total']:
+        row = {'column': name}
+        for label, df in frames.items():
+            if name == 'total':
+                row[label] = int(usage[label].sum())
+                row[f"{label} dtype"] = ''
+            else:
+                row[label] = int(usage[label][name]) if name in df.columns else None
+                row[f"{label} dtype"] = str(df[name].dtype) if name in df.columns else ''
+        rows.append(row)
+    return pd.DataFrame(rows).set_index('column').astype({label: 'Int64' for label in frames})
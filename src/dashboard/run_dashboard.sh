@@ -3,6 +3,11 @@
 # Add the Python path where streamlit is installed
 export PATH="$HOME/Library/Python/3.9/bin:$PATH"
 
+# Copy the shared modules (outcomes.py, ...) from their source service
+SCRIPT_DIR=$(cd "$(dirname "$0")" && pwd)
+python3 "$SCRIPT_DIR/../../scripts/sync_shared_modules.py" || exit 1
+cd "$SCRIPT_DIR"
+
 # Run the dashboard
 echo "Starting Vertex AI Agent Dashboard..."
 streamlit run dashboard.py 
\ No newline at end of file
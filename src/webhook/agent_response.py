@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Single-pass extractor for Dialogflow CX detectIntent responses
+
+Every caller used to walk queryResult.responseMessages, keep the first text
+message and ignore the rest. parse_response() reads the payload once and
+returns an AgentResponse holding everything worth keeping: all text
+messages, how the query was matched, the current page/flow/playbook, and
+timings. Raw bytes are decoded with orjson when it is installed.
+
+Edit this file in src/api only: scripts/sync_shared_modules.py copies it
+into src/webhook.
+"""
+import json
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+NO_RESPONSE = "No response from agent"
+
+
+def loads(payload):
+    """Decode a JSON payload (bytes or str), using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+class AgentResponse:
+    """Compact record of one detectIntent response."""
+
+    __slots__ = ('messages', 'match_type', 'intent', 'confidence', 'current_page',
+                 'current_flow', 'playbook', 'response_id', 'end_interaction',
+                 'handoff', 'request_ms', 'parse_ms')
+
+    def __init__(self, messages=None, match_type=None, intent=None, confidence=None,
+                 current_page=None, current_flow=None, playbook=None, response_id=None,
+                 end_interaction=False, handoff=False, request_ms=None, parse_ms=None):
+        self.messages = messages or []
+        self.match_type = match_type
+        self.intent = intent
+        self.confidence = confidence
+        self.current_page = current_page
+        self.current_flow = current_flow
+        self.playbook = playbook
+        self.response_id = response_id
+        self.end_interaction = end_interaction
+        self.handoff = handoff
+        self.request_ms = request_ms
+        self.parse_ms = parse_ms
+
+    @property
+    def text(self):
+        """All text messages joined, or the no-response placeholder."""
+        return "\n".join(self.messages) if self.messages else NO_RESPONSE
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data.get(name) for name in cls.__slots__ if name in data})
+
+
+def _display_name(value):
+    """Display name of a page/flow/intent object, or the last segment of a resource name."""
+    if isinstance(value, dict):
+        return value.get('displayName') or _display_name(value.get('name'))
+    if isinstance(value, str) and value:
+        return value.rsplit('/', 1)[-1]
+    return None
+
+
+def parse_response(payload, request_ms=None):
+    """
+    Extract an AgentResponse from a detectIntent response.
+
+    Args:
+        payload (bytes, str or dict): Raw response body or decoded REST response
+        request_ms (float, optional): Client-measured round trip of the call
+
+    Returns:
+        AgentResponse: The extracted record
+    """
+    start = time.perf_counter()
+    if not isinstance(payload, dict):
+        payload = loads(payload)
+
+    result = payload.get('queryResult') or {}
+    record = AgentResponse(response_id=payload.get('responseId'), request_ms=request_ms)
+
+    for msg in result.get('responseMessages') or ():
+        if 'text' in msg:
+            lines = msg['text'].get('text')
+            if lines:
+                record.messages.append("\n".join(lines))
+        elif 'endInteraction' in msg:
+            record.end_interaction = True
+        elif 'liveAgentHandoff' in msg:
+            record.handoff = True
+
+    match = result.get('match')
+    if match:
+        record.match_type = match.get('matchType')
+        record.intent = _display_name(match.get('intent'))
+        record.confidence = match.get('confidence')
+
+    record.current_page = _display_name(result.get('currentPage'))
+    record.current_flow = _display_name(result.get('currentFlow'))
+
+    playbooks = (result.get('generativeInfo') or {}).get('currentPlaybooks')
+    if playbooks:
+        record.playbook = _display_name(playbooks[-1])
+
+    record.parse_ms = round((time.perf_counter() - start) * 1000, 3)
+    return record
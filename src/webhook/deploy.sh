@@ -17,8 +17,24 @@ VERTEX_AI_APP_ID=${VERTEX_AI_APP_ID:-"8285e0d0-24ae-43e9-8491-b0bd99befc87"}
 BIGQUERY_DATASET=${BIGQUERY_DATASET:-"conversations"}
 BIGQUERY_TABLE=${BIGQUERY_TABLE:-"bia"}
 LOCATION=${LOCATION:-"global"}
+RAW_PAYLOAD_STORE=${RAW_PAYLOAD_STORE:-"table"}
+RAW_PAYLOAD_SAMPLE_RATE=${RAW_PAYLOAD_SAMPLE_RATE:-"0.1"}
+WEBHOOK_BUFFER_DIR=${WEBHOOK_BUFFER_DIR:-"/tmp/webhook_buffer"}
+SCHEDULE_BUDGET=${SCHEDULE_BUDGET:-"10"}
+QUESTION_SET=${QUESTION_SET:-"smoke"}
+DRIFT_THRESHOLD=${DRIFT_THRESHOLD:-"0.6"}
+# Local question_sets/ directory by default; set to gs://bucket/prefix to update sets without redeploying
+QUESTION_SET_URI=${QUESTION_SET_URI:-""}
+
+# Copy the shared modules (outcomes.py, ...) from their source service
+SCRIPT_DIR=$(cd "$(dirname "$0")" && pwd)
+if ! python3 "$SCRIPT_DIR/../../scripts/sync_shared_modules.py"; then
+    echo "Error: could not copy the shared modules."
+    exit 1
+fi
 
 # Deploy the function
+cd "$SCRIPT_DIR"
 gcloud functions deploy $FUNCTION_NAME \
   --gen2 \
   --runtime=python311 \
@@ -27,7 +43,7 @@ gcloud functions deploy $FUNCTION_NAME \
   --entry-point=test_vertex_agent \
   --trigger-http \
   --allow-unauthenticated \
-  --set-env-vars=PROJECT_ID=$PROJECT_ID,LOCATION=$LOCATION,VERTEX_AI_APP_ID=$VERTEX_AI_APP_ID,BIGQUERY_DATASET=$BIGQUERY_DATASET,BIGQUERY_TABLE=$BIGQUERY_TABLE
+  --set-env-vars=PROJECT_ID=$PROJECT_ID,LOCATION=$LOCATION,VERTEX_AI_APP_ID=$VERTEX_AI_APP_ID,BIGQUERY_DATASET=$BIGQUERY_DATASET,BIGQUERY_TABLE=$BIGQUERY_TABLE,RAW_PAYLOAD_STORE=$RAW_PAYLOAD_STORE,RAW_PAYLOAD_SAMPLE_RATE=$RAW_PAYLOAD_SAMPLE_RATE,WEBHOOK_BUFFER_DIR=$WEBHOOK_BUFFER_DIR,SCHEDULE_BUDGET=$SCHEDULE_BUDGET,QUESTION_SET=$QUESTION_SET,DRIFT_THRESHOLD=$DRIFT_THRESHOLD${QUESTION_SET_URI:+,QUESTION_SET_URI=$QUESTION_SET_URI}
 
 if [ $? -eq 0 ]; then
     echo "✅ Function deployed successfully!"
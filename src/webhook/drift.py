@@ -0,0 +1,134 @@
+"""
+Vectorized answer-drift detection
+
+Compares each question's latest answer with a baseline answer and scores
+how much it changed: drift = 1 - cosine similarity of the two answers'
+TF-IDF vectors over word unigrams and bigrams.
+
+All pairs are scored in one batch. Tokens are mapped to integer ids once,
+and every later step (n-gram ids, term counts, IDF, dot products, norms)
+is a NumPy array operation over the whole batch, using sparse
+(pair, term) keys rather than dense document-term matrices. Thousands of
+pairs take a fraction of a second, cheap enough to run after every
+scheduled webhook batch.
+"""
+import re
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.6
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _term_ids(texts):
+    """
+    Unigram and bigram ids for a list of texts.
+
+    Returns:
+        tuple: (doc index per term, term id per term) as int64 arrays
+    """
+    vocab = {}
+    ids = []
+    lengths = np.empty(len(texts), dtype=np.int64)
+    for i, text in enumerate(texts):
+        words = WORD_PATTERN.findall((text or '').lower())
+        lengths[i] = len(words)
+        ids.extend([vocab.setdefault(w, len(vocab)) for w in words])
+
+    unigrams = np.asarray(ids, dtype=np.int64)
+    docs = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+    if unigrams.size == 0:
+        return docs, unigrams
+
+    # Bigram ids: pair adjacent unigram ids within a document, offset past the unigrams
+    vocab_size = len(vocab)
+    same_doc = docs[1:] == docs[:-1]
+    bigrams = vocab_size + unigrams[:-1][same_doc] * vocab_size + unigrams[1:][same_doc]
+    # Renumber densely so later bincounts stay small
+    _, terms = np.unique(np.concatenate([unigrams, bigrams]), return_inverse=True)
+    return np.concatenate([docs, docs[1:][same_doc]]), terms.astype(np.int64)
+
+
+def _tfidf(docs, terms, n_docs):
+    """
+    Sparse TF-IDF weights.
+
+    Returns:
+        tuple: (doc index, term id, weight) arrays, one entry per distinct (doc, term)
+    """
+    if terms.size == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0)
+    # Collapse to distinct (doc, term) keys with counts
+    term_space = int(terms.max()) + 1
+    keys, counts = np.unique(docs * term_space + terms, return_counts=True)
+    doc_of, term_of = np.divmod(keys, term_space)
+
+    # Smoothed IDF over all documents in the batch, sublinear TF
+    df = np.bincount(term_of, minlength=term_space)
+    idf = np.log((1 + n_docs) / (1 + df)) + 1
+    weights = (1 + np.log(counts)) * idf[term_of]
+    return doc_of, term_of, weights
+
+
+def similarity(baseline, latest):
+    """
+    Cosine similarity of TF-IDF vectors for aligned lists of answers.
+
+    Args:
+        baseline (list): Baseline answers
+        latest (list): Latest answers, same length as baseline
+
+    Returns:
+        numpy.ndarray: Similarity per pair, 0.0 to 1.0 (1.0 when both are empty)
+    """
+    n = len(baseline)
+    if n != len(latest):
+        raise ValueError("baseline and latest must have the same length")
+    docs, terms = _term_ids(list(baseline) + list(latest))
+    doc_of, term_of, weights = _tfidf(docs, terms, 2 * n)
+
+    # Pair index and side (0 = baseline, 1 = latest) of every weight
+    pair = doc_of % n
+    side = doc_of // n
+    norms = np.sqrt(np.bincount(doc_of, weights=weights ** 2, minlength=2 * n))
+
+    # Terms present on both sides of a pair contribute to its dot product
+    term_space = int(term_of.max()) + 1 if term_of.size else 1
+    keys = pair * term_space + term_of
+    base, new = side == 0, side == 1
+    _, in_base, in_new = np.intersect1d(keys[base], keys[new], assume_unique=True, return_indices=True)
+    dots = np.bincount(pair[base][in_base], weights=weights[base][in_base] * weights[new][in_new], minlength=n)
+
+    denominators = norms[:n] * norms[n:]
+    sims = np.divide(dots, denominators, out=np.zeros(n), where=denominators > 0)
+    # Two empty answers are identical
+    sims[(norms[:n] == 0) & (norms[n:] == 0)] = 1.0
+    return np.clip(sims, 0.0, 1.0)
+
+
+def drift_scores(baseline, latest):
+    """1 - similarity for each (baseline, latest) pair."""
+    return 1.0 - similarity(baseline, latest)
+
+
+def drift_report(questions, baseline, latest, threshold=DEFAULT_THRESHOLD):
+    """
+    Score and flag a batch of questions.
+
+    Args:
+        questions (list): Question texts
+        baseline (list): Baseline answer per question
+        latest (list): Latest answer per question
+        threshold (float): Drift at or above which a question is flagged
+
+    Returns:
+        list: Dicts with question, drift and flagged, highest drift first
+    """
+    scores = drift_scores(baseline, latest)
+    order = np.argsort(-scores, kind='stable')
+    return [{
+        'question': questions[i],
+        'drift': round(float(scores[i]), 4),
+        'flagged': bool(scores[i] >= threshold),
+    } for i in order]
@@ -1,28 +1,169 @@
 import functions_framework
 import json
 import os
-import google.auth
-import google.auth.transport.requests
-from google.cloud import bigquery
-import requests
+import time
+import threading
 from datetime import datetime
 
-# Test questions for the Vertex AI agent
-TEST_QUESTIONS = [
-    "What are the best practices for data modeling in Looker?",
-    "How do I optimize a BigQuery query with many joins?",
-    "What's the difference between explores and views in Looker?",
-    "How can I create a dashboard in Looker Studio?",
-    "What are the benefits of using dbt with BigQuery?",
-    "How can I connect to BigQuery Omni from GCP?",
-    "What's the difference between LookML and SQL?",
-    "How do I create a derived table in Looker?",
-    "What are the best practices for BigQuery partitioning?",
-    "How can I implement row-level security in Looker?"
-]
+from agent_response import loads, parse_response
+from payload_store import RESPONSE_COLUMNS, create_payload_logger, response_columns
+from row_buffer import RowBuffer, DEFAULT_BUFFER_DIR
+import scheduler
+from question_sets import check_name, create_loader
+from outcomes import ERROR, classify_record
+
+# google-auth, requests and the BigQuery client are imported on first use (or
+# by the preload thread below) so they do not add to cold-start import time.
+# Clients are cached at module level and reused across warm invocations.
+_bigquery_client = None
+_checked_tables = set()
+_payload_logger = None
+_row_buffer = None
+_agent_version = (None, 0)
+
+# Scheduled (GET) runs ask only stale or unstable questions, up to SCHEDULE_BUDGET;
+# SCHEDULE_POLICY=all (or ?all=true) asks every question as before
+SCHEDULE_POLICY = os.environ.get('SCHEDULE_POLICY', 'stale')
+AGENT_VERSION_TTL_SECONDS = 300
+
+# Rows are written to a local write-ahead buffer and delivered in the background;
+# each invocation waits up to BUFFER_DRAIN_SECONDS at the end for delivery
+BUFFER_DIR = os.environ.get('WEBHOOK_BUFFER_DIR', DEFAULT_BUFFER_DIR)
+BUFFER_DRAIN_SECONDS = float(os.environ.get('BUFFER_DRAIN_SECONDS', 30))
+
+# Question sets (see question_sets.py): QUESTION_SET names the set asked by
+# scheduled runs; sets are loaded from QUESTION_SET_URI and cached in memory
+DEFAULT_QUESTION_SET = os.environ.get('QUESTION_SET', 'smoke')
+question_sets = create_loader()
+
+# After each scheduled batch, answers are compared with the question's previous
+# answer (see drift.py); questions drifting by DRIFT_THRESHOLD or more are flagged
+DRIFT_THRESHOLD = os.environ.get('DRIFT_THRESHOLD')
+
+def _preload():
+    """Import the heavy client libraries in the background during startup."""
+    try:
+        import requests
+        import google.auth.transport.requests
+        from google.cloud import bigquery
+        import drift
+    except Exception as e:
+        print(f"Background preload failed: {e}")
+
+if os.environ.get('WEBHOOK_PRELOAD', 'true').lower() == 'true':
+    threading.Thread(target=_preload, name='webhook-preload', daemon=True).start()
+
+def get_bigquery_client(project_id):
+    """Return a BigQuery client, creating it on first use."""
+    global _bigquery_client
+    if _bigquery_client is None or _bigquery_client.project != project_id:
+        from google.cloud import bigquery
+        _bigquery_client = bigquery.Client(project=project_id)
+    return _bigquery_client
+
+def get_row_buffer(project_id, results_table_ref):
+    """
+    Return the write-ahead row buffer, creating it on first use.
+
+    Creating it starts the background flusher, which also replays segments
+    left undelivered by earlier invocations.
+    """
+    global _row_buffer
+    if _row_buffer is None:
+        def insert_rows(table_ref, rows, row_ids):
+            client = get_bigquery_client(project_id)
+            # Ensure the results table exists (create if it doesn't); checked once per instance
+            if table_ref == results_table_ref and table_ref not in _checked_tables:
+                ensure_table(client, table_ref)
+                _checked_tables.add(table_ref)
+            return client.insert_rows_json(table_ref, rows, row_ids=row_ids)
+
+        _row_buffer = RowBuffer(BUFFER_DIR, insert_rows)
+        _row_buffer.start()
+    return _row_buffer
+
+def get_payload_logger(project_id, dataset_id, table_id):
+    """Return the raw payload logger (RAW_PAYLOAD_STORE), creating it on first use."""
+    global _payload_logger
+    if _payload_logger is None:
+        buffer = get_row_buffer(project_id, f"{project_id}.{dataset_id}.{table_id}")
+        _payload_logger = create_payload_logger(get_bigquery_client, project_id, dataset_id, table_id, buffer)
+    return _payload_logger
+
+def get_agent_version(access_token, project_id, location, agent_id):
+    """Return the agent version fingerprint, cached for a few minutes across invocations."""
+    global _agent_version
+    version, expires_at = _agent_version
+    if time.time() >= expires_at:
+        version = scheduler.agent_version(access_token, project_id, location, agent_id)
+        _agent_version = (version, time.time() + AGENT_VERSION_TTL_SECONDS)
+    return version
+
+def load_question_states(project_id, table_ref):
+    """
+    Read recent per-question history from the results table.
+
+    Returns:
+        dict: question -> scheduler.QuestionState (empty if the history cannot be read)
+    """
+    client = get_bigquery_client(project_id)
+    try:
+        if table_ref not in _checked_tables:
+            ensure_table(client, table_ref)
+            _checked_tables.add(table_ref)
+        return scheduler.load_states(client, table_ref)
+    except Exception as e:
+        # Without history every question counts as new; the budget still applies
+        print(f"Could not load question history: {e}")
+        return {}
+
+def select_scheduled_questions(states, version, question_set, ask_all=False):
+    """
+    Pick the questions this scheduled run should ask from a question set.
+
+    Returns:
+        list: (question, reason) pairs
+    """
+    return scheduler.select_for_run(question_set.texts(), states, version, SCHEDULE_POLICY, ask_all,
+                                    weight=question_set.weight if question_set.weights else None)
+
+def score_drift(rows, states):
+    """
+    Set drift_score on each row whose question has a previous answer.
+
+    Args:
+        rows (list): Result rows from build_log_row
+        states (dict): question -> scheduler.QuestionState, newest answer first
+
+    Returns:
+        list: Drift report entries (question, drift, flagged), highest drift first
+    """
+    # Failed calls have no answer to compare
+    pairs = [(row, states[row["question"]].answers[0]) for row in rows
+             if row.get("outcome") != ERROR and row["question"] in states and states[row["question"]].answers]
+    if not pairs:
+        return []
+    import drift
+
+    threshold = float(DRIFT_THRESHOLD) if DRIFT_THRESHOLD else drift.DEFAULT_THRESHOLD
+    start = time.perf_counter()
+    report = drift.drift_report([row["question"] for row, _ in pairs],
+                                [baseline for _, baseline in pairs],
+                                [row["response_text"] for row, _ in pairs],
+                                threshold)
+    scores = {entry["question"]: entry["drift"] for entry in report}
+    for row, _ in pairs:
+        row["drift_score"] = scores[row["question"]]
+    flagged = sum(entry["flagged"] for entry in report)
+    print(f"Drift: scored {len(pairs)} answers in {(time.perf_counter() - start) * 1000:.1f} ms, "
+          f"{flagged} at or above {threshold}")
+    return report
 
 def get_access_token():
     """Get an OAuth 2.0 access token using the default credentials."""
+    import google.auth
+    import google.auth.transport.requests
+
     credentials, project = google.auth.default(
         scopes=['https://www.googleapis.com/auth/cloud-platform']
     )
@@ -31,32 +172,94 @@ def get_access_token():
     return credentials.token
 
 def log_to_bigquery(project_id, dataset_id, table_id, data):
-    """Log the question and response to BigQuery."""
-    client = bigquery.Client(project=project_id)
+    """Queue the question and response for BigQuery via the write-ahead buffer."""
     table_ref = f"{project_id}.{dataset_id}.{table_id}"
-    
-    # Ensure the table exists (create if it doesn't)
+    get_row_buffer(project_id, table_ref).append(table_ref, data)
+    return True
+
+def ensure_table(client, table_ref):
+    """Create the results table if it does not exist yet, or add missing columns."""
+    from google.cloud import bigquery
+
+    schema = [
+        bigquery.SchemaField("question", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("response_text", "STRING", mode="NULLABLE"),
+        # Legacy raw payload columns; new rows leave them empty (see payload_store.py
+        # and agent-api/scripts/backfill_payload_columns.py)
+        bigquery.SchemaField("full_response", "STRING", mode="NULLABLE"),
+        bigquery.SchemaField("timestamp", "TIMESTAMP", mode="REQUIRED"),
+        bigquery.SchemaField("response_record", "STRING", mode="NULLABLE"),
+        # Agent version the question was asked against (see scheduler.py)
+        bigquery.SchemaField("agent_version", "STRING", mode="NULLABLE"),
+        # Question set, version and catalog labels (see question_sets.py)
+        bigquery.SchemaField("question_set", "STRING", mode="NULLABLE"),
+        bigquery.SchemaField("question_set_version", "STRING", mode="NULLABLE"),
+        bigquery.SchemaField("category", "STRING", mode="NULLABLE"),
+        bigquery.SchemaField("difficulty", "STRING", mode="NULLABLE"),
+        # answered, clarifying, handoff, refusal, empty or error (see outcomes.py)
+        bigquery.SchemaField("outcome", "STRING", mode="NULLABLE"),
+        # 1 - similarity to the question's previous answer (see drift.py)
+        bigquery.SchemaField("drift_score", "FLOAT", mode="NULLABLE"),
+    ] + [bigquery.SchemaField(name, field_type, mode="NULLABLE") for name, field_type in RESPONSE_COLUMNS]
     try:
-        client.get_table(table_ref)
+        table = client.get_table(table_ref)
     except Exception:
         # Create table
-        schema = [
-            bigquery.SchemaField("question", "STRING", mode="REQUIRED"),
-            bigquery.SchemaField("response_text", "STRING", mode="NULLABLE"),
-            bigquery.SchemaField("full_response", "STRING", mode="NULLABLE"),
-            bigquery.SchemaField("timestamp", "TIMESTAMP", mode="REQUIRED"),
-        ]
         table = bigquery.Table(table_ref, schema=schema)
         client.create_table(table, exists_ok=True)
-    
-    # Insert row
-    rows_to_insert = [data]
-    errors = client.insert_rows_json(table_ref, rows_to_insert)
-    
-    if errors:
-        print(f"Error inserting rows: {errors}")
-        return False
-    return True
+        return
+
+    existing = {field.name for field in table.schema}
+    missing = [field for field in schema if field.name not in existing]
+    if missing:
+        table.schema = list(table.schema) + missing
+        client.update_table(table, ["schema"])
+
+def ask_agent(api_url, access_token, question):
+    """
+    Send one question to the agent.
+
+    Returns:
+        tuple: (HTTP status code, AgentResponse, decoded response payload)
+    """
+    import requests
+
+    payload = {
+        "queryInput": {
+            "text": {
+                "text": question
+            },
+            "languageCode": "en"
+        }
+    }
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": "application/json"
+    }
+    start = time.perf_counter()
+    response = requests.post(api_url, headers=headers, json=payload)
+    request_ms = (time.perf_counter() - start) * 1000
+    payload = loads(response.content)
+    return response.status_code, parse_response(payload, request_ms=request_ms), payload
+
+def build_log_row(question, record, payload_hash=None, version=None, question_set=None, status_code=None):
+    """BigQuery row for one answer: extracted columns instead of the raw payload."""
+    row = {
+        "question": question,
+        "response_text": record.text,
+        "outcome": classify_record(record, status_code),
+        "agent_version": version,
+        "timestamp": datetime.now().isoformat()
+    }
+    entry = question_set.get(question) if question_set else None
+    if question_set:
+        row["question_set"] = question_set.name
+        row["question_set_version"] = question_set.version
+    if entry:
+        row["category"] = entry.get("category")
+        row["difficulty"] = entry.get("difficulty")
+    row.update(response_columns(record, payload_hash))
+    return row
 
 @functions_framework.http
 def test_vertex_agent(request):
@@ -67,75 +270,99 @@ def test_vertex_agent(request):
     agent_id = os.environ.get('VERTEX_AI_APP_ID', '8285e0d0-24ae-43e9-8491-b0bd99befc87')
     bq_dataset = os.environ.get('BIGQUERY_DATASET', 'conversations')
     bq_table = os.environ.get('BIGQUERY_TABLE', 'bia')
+    # Creating the buffer replays rows left undelivered by earlier invocations
+    payload_logger = get_payload_logger(project_id, bq_dataset, bq_table)
+    row_buffer = get_row_buffer(project_id, f"{project_id}.{bq_dataset}.{bq_table}")
     
     # Get access token for authentication
     access_token = get_access_token()
+    version = get_agent_version(access_token, project_id, location, agent_id)
     
     # Process request
     if request.method == 'GET':
         # Handle scheduled invocation or testing
         results = []
         
-        for question in TEST_QUESTIONS:
+        try:
+            set_name = check_name(request.args.get('set', DEFAULT_QUESTION_SET))
+        except ValueError:
+            return json.dumps({
+                "status": "error",
+                "message": "Invalid question set name"
+            }), 400
+        try:
+            question_set = question_sets.load(set_name)
+        except Exception as e:
+            print(f"Could not load question set {set_name}: {e}")
+            return json.dumps({
+                "status": "error",
+                "message": "Could not load question set"
+            }), 500
+        
+        # History drives both question selection and the drift baselines
+        states = load_question_states(project_id, f"{project_id}.{bq_dataset}.{bq_table}")
+        selected = select_scheduled_questions(states, version, question_set, request.args.get('all') == 'true')
+        print(f"Scheduled run: asking {len(selected)} of {len(question_set)} questions "
+              f"from {question_set.name} {question_set.version}")
+        
+        rows = []
+        for question, reason in selected:
             # Prepare the API URL
             api_url = f"https://dialogflow.googleapis.com/v3/projects/{project_id}/locations/{location}/agents/{agent_id}/sessions/test-session-{datetime.now().timestamp()}:detectIntent"
             
-            # Prepare the request payload
-            payload = {
-                "queryInput": {
-                    "text": {
-                        "text": question
-                    },
-                    "languageCode": "en"
-                }
-            }
-            
-            # Set headers with authentication
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json"
-            }
-            
+            # Make the API call and extract every message, the match and the playbook
             try:
-                # Make the API call
-                response = requests.post(api_url, headers=headers, json=payload)
-                response_data = response.json()
-                
-                # Extract the response text from the agent
-                response_text = "No response text found"
-                if "queryResult" in response_data and "responseMessages" in response_data["queryResult"]:
-                    for msg in response_data["queryResult"]["responseMessages"]:
-                        if "text" in msg and "text" in msg["text"]:
-                            response_text = "\n".join(msg["text"]["text"])
-                            break
-                
-                # Log to BigQuery
-                log_data = {
-                    "question": question,
-                    "response_text": response_text,
-                    "full_response": json.dumps(response_data),
-                    "timestamp": datetime.now().isoformat()
-                }
-                
-                log_to_bigquery(project_id, bq_dataset, bq_table, log_data)
+                status_code, record, payload = ask_agent(api_url, access_token, question)
+                row = build_log_row(question, record, payload_logger.log(payload), version, question_set, status_code)
+                rows.append(row)
                 
                 # Add to results
                 results.append({
                     "question": question,
-                    "response": response_text,
-                    "status": response.status_code
+                    "reason": reason,
+                    "response": record.text,
+                    "outcome": row["outcome"],
+                    "status": status_code
                 })
                 
             except Exception as e:
+                print(f"Question failed: {question}: {e}")
                 results.append({
                     "question": question,
-                    "error": str(e),
+                    "reason": reason,
+                    "error": "Agent request failed",
                     "status": "Error"
                 })
         
+        # Score the batch against previous answers, then log to BigQuery
+        try:
+            drift_entries = score_drift(rows, states)
+        except Exception as e:
+            # Drift scoring must never lose the batch's rows
+            print(f"Drift scoring failed: {e}")
+            drift_entries = []
+        for row in rows:
+            log_to_bigquery(project_id, bq_dataset, bq_table, row)
+        scores = {entry["question"]: entry["drift"] for entry in drift_entries}
+        for result in results:
+            if result["question"] in scores:
+                result["drift"] = scores[result["question"]]
+        
+        # Deliver this invocation's rows before the instance goes idle
+        _, pending = row_buffer.drain(BUFFER_DRAIN_SECONDS)
+        
         return json.dumps({
             "status": "success",
             "results": results,
+            "question_set": question_set.name,
+            "question_set_version": question_set.version,
+            "skipped": len(question_set) - len(selected),
+            "agent_version": version,
+            "drift": {
+                "scored": len(drift_entries),
+                "flagged": [entry for entry in drift_entries if entry["flagged"]]
+            },
+            "logging": {"pending_rows": pending},
             "timestamp": datetime.now().isoformat()
         }), 200
     
@@ -144,74 +371,62 @@ def test_vertex_agent(request):
         try:
             request_json = request.get_json(silent=True)
             
-            if not request_json or 'questions' not in request_json:
+            if not request_json or not ('questions' in request_json or 'questionSet' in request_json):
                 return json.dumps({
                     "status": "error",
-                    "message": "Please provide a 'questions' array in the request body"
+                    "message": "Please provide a 'questions' array or a 'questionSet' name in the request body"
                 }), 400
             
-            custom_questions = request_json['questions']
+            # A named set is sampled by its category/difficulty weights
+            question_set = None
+            if 'questionSet' in request_json:
+                try:
+                    set_name = check_name(request_json['questionSet'])
+                except ValueError:
+                    return json.dumps({
+                        "status": "error",
+                        "message": "Invalid question set name"
+                    }), 400
+                question_set = question_sets.load(set_name)
+                custom_questions = question_set.sample(int(request_json.get('count', len(question_set))))
+            else:
+                custom_questions = request_json['questions']
             results = []
             
             for question in custom_questions:
                 # Prepare the API URL
                 api_url = f"https://dialogflow.googleapis.com/v3/projects/{project_id}/locations/{location}/agents/{agent_id}/sessions/test-session-{datetime.now().timestamp()}:detectIntent"
                 
-                # Prepare the request payload
-                payload = {
-                    "queryInput": {
-                        "text": {
-                            "text": question
-                        },
-                        "languageCode": "en"
-                    }
-                }
-                
-                # Set headers with authentication
-                headers = {
-                    "Authorization": f"Bearer {access_token}",
-                    "Content-Type": "application/json"
-                }
-                
-                # Make the API call
-                response = requests.post(api_url, headers=headers, json=payload)
-                response_data = response.json()
-                
-                # Extract the response text from the agent
-                response_text = "No response text found"
-                if "queryResult" in response_data and "responseMessages" in response_data["queryResult"]:
-                    for msg in response_data["queryResult"]["responseMessages"]:
-                        if "text" in msg and "text" in msg["text"]:
-                            response_text = "\n".join(msg["text"]["text"])
-                            break
+                # Make the API call and extract every message, the match and the playbook
+                status_code, record, payload = ask_agent(api_url, access_token, question)
                 
                 # Log to BigQuery
-                log_data = {
-                    "question": question,
-                    "response_text": response_text,
-                    "full_response": json.dumps(response_data),
-                    "timestamp": datetime.now().isoformat()
-                }
-                
-                log_to_bigquery(project_id, bq_dataset, bq_table, log_data)
+                row = build_log_row(question, record, payload_logger.log(payload), version, question_set, status_code)
+                log_to_bigquery(project_id, bq_dataset, bq_table, row)
                 
                 # Add to results
                 results.append({
                     "question": question,
-                    "response": response_text,
-                    "status": response.status_code
+                    "response": record.text,
+                    "outcome": row["outcome"],
+                    "status": status_code
                 })
             
+            # Deliver this invocation's rows before the instance goes idle
+            _, pending = row_buffer.drain(BUFFER_DRAIN_SECONDS)
+            
             return json.dumps({
                 "status": "success",
                 "results": results,
+                "logging": {"pending_rows": pending},
                 "timestamp": datetime.now().isoformat()
             }), 200
             
         except Exception as e:
+            print(f"Custom question request failed: {e}")
             return json.dumps({
                 "status": "error",
-                "message": str(e)
+                "message": "Internal error while processing the questions"
             }), 500
     
     else:
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Outcome classifier for agent answers
+
+Runners used to count an answer as an error when it contained "error",
+"failed" or "status code" anywhere, which mislabels real answers about error
+handling, while the dashboards only checked startswith('ERROR'). classify()
+is the single rule set used everywhere. It returns one of OUTCOMES:
+
+- error: non-2xx HTTP status, a structured error field, or one of the
+  messages the runners record when a call fails ("Agent API call failed
+  with status code 500: ...", "ERROR: ...", ...)
+- empty: no answer text
+- handoff: the agent flagged a live-agent handoff, or routes the user to
+  another agent or expert
+- refusal: the agent declines to answer
+- clarifying: the agent asks the user for more details instead of answering
+- answered: everything else
+
+Structured signals are checked first; text patterns are compiled once and
+anchored or phrase-specific, so mentioning an error in an answer is not an
+error. outcome_column() applies the same rules to a results DataFrame and
+returns a pandas categorical.
+
+Edit this file in src/api only: scripts/sync_shared_modules.py copies it
+into src/webhook and src/dashboard.
+"""
+import re
+
+ANSWERED = 'answered'
+CLARIFYING = 'clarifying'
+HANDOFF = 'handoff'
+REFUSAL = 'refusal'
+EMPTY = 'empty'
+ERROR = 'error'
+
+# Category order used for the categorical column
+OUTCOMES = (ANSWERED, CLARIFYING, HANDOFF, REFUSAL, EMPTY, ERROR)
+
+# Placeholders written when the agent returned no text
+EMPTY_ANSWERS = {'', 'no response from agent', 'no response from model', 'no response text found', 'none', 'nan'}
+
+# Messages written by the runners, the API and the webhook when a call fails
+ERROR_PATTERN = re.compile(
+    r"\s*(?:ERROR\b"
+    r"|Error(?: sending request| processing request| in API call)?:"
+    r"|Agent API call failed\b"
+    r"|API call failed\b"
+    r"|Credentials file not found:"
+    r"|An error occurred:"
+    r"|Exception(?: occurred)?:"
+    r"|\{\s*\"error\"\s*:)"
+)
+
+_APOSTROPHE = r"['’]"
+
+# Handoffs, refusals and clarifying questions are found with one literal
+# keyword per phrase plus a pattern that confirms the phrase around it.
+# str.find() locates the keywords, and each pattern only runs on the
+# CONTEXT_CHARS on either side of a hit, so an answer that contains none of
+# the keywords costs a few substring checks. Patterns run on lowercased text.
+CONTEXT_CHARS = 60
+
+HANDOFF_KEYWORDS = ('route you', 'connect you', 'pass you', 'transfer', 'introduce you', 'hand you',
+                    'speak with', 'live agent', 'human agent')
+HANDOFF_PATTERN = re.compile(
+    r"\b(?:i(?:" + _APOSTROPHE + r"ll| will| can|" + _APOSTROPHE + r"m going to|" + _APOSTROPHE + r"d like to)"
+    r"|let me|would you like me to)\s+(?:route|connect|pass|transfer|introduce|hand)\s+you\b"
+    r"|\bwould you like to (?:be transferred|speak with)\b"
+    r"|\b(?:live|human) agent\b"
+)
+
+REFUSAL_KEYWORDS = ("can't", "can’t", 'cannot', 'can not', 'unable to', 'not able to', "won't", "won’t",
+                    'outside', 'beyond', "don't have", "don’t have", 'do not have')
+REFUSAL_PATTERN = re.compile(
+    r"\bi(?: can(?:not|" + _APOSTROPHE + r"t| not)| am unable to|" + _APOSTROPHE + r"m unable to"
+    r"| am not able to|" + _APOSTROPHE + r"m not able to| won" + _APOSTROPHE + r"t)"
+    r" (?:help|assist|answer|provide|share|discuss|respond)\b"
+    r"|\b(?:outside|beyond) (?:of )?(?:my|the) (?:scope|expertise|area)\b"
+    r"|\bi(?: don" + _APOSTROPHE + r"t| do not) have (?:access|information|details) (?:to|about|on)\b"
+)
+
+CLARIFYING_KEYWORDS = ('could you', 'can you', 'would you', 'i need', 'what type', 'what kind', 'in mind',
+                       'do you mean', 'referring to', 'more specific', 'would you prefer')
+CLARIFYING_PATTERN = re.compile(
+    r"\b(?:could|can|would) you (?:please )?(?:tell me|clarify|specify|share|describe|explain what"
+    r"|provide (?:more|some|a few|additional) (?:details|information|context))\b"
+    r"|\bi need (?:some |a bit )?more (?:information|details|context)\b"
+    r"|\bwhat (?:type|kind)s? of [^.?!]{0,60}\b(?:are|do) you (?:working with|using|have)\b[^.?!]*\?"
+    r"|\bdo you have (?:a |any )?(?:specific|particular) [^.?!]{0,40}in mind\?"
+    r"|\b(?:do you mean|are you referring to|could you be more specific|would you prefer)\b"
+)
+
+# Checked in this order; the first rule that matches wins
+TEXT_RULES = (
+    (HANDOFF, HANDOFF_KEYWORDS, HANDOFF_PATTERN),
+    (REFUSAL, REFUSAL_KEYWORDS, REFUSAL_PATTERN),
+    (CLARIFYING, CLARIFYING_KEYWORDS, CLARIFYING_PATTERN),
+)
+
+
+def _matches(lowered, keywords, pattern):
+    """True if pattern matches around any occurrence of one of the keywords."""
+    for keyword in keywords:
+        hit = lowered.find(keyword)
+        while hit >= 0:
+            if pattern.search(lowered, max(0, hit - CONTEXT_CHARS), hit + len(keyword) + CONTEXT_CHARS):
+                return True
+            hit = lowered.find(keyword, hit + 1)
+    return False
+
+
+def classify(answer, status_code=None, error=None, handoff=None):
+    """
+    Classify one agent answer.
+
+    Args:
+        answer (str): Answer text (or the error message recorded instead)
+        status_code (int, optional): HTTP status of the agent call
+        error (optional): Structured error field from the response, if any
+        handoff (bool, optional): Live-agent handoff flag from the response
+
+    Returns:
+        str: One of OUTCOMES
+    """
+    if error or (status_code is not None and not 200 <= int(status_code) < 300):
+        return ERROR
+    text = answer if isinstance(answer, str) else ('' if answer is None else str(answer))
+    if text.strip().lower() in EMPTY_ANSWERS:
+        return EMPTY
+    if ERROR_PATTERN.match(text):
+        return ERROR
+    if handoff:
+        return HANDOFF
+    lowered = text.lower()
+    for outcome, keywords, pattern in TEXT_RULES:
+        if _matches(lowered, keywords, pattern):
+            return outcome
+    return ANSWERED
+
+
+def classify_record(record, status_code=None):
+    """Classify an AgentResponse (see agent_response.py), using its handoff flag."""
+    return classify(record.text if record.messages else '', status_code, handoff=record.handoff)
+
+
+def outcome_column(df):
+    """
+    Outcome of every row of a results DataFrame, as a pandas categorical.
+
+    Uses a stored outcome column where present; other rows are classified
+    from answer (and status_code / success when the file has them).
+    """
+    import pandas as pd
+
+    stored = df['outcome'] if 'outcome' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    answers = df['answer'] if 'answer' in df.columns else pd.Series('', index=df.index)
+    status = df['status_code'] if 'status_code' in df.columns else None
+    failed = ~df['success'].astype(str).str.lower().isin(('true', '1')) if 'success' in df.columns else None
+
+    values = []
+    for i, (outcome, answer) in enumerate(zip(stored.tolist(), answers.tolist())):
+        if isinstance(outcome, str) and outcome in OUTCOMES:
+            values.append(outcome)
+            continue
+        code = status.iat[i] if status is not None else None
+        code = int(code) if code is not None and not pd.isna(code) else None
+        values.append(ERROR if failed is not None and failed.iat[i] else classify(answer, code))
+    return pd.Series(pd.Categorical(values, categories=OUTCOMES), index=df.index, name='outcome')
@@ -0,0 +1,227 @@
+"""
+Column extraction and compressed, deduplicated storage of raw agent payloads
+
+Result rows used to carry the whole detectIntent JSON in full_response, which
+was most of the table's storage and scan cost while nothing read it. Rows
+now get the useful fields as columns (RESPONSE_COLUMNS) plus a payload_hash,
+and the raw payload goes to a side store:
+
+- "table": a BigQuery side table (<table>_payloads) with gzip'd payloads
+- "blobs": gzip files under a local directory, <dir>/<hash[:2]>/<hash>.json.gz
+- "none": raw payloads are not kept
+
+Payloads are content-addressed: the hash covers the payload without the
+fields that change on every call (responseId and diagnosticInfo), so the
+same answer is stored once. Only a sample of payloads (RAW_PAYLOAD_SAMPLE_RATE)
+is stored at all; every row still records its hash. The sampling decision is
+taken from the hash, not a random draw, so a given payload is either always
+or never kept, on every instance and in every run.
+"""
+import os
+import gzip
+import json
+import base64
+import hashlib
+import threading
+from datetime import datetime
+
+# Extracted columns added to the results table, as (name, BigQuery type)
+RESPONSE_COLUMNS = [
+    ("message_count", "INTEGER"),
+    ("match_type", "STRING"),
+    ("intent", "STRING"),
+    ("confidence", "FLOAT"),
+    ("current_page", "STRING"),
+    ("current_flow", "STRING"),
+    ("playbook", "STRING"),
+    ("response_id", "STRING"),
+    ("end_interaction", "BOOLEAN"),
+    ("handoff", "BOOLEAN"),
+    ("request_ms", "FLOAT"),
+    ("payload_hash", "STRING"),
+]
+
+# Side table of raw payloads, as (name, BigQuery type, mode)
+PAYLOAD_TABLE_SCHEMA = [
+    ("payload_hash", "STRING", "REQUIRED"),
+    ("payload_gzip", "BYTES", "REQUIRED"),
+    ("raw_bytes", "INTEGER", "NULLABLE"),
+    ("stored_at", "TIMESTAMP", "REQUIRED"),
+]
+
+DEFAULT_SAMPLE_RATE = 0.1
+DEFAULT_BLOB_DIR = '/tmp/raw_payloads'
+
+
+def response_columns(record, payload_hash=None):
+    """Column values for an AgentResponse record."""
+    return {
+        "message_count": len(record.messages),
+        "match_type": record.match_type,
+        "intent": record.intent,
+        "confidence": record.confidence,
+        "current_page": record.current_page,
+        "current_flow": record.current_flow,
+        "playbook": record.playbook,
+        "response_id": record.response_id,
+        "end_interaction": record.end_interaction,
+        "handoff": record.handoff,
+        "request_ms": round(record.request_ms, 1) if record.request_ms is not None else None,
+        "payload_hash": payload_hash,
+    }
+
+
+def canonical_payload(payload):
+    """Return the payload without per-call fields, serialized deterministically."""
+    payload = {k: v for k, v in payload.items() if k != 'responseId'}
+    result = payload.get('queryResult')
+    if isinstance(result, dict) and 'diagnosticInfo' in result:
+        payload['queryResult'] = {k: v for k, v in result.items() if k != 'diagnosticInfo'}
+    return json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def payload_hash(canonical):
+    return hashlib.sha256(canonical).hexdigest()
+
+
+def sampled(digest, sample_rate):
+    """Whether a payload is in the sample: its hash, read as a fraction in [0, 1), is below sample_rate."""
+    return int(digest[:8], 16) / 0x100000000 < sample_rate
+
+
+class BlobPayloadStore:
+    """Gzip'd payload files in a local directory, one per hash."""
+
+    name = 'blobs'
+
+    def __init__(self, directory=DEFAULT_BLOB_DIR):
+        self.directory = directory
+
+    def path(self, digest):
+        return os.path.join(self.directory, digest[:2], f"{digest}.json.gz")
+
+    def put(self, digest, canonical):
+        """Store a payload unless it is already there. Returns True if written."""
+        path = self.path(digest)
+        if os.path.exists(path):
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, 'wb') as f:
+            f.write(canonical)
+        os.replace(tmp_path, path)
+        return True
+
+    def get(self, digest):
+        with gzip.open(self.path(digest), 'rb') as f:
+            return json.loads(f.read())
+
+
+class TablePayloadStore:
+    """
+    Gzip'd payloads in a BigQuery side table.
+
+    Hashes written by this instance are remembered so repeats are skipped;
+    a hash written by another instance can appear twice in the table, so
+    readers should pick any one row per payload_hash. With a row buffer
+    (row_buffer.RowBuffer) rows are queued for its flusher instead of being
+    inserted inline.
+    """
+
+    name = 'table'
+
+    def __init__(self, client, table_ref, buffer=None):
+        self.client = client
+        self.table_ref = table_ref
+        self.buffer = buffer
+        self._seen = set()
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def ensure_table(self):
+        from google.cloud import bigquery
+
+        schema = [bigquery.SchemaField(name, field_type, mode=mode)
+                  for name, field_type, mode in PAYLOAD_TABLE_SCHEMA]
+        self.client.create_table(bigquery.Table(self.table_ref, schema=schema), exists_ok=True)
+
+    def put(self, digest, canonical):
+        with self._lock:
+            if digest in self._seen:
+                return False
+            if not self._ready:
+                self.ensure_table()
+                self._ready = True
+            self._seen.add(digest)
+
+        row = {
+            "payload_hash": digest,
+            "payload_gzip": base64.b64encode(gzip.compress(canonical)).decode('ascii'),
+            "raw_bytes": len(canonical),
+            "stored_at": datetime.now().isoformat(),
+        }
+        if self.buffer is not None:
+            self.buffer.append(self.table_ref, row)
+            return True
+
+        errors = self.client.insert_rows_json(self.table_ref, [row])
+        if errors:
+            print(f"Error storing raw payload {digest}: {errors}")
+            with self._lock:
+                self._seen.discard(digest)
+            return False
+        return True
+
+
+class PayloadLogger:
+    """
+    Hashes every payload and stores a sample of them.
+
+    Args:
+        store: BlobPayloadStore, TablePayloadStore, or None to keep no payloads
+        sample_rate (float): Share of payloads stored, 0.0 to 1.0
+    """
+
+    def __init__(self, store=None, sample_rate=DEFAULT_SAMPLE_RATE):
+        self.store = store
+        self.sample_rate = sample_rate
+
+    def log(self, payload):
+        """
+        Returns:
+            str: The payload's content hash (recorded on the row even when
+            the payload itself is not sampled)
+        """
+        canonical = canonical_payload(payload)
+        digest = payload_hash(canonical)
+        if self.store is not None and sampled(digest, self.sample_rate):
+            try:
+                self.store.put(digest, canonical)
+            except Exception as e:
+                # Losing a sampled payload must never fail the question
+                print(f"Error storing raw payload {digest}: {e}")
+        return digest
+
+
+def create_payload_logger(get_client, project_id, dataset_id, table_id, buffer=None):
+    """
+    Build the payload logger from environment configuration.
+
+    RAW_PAYLOAD_STORE is "table" (default), "blobs" or "none";
+    RAW_PAYLOAD_SAMPLE_RATE is the share of payloads kept (default 0.1);
+    RAW_PAYLOAD_TABLE names the side table (default <table>_payloads);
+    RAW_PAYLOAD_DIR is the blob directory. Side-table rows go through
+    buffer when one is given.
+    """
+    mode = os.environ.get('RAW_PAYLOAD_STORE', 'table')
+    sample_rate = float(os.environ.get('RAW_PAYLOAD_SAMPLE_RATE', DEFAULT_SAMPLE_RATE))
+    if mode == 'table':
+        table = os.environ.get('RAW_PAYLOAD_TABLE', f"{table_id}_payloads")
+        store = TablePayloadStore(get_client(project_id), f"{project_id}.{dataset_id}.{table}", buffer)
+    elif mode == 'blobs':
+        store = BlobPayloadStore(os.environ.get('RAW_PAYLOAD_DIR', DEFAULT_BLOB_DIR))
+    elif mode == 'none':
+        store = None
+    else:
+        raise ValueError(f"Unknown RAW_PAYLOAD_STORE: {mode} (expected table, blobs or none)")
+    return PayloadLogger(store, sample_rate)
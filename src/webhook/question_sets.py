@@ -0,0 +1,185 @@
+"""
+Versioned question sets for the webhook
+
+Question sets are JSON files built by agent-api/scripts/build_question_set.py:
+
+    {
+      "name": "catalog",
+      "version": "20261019-3f2a9c1e",
+      "content_hash": "<sha256 of the questions and weights>",
+      "weights": {"difficulty": {"Easy": 1, "Extremely Difficult": 3}},
+      "questions": [{"question": "...", "category": "Looker", "difficulty": "Easy"}, ...]
+    }
+
+They are loaded by name from QUESTION_SET_URI, a local directory (default:
+question_sets/ next to this file) or a gs://bucket/prefix. Loaded sets stay
+in memory across warm invocations and are re-checked after
+QUESTION_SET_TTL_SECONDS; a bucket object is only downloaded again when its
+generation changes. A set whose content hash does not match is rejected and
+the last good copy keeps being served.
+
+Set names come from request parameters, so only names made of letters,
+digits, '_', '-' and '.' (and not containing '..') are loaded; anything
+else is rejected before a path or object name is built.
+"""
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+
+DEFAULT_SET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'question_sets')
+DEFAULT_TTL_SECONDS = 300
+SET_NAME_PATTERN = re.compile(r'[\w.-]+')
+
+
+def check_name(name):
+    """
+    Reject set names that could point outside the set directory or prefix.
+
+    Raises:
+        ValueError: If the name is not a plain file name
+    """
+    if not isinstance(name, str) or not SET_NAME_PATTERN.fullmatch(name) or '..' in name:
+        raise ValueError(f"Invalid question set name: {name!r}")
+    return name
+
+
+def content_hash(questions, weights=None):
+    """SHA-256 over the questions and weights, independent of key order."""
+    canonical = json.dumps({"questions": questions, "weights": weights or {}},
+                           sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class QuestionSet:
+    """A validated question set."""
+
+    def __init__(self, data):
+        self.name = data['name']
+        self.version = data.get('version')
+        self.weights = data.get('weights') or {}
+        self.questions = data['questions']
+        self.content_hash = data.get('content_hash')
+        actual = content_hash(self.questions, self.weights)
+        if self.content_hash != actual:
+            raise ValueError(f"Question set {self.name} failed validation: "
+                             f"content hash {self.content_hash} != {actual}")
+        self._by_text = {q['question']: q for q in self.questions}
+
+    def __len__(self):
+        return len(self.questions)
+
+    def texts(self):
+        return [q['question'] for q in self.questions]
+
+    def get(self, question):
+        """Catalog entry (question, category, difficulty) for a question text."""
+        return self._by_text.get(question)
+
+    def weight(self, question):
+        """Product of the question's category and difficulty weights (default 1)."""
+        entry = self._by_text.get(question) or {}
+        weight = 1.0
+        for field in ('category', 'difficulty'):
+            weight *= float(self.weights.get(field, {}).get(entry.get(field), 1))
+        return weight
+
+    def sample(self, k, rng=random):
+        """
+        Weighted sample of k questions without replacement.
+
+        Uses Efraimidis-Spirakis keys (u ** (1 / weight)), so every question
+        with a positive weight can be drawn and heavier ones are drawn more often.
+        """
+        keyed = []
+        for q in self.questions:
+            weight = self.weight(q['question'])
+            if weight > 0:
+                keyed.append((rng.random() ** (1.0 / weight), q['question']))
+        keyed.sort(reverse=True)
+        return [question for _, question in keyed[:k]]
+
+
+class QuestionSetLoader:
+    """
+    Loads question sets by name and caches them.
+
+    Args:
+        base_uri (str): Local directory or gs://bucket/prefix
+        ttl (float): Seconds before a cached set is checked for changes
+    """
+
+    def __init__(self, base_uri=DEFAULT_SET_DIR, ttl=DEFAULT_TTL_SECONDS):
+        self.base_uri = base_uri.rstrip('/')
+        self.ttl = ttl
+        self._cache = {}  # name -> (QuestionSet, source marker, checked_at)
+        self._lock = threading.Lock()
+        self._storage_client = None
+
+    def _read_local(self, name, marker):
+        path = os.path.join(self.base_uri, f"{name}.json")
+        mtime = os.path.getmtime(path)
+        if mtime == marker:
+            return None, marker
+        with open(path, 'rb') as f:
+            return f.read(), mtime
+
+    def _read_bucket(self, name, marker):
+        from google.cloud import storage
+
+        if self._storage_client is None:
+            self._storage_client = storage.Client()
+        bucket_name, _, prefix = self.base_uri[len('gs://'):].partition('/')
+        object_name = f"{prefix}/{name}.json" if prefix else f"{name}.json"
+        blob = self._storage_client.bucket(bucket_name).get_blob(object_name)
+        if blob is None:
+            raise FileNotFoundError(f"gs://{bucket_name}/{object_name}")
+        if blob.generation == marker:
+            return None, marker
+        return blob.download_as_bytes(if_generation_match=blob.generation), blob.generation
+
+    def load(self, name):
+        """
+        Return the named set, from cache when it is fresh or unchanged.
+
+        Raises:
+            ValueError: If the name is not a valid set name
+            Exception: If the set cannot be read or validated and no good copy is cached
+        """
+        check_name(name)
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached and time.time() - cached[2] < self.ttl:
+                return cached[0]
+
+            marker = cached[1] if cached else None
+            read = self._read_bucket if self.base_uri.startswith('gs://') else self._read_local
+            try:
+                raw, marker = read(name, marker)
+                question_set = QuestionSet(json.loads(raw)) if raw is not None else cached[0]
+            except Exception as e:
+                if not cached:
+                    raise
+                print(f"Keeping cached question set {name} {cached[0].version}: {e}")
+                question_set, marker = cached[0], cached[1]
+
+            if not cached or question_set is not cached[0]:
+                print(f"Loaded question set {name} {question_set.version}: {len(question_set)} questions")
+            self._cache[name] = (question_set, marker, time.time())
+            return question_set
+
+
+def create_loader():
+    """
+    Build the loader from environment configuration.
+
+    QUESTION_SET_URI is a local directory or gs://bucket/prefix;
+    QUESTION_SET_TTL_SECONDS sets how long a cached set is trusted.
+    """
+    return QuestionSetLoader(
+        os.environ.get('QUESTION_SET_URI', DEFAULT_SET_DIR),
+        ttl=float(os.environ.get('QUESTION_SET_TTL_SECONDS', DEFAULT_TTL_SECONDS))
+    )
@@ -0,0 +1,271 @@
+"""
+Local write-ahead buffer for BigQuery result rows
+
+log_to_bigquery() used to call insert_rows_json inline: a slow BigQuery call
+held up the next question, and a failed one printed the row and lost it.
+Rows now go to an append-only segment file first and a background flusher
+delivers them in batches with retries.
+
+Segment files live in WEBHOOK_BUFFER_DIR (default /tmp/webhook_buffer) and
+move through these states:
+
+    <id>.open       being appended to by this process
+    <id>.ready      closed, waiting for delivery
+    <id>.inflight   claimed by a flusher
+    <id>.dead       rejected by BigQuery too many times; kept for inspection
+    <id>.torn       lines that could not be parsed (a process that crashed
+                    mid-write leaves a torn last line); kept for inspection
+
+Each line is {"table": ..., "row": ..., "id": ...}. The id is sent as the
+BigQuery insertId so a batch retried after a timeout is not written twice.
+Segments left behind by an earlier invocation (or a crashed process) are
+replayed by the next flush. /tmp is instance memory on Cloud Functions, so
+undelivered rows survive across invocations of the same instance; point
+WEBHOOK_BUFFER_DIR at a mounted volume to survive instance shutdown too.
+"""
+import os
+import glob
+import json
+import time
+import uuid
+import threading
+
+DEFAULT_BUFFER_DIR = '/tmp/webhook_buffer'
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_SEGMENT_ROWS = 1000
+# A segment that fails delivery this many times is set aside as .dead
+MAX_SEGMENT_ATTEMPTS = 5
+# .open/.inflight files untouched this long belong to a process that is gone
+STALE_SECONDS = 300
+
+
+class RowBuffer:
+    """
+    Append-only segment files plus a batch flusher.
+
+    Args:
+        directory (str): Where segment files are kept
+        insert_rows (callable): insert_rows(table_ref, rows, row_ids) that
+            returns a list of BigQuery insert errors ({"index": i, ...})
+        batch_size (int): Rows per insert call
+        segment_rows (int): Rows per segment before it is closed
+        retry_delays (tuple): Seconds to wait between insert attempts
+    """
+
+    def __init__(self, directory, insert_rows, batch_size=DEFAULT_BATCH_SIZE,
+                 segment_rows=DEFAULT_SEGMENT_ROWS, retry_delays=(0.5, 2, 5)):
+        self.directory = directory
+        self.insert_rows = insert_rows
+        self.batch_size = batch_size
+        self.segment_rows = segment_rows
+        self.retry_delays = retry_delays
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._segment = None
+        self._segment_file = None
+        self._segment_count = 0
+        self._flusher = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    # Writing
+
+    def _open_segment(self):
+        self._segment = os.path.join(self.directory, f"{time.time():.6f}-{os.getpid()}-{uuid.uuid4().hex[:8]}-a0")
+        self._segment_file = open(f"{self._segment}.open", 'a', encoding='utf-8')
+        self._segment_count = 0
+
+    def _close_segment(self):
+        if self._segment_file is None:
+            return
+        self._segment_file.close()
+        os.replace(f"{self._segment}.open", f"{self._segment}.ready")
+        self._segment = self._segment_file = None
+
+    def append(self, table_ref, row):
+        """Durably record one row for delivery; returns immediately."""
+        with self._lock:
+            if self._segment_file is None:
+                self._open_segment()
+            line = {"table": table_ref, "row": row, "id": f"{os.path.basename(self._segment)}-{self._segment_count}"}
+            self._segment_file.write(json.dumps(line) + "\n")
+            self._segment_file.flush()
+            os.fsync(self._segment_file.fileno())
+            self._segment_count += 1
+            if self._segment_count >= self.segment_rows:
+                self._close_segment()
+        self._wake.set()
+
+    def rotate(self):
+        """Close the current segment so the flusher can pick it up."""
+        with self._lock:
+            self._close_segment()
+
+    # Delivery
+
+    def _claim_segments(self):
+        """Claim ready segments, plus stale ones left by processes that are gone."""
+        now = time.time()
+        claimed = []
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.ready')) +
+                           glob.glob(os.path.join(self.directory, '*.open')) +
+                           glob.glob(os.path.join(self.directory, '*.inflight'))):
+            base, state = path.rsplit('.', 1)
+            if state != 'ready':
+                if base == self._segment:
+                    continue
+                try:
+                    if now - os.path.getmtime(path) < STALE_SECONDS:
+                        continue
+                except OSError:
+                    continue
+            try:
+                os.replace(path, f"{base}.inflight")
+            except OSError:
+                continue  # Another flusher claimed it first
+            os.utime(f"{base}.inflight")
+            claimed.append(base)
+        return claimed
+
+    def _insert_with_retry(self, table_ref, lines):
+        """
+        Returns:
+            list: Lines that could not be delivered
+        """
+        pending = lines
+        for delay in (0,) + tuple(self.retry_delays):
+            if delay:
+                time.sleep(delay)
+            try:
+                errors = self.insert_rows(table_ref, [l["row"] for l in pending], [l["id"] for l in pending])
+            except Exception as e:
+                print(f"Error inserting {len(pending)} rows into {table_ref}: {e}")
+                continue
+            if not errors:
+                return []
+            failed = {error["index"] for error in errors}
+            print(f"Error inserting rows into {table_ref}: {errors}")
+            pending = [l for i, l in enumerate(pending) if i in failed]
+        return pending
+
+    def _read_segment(self, base):
+        """
+        Parse a claimed segment, moving lines that do not parse to <id>.torn
+        so they cannot block delivery of the rest.
+
+        Returns:
+            list: Parsed lines
+        """
+        lines = []
+        torn = []
+        with open(f"{base}.inflight", encoding='utf-8') as f:
+            for text in f:
+                if not text.strip():
+                    continue
+                try:
+                    lines.append(json.loads(text))
+                except ValueError:
+                    torn.append(text if text.endswith("\n") else text + "\n")
+        if torn:
+            with open(f"{base}.torn", 'a', encoding='utf-8') as f:
+                f.writelines(torn)
+            print(f"Set aside {len(torn)} unreadable lines: {base}.torn")
+        return lines
+
+    def _deliver_segment(self, base):
+        lines = self._read_segment(base)
+
+        by_table = {}
+        for line in lines:
+            by_table.setdefault(line["table"], []).append(line)
+
+        undelivered = []
+        for table_ref, table_lines in by_table.items():
+            for i in range(0, len(table_lines), self.batch_size):
+                undelivered += self._insert_with_retry(table_ref, table_lines[i:i + self.batch_size])
+
+        if undelivered:
+            # Keep only what is still undelivered, counting the attempt in the name
+            prefix, attempts = base.rsplit('-a', 1)
+            attempts = int(attempts) + 1
+            state = 'dead' if attempts >= MAX_SEGMENT_ATTEMPTS else 'ready'
+            with open(f"{prefix}-a{attempts}.{state}", 'w', encoding='utf-8') as f:
+                for line in undelivered:
+                    f.write(json.dumps(line) + "\n")
+            if state == 'dead':
+                print(f"Giving up on {len(undelivered)} rows after {attempts} attempts: {prefix}-a{attempts}.dead")
+        os.remove(f"{base}.inflight")
+        return len(lines) - len(undelivered), len(undelivered)
+
+    def flush(self):
+        """
+        Deliver every closed or abandoned segment.
+
+        Returns:
+            tuple: (rows delivered, rows still pending)
+        """
+        self.rotate()
+        delivered = pending = 0
+        with self._flush_lock:
+            for base in self._claim_segments():
+                ok, failed = self._deliver_segment(base)
+                delivered += ok
+                pending += failed
+        return delivered, pending
+
+    def pending_rows(self):
+        """Rows in segments that have not been delivered (excluding .dead)."""
+        count = 0
+        for state in ('open', 'ready', 'inflight'):
+            for path in glob.glob(os.path.join(self.directory, f'*.{state}')):
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        count += sum(1 for line in f if line.strip())
+                except OSError:
+                    pass
+        return count
+
+    # Background flusher
+
+    def start(self, interval=2.0):
+        """Start a daemon thread that flushes whenever rows arrive (at most every interval seconds)."""
+        if self._flusher and self._flusher.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                self._wake.wait(interval)
+                self._wake.clear()
+                time.sleep(interval)
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Background flush failed: {e}")
+
+        self._flusher = threading.Thread(target=run, name='row-buffer-flusher', daemon=True)
+        self._flusher.start()
+
+    def drain(self, timeout=30):
+        """
+        Flush everything now, giving up after timeout seconds.
+
+        Rows that are not delivered stay on disk for the next invocation.
+
+        Returns:
+            tuple: (rows delivered, rows still pending)
+        """
+        result = {}
+
+        def run():
+            result['counts'] = self.flush()
+
+        worker = threading.Thread(target=run, name='row-buffer-drain', daemon=True)
+        worker.start()
+        worker.join(timeout)
+        if worker.is_alive():
+            print(f"Buffer drain still running after {timeout}s; remaining rows replay on the next invocation")
+            return 0, self.pending_rows()
+        return result['counts']
@@ -0,0 +1,209 @@
+"""
+Staleness-aware question selection for scheduled runs
+
+Scheduled runs used to ask every test question every time. The policy here
+asks only the questions whose last result no longer tells us anything new,
+within a per-run budget:
+
+1. never asked (or not within the lookback window)
+2. last asked against a different agent version
+3. unstable: consecutive recent answers are about as different as answers
+   to different questions, by drift.py's similarity (re-asked at most
+   every quarter of the maximum age, so they cannot starve the rest)
+4. older than the maximum age
+
+Higher-priority reasons go first. Within a reason the oldest result goes
+first, or, when question weights are given, questions are drawn at random
+in proportion to weight times age so a large catalog is covered over time.
+Everything else is skipped until it becomes due.
+
+Per-question history comes from the results table. The agent version is
+AGENT_VERSION when set, otherwise a fingerprint of the agent's playbooks
+(their names and update times), so editing a playbook makes every question
+due again.
+"""
+import os
+import random
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from drift import similarity
+
+# Hourly runs: one run re-asks the whole smoke set after a playbook change,
+# and the 140-question catalog is covered daily with room for unstable re-asks
+DEFAULT_BUDGET = 10
+DEFAULT_MAX_AGE_HOURS = 24
+# On drift.similarity, repeated answers in agent-api/data score 0.94-1.0 and
+# answers to different questions 0.15 (median); reworded but equivalent
+# answers score around 0.3, so only answers below that count as unstable
+DEFAULT_MIN_STABILITY = 0.2
+DEFAULT_LOOKBACK_DAYS = 30
+# Recent answers per question compared for stability
+HISTORY_DEPTH = 3
+
+# Selection reasons, highest priority first
+REASONS = ('new', 'agent_changed', 'unstable', 'stale')
+
+
+class QuestionState:
+    """What the results table says about one question."""
+
+    def __init__(self, question, last_asked=None, agent_version=None, answers=None):
+        self.question = question
+        self.last_asked = last_asked
+        self.agent_version = agent_version
+        self.answers = answers or []
+
+    @property
+    def stability(self):
+        """Mean drift.similarity() of consecutive recent answers (1.0 = identical)."""
+        if len(self.answers) < 2:
+            return 1.0
+        return float(similarity(self.answers[:-1], self.answers[1:]).mean())
+
+
+class StalenessPolicy:
+    """
+    Picks the questions a scheduled run should ask.
+
+    Args:
+        budget (int): Maximum questions per run
+        max_age_hours (float): Re-ask a question at least this often
+        min_stability (float): Re-ask questions whose recent answers agree less than this
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET, max_age_hours=DEFAULT_MAX_AGE_HOURS,
+                 min_stability=DEFAULT_MIN_STABILITY):
+        self.budget = budget
+        self.max_age = timedelta(hours=max_age_hours)
+        self.min_stability = min_stability
+
+    def reason(self, state, agent_version, now):
+        """Why a question is due, or None if its last result is still current."""
+        if state is None or state.last_asked is None:
+            return 'new'
+        if agent_version and state.agent_version != agent_version:
+            return 'agent_changed'
+        age = now - state.last_asked
+        if state.stability < self.min_stability and age >= self.max_age / 4:
+            return 'unstable'
+        if age >= self.max_age:
+            return 'stale'
+        return None
+
+    def select(self, questions, states, agent_version=None, now=None, weight=None, rng=random):
+        """
+        Args:
+            questions (list): Candidate questions
+            states (dict): question -> QuestionState
+            agent_version (str, optional): Current agent version
+            weight (callable, optional): question -> sampling weight
+
+        Returns:
+            list: (question, reason) pairs, at most budget long
+        """
+        now = now or datetime.now(timezone.utc)
+        oldest = datetime.min.replace(tzinfo=timezone.utc)
+        due = []
+        for question in questions:
+            state = states.get(question)
+            reason = self.reason(state, agent_version, now)
+            if not reason:
+                continue
+            last_asked = state.last_asked if state and state.last_asked else None
+            if weight is None:
+                order = last_asked or oldest
+            else:
+                # Weighted random key (Efraimidis-Spirakis); older results weigh more
+                age_factor = 1 + (now - last_asked) / self.max_age if last_asked else 1
+                w = weight(question) * age_factor
+                if w <= 0:
+                    continue
+                order = -(rng.random() ** (1.0 / w))
+            due.append((REASONS.index(reason), order, question, reason))
+        due.sort()
+        return [(question, reason) for _, _, question, reason in due[:self.budget]]
+
+
+def select_for_run(questions, states, agent_version=None, schedule_policy='stale', ask_all=False,
+                   weight=None, now=None, rng=random):
+    """
+    Questions a scheduled run asks under SCHEDULE_POLICY.
+
+    Args:
+        questions (list): Candidate questions
+        states (dict): question -> QuestionState
+        agent_version (str, optional): Current agent version
+        schedule_policy (str): 'all' asks every question; anything else uses
+            the staleness policy from create_policy()
+        ask_all (bool): Ask every question for this run (?all=true)
+        weight (callable, optional): question -> sampling weight
+
+    Returns:
+        list: (question, reason) pairs; the reason is 'all' when every question is asked
+    """
+    if schedule_policy == 'all' or ask_all:
+        return [(question, 'all') for question in questions]
+    return create_policy().select(questions, states, agent_version, now=now, weight=weight, rng=rng)
+
+
+def load_states(client, table_ref, lookback_days=DEFAULT_LOOKBACK_DAYS):
+    """
+    Read recent per-question history from the results table.
+
+    Returns:
+        dict: question -> QuestionState
+    """
+    query = f"""
+    SELECT question, timestamp, response_text, agent_version
+    FROM `{table_ref}`
+    WHERE timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL {int(lookback_days)} DAY)
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY question ORDER BY timestamp DESC) <= {HISTORY_DEPTH}
+    ORDER BY question, timestamp DESC
+    """
+    states = {}
+    for row in client.query(query).result():
+        state = states.get(row['question'])
+        if state is None:
+            # Rows arrive newest first, so the first one sets last_asked and the version
+            state = states[row['question']] = QuestionState(row['question'], row['timestamp'], row['agent_version'])
+        state.answers.append(row['response_text'])
+    return states
+
+
+def agent_version(access_token, project_id, location, agent_id):
+    """
+    Current agent version: AGENT_VERSION, else a fingerprint of the playbooks.
+
+    Returns:
+        str or None: None when the version cannot be determined
+    """
+    import requests
+
+    if os.environ.get('AGENT_VERSION'):
+        return os.environ['AGENT_VERSION']
+    host = "dialogflow.googleapis.com" if location == 'global' else f"{location}-dialogflow.googleapis.com"
+    url = f"https://{host}/v3/projects/{project_id}/locations/{location}/agents/{agent_id}/playbooks"
+    try:
+        response = requests.get(url, headers={"Authorization": f"Bearer {access_token}"}, timeout=10)
+        response.raise_for_status()
+    except Exception as e:
+        print(f"Could not read agent playbooks for versioning: {e}")
+        return None
+    playbooks = sorted((p.get('name', ''), p.get('updateTime', '')) for p in response.json().get('playbooks', []))
+    return hashlib.sha1(repr(playbooks).encode('utf-8')).hexdigest()[:12]
+
+
+def create_policy():
+    """
+    Build the policy from environment configuration.
+
+    SCHEDULE_BUDGET caps questions per scheduled run, SCHEDULE_MAX_AGE_HOURS
+    is how often every question is re-asked regardless, SCHEDULE_MIN_STABILITY
+    is the answer agreement below which a question is re-asked.
+    """
+    return StalenessPolicy(
+        budget=int(os.environ.get('SCHEDULE_BUDGET', DEFAULT_BUDGET)),
+        max_age_hours=float(os.environ.get('SCHEDULE_MAX_AGE_HOURS', DEFAULT_MAX_AGE_HOURS)),
+        min_stability=float(os.environ.get('SCHEDULE_MIN_STABILITY', DEFAULT_MIN_STABILITY))
+    )